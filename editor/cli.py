@@ -0,0 +1,379 @@
+"""
+OpenFF command-line interface.
+
+Runs the game data core without Qt, for scripts and batch pipelines:
+
+    python openff.py extract js/app.js --domains items,monsters
+    python openff.py export js/app.js -o out/ --format ndjson
+    python openff.py patch js/app.js --edits edits.json -o patched/app.js
+    python openff.py import js/app.js -i out/ -o patched/app.js
+    python openff.py validate variants/*/app.js --jobs 8
+    python openff.py stats variants/*/app.js --format ndjson
+
+Every command takes one or many bundles; with --jobs they are processed in
+a process pool. Results go to stdout as one JSON document (a list when
+there are several bundles) or as NDJSON, one object per line; the messages
+the core prints go to stderr (or nowhere with --quiet). The exit status is
+0 on success, 1 if a bundle failed to load, patch or validate (an edit
+that can't be written into the bundle fails the patch), 2 for invalid
+arguments.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+# The core modules import each other as core.xxx, relative to editor/
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.game_data_manager import GameDataManager, EXTRACTION_ORDER
+from core.undo_history import MISSING, set_path
+from core.records import to_json
+
+
+def dumps(value, indent=None):
+    """Serialize a result, keeping non-ASCII text readable."""
+    return json.dumps(value, ensure_ascii=False, indent=indent, default=to_json)
+
+
+def parse_domains(text):
+    """Parse a --domains value, e.g. 'items,monsters'."""
+    if not text:
+        return list(EXTRACTION_ORDER)
+    domains = [name.strip() for name in text.split(',') if name.strip()]
+    unknown = [name for name in domains if name not in EXTRACTION_ORDER]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown domain(s): {', '.join(unknown)} "
+                                         f"(choose from {', '.join(EXTRACTION_ORDER)})")
+    return domains
+
+
+def read_edits(path):
+    """
+    Read the edits of the patch command.
+
+    A JSON list of edits, or NDJSON with one edit per line. An edit is
+    {"domain": "items", "key": "Potion", "set": {"price": 60, "stat_bonuses.lk": 2},
+    "unset": ["effect"]}; the key is the record's journal key (see
+    GameData.RECORD_KEY), "index" can select the record by position instead,
+    and dotted field names reach into nested values.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _field_path(name):
+    """Split a dotted field name into a key path, list positions as ints."""
+    return tuple(int(part) if part.isdigit() else part for part in name.split('.'))
+
+
+def load_bundle(bundle, use_cache):
+    """
+    Load a bundle without the GUI features (edit log, lazy extraction).
+
+    Returns:
+        tuple: (GameDataManager, seconds taken); the manager's last_error is
+            set if the load failed
+    """
+    manager = GameDataManager(use_cache=use_cache, edit_log=False)
+    start = time.perf_counter()
+    manager.load_from_file(bundle)
+    return manager, time.perf_counter() - start
+
+
+def command_extract(manager, bundle, options):
+    """Extract the records of the selected domains."""
+    return {'bundle': bundle,
+            'domains': {name: list(manager.domain_records(name)) for name in options.domains}}
+
+
+def command_export(manager, bundle, options):
+    """Write one file per domain into the output directory."""
+    # Bundles are exported side by side, named after their directory
+    output = options.output
+    if len(options.bundles) > 1:
+        name = os.path.basename(os.path.dirname(os.path.abspath(bundle))) or 'bundle'
+        output = os.path.join(output, name)
+
+    # Streamed per domain, the files already up to date are left alone
+    fmt = 'ndjson.gz' if options.compress else options.format
+    files = manager.export_data(output, fmt, options.domains, options.force)
+    return {'bundle': bundle, 'files': files}
+
+
+def _output_file(bundle, options):
+    """Get the file patch and import save to, None for the bundle itself."""
+    output = options.output
+    if output and len(options.bundles) > 1:
+        name = os.path.basename(os.path.dirname(os.path.abspath(bundle))) or 'bundle'
+        output = os.path.join(output, name, os.path.basename(bundle))
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    return output
+
+
+def command_patch(manager, bundle, options):
+    """Apply edits to records and save the bundle."""
+    edits = read_edits(options.edits)
+    applied = 0
+    errors = []
+    for number, edit in enumerate(edits, 1):
+        try:
+            domain = edit['domain']
+            if domain not in EXTRACTION_ORDER:
+                raise ValueError(f"unknown domain {domain!r}")
+            handler = manager.handler(domain)
+            records = manager.domain_records(domain)
+            if 'index' in edit:
+                record = records[edit['index']]
+            else:
+                record = next((other for other in records if handler.record_key(other) == edit['key']), None)
+            if record is None:
+                raise ValueError(f"no {domain} record {edit.get('key')!r}")
+            for field, value in edit.get('set', {}).items():
+                set_path(record, _field_path(field), value)
+            for field in edit.get('unset', []):
+                set_path(record, _field_path(field), MISSING)
+            manager.record_changed(record)
+            applied += 1
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            errors.append(f"edit {number}: {str(e)}")
+
+    output = _output_file(bundle, options)
+    result = {'bundle': bundle, 'output': output or bundle, 'applied': applied, 'errors': errors,
+              'changes': [entry.describe() for entry in manager.journal.entries()]}
+    if errors and not options.force:
+        result['saved'] = False
+    else:
+        _save(manager, output, result, options.force)
+    result['ok'] = result['saved'] and (not errors or options.force)
+    return result
+
+
+def command_import(manager, bundle, options):
+    """Update the records from an export directory and save the bundle."""
+    try:
+        changed = manager.import_data(options.input, options.domains, prune=not options.keep)
+    except (OSError, ValueError) as e:
+        return {'bundle': bundle, 'ok': False, 'errors': [f"import failed: {str(e)}"]}
+    output = _output_file(bundle, options)
+    result = {'bundle': bundle, 'output': output or bundle, 'domains': sorted(changed),
+              'changes': [entry.describe() for entry in manager.journal.entries()]}
+    if changed:
+        _save(manager, output, result, options.force)
+    else:
+        result['saved'] = True
+    result['ok'] = result['saved']
+    return result
+
+
+def _save(manager, output, result, force):
+    """
+    Save the bundle for patch and import.
+
+    'saved' is only true if every edit was written; 'written' counts the
+    values written, and 'unsaved' lists the edits that can't be. Like edit
+    errors, those keep the bundle untouched unless force is set.
+    """
+    _, _, unsaved = manager.collect_source_patches()
+    if unsaved and not force:
+        result.update(saved=False, written=0, unsaved=manager.describe_unsaved(unsaved))
+        return
+    result['saved'] = manager.save_to_file(output or None)
+    result['written'] = manager.saved_changes
+    if manager.unsaved_changes:
+        result['unsaved'] = manager.unsaved_changes
+
+
+def command_validate(manager, bundle, options):
+    """Check the extracted data for problems."""
+    errors = []
+    warnings = []
+    if manager.using_default_characters:
+        warnings.append("characters: not found in the bundle, defaults were used")
+    # A load restored from the cache doesn't index the bundle
+    if not len(manager.module_index):
+        manager.module_index.build(manager.js_content)
+    for name in options.domains:
+        handler = manager.handler(name)
+        records = manager.domain_records(name)
+        if handler.MODULE_PATH and manager.module_index.get_source(handler.MODULE_PATH) is None:
+            errors.append(f"{name}: module {handler.MODULE_PATH} not found, the data are defaults")
+        if not records:
+            errors.append(f"{name}: no records extracted")
+            continue
+        keys = {}
+        for record in records:
+            key = handler.record_key(record)
+            if key is None:
+                errors.append(f"{name}: record without a {handler.RECORD_KEY}")
+            keys[key] = keys.get(key, 0) + 1
+        duplicates = sorted(str(key) for key, count in keys.items() if count > 1 and key is not None)
+        if duplicates:
+            warnings.append(f"{name}: duplicate {handler.RECORD_KEY}(s): {', '.join(duplicates[:10])}")
+        if len(handler.spans):
+            unlocated = sum(1 for record in records if handler.source_span(record) is None)
+            if unlocated:
+                warnings.append(f"{name}: {unlocated} record(s) have no location in the bundle")
+
+    # Saving unedited data must not change anything: every extracted value
+    # has to write back exactly as it was read
+    manager.mark_as_changed()
+    patches, _, _ = manager.collect_source_patches()
+    for patch in patches[:20]:
+        errors.append(f"round trip: bytes {patch.start}-{patch.end} would be rewritten as {patch.text[:60]!r}")
+    if len(patches) > 20:
+        errors.append(f"round trip: {len(patches) - 20} more value(s) would be rewritten")
+    manager.journal.clear()
+
+    return {'bundle': bundle, 'ok': not errors, 'errors': errors, 'warnings': warnings}
+
+
+def command_stats(manager, bundle, options):
+    """Count the records and describe the bundle."""
+    counts = {name: len(manager.domain_records(name)) for name in options.domains}
+    located = {}
+    for name in options.domains:
+        handler = manager.handler(name)
+        located[name] = sum(1 for record in manager.domain_records(name) if handler.source_span(record) is not None)
+    return {'bundle': bundle, 'size': os.path.getsize(bundle), 'modules': len(manager.module_index),
+            'records': counts, 'located_records': located,
+            'default_characters': manager.using_default_characters}
+
+
+COMMANDS = {
+    'extract': command_extract,
+    'export': command_export,
+    'patch': command_patch,
+    'import': command_import,
+    'validate': command_validate,
+    'stats': command_stats,
+}
+
+
+def run_bundle(bundle, options):
+    """
+    Run the command on one bundle, in this process or a pool worker.
+
+    Returns:
+        dict: The command's result, with 'ok' and 'seconds'
+    """
+    start = time.perf_counter()
+    sink = open(os.devnull, 'w') if options.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(sink):
+            manager, seconds = load_bundle(bundle, not options.no_cache)
+            if manager.last_error:
+                return {'bundle': bundle, 'ok': False, 'errors': [f"load failed: {manager.last_error}"],
+                        'seconds': round(seconds, 3)}
+            result = COMMANDS[options.command](manager, bundle, options)
+    except Exception as e:
+        return {'bundle': bundle, 'ok': False, 'errors': [f"{type(e).__name__}: {str(e)}"]}
+    finally:
+        if sink is not sys.stderr:
+            sink.close()
+    result.setdefault('ok', True)
+    result['load_seconds'] = round(seconds, 3)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def iter_results(options):
+    """Run the command over every bundle, yielding the results in bundle order."""
+    if options.jobs > 1 and len(options.bundles) > 1:
+        with ProcessPoolExecutor(max_workers=options.jobs) as pool:
+            yield from pool.map(run_bundle, options.bundles, [options] * len(options.bundles))
+    else:
+        for bundle in options.bundles:
+            yield run_bundle(bundle, options)
+
+
+def write_results(results, options, out):
+    """Print the results as JSON or NDJSON, returns True if they all succeeded."""
+    ok = True
+    collected = []
+    for result in results:
+        ok = ok and result.get('ok', True)
+        if options.format != 'ndjson':
+            collected.append(result)
+        elif options.command == 'extract' and 'domains' in result:
+            # One line per record, easy to stream into other tools
+            for name, records in result['domains'].items():
+                for record in records:
+                    out.write(dumps({'bundle': result['bundle'], 'domain': name, 'record': record}) + '\n')
+        else:
+            out.write(dumps(result) + '\n')
+        out.flush()
+    if options.format != 'ndjson':
+        document = collected[0] if len(collected) == 1 else collected
+        out.write(dumps(document, indent=2) + '\n')
+    return ok
+
+
+def build_parser():
+    """Build the argument parser of the CLI."""
+    parser = argparse.ArgumentParser(prog='openff', description="OpenFF game data tools, without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, help_text):
+        command = subparsers.add_parser(name, help=help_text, description=help_text)
+        command.add_argument('bundles', nargs='+', metavar='BUNDLE', help="app.js bundle(s) to process")
+        command.add_argument('--domains', type=parse_domains, default=list(EXTRACTION_ORDER),
+                             help=f"comma-separated domains (default: all of {','.join(EXTRACTION_ORDER)})")
+        command.add_argument('--format', choices=('json', 'ndjson'), default='json', help="output format")
+        command.add_argument('--jobs', '-j', type=int, default=1,
+                             help="bundles processed in parallel, 0 for one per CPU")
+        command.add_argument('--no-cache', action='store_true', help="ignore the extraction cache")
+        command.add_argument('--quiet', '-q', action='store_true', help="hide the progress messages")
+        return command
+
+    add_command('extract', "Extract game data records.")
+    export = add_command('export', "Export game data records to one file per domain.")
+    export.add_argument('--output', '-o', required=True, help="output directory")
+    export.add_argument('--compress', action='store_true', help="gzip the NDJSON files (.ndjson.gz)")
+    export.add_argument('--force', action='store_true', help="rewrite the files that didn't change")
+    patch = add_command('patch', "Apply record edits and save the bundle.")
+    patch.add_argument('--edits', '-e', required=True, help="JSON list or NDJSON file of edits")
+    patch.add_argument('--output', '-o', help="file to write (a directory with several bundles), "
+                                              "the bundle itself by default")
+    patch.add_argument('--force', action='store_true', help="save even if some edits failed")
+    import_ = add_command('import', "Update records from an export directory and save the bundle.")
+    import_.add_argument('--input', '-i', required=True, help="export directory")
+    import_.add_argument('--output', '-o', help="file to write (a directory with several bundles), "
+                                                "the bundle itself by default")
+    import_.add_argument('--keep', action='store_true', help="keep the records the exported files don't have")
+    import_.add_argument('--force', action='store_true', help="save the changes that can be written even if "
+                                                              "others can't")
+    add_command('validate', "Check that the game data extracts and writes back cleanly.")
+    add_command('stats', "Count the records of each domain.")
+    return parser
+
+
+def main(argv=None):
+    """Run the CLI, returns the exit status."""
+    options = build_parser().parse_args(argv)
+    if options.jobs < 1:
+        options.jobs = os.cpu_count() or 1
+    missing = [bundle for bundle in options.bundles if not os.path.isfile(bundle)]
+    if missing:
+        print(f"openff: no such bundle: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    try:
+        ok = write_results(iter_results(options), options, sys.stdout)
+    except BrokenPipeError:
+        # The reader stopped early (e.g. piped into head), not an error
+        sys.stdout = open(os.devnull, 'w')
+        return 0
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
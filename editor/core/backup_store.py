@@ -0,0 +1,438 @@
+"""
+Versioned backups of the bundle.
+
+Saves used to copy the whole app.js over a single app.js.bak, which cost a
+full copy per save and kept one version only. The store keeps every saved
+version in ``.openff_backups/<bundle name>/`` next to the bundle instead:
+
+- objects are named by the SHA-256 of the content they hold, so saving the
+  same content twice stores it once;
+- an object is either the full content (zlib) or a delta against the
+  previous version: the lines copied from it and the lines inserted, so a
+  save that patched a few values of a 900 KB bundle costs a few hundred
+  bytes. Every MAX_CHAIN deltas a full copy bounds the restore cost;
+- ``versions.json`` lists the versions (number, object, time, label);
+- a RetentionPolicy drops old versions, and the objects no kept version
+  needs, after every new version.
+
+Every file (objects, the version list, restored bundles) is written with
+atomic_write(): a temporary file, fsync, then a rename over the target, so
+a crash never leaves a half-written file.
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import hashlib
+import tempfile
+
+BACKUP_DIR_NAME = ".openff_backups"
+VERSIONS_FILE_NAME = "versions.json"
+
+# Deltas in a row before a version is stored in full again
+MAX_CHAIN = 16
+
+_MAGIC = b"OFFBACK1"
+_FULL = b"F"
+_DELTA = b"D"
+
+# magic, kind, chain depth, base object digest (zeros for a full object)
+_HEADER = struct.Struct("<8scH32s")
+# Delta operations: copy base lines [start, start + count), or insert data
+_COPY = struct.Struct("<cII")
+_INSERT = struct.Struct("<cI")
+
+
+# Umask of the process, read once: reading it means setting it, which isn't thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class BackupError(Exception):
+    """A version or object of the store is missing or damaged."""
+
+
+def atomic_write(path, data):
+    """
+    Write bytes to a file atomically.
+
+    The data goes to a temporary file in the same directory, is fsync'ed,
+    then renamed over path; see copy_permissions() for its mode.
+
+    Args:
+        path (str): File to write
+        data (bytes): New content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        copy_permissions(temp_path, path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def copy_permissions(temp_path, path):
+    """
+    Give a temporary file about to be renamed over path the mode path should have.
+
+    mkstemp() creates files readable by their owner only: the file keeps the
+    permissions of the file it replaces, or gets those of a file created
+    with open() (0o666 minus the umask) if path doesn't exist yet.
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(temp_path, mode)
+
+
+def fsync_directory(directory):
+    """Make a rename in directory durable, where the platform allows it."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def make_delta(base, target):
+    """
+    Encode target as the lines it copies from base and the lines it adds.
+
+    Lines are matched through a dict of the base lines, in one pass over
+    the target: a copy goes on while the next lines match, and restarts at
+    the first occurrence of the next line otherwise.
+
+    Args:
+        base (bytes): Previous content
+        target (bytes): New content
+
+    Returns:
+        bytes: The delta, see apply_delta()
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    first = {}
+    for position, line in enumerate(base_lines):
+        first.setdefault(line, position)
+
+    parts = []
+    copy_start = copy_end = None
+    inserted = []
+
+    def flush_copy():
+        if copy_start is not None:
+            parts.append(_COPY.pack(b'C', copy_start, copy_end - copy_start))
+
+    def flush_insert():
+        if inserted:
+            data = b''.join(inserted)
+            parts.append(_INSERT.pack(b'I', len(data)))
+            parts.append(data)
+            inserted.clear()
+
+    for line in target_lines:
+        if copy_end is not None and copy_end < len(base_lines) and base_lines[copy_end] == line:
+            copy_end += 1
+            continue
+        position = first.get(line)
+        if position is None:
+            flush_copy()
+            copy_start = copy_end = None
+            inserted.append(line)
+        else:
+            flush_copy()
+            flush_insert()
+            copy_start, copy_end = position, position + 1
+    flush_copy()
+    flush_insert()
+    return b''.join(parts)
+
+
+def apply_delta(base, delta):
+    """Rebuild the content a delta was made of, from its base."""
+    base_lines = base.splitlines(keepends=True)
+    pieces = []
+    offset = 0
+    while offset < len(delta):
+        kind = delta[offset:offset + 1]
+        if kind == b'C':
+            _, start, count = _COPY.unpack_from(delta, offset)
+            offset += _COPY.size
+            pieces.append(b''.join(base_lines[start:start + count]))
+        elif kind == b'I':
+            _, length = _INSERT.unpack_from(delta, offset)
+            offset += _INSERT.size
+            pieces.append(delta[offset:offset + length])
+            offset += length
+        else:
+            raise BackupError("Damaged delta")
+    return b''.join(pieces)
+
+
+class BackupVersion:
+    """One version of the bundle in the store."""
+
+    __slots__ = ('number', 'digest', 'time', 'size', 'label')
+
+    def __init__(self, number, digest, time, size, label=""):
+        self.number = number    # Increasing, never reused
+        self.digest = digest    # SHA-256 of the content, hex, names its object
+        self.time = time        # Seconds since the epoch
+        self.size = size        # Bytes of the bundle
+        self.label = label
+
+    def to_dict(self):
+        return {'number': self.number, 'digest': self.digest, 'time': self.time,
+                'size': self.size, 'label': self.label}
+
+    def describe(self):
+        """Get a one-line description, e.g. for a list of versions."""
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time))
+        return f"#{self.number}  {when}  {self.size:,} bytes  {self.label}"
+
+    def __repr__(self):
+        return f"BackupVersion({self.number}, {self.digest[:12]}, {self.label!r})"
+
+
+class RetentionPolicy:
+    """Which versions a store keeps."""
+
+    def __init__(self, keep_last=50, keep_daily=30):
+        """
+        Initialize the policy.
+
+        Args:
+            keep_last (int): Most recent versions always kept
+            keep_daily (int): Days for which the last version of the day is kept
+                too, counting back from the newest version
+        """
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+
+    def select(self, versions):
+        """Get the numbers of the versions to keep, versions being oldest first."""
+        keep = {version.number for version in versions[-self.keep_last:]} if self.keep_last else set()
+        if versions and self.keep_daily:
+            newest_day = int(versions[-1].time // 86400)
+            last_of_day = {}
+            for version in versions:
+                day = int(version.time // 86400)
+                if newest_day - day < self.keep_daily:
+                    last_of_day[day] = version.number
+            keep.update(last_of_day.values())
+        if versions:
+            # The newest one is the base of the next delta
+            keep.add(versions[-1].number)
+        return keep
+
+
+class BackupStore:
+    """Deduplicated, delta-compressed versions of one bundle."""
+
+    def __init__(self, js_path, retention=None, max_chain=MAX_CHAIN):
+        """
+        Initialize the store of a bundle.
+
+        Args:
+            js_path (str): Path of the bundle
+            retention (RetentionPolicy): Versions to keep, the default policy if None
+            max_chain (int): Deltas in a row before a full copy
+        """
+        self.js_path = os.path.abspath(js_path)
+        self.root = os.path.join(os.path.dirname(self.js_path), BACKUP_DIR_NAME, os.path.basename(self.js_path))
+        self.retention = retention if retention is not None else RetentionPolicy()
+        self.max_chain = max_chain
+        # Content of the newest version, the base of the next delta
+        self._last = None
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def versions(self):
+        """Get the stored versions, oldest first."""
+        try:
+            with open(os.path.join(self.root, VERSIONS_FILE_NAME), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            raise BackupError(f"Unreadable version list: {str(e)}")
+        return [BackupVersion(**version) for version in data.get('versions', [])]
+
+    def get_version(self, number):
+        """Get a version by number, None if there is no such version."""
+        return next((version for version in self.versions() if version.number == number), None)
+
+    def add(self, data, label=""):
+        """
+        Store a version of the bundle.
+
+        Args:
+            data (bytes): Content of the bundle
+            label (str): Description, e.g. "Before save"
+
+        Returns:
+            BackupVersion: The new version, None if data is the newest version already
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        versions = self.versions()
+        if versions and versions[-1].digest == digest:
+            return None
+
+        if not os.path.exists(self._object_path(digest)):
+            self._write_object(digest, data, versions[-1] if versions else None)
+        number = versions[-1].number + 1 if versions else 1
+        version = BackupVersion(number, digest, time.time(), len(data), label)
+        versions.append(version)
+        self._last = (digest, data)
+
+        kept = self.retention.select(versions)
+        versions = [other for other in versions if other.number in kept]
+        self._write_versions(versions)
+        self._collect_garbage(versions)
+        return version
+
+    def add_file(self, path=None, label=""):
+        """Store the current content of the bundle (or another file), see add()."""
+        with open(path or self.js_path, 'rb') as f:
+            return self.add(f.read(), label)
+
+    def read(self, number):
+        """
+        Get the content of a version.
+
+        Raises:
+            BackupError: If the version or one of its objects is missing or damaged
+        """
+        version = self.get_version(number)
+        if version is None:
+            raise BackupError(f"No backup version {number}")
+        return self._read_object(version.digest)
+
+    def restore(self, number, path=None):
+        """
+        Write a version back over the bundle, atomically.
+
+        The content being replaced is stored first, so a restore can be undone
+        by restoring that version.
+
+        Args:
+            number (int): Version to restore
+            path (str): File to write, the bundle by default
+
+        Returns:
+            BackupVersion: The restored version
+        """
+        data = self.read(number)
+        path = path or self.js_path
+        if os.path.exists(path):
+            self.add_file(path, "Before restore")
+        atomic_write(path, data)
+        return self.get_version(number)
+
+    def _write_object(self, digest, data, previous):
+        """Store data as a delta against the previous version, or in full."""
+        kind, depth, base_digest, payload = _FULL, 0, b"\0" * 32, data
+        if previous is not None:
+            try:
+                _, base_depth, _ = self._read_header(previous.digest)
+                if base_depth < self.max_chain:
+                    if self._last is None or self._last[0] != previous.digest:
+                        self._last = (previous.digest, self._read_object(previous.digest))
+                    delta = make_delta(self._last[1], data)
+                    if len(delta) < len(data) // 2:
+                        kind, depth, base_digest, payload = _DELTA, base_depth + 1, bytes.fromhex(previous.digest), delta
+            except BackupError as e:
+                # A damaged base can't be built on, store this one in full
+                print(f"Warning: {str(e)}")
+        path = self._object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, _HEADER.pack(_MAGIC, kind, depth, base_digest) + zlib.compress(payload, 6))
+
+    def _read_header(self, digest):
+        """Get (kind, chain depth, base digest) of an object."""
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                header = f.read(_HEADER.size)
+        except OSError:
+            raise BackupError(f"Missing backup object {digest[:12]}")
+        if len(header) < _HEADER.size:
+            raise BackupError(f"Damaged backup object {digest[:12]}")
+        magic, kind, depth, base = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise BackupError(f"Damaged backup object {digest[:12]}")
+        return kind, depth, base.hex() if kind == _DELTA else None
+
+    def _read_object(self, digest):
+        """Rebuild the content of an object, following its delta chain."""
+        chain = []
+        current = digest
+        while current is not None:
+            if any(current == other for other, _, _ in chain):
+                raise BackupError(f"Backup delta chain loops at {current[:12]}")
+            try:
+                with open(self._object_path(current), 'rb') as f:
+                    raw = f.read()
+            except OSError:
+                raise BackupError(f"Missing backup object {current[:12]}")
+            magic, kind, _, base = _HEADER.unpack_from(raw)
+            if magic != _MAGIC:
+                raise BackupError(f"Damaged backup object {current[:12]}")
+            try:
+                payload = zlib.decompress(raw[_HEADER.size:])
+            except zlib.error:
+                raise BackupError(f"Damaged backup object {current[:12]}")
+            chain.append((current, kind, payload))
+            current = base.hex() if kind == _DELTA else None
+
+        data = None
+        for object_digest, kind, payload in reversed(chain):
+            data = payload if kind == _FULL else apply_delta(data, payload)
+            if hashlib.sha256(data).hexdigest() != object_digest:
+                raise BackupError(f"Backup object {object_digest[:12]} doesn't match its content")
+        return data
+
+    def _write_versions(self, versions):
+        os.makedirs(self.root, exist_ok=True)
+        data = json.dumps({'versions': [version.to_dict() for version in versions]}, indent=1)
+        atomic_write(os.path.join(self.root, VERSIONS_FILE_NAME), data.encode('utf-8'))
+
+    def _collect_garbage(self, versions):
+        """Delete the objects no kept version needs, bases of kept deltas included."""
+        needed = set()
+        for version in versions:
+            current = version.digest
+            while current is not None and current not in needed:
+                needed.add(current)
+                try:
+                    current = self._read_header(current)[2]
+                except BackupError:
+                    break
+        objects = os.path.join(self.root, "objects")
+        for prefix in os.listdir(objects) if os.path.isdir(objects) else ():
+            for name in os.listdir(os.path.join(objects, prefix)):
+                if prefix + name not in needed:
+                    try:
+                        os.remove(os.path.join(objects, prefix, name))
+                    except OSError:
+                        pass
@@ -0,0 +1,316 @@
+"""
+Journal of the unsaved edits to the game data.
+
+Instead of one "changed" flag per handler, the journal keeps what changed:
+for every touched record its domain, key and the fields that differ from
+the loaded data, with their old and new values. Records added or removed
+through the record lists are journaled too. has_changes() reads from the
+journal, saves only visit the touched records, and the window can show
+exactly what is pending.
+
+Edits are reported with GameDataManager.record_changed(record), which diffs
+the record against its original (re-read from app.js, or a snapshot for the
+data not extracted from literals). The entries of a record are replaced on
+every report, so they are always the net change: editing a field back to
+its original value removes its entry.
+
+Changes that weren't reported record by record (mark_as_changed(), a whole
+list replaced...) mark their domain dirty, and the next save falls back to
+visiting every record of that domain.
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+# Value of a field a record doesn't have
+_MISSING = object()
+
+
+def diff_records(old, new, path=()):
+    """
+    Compare two records field by field.
+
+    Nested dicts are compared key by key, other values (lists, tile grids...)
+    as a whole.
+
+    Args:
+        old (dict): Original record, None for a new one
+        new (dict): Current record, None for a removed one
+        path (tuple): Path of old/new inside the record, for recursion
+
+    Returns:
+        list: (field path, old value, new value) of the fields that differ,
+            with None for a missing value
+    """
+    old = old if old is not None else {}
+    new = new if new is not None else {}
+    changes = []
+    for key in list(old) + [key for key in new if key not in old]:
+        old_value = old.get(key, _MISSING)
+        new_value = new.get(key, _MISSING)
+        if isinstance(old_value, Mapping) and isinstance(new_value, Mapping):
+            changes += diff_records(old_value, new_value, path + (key,))
+        elif isinstance(old_value, np.ndarray) or isinstance(new_value, np.ndarray):
+            if not np.array_equal(old_value, new_value) or type(old_value) is not type(new_value):
+                changes.append((path + (key,),
+                                None if old_value is _MISSING else old_value,
+                                None if new_value is _MISSING else new_value))
+        elif old_value != new_value:
+            changes.append((path + (key,),
+                            None if old_value is _MISSING else old_value,
+                            None if new_value is _MISSING else new_value))
+    return changes
+
+
+def values_equal(old, new):
+    """
+    Compare two values that may hold tile grids.
+
+    == on NumPy arrays is element-wise, so containers holding them are
+    compared item by item.
+    """
+    try:
+        return bool(old == new)
+    except ValueError:
+        pass
+    if isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        return type(old) is type(new) and np.array_equal(old, new)
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        return old.keys() == new.keys() and all(values_equal(old[key], new[key]) for key in old)
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        return type(old) is type(new) and len(old) == len(new) and all(map(values_equal, old, new))
+    return False
+
+
+class ChangeEntry:
+    """One changed field: (domain, record key, field, old, new)."""
+
+    __slots__ = ('domain', 'key', 'field', 'old', 'new')
+
+    def __init__(self, domain, key, field, old, new):
+        self.domain = domain    # Kind of data, e.g. 'items'
+        self.key = key          # Key of the record, e.g. its ID or name
+        self.field = field      # Field path, e.g. ('stat_bonuses', 'lk'), None for a whole record
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        return f"ChangeEntry({self.domain}, {self.key!r}, {self.field}, {self.old!r} -> {self.new!r})"
+
+    def describe(self):
+        """Get a one-line description of the change."""
+        if self.field is None:
+            return f"{self.domain}: {self.key} {'added' if self.old is None else 'removed'}"
+        field = '.'.join(str(part) for part in self.field)
+        if isinstance(self.old, np.ndarray) and isinstance(self.new, np.ndarray) and self.old.shape == self.new.shape:
+            return f"{self.domain}: {self.key} {field} {int((self.old != self.new).sum())} tile(s) changed"
+        if isinstance(self.old, np.ndarray) or isinstance(self.new, np.ndarray):
+            return f"{self.domain}: {self.key} {field} resized"
+        return f"{self.domain}: {self.key} {field} {self.old!r} -> {self.new!r}"
+
+
+class _RecordChanges:
+    """Pending changes of one record."""
+
+    __slots__ = ('record', 'key', 'status', 'fields')
+
+    def __init__(self, record, key, status):
+        self.record = record
+        self.key = key
+        self.status = status    # 'changed', 'added' or 'removed'
+        self.fields = {}        # Field path -> ChangeEntry
+
+
+class ChangeJournal:
+    """Unsaved changes by domain and record."""
+
+    def __init__(self):
+        """Initialize an empty journal."""
+        self._records = {}          # (domain, id(record)) -> _RecordChanges
+        self._dirty = set()         # Domains changed in ways not reported per record
+        self._revisions = {}        # Domain (None for all) -> number of changes, never reset
+        self.listeners = []         # Called without arguments after every change
+
+    def __len__(self):
+        """Number of touched records, plus dirty domains."""
+        return len(self._records) + len(self._dirty)
+
+    def __bool__(self):
+        return bool(self._records or self._dirty)
+
+    def has_changes(self, domain=None):
+        """Check for pending changes, in one domain or in any."""
+        if domain is None:
+            return bool(self)
+        return domain in self._dirty or None in self._dirty or any(d == domain for d, _ in self._records)
+
+    def update(self, domain, key, record, changes):
+        """
+        Set the changes of an edited record.
+
+        Args:
+            domain (str): Kind of data
+            key: Key of the record (its ID, name...)
+            record (dict): The record
+            changes (list): (field path, old, new) from diff_records(), replacing
+                the ones journaled before; an empty list drops the record
+        """
+        self._bump(domain)
+        slot = (domain, id(record))
+        entry = self._records.get(slot)
+        if entry is not None and entry.status != 'changed':
+            # Added records stay added whatever was edited since
+            entry.key = key
+        elif changes:
+            entry = self._records[slot] = _RecordChanges(record, key, 'changed')
+            entry.fields = {field: ChangeEntry(domain, key, field, old, new) for field, old, new in changes}
+        else:
+            self._records.pop(slot, None)
+        self._notify()
+
+    def record_added(self, domain, key, record):
+        """Journal a record added to a domain."""
+        self._bump(domain)
+        slot = (domain, id(record))
+        entry = self._records.get(slot)
+        if entry is not None and entry.status == 'removed':
+            # Removed then put back
+            del self._records[slot]
+        else:
+            self._records[slot] = _RecordChanges(record, key, 'added')
+        self._notify()
+
+    def record_removed(self, domain, key, record):
+        """Journal a record removed from a domain."""
+        self._bump(domain)
+        slot = (domain, id(record))
+        entry = self._records.get(slot)
+        if entry is not None and entry.status == 'added':
+            # Added then removed, nothing to save
+            del self._records[slot]
+        else:
+            self._records[slot] = _RecordChanges(record, key, 'removed')
+        self._notify()
+
+    def mark_dirty(self, domain=None):
+        """Mark a domain (None for every domain) changed in a way not reported per record."""
+        self._bump(domain)
+        self._dirty.add(domain)
+        self._notify()
+
+    def is_dirty(self, domain):
+        """Check if every record of a domain has to be visited on save."""
+        return domain in self._dirty or None in self._dirty
+
+    def revision(self, domain):
+        """
+        Count the changes reported for a domain so far.
+
+        Unlike the entries, the count isn't reset by saves, so comparing two
+        revisions tells whether the data changed in between (see core.data_export).
+        """
+        return self._revisions.get(domain, 0) + self._revisions.get(None, 0)
+
+    def records(self, domain, statuses=('changed', 'added')):
+        """
+        Get the touched records of a domain.
+
+        Args:
+            domain (str): Kind of data
+            statuses (tuple): Kinds of changes to include
+
+        Returns:
+            list: The records, in the order they were first touched
+        """
+        return [entry.record for (d, _), entry in self._records.items()
+                if d == domain and entry.status in statuses]
+
+    def touched(self):
+        """
+        Get the touched records of every domain.
+
+        Returns:
+            list: (domain, record, status, field paths) tuples, in the order
+                the records were first touched; status is 'changed', 'added'
+                or 'removed', and only changed records have field paths
+        """
+        return [(d, entry.record, entry.status, list(entry.fields)) for (d, _), entry in self._records.items()]
+
+    def entries(self, domain=None):
+        """
+        Get the journal entries.
+
+        Args:
+            domain (str): Only this domain, all if None
+
+        Returns:
+            list: ChangeEntry objects; added and removed records are one entry
+                each, with field None
+        """
+        result = []
+        for (d, _), entry in self._records.items():
+            if domain is not None and d != domain:
+                continue
+            if entry.status == 'changed':
+                result += entry.fields.values()
+            elif entry.status == 'added':
+                result.append(ChangeEntry(d, entry.key, None, None, entry.record))
+            else:
+                result.append(ChangeEntry(d, entry.key, None, entry.record, None))
+        return result
+
+    def domains(self):
+        """Get the domains with pending changes (None if some change has no domain)."""
+        return {d for d, _ in self._records} | self._dirty
+
+    def summary(self):
+        """Get a short description such as '3 items, 1 monster changed'."""
+        counts = {}
+        for d, _ in self._records:
+            counts[d] = counts.get(d, 0) + 1
+        for d in self._dirty:
+            counts.setdefault(d, 0)
+        parts = [f"{count} {d}" if count else (d or "data") for d, count in sorted(counts.items(), key=lambda c: c[0] or '')]
+        return ", ".join(parts) + " changed" if parts else "No unsaved changes"
+
+    def describe(self, limit=50):
+        """Get one line per pending change, for the window."""
+        lines = [entry.describe() for entry in self.entries()[:limit]]
+        for d in sorted(self._dirty, key=lambda d: d or ''):
+            lines.append(f"{d or 'data'}: changed (not tracked per record)")
+        return "\n".join(lines)
+
+    def clear(self, *domains):
+        """Forget the changes of some domains (None for changes without one), or all of them."""
+        if not domains:
+            self._records = {}
+            self._dirty = set()
+        else:
+            self._records = {slot: entry for slot, entry in self._records.items() if slot[0] not in domains}
+            self._dirty.difference_update(domains)
+        self._notify()
+
+    def discard(self, domain, record):
+        """Forget the changes of one record, e.g. once a save wrote them."""
+        if self._records.pop((domain, id(record)), None) is not None:
+            self._notify()
+
+    def clear_dirty(self, keep=()):
+        """
+        Forget which domains were changed without per-record reports, e.g.
+        after a save visited all their records.
+
+        Args:
+            keep (iterable): Domains that stay dirty (marked by name or through
+                None), e.g. because some of their changes couldn't be saved
+        """
+        self._dirty = {domain for domain in keep if self.is_dirty(domain)}
+        self._notify()
+
+    def _bump(self, domain):
+        self._revisions[domain] = self._revisions.get(domain, 0) + 1
+
+    def _notify(self):
+        for listener in list(self.listeners):
+            listener()
@@ -0,0 +1,278 @@
+"""
+Per-domain export and import of the game data.
+
+The data is exported as one file per domain (characters.ndjson,
+items.ndjson...) in a directory, ``extracted_data/`` next to the bundle by
+default:
+
+- records are streamed to the file one at a time, nothing holds a whole
+  document in memory. NDJSON (one compact JSON record per line) is the
+  default, "ndjson.gz" is the same gzip-compressed, and "json" keeps the
+  old pretty-printed list for people reading the files by hand;
+- ``manifest.json`` remembers, for each domain, the format, the SHA-256 of
+  the records written and the data revision they were exported from (see
+  GameDataManager.data_revision()). A domain whose revision didn't change
+  since the last export is skipped without being serialized; one exported
+  by another session is serialized and hashed, and only replaces the file
+  if its content changed, so unchanged files keep their date;
+- files are written to a temporary file and renamed, a crash never leaves
+  half an export.
+
+Importing streams the records back into a live GameDataManager: records
+are matched by their journal key (GameData.record_key()), changed records
+are updated in place and reported with record_changed(), so they are
+journaled, undoable and saved into app.js like edits made in the tabs.
+"""
+
+import os
+import json
+import gzip
+import hashlib
+import tempfile
+
+from core.backup_store import atomic_write, copy_permissions, fsync_directory
+from core.records import to_json
+
+# Default export directory, next to the bundle
+EXPORT_DIR_NAME = "extracted_data"
+
+MANIFEST_NAME = "manifest.json"
+
+# Export formats and the extension of their files
+FORMATS = {
+    'ndjson': '.ndjson',
+    'ndjson.gz': '.ndjson.gz',
+    'json': '.json',
+}
+
+_FORMAT_VERSION = 1
+
+_MISSING = object()
+
+
+def _plain(value):
+    """Get a value the way it reads back from its JSON export."""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=to_json))
+
+
+def domain_path(directory, name, fmt='ndjson'):
+    """Get the file a domain is exported to."""
+    return os.path.join(directory, name + FORMATS[fmt])
+
+
+def read_manifest(directory):
+    """Read the manifest of an export directory, empty if there is none."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': _FORMAT_VERSION, 'domains': {}}
+    if not isinstance(manifest, dict) or manifest.get('version') != _FORMAT_VERSION:
+        return {'version': _FORMAT_VERSION, 'domains': {}}
+    manifest.setdefault('domains', {})
+    return manifest
+
+
+def find_domain_file(directory, name):
+    """
+    Find the exported file of a domain.
+
+    The manifest tells which format was exported last; without one the
+    formats are tried in FORMATS order.
+
+    Returns:
+        str: Path of the file, None if the domain wasn't exported
+    """
+    entry = read_manifest(directory)['domains'].get(name)
+    if entry is not None and entry.get('format') in FORMATS:
+        path = domain_path(directory, name, entry['format'])
+        if os.path.isfile(path):
+            return path
+    for fmt in FORMATS:
+        path = domain_path(directory, name, fmt)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def iter_records(path):
+    """
+    Read the records of an exported file, one at a time.
+
+    NDJSON files are streamed line by line; a "json" file is a single
+    document and is parsed whole.
+
+    Args:
+        path (str): File written by export_domains()
+
+    Yields:
+        dict: The records, as plain data
+    """
+    if path.endswith(FORMATS['json']) and not path.endswith(FORMATS['ndjson']):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{os.path.basename(path)} line {line_number}: {str(e)}") from None
+
+
+def _write_records(records, directory, name, fmt):
+    """
+    Stream records to a temporary file in directory.
+
+    Returns:
+        tuple: (temporary file path, SHA-256 of the records as written, hex);
+            the hash is over the uncompressed data, so it doesn't depend on
+            the gzip header
+    """
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}_", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            out = gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) if fmt == 'ndjson.gz' else raw
+
+            def write(text):
+                data = text.encode('utf-8')
+                digest.update(data)
+                out.write(data)
+
+            if fmt == 'json':
+                write('[')
+                for i, record in enumerate(records):
+                    write((',\n' if i else '\n') + json.dumps(record, ensure_ascii=False, indent=2, default=to_json))
+                write('\n]\n')
+            else:
+                for record in records:
+                    write(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=to_json) + '\n')
+            if out is not raw:
+                out.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return temp_path, digest.hexdigest()
+
+
+def export_domains(manager, directory, domains, fmt='ndjson', force=False):
+    """
+    Export the records of a GameDataManager, one file per domain.
+
+    Args:
+        manager (GameDataManager): Loaded game data
+        directory (str): Export directory, created if needed
+        domains (list): Domains to export
+        fmt (str): One of FORMATS
+        force (bool): Rewrite every file, even the unchanged ones
+
+    Returns:
+        dict: domain -> {'path', 'records', 'written'}; written is False for
+            the files that were already up to date
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    results = {}
+    renamed = False
+
+    for name in domains:
+        path = domain_path(directory, name, fmt)
+        revision = manager.data_revision(name)
+        entry = manifest['domains'].get(name, {})
+        same_file = entry.get('format') == fmt and os.path.isfile(path)
+        if not force and same_file and entry.get('revision') == revision:
+            results[name] = {'path': path, 'records': entry.get('records', 0), 'written': False}
+            continue
+
+        records = manager.domain_records(name)
+        temp_path, digest = _write_records(records, directory, name, fmt)
+        if not force and same_file and entry.get('sha256') == digest:
+            # Exported by another session, but nothing changed since
+            os.remove(temp_path)
+            written = False
+        else:
+            copy_permissions(temp_path, path)
+            os.replace(temp_path, path)
+            renamed = True
+            written = True
+            # Drop the file of the format exported before, import would pick it up
+            old_format = entry.get('format')
+            if old_format in FORMATS and old_format != fmt:
+                try:
+                    os.remove(domain_path(directory, name, old_format))
+                except OSError:
+                    pass
+
+        manifest['domains'][name] = {'format': fmt, 'records': len(records), 'sha256': digest, 'revision': revision}
+        results[name] = {'path': path, 'records': len(records), 'written': written}
+
+    if renamed:
+        fsync_directory(directory)
+    atomic_write(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest, indent=1).encode('utf-8'))
+    return results
+
+
+def import_domain(manager, name, path, prune=True):
+    """
+    Update a domain of a live GameDataManager from an exported file.
+
+    The caller holds the manager's lock and an undo transaction, see
+    GameDataManager.import_data().
+
+    Args:
+        manager (GameDataManager): Loaded game data
+        name (str): Domain of the file
+        path (str): File written by export_domains()
+        prune (bool): Remove the records the file doesn't have
+
+    Returns:
+        tuple: (records updated, added, removed)
+    """
+    handler = manager.handler(name)
+    records = manager.domain_records(name)
+
+    # Records not matched yet, by key; keys can repeat, they are matched in order
+    unmatched = {}
+    for record in records:
+        unmatched.setdefault(handler.record_key(record), []).append(record)
+
+    updated = added = 0
+    for data in iter_records(path):
+        new = handler.make_record(data)
+        candidates = unmatched.get(handler.record_key(new))
+        if not candidates:
+            records.append(new)
+            added += 1
+            continue
+        record = candidates.pop(0)
+        # Compared as JSON: the file has lists where the record may have tuples
+        current = _plain(record)
+        if current == data:
+            continue
+        for field in [field for field in record if field not in new]:
+            del record[field]
+        for field, value in new.items():
+            if current.get(field, _MISSING) != data.get(field, _MISSING):
+                record[field] = value
+        manager.record_changed(record)
+        updated += 1
+
+    removed = 0
+    if prune:
+        for candidates in unmatched.values():
+            for record in candidates:
+                records.remove(record)
+                removed += 1
+    return updated, added, removed
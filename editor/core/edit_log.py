@@ -0,0 +1,228 @@
+"""
+Write-ahead log of the unsaved edits.
+
+Edits only live in memory until they are saved into app.js. To survive a
+crash, every edit reported by the tabs (see GameDataManager.record_changed)
+is also appended to ``.openff_cache/edits.log`` next to the bundle, and the
+log is deleted when the editor closes normally. A log still holding edits at
+the next start means the session crashed; the edits can then be replayed on
+top of the loaded (usually cached) extraction.
+
+Appending only queues the operation: a background thread serializes the
+queue, writes it and fsyncs the file every FLUSH_INTERVAL seconds, so
+editing never waits for the disk.
+
+File layout: one JSON object per line. The first line identifies the bundle
+the edits apply to (its SHA-256), the others are operations:
+
+    {"op": "set", "d": domain, "i": position, "k": key, "c": [[path, value]...], "x": [path...]}
+    {"op": "add", "d": domain, "i": position, "r": record}
+    {"op": "remove", "d": domain, "i": position, "k": key}
+    {"op": "replace", "d": domain, "r": [record...]}
+
+"c" holds the changed values and "x" the deleted fields; the changed cells
+of a tile grid are logged as {"$cells": [rows, columns, tiles]} (see
+core.map_grid.CellPatch). A line torn by the crash ends the replay,
+everything before it is kept.
+"""
+
+import os
+import json
+import threading
+
+from core.extraction_cache import CACHE_DIR_NAME
+from core.records import to_json
+
+LOG_FILE_NAME = "edits.log"
+
+# Seconds between two writes (and fsyncs) of the queued edits
+FLUSH_INTERVAL = 0.5
+
+_FORMAT_VERSION = 1
+
+
+def _serialize(operations):
+    """Get the lines of some operations."""
+    return ''.join(json.dumps(operation, ensure_ascii=False, separators=(',', ':'), default=to_json) + '\n'
+                   for operation in operations)
+
+
+class EditLog:
+    """Append-only log of the edits of one bundle, written on a background thread."""
+
+    def __init__(self, enabled=True, flush_interval=FLUSH_INTERVAL):
+        """
+        Initialize a closed log.
+
+        Args:
+            enabled (bool): False never touches the disk (headless tools, tests)
+            flush_interval (float): Seconds between two writes of the queue
+        """
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.path = None
+        self.bundle = None
+        self._queue = []
+        self._lock = threading.Lock()           # Guards _queue
+        self._write_lock = threading.Lock()     # One writer of the file at a time, taken before _lock
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+
+    @staticmethod
+    def log_path(js_path):
+        """Get the log file used for the given bundle."""
+        directory = os.path.dirname(os.path.abspath(js_path))
+        return os.path.join(directory, CACHE_DIR_NAME, LOG_FILE_NAME)
+
+    @property
+    def started(self):
+        return self._file is not None
+
+    def open(self, js_path, bundle):
+        """
+        Attach the log to a bundle and read the edits a crashed session left.
+
+        Nothing is written until start() is called, so the old edits stay on
+        disk until the caller replayed or discarded them.
+
+        Args:
+            js_path (str): Path of the bundle
+            bundle (str): SHA-256 of the bundle, hex
+
+        Returns:
+            list: Operations to replay, empty if there are none or they were
+                made on a different bundle
+        """
+        self.close(remove=False)
+        if not self.enabled:
+            return []
+        self.path = self.log_path(js_path)
+        self.bundle = bundle
+        return self.read(self.path, bundle)
+
+    @staticmethod
+    def read(path, bundle):
+        """Read the operations of a log file, see open()."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return []
+        operations = []
+        try:
+            header = json.loads(lines[0])
+            if header.get('version') != _FORMAT_VERSION or header.get('bundle') != bundle:
+                print("Ignoring the edit log of a different app.js")
+                return []
+            for line in lines[1:]:
+                if line:
+                    operations.append(json.loads(line))
+        except (ValueError, IndexError, AttributeError):
+            # Torn by the crash, keep what was complete
+            pass
+        return operations
+
+    def start(self):
+        """Start a new log file (dropping the old edits) and the writer thread."""
+        if not self.enabled or self.path is None or self.started:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write_header()
+        except OSError as e:
+            print(f"Warning: Could not open the edit log: {str(e)}")
+            self._file = None
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="edit-log", daemon=True)
+        self._thread.start()
+
+    def append(self, operation):
+        """
+        Queue an operation, written by the background thread.
+
+        The operation must not share mutable values with the records, they
+        are serialized later.
+        """
+        if not self.enabled or self.path is None:
+            return
+        with self._lock:
+            self._queue.append(operation)
+
+    def flush(self):
+        """Write the queued operations and fsync, now."""
+        if not self.started:
+            return
+        # The queue is taken under the write lock: a reset() can't come in
+        # between and have these operations written after its new header
+        with self._write_lock:
+            with self._lock:
+                queue, self._queue = self._queue, []
+            if self._file is None:
+                return
+            try:
+                if queue:
+                    self._file.write(_serialize(queue))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Warning: Could not write the edit log: {str(e)}")
+
+    def reset(self, bundle=None, operations=()):
+        """
+        Drop the logged edits once they are saved, optionally switching to a new bundle.
+
+        Args:
+            bundle (str): SHA-256 of the bundle the edits now apply to
+            operations (list): Edits that are still unsaved, written right
+                after the new header
+        """
+        if bundle is not None:
+            self.bundle = bundle
+        with self._write_lock:
+            with self._lock:
+                self._queue = []
+            if self._file is None:
+                return
+            try:
+                # Serialized first, a failure leaves the old log in place
+                lines = _serialize(operations)
+                self._file.seek(0)
+                self._file.truncate()
+                self._write_header(lines)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Warning: Could not reset the edit log: {str(e)}")
+
+    def close(self, remove=True):
+        """
+        Stop the writer thread and close the file.
+
+        Args:
+            remove (bool): Delete the log, nothing is left to recover
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self.flush()
+            with self._write_lock:
+                self._file.close()
+                self._file = None
+            if remove:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def _write_header(self, lines=''):
+        self._file.write(json.dumps({'version': _FORMAT_VERSION, 'bundle': self.bundle}) + '\n' + lines)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._queue:
+                self.flush()
@@ -0,0 +1,180 @@
+"""
+On-disk cache of extracted game data.
+
+Extracting every handler from app.js is the slowest part of startup. The
+cache stores the result of a full extraction, keyed by the bundle's size,
+mtime and content hash plus the extractor version, so a warm start can
+restore the data without parsing.
+
+The cache is a pickle, and unpickling runs code, so it is kept in the
+user's own cache directory (one file per bundle path) rather than next to
+the bundle, where a shared mod could ship a crafted one.
+
+File layout: a fixed header (magic, format and extractor versions, size,
+mtime and SHA-256 of the bundle) followed by a zlib-compressed pickle of
+the cached state. The header is checked before anything is unpickled.
+"""
+
+import os
+import sys
+import zlib
+import pickle
+import struct
+import hashlib
+import tempfile
+
+# Bump when an extractor changes what it produces so old caches are ignored
+EXTRACTOR_VERSION = 4
+
+# Directory next to the bundle holding the edit log, see EditLog
+CACHE_DIR_NAME = ".openff_cache"
+CACHE_FILE_NAME = "extraction.bin"
+
+_MAGIC = b"OFFCACHE"
+_FORMAT_VERSION = 1
+
+# magic, format version, extractor version, bundle size, bundle mtime (ns), sha256
+_HEADER = struct.Struct("<8sHHQq32s")
+
+
+def user_cache_dir():
+    """Get the per-user directory holding the extraction caches."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'openff')
+
+
+class CacheKey:
+    """Identity of a bundle: size, mtime and content hash."""
+
+    __slots__ = ('size', 'mtime_ns', 'digest')
+
+    def __init__(self, size, mtime_ns, digest):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+
+    def __eq__(self, other):
+        return (isinstance(other, CacheKey) and self.size == other.size and
+                self.mtime_ns == other.mtime_ns and self.digest == other.digest)
+
+    def __repr__(self):
+        return f"CacheKey({self.size}, {self.mtime_ns}, {self.digest.hex()[:12]})"
+
+
+class ExtractionCache:
+    """Reads and writes the extraction cache of a bundle."""
+
+    def __init__(self, enabled=True, cache_dir=None):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled (bool): Whether the cache is read and written
+            cache_dir (str): Directory of the cache files, defaults to user_cache_dir()
+        """
+        self.enabled = enabled
+        self.cache_dir = cache_dir or user_cache_dir()
+
+    def cache_path(self, js_path):
+        """Get the cache file used for the given bundle, named after its absolute path."""
+        name = hashlib.sha256(os.path.abspath(js_path).encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{name}-{CACHE_FILE_NAME}")
+
+    @staticmethod
+    def make_key(js_path, js_content):
+        """
+        Build the cache key of a bundle.
+
+        Args:
+            js_path (str): Path of the bundle on disk
+            js_content (str): The bundle source as loaded
+
+        Returns:
+            CacheKey: The key, or None if the file can't be stat'ed
+        """
+        try:
+            stat = os.stat(js_path)
+        except OSError:
+            return None
+        digest = hashlib.sha256(js_content.encode('utf-8')).digest()
+        return CacheKey(stat.st_size, stat.st_mtime_ns, digest)
+
+    def load(self, js_path, key):
+        """
+        Load the cached state for a bundle.
+
+        Args:
+            js_path (str): Path of the bundle
+            key (CacheKey): Key of the bundle as it is now
+
+        Returns:
+            The cached state, or None if there is no valid cache for this key
+        """
+        if not self.enabled or key is None:
+            return None
+
+        path = self.cache_path(js_path)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                if len(header) != _HEADER.size:
+                    return None
+                magic, format_version, extractor_version, size, mtime_ns, digest = _HEADER.unpack(header)
+                if (magic != _MAGIC or format_version != _FORMAT_VERSION or
+                        extractor_version != EXTRACTOR_VERSION):
+                    return None
+                if CacheKey(size, mtime_ns, digest) != key:
+                    return None
+                return pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A corrupt cache is just a cache miss
+            print(f"Ignoring unreadable extraction cache: {str(e)}")
+            return None
+
+    def store(self, js_path, key, state):
+        """
+        Write the state for a bundle, replacing the previous cache atomically.
+
+        Returns:
+            bool: True if the cache was written
+        """
+        if not self.enabled or key is None:
+            return False
+
+        path = self.cache_path(js_path)
+        temp_path = None
+        try:
+            # Only readable by the user, see the module docstring
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+            header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, EXTRACTOR_VERSION,
+                                  key.size, key.mtime_ns, key.digest)
+
+            fd, temp_path = tempfile.mkstemp(prefix=CACHE_FILE_NAME, dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(payload)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            print(f"Warning: Could not write extraction cache: {str(e)}")
+            if temp_path and os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return False
+
+    def clear(self, js_path):
+        """Delete the cache of a bundle."""
+        try:
+            os.remove(self.cache_path(js_path))
+        except OSError:
+            pass
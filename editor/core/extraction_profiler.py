@@ -0,0 +1,326 @@
+"""
+Profiling and time budgets for the extraction patterns.
+
+The extractors still fall back to regular expressions such as
+``this\\.gl\\.battle\\s*=\\s*\\[(.*?)\\]`` with re.DOTALL over the whole bundle.
+On unexpected input those can backtrack for a very long time, and Python's
+re module can't be interrupted: it holds the GIL until it returns. So every
+scan of a large text runs in a helper process that is killed when the
+pattern exceeds its time budget, and the caller gets "no match" instead of
+a hang. Scans of small texts (single records) run inline.
+
+Every call is recorded: wall time, match count and characters scanned per
+pattern, plus the total time of each handler. report() formats the result,
+see the --profile-extraction flag of the editor.
+
+This module (and core.process_entry, the helper's __main__) only depends on
+the standard library so the helper process starts quickly.
+"""
+
+import os
+import re
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from core.process_entry import process_context, as_main
+
+# Texts at least this long are scanned in the helper process
+GUARD_MIN_CHARS = 64 * 1024
+
+# Default time budget of a single pattern call, in seconds
+DEFAULT_BUDGET = 2.0
+
+# Process that imported this module; a process with another pid is a forked copy
+_IMPORT_PID = os.getpid()
+
+
+class PatternBudgetExceeded(Exception):
+    """Raised when a pattern runs longer than its time budget."""
+
+    def __init__(self, pattern, budget, length):
+        super().__init__(f"Pattern exceeded its {budget:.1f}s budget on {length} characters: {pattern[:80]}")
+        self.pattern = pattern
+        self.budget = budget
+        self.length = length
+
+
+class PatternMatch:
+    """Picklable stand-in for re.Match, returned by guarded searches."""
+
+    __slots__ = ('_spans', '_groups')
+
+    def __init__(self, match):
+        self._spans = [match.span(i) for i in range(len(match.groups()) + 1)]
+        self._groups = (match.group(0),) + match.groups()
+
+    def group(self, index=0):
+        return self._groups[index]
+
+    def groups(self):
+        return self._groups[1:]
+
+    def start(self, index=0):
+        return self._spans[index][0]
+
+    def end(self, index=0):
+        return self._spans[index][1]
+
+    def span(self, index=0):
+        return self._spans[index]
+
+
+def _run_pattern(op, pattern, text, flags):
+    """Run one pattern operation, with results that can be pickled."""
+    if op == 'findall':
+        return re.findall(pattern, text, flags)
+    match = re.search(pattern, text, flags)
+    return PatternMatch(match) if match else None
+
+
+def _serve(conn):
+    """Helper process: keep the last text sent and run patterns over it."""
+    text = ""
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == 'text':
+            text = message[1]
+            continue
+        op, pattern, flags = message
+        try:
+            conn.send(('ok', _run_pattern(op, pattern, text, flags)))
+        except Exception as e:
+            conn.send(('error', e))
+
+
+class _ScanWorker:
+    """Helper process running patterns over large texts."""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.text_id = None
+
+    def run(self, op, pattern, text, flags, budget):
+        """Run a pattern in the helper process, killing it when the budget runs out."""
+        if self.process is None or not self.process.is_alive():
+            self._start()
+        text_id = (id(text), len(text), hash(text))
+        if self.text_id != text_id:
+            # The bundle is sent once, later patterns reuse it
+            self.conn.send(('text', text))
+            self.text_id = text_id
+
+        self.conn.send((op, pattern, flags))
+        if not self.conn.poll(budget):
+            self.stop()
+            raise PatternBudgetExceeded(pattern, budget, len(text))
+        status, result = self.conn.recv()
+        if status == 'error':
+            raise result
+        return result
+
+    def _start(self):
+        """Start the helper process."""
+        in_worker = os.getpid() != _IMPORT_PID or multiprocessing.parent_process() is not None
+        if in_worker and 'fork' in multiprocessing.get_all_start_methods():
+            # An extraction worker can't use its parent's fork server, and
+            # only runs one thread: it can fork
+            context = multiprocessing.get_context('fork')
+        else:
+            context = process_context()
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+        try:
+            # The helper imports an empty module as __main__, not the caller's script
+            with as_main():
+                self.process.start()
+        finally:
+            child_conn.close()
+        self.text_id = None
+
+    def stop(self):
+        """Kill the helper process."""
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+        self.text_id = None
+
+
+class PatternStats:
+    """Totals for one pattern."""
+
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'matches', 'chars', 'timeouts')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.matches = 0
+        self.chars = 0          # Characters scanned
+        self.timeouts = 0
+
+
+class ExtractionProfiler:
+    """Runs extraction patterns under a time budget and records their cost."""
+
+    def __init__(self, budget=DEFAULT_BUDGET, guard_min_chars=GUARD_MIN_CHARS):
+        """
+        Initialize the profiler.
+
+        Args:
+            budget (float): Time budget of a pattern call in seconds, None for no budget
+            guard_min_chars (int): Texts at least this long are scanned under the budget
+        """
+        self.budget = budget
+        self.guard_min_chars = guard_min_chars
+        self.patterns = {}          # (handler, pattern) -> PatternStats
+        self.handlers = {}          # handler -> [seconds, runs]
+        self._worker = None
+        self._worker_pid = None     # Process that started the helper
+        self._guard_available = True
+        self._lock = threading.Lock()
+
+    def findall(self, handler, pattern, text, flags=0, budget=None):
+        """
+        re.findall() under the time budget.
+
+        Args:
+            handler (str): Name of the calling handler, for the report
+            pattern (str): Regular expression
+            text (str): Text to scan
+            flags (int): re flags
+            budget (float): Budget for this call, defaults to self.budget
+
+        Returns:
+            list: The matches, empty if the budget was exceeded
+        """
+        result = self._run(handler, 'findall', pattern, text, flags, budget)
+        return result if result is not None else []
+
+    def search(self, handler, pattern, text, flags=0, budget=None):
+        """
+        re.search() under the time budget.
+
+        Returns:
+            The match (re.Match or PatternMatch), None if there is none or
+            the budget was exceeded
+        """
+        return self._run(handler, 'search', pattern, text, flags, budget)
+
+    def _run(self, handler, op, pattern, text, flags, budget):
+        """Run a pattern, inline or in the helper process, and record it."""
+        if budget is None:
+            budget = self.budget
+
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            if budget is not None and len(text) >= self.guard_min_chars and self._guard_available:
+                result = self._run_guarded(op, pattern, text, flags, budget)
+            elif op == 'findall':
+                result = re.findall(pattern, text, flags)
+            else:
+                result = re.search(pattern, text, flags)
+        except PatternBudgetExceeded as e:
+            print(f"Warning: {str(e)} (skipped, extraction falls back)")
+            result = None
+            timed_out = True
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            stats = self.patterns.get((handler, pattern))
+            if stats is None:
+                stats = self.patterns[(handler, pattern)] = PatternStats()
+            stats.calls += 1
+            stats.seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            stats.chars += len(text)
+            stats.timeouts += timed_out
+            if op == 'findall':
+                stats.matches += len(result or ())
+            else:
+                stats.matches += result is not None
+        return result
+
+    def _run_guarded(self, op, pattern, text, flags, budget):
+        """Run a pattern in the helper process, inline if it can't be started."""
+        with self._lock:
+            try:
+                if self._worker is None or self._worker_pid != os.getpid():
+                    # A forked pool worker inherits the parent's helper, which
+                    # only the parent can use: it starts its own
+                    self._worker = _ScanWorker()
+                    self._worker_pid = os.getpid()
+                return self._worker.run(op, pattern, text, flags, budget)
+            except PatternBudgetExceeded:
+                raise
+            except (OSError, EOFError, RuntimeError) as e:
+                # E.g. the helper process can't be started (RuntimeError while
+                # this process is itself bootstrapping) or died
+                print(f"Pattern guard unavailable, scanning without a time budget: {str(e)}")
+                self._guard_available = False
+                self._worker = None
+        return _run_pattern(op, pattern, text, flags)
+
+    @contextmanager
+    def time_handler(self, handler):
+        """Context manager adding the time spent inside to a handler's total."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                totals = self.handlers.setdefault(handler, [0.0, 0])
+                totals[0] += elapsed
+                totals[1] += 1
+
+    def reset(self):
+        """Forget the recorded statistics."""
+        with self._lock:
+            self.patterns = {}
+            self.handlers = {}
+
+    def close(self):
+        """Stop the helper process."""
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                self._worker.stop()
+            self._worker = None
+
+    def report(self, limit=30):
+        """
+        Format the recorded statistics.
+
+        Args:
+            limit (int): Number of patterns listed, the slowest first
+
+        Returns:
+            str: The report
+        """
+        lines = ["Extraction profile", "", "Handlers:"]
+        for handler, (seconds, runs) in sorted(self.handlers.items(), key=lambda h: -h[1][0]):
+            lines.append(f"  {handler:<12} {seconds * 1000:9.1f} ms  ({runs} run{'s' if runs != 1 else ''})")
+
+        lines += ["", "Patterns (slowest first):",
+                  f"  {'handler':<12} {'calls':>5} {'total ms':>9} {'max ms':>8} {'matches':>8} {'chars':>11} {'timeouts':>8}  pattern"]
+        ranked = sorted(self.patterns.items(), key=lambda p: -p[1].seconds)
+        for (handler, pattern), stats in ranked[:limit]:
+            shown = pattern if len(pattern) <= 60 else pattern[:57] + '...'
+            lines.append(f"  {handler:<12} {stats.calls:>5} {stats.seconds * 1000:>9.1f} {stats.max_seconds * 1000:>8.1f} "
+                         f"{stats.matches:>8} {stats.chars:>11} {stats.timeouts:>8}  {shown}")
+        if len(ranked) > limit:
+            lines.append(f"  ... {len(ranked) - limit} more")
+        return "\n".join(lines)
+
+
+# Shared by every handler
+PROFILER = ExtractionProfiler()
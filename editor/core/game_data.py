@@ -3,30 +3,577 @@ Base game data module that provides core functionality for all data handlers.
 """
 
 import os
+import re
+import copy
 import json
+from collections.abc import MutableMapping
+
+from core.js_literal_parser import JSParseError, parse_js_literal, parse_module_exports
+from core.source_spans import SourceSpans
+from core.source_patcher import insert_properties, replace_value
+from core.extraction_profiler import PROFILER
+from core.record_index import RecordIndex, RecordList, field_key
+from core.change_journal import diff_records
+from core.undo_history import ListEdit, copy_value
+from core.backup_store import BackupStore, BackupError
+
+# Marks a field missing from a record
+_MISSING = object()
+
+
+def _get_path(value, path):
+    """Follow a path of keys/indices into nested dicts and lists."""
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return _MISSING
+    return value
 
 
 class GameData:
     """Base class for game data handling."""
     
+    # Attributes holding the extracted data, see export_state(); the first
+    # one is the list of records
+    DATA_ATTRS = ()
+    
+    # Bundle module the handler extracts from, None if it scans the whole bundle
+    MODULE_PATH = None
+    
+    # Record fields written back to app.js on save: (record path, source path)
+    # pairs for fields copied unchanged from the source literal
+    SOURCE_FIELDS = ()
+    
+    # Hash indexes kept over the records: (key name, key function) pairs,
+    # see core.record_index
+    INDEX_KEYS = (('name', field_key('name')),)
+    
+    # Field identifying a record in the change journal
+    RECORD_KEY = 'name'
+    
+    # Class of the records, see core.records; plain dicts by default
+    RECORD_CLASS = dict
+    
     def __init__(self):
         """Initialize the game data handler."""
         self._has_changes = False
         self.js_content = ""
         self.js_path = ""
+        self.module_index = None
+        self._exports_cache = {}
+        
+        # Where the extracted records came from in the bundle
+        self.spans = SourceSpans()
+        
+        # Indexed copy of the record list, built on the first lookup
+        self._indexed_records = None
+        
+        # Change journal shared by the handlers of a GameDataManager, which
+        # also sets the domain name this handler is journaled under
+        self.journal = None
+        self.domain = None
+        # Undo history and edit log, shared the same way
+        self.history = None
+        self.edit_log = None
+        
+        # id(record) -> (record, copy as extracted) for records without a source span
+        self._snapshots = {}
         
     def has_changes(self):
         """Check if there are unsaved changes."""
+        if self.journal is not None:
+            return self.journal.has_changes(self.domain)
         return self._has_changes
         
     def mark_as_changed(self):
-        """Mark the data as changed."""
+        """Mark the data as changed, without saying which records."""
         self._has_changes = True
+        if self.journal is not None:
+            self.journal.mark_dirty(self.domain)
+            
+    def make_record(self, data):
+        """Build a record of this handler from plain data, e.g. read from JSON."""
+        return self.RECORD_CLASS(data)
+        
+    def reference_targets(self, record):
+        """
+        Get the targets other data use to refer to a record, e.g. ('monster', 'ms_15').
+        
+        See core.reference_index; records nothing refers to have none.
+        """
+        return ()
+        
+    def record_references(self, record):
+        """Get the (target, kind) pairs of the records a record refers to, see reference_targets()."""
+        return ()
+        
+    def record_key(self, record):
+        """Get the key identifying a record in the change journal."""
+        key = record.get(self.RECORD_KEY)
+        return key if key is not None else record.get('name')
+        
+    def snapshot_records(self, records=None):
+        """
+        Remember the extracted state of the records that have no source span.
+        
+        Records with a span are compared with their source literal instead,
+        see original_record().
+        
+        Args:
+            records (list): Only update the snapshots of these records (e.g.
+                the ones a save wrote), all of them if None
+        """
+        if records is None:
+            self._snapshots = {}
+            records = self.get_records()
+        for record in records:
+            if self.spans.record_path(record) is None:
+                self._snapshots[id(record)] = (record, copy.deepcopy(record))
+            else:
+                self._snapshots.pop(id(record), None)
         
-    def load_js_content(self, js_content, js_path=""):
+    def snapshot_changes(self):
+        """
+        Compare the records that have no source span with their snapshots.
+        
+        Returns:
+            tuple: (list of the records without a source span that differ
+                from their snapshot or were added since, True if a
+                snapshotted record was taken out of the list)
+        """
+        records = self.get_records()
+        present = {id(record) for record in records}
+        changed = [record for record in records if self.spans.record_path(record) is None and self.record_changes(record)]
+        return changed, any(key not in present for key in self._snapshots)
+        
+    def original_record(self, record):
+        """
+        Get a record as it was loaded (or last saved).
+        
+        Args:
+            record (dict): A record of this handler
+            
+        Returns:
+            dict: The original record, None for a record added since
+        """
+        span = self.source_span(record)
+        if span is not None:
+            try:
+                literal = parse_js_literal(self.js_content[span[0]:span[1]])
+                return self.parse_source_record(self.spans.record_path(record), literal)
+            except JSParseError:
+                pass
+        snapshot = self._snapshots.get(id(record))
+        return snapshot[1] if snapshot is not None and snapshot[0] is record else None
+        
+    def record_changes(self, record, original=_MISSING):
+        """Get the (field path, old, new) differences of a record from its original."""
+        if original is _MISSING:
+            original = self.original_record(record)
+        return diff_records(original, record)
+        
+    def _on_records_changed(self, action, record, position=None):
+        """Journal records added to or removed from the record list, with their undo steps."""
+        # Records taken out of the list lose their source link, which would
+        # keep them alive; the undo step links them again when put back
+        source_path = None
+        if action == 'removed':
+            source_path = self.spans.unlink(record)
+        elif action == 'reset':
+            self.spans.retain(self.get_records())
+            
+        if self.journal is None:
+            return
+        if action == 'added':
+            self.journal.record_added(self.domain, self.record_key(record), record)
+        elif action == 'removed':
+            self.journal.record_removed(self.domain, self.record_key(record), record)
+        else:
+            self.journal.mark_dirty(self.domain)
+            
+        if self.edit_log is not None:
+            if action == 'added':
+                self.edit_log.append({'op': 'add', 'd': self.domain, 'i': position, 'r': copy_value(record)})
+            elif action == 'removed':
+                self.edit_log.append({'op': 'remove', 'd': self.domain, 'i': position, 'k': self.record_key(record)})
+            else:
+                self.edit_log.append({'op': 'replace', 'd': self.domain,
+                                      'r': [copy_value(other) for other in self.get_records()]})
+                
+        if self.history is None:
+            return
+        if action == 'reset':
+            # Positions of earlier steps may be wrong now
+            self.history.clear(self.domain)
+            return
+        if action == 'added':
+            self.history.track(record, self.domain)
+        self.history.push(ListEdit(self.domain, self.record_key(record), record, position, action == 'added',
+                                   source_path))
+        
+    def load_js_content(self, js_content, js_path="", module_index=None):
         """Load JavaScript content for parsing."""
         self.js_content = js_content
         self.js_path = js_path
+        self.module_index = module_index
+        self._exports_cache = {}
+        
+    def get_records(self):
+        """Get the list of extracted records (the first of DATA_ATTRS)."""
+        return getattr(self, self.DATA_ATTRS[0]) if self.DATA_ATTRS else []
+        
+    def record_index(self):
+        """
+        Get the index of the records, building it if the list was replaced.
+        
+        The record list (the first of DATA_ATTRS) is swapped for a RecordList
+        keeping the index up to date as records are added or removed.
+        
+        Returns:
+            RecordIndex: The index
+        """
+        records = self.get_records()
+        if records is not self._indexed_records:
+            records = RecordList(records, RecordIndex(dict(self.INDEX_KEYS)), self._on_records_changed)
+            setattr(self, self.DATA_ATTRS[0], records)
+            self._indexed_records = records
+        return records.index
+        
+    def find_record(self, key, value):
+        """
+        Get the first record whose index key has value.
+        
+        Args:
+            key (str): Name of the index key, e.g. 'name'
+            value: Value to look up
+            
+        Returns:
+            dict: The record, or None if there is none
+        """
+        if not self.DATA_ATTRS:
+            return None
+        index = self.record_index()
+        record = index.first(key, value)
+        if record is not None and value not in index.keys[key](record):
+            # Edited without reindex_record(), trust the records again
+            index.rebuild(self._indexed_records)
+            record = index.first(key, value)
+        return record
+        
+    def find_records(self, key, value):
+        """
+        Get the records whose index key has value, in list order.
+        
+        Args:
+            key (str): Name of the index key, e.g. 'type'
+            value: Value to look up
+            
+        Returns:
+            list: The records
+        """
+        if not self.DATA_ATTRS:
+            return []
+        index = self.record_index()
+        records = index.select(key, value)
+        if any(value not in index.keys[key](record) for record in records):
+            index.rebuild(self._indexed_records)
+            records = index.select(key, value)
+        return records
+        
+    def index_values(self, key):
+        """Get the distinct values of an index key, with their number of records."""
+        return self.record_index().values(key) if self.DATA_ATTRS else {}
+        
+    def reindex_record(self, record):
+        """
+        Update the indexes after a record was edited (renamed, retyped...).
+        
+        Returns:
+            bool: True if the record belongs to this handler
+        """
+        if not self.DATA_ATTRS:
+            return False
+        return self.record_index().update(record)
+        
+    def export_state(self):
+        """Get the extracted data as a dict of DATA_ATTRS values, plus the source spans."""
+        state = {attr: getattr(self, attr) for attr in self.DATA_ATTRS}
+        state['spans'] = self.spans.export_state(self.get_records())
+        return state
+        
+    def import_state(self, state):
+        """
+        Restore data saved with export_state() instead of extracting it again.
+        
+        Returns:
+            bool: False if the state doesn't contain every attribute
+        """
+        if not all(attr in state for attr in self.DATA_ATTRS):
+            return False
+        for attr in self.DATA_ATTRS:
+            setattr(self, attr, state[attr])
+            
+        if 'spans' in state:
+            self.spans.import_state(state['spans'], self.get_records())
+        else:
+            self.spans.clear()
+        self.snapshot_records()
+        return True
+        
+    def get_module_source(self, module_path):
+        """
+        Get the source of a bundle module from the shared module index.
+        
+        Args:
+            module_path (str): Require path of the module, e.g. './game/variables/_enemy'
+            
+        Returns:
+            str: The module source, or None if there is no index or no such module
+        """
+        if self.module_index is None:
+            return None
+        return self.module_index.get_source(module_path)
+        
+    def get_module_exports(self, module_path):
+        """
+        Get the literal a bundle module exports, parsed into Python values.
+        
+        The result is cached until new content is loaded, so handlers that
+        share a module only parse it once.
+        
+        Args:
+            module_path (str): Require path of the module
+            
+        Returns:
+            The exported value, or None if the module is missing or doesn't export a literal
+        """
+        if module_path not in self._exports_cache:
+            source = self.get_module_source(module_path)
+            if source is not None:
+                # Spans are recorded relative to the module body
+                exports = parse_module_exports(source, self.spans.recorder((module_path,)))
+            else:
+                exports = None
+            self._exports_cache[module_path] = exports
+        return self._exports_cache[module_path]
+        
+    def module_offset(self, module_path):
+        """
+        Get the bundle offset spans under module_path are relative to.
+        
+        Args:
+            module_path (str): Require path of the module, None for the whole bundle
+            
+        Returns:
+            int: Offset of the module body in js_content, or None if the module is unknown
+        """
+        if module_path is None:
+            return 0
+        module = self.module_index.find_module(module_path) if self.module_index is not None else None
+        return module.body_start if module is not None else None
+        
+    def source_span(self, record, *field):
+        """
+        Find where an extracted record, or a value inside it, is in the bundle.
+        
+        Args:
+            record (dict): A record extracted by this handler
+            *field: Keys/indices of a value inside the record's source literal,
+                using the names in app.js (e.g. 'st', 'wp'), not the editor's
+                
+        Returns:
+            tuple: (start, end) offsets in js_content, or None if unknown
+        """
+        path = self.spans.record_path(record)
+        if path is None:
+            return None
+        span = self.spans.span(path + field)
+        offset = self.module_offset(path[0])
+        if span is None or offset is None:
+            return None
+        return span[0] + offset, span[1] + offset
+        
+    def source_fields(self, record, literal):
+        """
+        Get the fields of a record that can be written back to its source literal.
+        
+        Args:
+            record (dict): The record as extracted from literal
+            literal (dict): The parsed source literal
+            
+        Returns:
+            list: (record path, source path) pairs, see SOURCE_FIELDS
+        """
+        return list(self.SOURCE_FIELDS)
+        
+    def parse_source_record(self, path, literal):
+        """
+        Build a record from its source literal again, the way extraction did.
+        
+        Args:
+            path (tuple): The record's path in self.spans
+            literal: The parsed source literal
+            
+        Returns:
+            dict: The record, or None if the handler can't rebuild it
+        """
+        return None
+        
+    def source_patches(self, record):
+        """
+        Get the patches that write a record's edits back to app.js.
+        
+        The record's source literal is extracted again and compared with the
+        record, so only the fields that were actually edited are patched.
+        
+        Args:
+            record (dict): A record extracted by this handler
+            
+        Returns:
+            tuple: (list of SourcePatch, list of the (field path, old, new)
+                edits the patches don't write, e.g. removed or derived fields),
+                or None if the record has no source span
+        """
+        path = self.spans.record_path(record)
+        span = self.source_span(record)
+        if span is None:
+            return None
+            
+        literal = parse_js_literal(self.js_content[span[0]:span[1]])
+        original = self.parse_source_record(path, literal)
+        if original is None:
+            return None
+            
+        patches = []
+        written = []        # Record paths whose value the patches write
+        insertions = {}     # Source path of an existing object -> properties to add
+        inserted = {}       # Source path of an existing object -> record paths of its properties
+        for record_path, source_path in self.source_fields(original, literal):
+            value = _get_path(record, record_path)
+            if value is _MISSING:
+                continue
+            if value == _get_path(original, record_path):
+                written.append(record_path)
+                continue
+                
+            value_span = self.source_span(record, *source_path)
+            if value_span is not None:
+                try:
+                    patches.append(replace_value(value_span, value))
+                except (TypeError, ValueError):
+                    # No literal form (e.g. NaN), left unsaved
+                    continue
+                written.append(record_path)
+                continue
+                
+            # Add the property to the deepest object that already exists
+            for depth in range(len(source_path) - 1, -1, -1):
+                if isinstance(_get_path(literal, source_path[:depth]), dict):
+                    break
+            else:
+                continue
+            properties = insertions.setdefault(source_path[:depth], {})
+            for key in source_path[depth:-1]:
+                properties = properties.setdefault(key, {})
+            properties[source_path[-1]] = value
+            inserted.setdefault(source_path[:depth], []).append(record_path)
+            
+        for object_path, properties in insertions.items():
+            try:
+                patch = insert_properties(self.js_content, self.source_span(record, *object_path), properties)
+            except (TypeError, ValueError):
+                continue
+            if patch is not None:
+                patches.append(patch)
+                written += inserted[object_path]
+                
+        # Edits outside the written fields stay unsaved
+        unwritten = [(field, old, new) for field, old, new in diff_records(original, record)
+                     if not any(field[:len(record_path)] == record_path for record_path in written)]
+        return patches, unwritten
+        
+    def rebase_spans(self):
+        """
+        Record the source spans again after a save rewrote the bundle.
+        
+        Records stay linked to the same paths; records extracted without a
+        module index can't be rebased and lose their link.
+        """
+        links = [(record, self.spans.record_path(record)) for record in self.get_records()]
+        self.spans.clear()
+        self._exports_cache = {}
+        for module_path in {path[0] for _, path in links if path is not None and path[0] is not None}:
+            self.get_module_exports(module_path)
+        for record, path in links:
+            if path is not None and path[0] is not None:
+                self.spans.link(record, path)
+                self._sync_source_fields(record)
+                
+    def _sync_source_fields(self, record):
+        """
+        Update a record's saved fields from its source literal.
+        
+        Right after a save, a difference can only come from another handler
+        sharing the literal (items and spells both read the magic table).
+        """
+        span = self.source_span(record)
+        if span is None:
+            return
+        literal = parse_js_literal(self.js_content[span[0]:span[1]])
+        current = self.parse_source_record(self.spans.record_path(record), literal)
+        if current is None:
+            return
+        for record_path, _ in self.source_fields(current, literal):
+            value = _get_path(current, record_path)
+            if value is _MISSING or value == _get_path(record, record_path):
+                continue
+            target = _get_path(record, record_path[:-1])
+            if isinstance(target, MutableMapping):
+                target[record_path[-1]] = value
+        
+    def profile_name(self):
+        """Name of the handler in the extraction profile, e.g. 'monsters'."""
+        return type(self).__name__.replace('GameData', '').lower() or 'base'
+        
+    def re_findall(self, pattern, text, flags=0):
+        """re.findall() through the extraction profiler, under its time budget."""
+        return PROFILER.findall(self.profile_name(), pattern, text, flags)
+        
+    def re_search(self, pattern, text, flags=0):
+        """re.search() through the extraction profiler, under its time budget."""
+        return PROFILER.search(self.profile_name(), pattern, text, flags)
+        
+    def find_literal(self, key, content=None):
+        """
+        Find a property such as `item: [...]` and parse the literal assigned to it.
+        
+        Args:
+            key (str): Property name
+            content (str): Text to search, defaults to the whole bundle
+            
+        Returns:
+            The first non-empty value of that property that parses, or None
+        """
+        # Spans are only meaningful for the bundle itself
+        record_spans = content is None
+        if content is None:
+            content = self.js_content
+            
+        pattern = r'(?<![\w$.])' + re.escape(key) + r'\s*:\s*(?=[\[{])'
+        for match in re.finditer(pattern, content):
+            spans = []
+            try:
+                value = parse_js_literal(content, match.end(), lambda *span: spans.append(span))
+            except JSParseError:
+                continue
+            # Skip placeholders such as `wep: []` in save data templates
+            if value:
+                if record_spans:
+                    for path, start, end in spans:
+                        self.spans.add((None, key) + path, start, end)
+                return value
+        return None
         
     def load_from_file(self, js_path):
         """Load game data from the specified JavaScript file."""
@@ -41,14 +588,12 @@ class GameData:
             return False
             
     def create_backup(self, file_path):
-        """Create a backup of the specified file."""
+        """Store the current content of the specified file in its backup store, see core.backup_store."""
         if os.path.exists(file_path):
-            backup_path = file_path + ".bak"
             try:
-                import shutil
-                shutil.copy2(file_path, backup_path)
+                BackupStore(file_path).add_file(file_path, "Backup")
                 return True
-            except Exception as e:
+            except (OSError, BackupError) as e:
                 print(f"Warning: Could not create backup: {str(e)}")
                 return False
         return False 
\ No newline at end of file
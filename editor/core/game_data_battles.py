@@ -9,6 +9,9 @@ from core.default_game_data import DEFAULT_BATTLES
 class GameDataBattles(GameData):
     """Handler for battle data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('battles', 'using_default_battles')
+    
     def __init__(self):
         """Initialize battle data handler."""
         super().__init__()
@@ -31,18 +34,18 @@ class GameDataBattles(GameData):
         all_battles = []
         
         for pattern in patterns:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
+            matches = self.re_findall(pattern, self.js_content, re.DOTALL)
             for match in matches:
                 # Process each battle entry
                 if '{' in match:  # If it's an object with multiple battles
-                    battle_entries = re.findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
+                    battle_entries = self.re_findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
                     
                     for battle_id, battle_content in battle_entries:
                         battle = self._parse_battle_properties(battle_id, battle_content)
                         if battle:
                             all_battles.append(battle)
                 else:  # If it's an array of battle objects
-                    battle_matches = re.findall(r'\{(.*?)\}', match, re.DOTALL)
+                    battle_matches = self.re_findall(r'\{(.*?)\}', match, re.DOTALL)
                     for i, battle_str in enumerate(battle_matches):
                         battle = self._parse_battle_properties(f"battle{i}", battle_str)
                         if battle:
@@ -68,7 +71,7 @@ class GameDataBattles(GameData):
             }
             
             # Extract name if available
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', battle_content)
+            name_match = self.re_search(r'name\s*:\s*["\']([^"\']*)["\']', battle_content)
             if name_match:
                 battle['name'] = name_match.group(1)
             else:
@@ -76,17 +79,17 @@ class GameDataBattles(GameData):
                 battle['name'] = battle_id.replace('_', ' ').title()
                 
             # Extract enemies
-            enemies_match = re.search(r'enemies\s*:\s*\[(.*?)\]', battle_content, re.DOTALL)
+            enemies_match = self.re_search(r'enemies\s*:\s*\[(.*?)\]', battle_content, re.DOTALL)
             if enemies_match:
                 enemies_str = enemies_match.group(1)
                 # Extract enemy names
-                enemy_names = re.findall(r'["\']([^"\']*)["\']', enemies_str)
+                enemy_names = self.re_findall(r'["\']([^"\']*)["\']', enemies_str)
                 
                 if enemy_names:
                     battle['enemies'] = enemy_names
                 else:
                     # Try to extract enemy IDs if names aren't available
-                    enemy_ids = re.findall(r'\b(\d+)\b', enemies_str)
+                    enemy_ids = self.re_findall(r'\b(\d+)\b', enemies_str)
                     if enemy_ids:
                         battle['enemies'] = [f"Enemy{id}" for id in enemy_ids]
                     else:
@@ -99,7 +102,7 @@ class GameDataBattles(GameData):
                     battle['enemies'] = ["Goblin", "Wolf"]  # Default random encounter
                     
             # Extract background if available
-            bg_match = re.search(r'background\s*:\s*["\']?([^"\',:]+)["\']?', battle_content)
+            bg_match = self.re_search(r'background\s*:\s*["\']?([^"\',:]+)["\']?', battle_content)
             if bg_match:
                 battle['background'] = bg_match.group(1)
             else:
@@ -126,9 +129,17 @@ class GameDataBattles(GameData):
             print(f"Error parsing battle data: {str(e)}")
             return None
             
+    def record_references(self, record):
+        """A battle's enemies are monster IDs or names."""
+        references = []
+        for enemy in record.get('enemies') or ():
+            if isinstance(enemy, dict):
+                enemy = enemy.get('id') or enemy.get('name')
+            if isinstance(enemy, str):
+                target = ('monster', enemy) if enemy.startswith('ms_') else ('monster-name', enemy)
+                references.append((target, 'battle'))
+        return references
+        
     def get_battle_by_name(self, name):
         """Get a battle by name."""
-        for battle in self.battles:
-            if battle.get('name') == name:
-                return battle
-        return None 
\ No newline at end of file
+        return self.find_record('name', name) 
\ No newline at end of file
@@ -4,11 +4,25 @@ Character data handling module.
 
 import re
 from core.game_data import GameData
+from core.record_index import field_key
 from core.default_game_data import DEFAULT_CHARACTERS, JOB_SPRITE_MAP
 
 class GameDataCharacters(GameData):
     """Handler for character data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('characters', 'using_default_characters')
+    
+    # Hash indexes over the characters, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('id', field_key('id')),
+        ('job', field_key('job')),
+    )
+    
+    # Bundle module that creates the party (this.gl.charaSt)
+    MODULE_PATH = './game.vue'
+    
     def __init__(self, debug=False):
         """Initialize character data handler."""
         super().__init__()
@@ -54,7 +68,12 @@ class GameDataCharacters(GameData):
             # Look for the exact character creation pattern
             char_creation_pattern = r'for\s*\(\s*var\s+([a-zA-Z]+)\s*=\s*\[(.*?)\],\s*([a-zA-Z]+)\s*=\s*0;\s*\3\s*<\s*(\d+);\s*\3\+\+\)\s*this\.gl\.charaSt\.push\(new\s+([a-zA-Z]+)\(\{[^}]*?id:\s*\1\[\3\],\s*job:\s*\3[^}]*?\}\)\)'
             
-            creation_match = re.search(char_creation_pattern, self.js_content, re.DOTALL)
+            # Search only the game module when the bundle has been indexed
+            source = self.get_module_source(self.MODULE_PATH)
+            if source is None:
+                source = self.js_content
+            
+            creation_match = self.re_search(char_creation_pattern, source, re.DOTALL)
             
             if creation_match:
                 self._log("Found exact character creation pattern!")
@@ -65,9 +84,9 @@ class GameDataCharacters(GameData):
                 class_name = creation_match.group(5)  # 'a' in the example
                 
                 # Extract character IDs
-                char_ids = re.findall(r'"([^"]+)"', ids_str)
+                char_ids = self.re_findall(r'"([^"]+)"', ids_str)
                 if not char_ids:
-                    char_ids = re.findall(r'\'([^\']+)\'', ids_str)
+                    char_ids = self.re_findall(r'\'([^\']+)\'', ids_str)
                 
                 self._log(f"Found character creation with {count} characters, IDs: {char_ids}")
                 
@@ -125,7 +144,7 @@ class GameDataCharacters(GameData):
             # If the exact pattern doesn't match, try a more flexible approach
             # Look for a more general pattern
             general_pattern = r'this\.gl\.charaSt\.push\(new\s+[a-zA-Z]+\(\{\s*id:\s*[^,]+,\s*job:\s*(\d+)'
-            job_matches = re.findall(general_pattern, self.js_content)
+            job_matches = self.re_findall(general_pattern, source)
             
             if job_matches:
                 self._log(f"Found {len(job_matches)} character creation statements with job IDs")
@@ -187,7 +206,4 @@ class GameDataCharacters(GameData):
     
     def get_character_by_name(self, name):
         """Get a character by name."""
-        for character in self.characters:
-            if character.get('name') == name:
-                return character
-        return None
+        return self.find_record('name', name)
@@ -4,11 +4,30 @@ Item data handling module.
 
 import re
 from core.game_data import GameData
+from core.record_index import each_key, field_key
+from core.records import ItemRecord
 from core.default_game_data import DEFAULT_ITEMS
 
 class GameDataItems(GameData):
     """Handler for item data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('items', 'using_default_items')
+    
+    # Hash indexes over the items, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('id', field_key('id')),
+        ('type', field_key('type')),
+        ('category', field_key('category')),
+        ('job', each_key('job_restrictions')),
+    )
+    
+    # Bundle module holding the item, equipment and magic tables
+    MODULE_PATH = './game/variables/_items'
+    
+    RECORD_CLASS = ItemRecord
+    
     def __init__(self, debug=False):
         """Initialize item data handler."""
         super().__init__()
@@ -19,7 +38,7 @@ class GameDataItems(GameData):
     def _debug_print(self, message):
         if self.debug:
             print(message)
-    
+            
     def extract_items(self):
         """Extract item data from the JavaScript content."""
         self._debug_print("Extracting items...")
@@ -66,12 +85,81 @@ class GameDataItems(GameData):
         self.items = DEFAULT_ITEMS.copy()
         self.using_default_items = True
     
+    def parse_source_record(self, path, literal):
+        """Build an item from its source literal again, see GameData.source_patches()."""
+        array_key = path[-2]
+        if array_key == 'item':
+            return self._parse_item_record(literal)
+        if array_key == 'wep':
+            return self._parse_equipment_record(literal, 'weapon')
+        if array_key == 'arm':
+            return self._parse_equipment_record(literal, 'armor')
+        if array_key == 'mgc':
+            return self._parse_magic_record(literal)
+        return None
+        
+    def reference_targets(self, record):
+        """Shops and drops refer to an item by its table and position, e.g. ('item', 'wep', 0)."""
+        path = self.spans.record_path(record)
+        return (('item',) + tuple(path[-2:]),) if path is not None else ()
+        
+    def source_fields(self, record, literal):
+        """
+        Get the fields of an item that can be written back to its source literal.
+        
+        Only fields copied as is are included, derived ones such as the
+        type, category or the description (which drops <br> tags) are not.
+        """
+        fields = [(('name',), ('name',)), (('id',), ('idx',)), (('price',), ('buy',))]
+        act = literal.get('act')
+        
+        if record['type'] == 'Weapon':
+            fields += [(('job_restrictions',), ('job',)),
+                       (('power',), ('st', 'wp')),
+                       (('stat_bonuses', 'lk'), ('st', 'crt'))]
+        elif record['type'] in ('Armor', 'Helmet', 'Shield', 'Accessory'):
+            fields += [(('job_restrictions',), ('job',)),
+                       (('power',), ('st', 'am')),
+                       (('stat_bonuses', 'sp'), ('st', 'ev'))]
+        elif record['type'] == 'Magic':
+            fields += [(('job_restrictions',), ('job',)), (('magic_level',), ('mlv',))]
+            if isinstance(act, dict) and isinstance(act.get('val'), dict):
+                fields += [(('effect', 'min_value'), ('act', 'val', 'min')),
+                           (('effect', 'max_value'), ('act', 'val', 'max'))]
+            elif isinstance(act, dict):
+                fields.append((('effect', 'strength'), ('act', 'val')))
+        else:
+            fields.append((('quantity',), ('max',)))
+            if isinstance(act, dict) and not isinstance(act.get('val'), dict):
+                fields.append((('effect', 'strength'), ('act', 'val')))
+        return fields
+        
+    def _item_table(self, array_key):
+        """
+        Get one of the record tables of the items module.
+        
+        Args:
+            array_key (str): The key in the JS object ('item', 'wep', 'arm' or 'mgc')
+            
+        Returns:
+            list: (source path, record) for each parsed record, empty if the
+                table wasn't found; the path locates the record in self.spans
+        """
+        exports = self.get_module_exports(self.MODULE_PATH)
+        if isinstance(exports, dict):
+            table = exports.get(array_key)
+            table_path = (self.MODULE_PATH, array_key)
+        else:
+            # No module index, look for the table in the whole bundle
+            table = self.find_literal(array_key)
+            table_path = (None, array_key)
+        if not isinstance(table, list):
+            return []
+        return [(table_path + (i,), record) for i, record in enumerate(table)]
+    
     def _extract_item_array(self):
         """Extract the regular item array from the JavaScript content."""
-        # Main item array pattern in app.js (more precise based on actual structure)
-        main_pattern = r'item\s*:\s*\[\s*\{(.*?)\}\s*\],'
-        
-        # Backup patterns if the main pattern doesn't work
+        # Backup patterns if the item table can't be found
         backup_patterns = [
             # Classic item array initialization
             r'this\.gl\.itemSt\s*=\s*\[(.*?)\];',
@@ -92,77 +180,31 @@ class GameDataItems(GameData):
         
         extracted_items = []
         
-        # First try with the main pattern that matches the observed structure
-        try:
-            matches = re.findall(main_pattern, self.js_content, re.DOTALL)
-            if matches:
-                # The main pattern captures the content of the item array without the brackets
-                # We need to split this into individual item objects
-                item_contents = matches[0]
-                
-                # Split at closing brace + comma + opening brace pattern, which separates items
-                item_strings = re.split(r'\},\s*\{', item_contents)
-                
-                for i, item_str in enumerate(item_strings):
-                    # Add back the curly braces that were removed in the split
-                    if i > 0:
-                        item_str = '{' + item_str
-                    if i < len(item_strings) - 1:
-                        item_str = item_str + '}'
-                    
-                    # Parse the item
-                    item = self._parse_item_from_js(item_str)
-                    if item:
-                        extracted_items.append(item)
-                        self._debug_print(f"Found item: {item['name']}")
-        except Exception as e:
-            self._debug_print(f"Error in main pattern matching: {str(e)}")
+        # First try the item table of the items module
+        for path, record in self._item_table('item'):
+            item = self._parse_item_record(record)
+            if item:
+                self.spans.link(item, path)
+                extracted_items.append(item)
+                self._debug_print(f"Found item: {item['name']}")
         
-        # If the main pattern didn't work, try the backup patterns
+        # If the table wasn't found, try the backup patterns
         if not extracted_items:
-            self._debug_print("Main pattern didn't match, trying backup patterns...")
+            self._debug_print("Item table not found, trying backup patterns...")
             for pattern in backup_patterns:
                 try:
-                    matches = re.findall(pattern, self.js_content, re.DOTALL)
+                    matches = self.re_findall(pattern, self.js_content, re.DOTALL)
                     for match in matches:
                         # Try to find individual item objects
-                        item_matches = re.findall(r'\{(.*?)\}', match, re.DOTALL)
+                        item_matches = self.re_findall(r'\{(.*?)\}', match, re.DOTALL)
                         for item_str in item_matches:
                             item = self._parse_item_properties(item_str)
                             if item:
-                                extracted_items.append(item)
+                                extracted_items.append(ItemRecord(item))
                                 self._debug_print(f"Found item with backup pattern: {item['name']}")
                 except Exception as e:
                     self._debug_print(f"Error in pattern matching: {str(e)}")
         
-        # If we still don't have items, try an advanced regex to find the structure
-        if not extracted_items:
-            self._debug_print("Trying more aggressive pattern matching...")
-            try:
-                # Look for a structure like e.exports = { item: [{ ... }] }
-                advanced_pattern = r'(?:e\.exports|module\.exports)\s*=\s*\{.*?item\s*:\s*\[\s*\{(.*?)\}\s*\]'
-                matches = re.findall(advanced_pattern, self.js_content, re.DOTALL)
-                
-                if matches:
-                    # Process similar to the main pattern
-                    item_contents = matches[0]
-                    item_strings = re.split(r'\},\s*\{', item_contents)
-                    
-                    for i, item_str in enumerate(item_strings):
-                        # Add back the curly braces that were removed in the split
-                        if i > 0:
-                            item_str = '{' + item_str
-                        if i < len(item_strings) - 1:
-                            item_str = item_str + '}'
-                        
-                        # Parse the item
-                        item = self._parse_item_from_js(item_str)
-                        if item:
-                            extracted_items.append(item)
-                            self._debug_print(f"Found item with advanced pattern: {item['name']}")
-            except Exception as e:
-                self._debug_print(f"Error in advanced pattern matching: {str(e)}")
-        
         return extracted_items
         
     def _extract_equipment_array(self, equipment_type, array_key):
@@ -176,269 +218,207 @@ class GameDataItems(GameData):
         Returns:
             list: Extracted equipment items
         """
-        # Pattern to find equipment arrays
-        pattern = fr'{array_key}\s*:\s*\[\s*\{{(.*?)\}}\s*\]'
-        
         extracted_items = []
         
-        try:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
-            if matches:
-                # Process the equipment array
-                equipment_contents = matches[0]
-                equipment_strings = re.split(r'\},\s*\{', equipment_contents)
-                
-                for i, equip_str in enumerate(equipment_strings):
-                    # Add back the curly braces that were removed in the split
-                    if i > 0:
-                        equip_str = '{' + equip_str
-                    if i < len(equipment_strings) - 1:
-                        equip_str = equip_str + '}'
-                    
-                    # Parse the equipment item
-                    item = self._parse_equipment_from_js(equip_str, equipment_type)
-                    if item:
-                        extracted_items.append(item)
-                        self._debug_print(f"Found {equipment_type}: {item['name']}")
-                        
-        except Exception as e:
-            self._debug_print(f"Error extracting {equipment_type} array: {str(e)}")
+        for path, record in self._item_table(array_key):
+            item = self._parse_equipment_record(record, equipment_type)
+            if item:
+                self.spans.link(item, path)
+                extracted_items.append(item)
+                self._debug_print(f"Found {equipment_type}: {item['name']}")
             
         return extracted_items
         
-    def _parse_equipment_from_js(self, equip_str, equipment_type):
+    def _parse_equipment_record(self, record, equipment_type):
         """
-        Parse equipment (weapon/armor) from JavaScript.
+        Parse equipment (weapon/armor) from its parsed JavaScript record.
         
         Args:
-            equip_str (str): String representation of equipment
+            record (dict): The equipment object as parsed from app.js
             equipment_type (str): 'weapon' or 'armor'
             
         Returns:
             dict: Parsed equipment item or None if parsing fails
         """
-        try:
-            # Extract basic properties
-            idx_match = re.search(r'idx\s*:\s*(\d+)', equip_str)
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', equip_str)
-            ctg_match = re.search(r'ctg\s*:\s*["\']([^"\']*)["\']', equip_str)
-            
-            if not name_match:
-                return None
-                
-            # Determine specific equipment type based on category
-            specific_type = 'Weapon'
-            category = 'Sword'  # Default
-            
-            if equipment_type == 'armor':
-                specific_type = 'Armor'
-                category = 'Medium'  # Default
-                
-                # Check if it's a different armor type
-                if ctg_match:
-                    ctg = ctg_match.group(1)
-                    if ctg == 'head':
-                        specific_type = 'Helmet'
-                        category = 'Helm'
-                    elif ctg == 'shield':
-                        specific_type = 'Shield'
-                        category = 'Shield'
-                    elif ctg == 'acce' or ctg == 'accessory':
-                        specific_type = 'Accessory'
-                        category = 'Ring'
-            
-            if equipment_type == 'weapon' and ctg_match:
-                ctg = ctg_match.group(1)
-                if ctg == 'slash':
-                    category = 'Sword'
-                elif ctg == 'pierce':
-                    category = 'Spear'
-                elif ctg == 'blow':
-                    category = 'Axe'
-                elif ctg == 'wand' or ctg == 'staff':
-                    category = 'Staff'
-                    
-            # Create the equipment item
-            item = {
-                'name': name_match.group(1),
-                'type': specific_type,
-                'category': category,
-                'power': 0,
-                'price': 0,
-                'description': f"A {specific_type.lower()}."
-            }
+        if not isinstance(record, dict) or not isinstance(record.get('name'), str):
+            return None
             
-            # Extract item ID if available
-            if idx_match:
-                item['id'] = int(idx_match.group(1))
+        ctg = record.get('ctg')
             
-            # Extract price information
-            buy_match = re.search(r'buy\s*:\s*(\d+)', equip_str)
-            sell_match = re.search(r'sell\s*:\s*(\d+)', equip_str)
+        # Determine specific equipment type based on category
+        specific_type = 'Weapon'
+        category = 'Sword'  # Default
+        
+        if equipment_type == 'armor':
+            specific_type = 'Armor'
+            category = 'Medium'  # Default
+            
+            # Check if it's a different armor type
+            if ctg == 'head':
+                specific_type = 'Helmet'
+                category = 'Helm'
+            elif ctg == 'shield':
+                specific_type = 'Shield'
+                category = 'Shield'
+            elif ctg == 'acce' or ctg == 'accessory':
+                specific_type = 'Accessory'
+                category = 'Ring'
+        
+        if equipment_type == 'weapon':
+            if ctg == 'slash':
+                category = 'Sword'
+            elif ctg == 'pierce':
+                category = 'Spear'
+            elif ctg == 'blow':
+                category = 'Axe'
+            elif ctg == 'wand' or ctg == 'staff':
+                category = 'Staff'
+                
+        # Create the equipment item
+        item = {
+            'name': record['name'],
+            'type': specific_type,
+            'category': category,
+            'power': 0,
+            'price': 0,
+            'description': f"A {specific_type.lower()}."
+        }
+        
+        # Extract item ID if available
+        if type(record.get('idx')) is int:
+            item['id'] = record['idx']
+        
+        # Extract price information
+        if type(record.get('buy')) is int:
+            item['price'] = record['buy']
+            
+        # Extract job restrictions
+        job = record.get('job')
+        item['job_restrictions'] = [v for v in job if type(v) is int] if isinstance(job, list) else []
+            
+        # Extract stats based on equipment type
+        st = record.get('st')
+        if isinstance(st, dict):
+            # Initialize stat bonuses
+            item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0}
             
-            if buy_match:
-                item['price'] = int(buy_match.group(1))
-                
-            # Extract job restrictions
-            job_match = re.search(r'job\s*:\s*\[(.*?)\]', equip_str)
-            if job_match:
-                job_str = job_match.group(1)
-                # Convert job indices to a list of integers
-                job_values = [int(v.strip()) for v in job_str.split(',') if v.strip().isdigit()]
-                item['job_restrictions'] = job_values
-            else:
-                item['job_restrictions'] = []
-                
-            # Extract stats based on equipment type
-            st_match = re.search(r'st\s*:\s*\{(.*?)\}', equip_str, re.DOTALL)
-            if st_match:
-                st_str = st_match.group(1)
-                
-                # Initialize stat bonuses
-                item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0}
-                
-                # For weapons, check weapon power
-                if equipment_type == 'weapon':
-                    wp_match = re.search(r'wp\s*:\s*(\d+)', st_str)
-                    if wp_match:
-                        item['power'] = int(wp_match.group(1))
-                    
-                    # Check critical hit rate
-                    crt_match = re.search(r'crt\s*:\s*(\d+)', st_str)
-                    if crt_match:
-                        item['stat_bonuses']['lk'] = int(crt_match.group(1))
-                
-                # For armor, check armor and evasion
-                elif equipment_type == 'armor':
-                    am_match = re.search(r'am\s*:\s*(\d+)', st_str)
-                    if am_match:
-                        item['power'] = int(am_match.group(1))
-                    
-                    # Check evasion (might be negative)
-                    ev_match = re.search(r'ev\s*:\s*(-?\d+)', st_str)
-                    if ev_match:
-                        item['stat_bonuses']['sp'] = int(ev_match.group(1))
+            # For weapons, check weapon power and critical hit rate
+            if equipment_type == 'weapon':
+                if type(st.get('wp')) is int:
+                    item['power'] = st['wp']
+                if type(st.get('crt')) is int:
+                    item['stat_bonuses']['lk'] = st['crt']
+            
+            # For armor, check armor and evasion (might be negative)
+            elif equipment_type == 'armor':
+                if type(st.get('am')) is int:
+                    item['power'] = st['am']
+                if type(st.get('ev')) is int:
+                    item['stat_bonuses']['sp'] = st['ev']
+        
+        return ItemRecord(item)
+        
+    def _parse_item_record(self, record):
+        """
+        Parse an item from its parsed JavaScript record.
+        
+        Args:
+            record (dict): The item object as parsed from app.js
             
-            return item
-        except Exception as e:
-            self._debug_print(f"Error parsing equipment: {str(e)}")
+        Returns:
+            dict: Parsed item or None if the record has no name
+        """
+        if not isinstance(record, dict) or not isinstance(record.get('name'), str):
             return None
         
-    def _parse_item_from_js(self, item_str):
-        """Parse an item from its JavaScript object representation."""
-        try:
-            # Extract basic properties with more precise regex patterns
-            idx_match = re.search(r'idx\s*:\s*(\d+)', item_str)
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', item_str)
-            
-            if not name_match:
-                return None
-            
-            item = {
-                'name': name_match.group(1),
-                'type': 'Consumable',  # Default type
-                'power': 0,
-                'price': 0,
-                'description': f"A consumable item."
-            }
-            
-            # Extract item ID if available
-            if idx_match:
-                item['id'] = int(idx_match.group(1))
-            
-            # Extract price information
-            buy_match = re.search(r'buy\s*:\s*(\d+)', item_str)
-            sell_match = re.search(r'sell\s*:\s*(\d+)', item_str)
-            
-            if buy_match:
-                item['price'] = int(buy_match.group(1))
-            
-            # Extract maximum quantity
-            max_match = re.search(r'max\s*:\s*(\d+)', item_str)
-            if max_match:
-                item['quantity'] = int(max_match.group(1))
+        item = {
+            'name': record['name'],
+            'type': 'Consumable',  # Default type
+            'power': 0,
+            'price': 0,
+            'description': f"A consumable item."
+        }
+        
+        # Extract item ID if available
+        if type(record.get('idx')) is int:
+            item['id'] = record['idx']
+        
+        # Extract price information
+        if type(record.get('buy')) is int:
+            item['price'] = record['buy']
+        
+        # Extract maximum quantity
+        item['quantity'] = record['max'] if type(record.get('max')) is int else 1
+        
+        # Extract effect/action information
+        effect_id = None
+        act = record.get('act')
+        if isinstance(act, dict) and isinstance(act.get('id'), str):
+            effect_id = act['id']
+            
+            # Set effect type based on id
+            if effect_id in ['heal', 'tent']:
+                item['effect'] = {
+                    'type': 'Restore HP',
+                    'target': 'Single',
+                    'strength': 0,
+                    'status': {}
+                }
+            elif effect_id == 'detox':
+                item['effect'] = {
+                    'type': 'Cure Status',
+                    'target': 'Single',
+                    'strength': 0,
+                    'status': {'poison': True}
+                }
             else:
-                item['quantity'] = 1
-            
-            # Extract effect/action information
-            act_match = re.search(r'act\s*:\s*\{(.*?)\}', item_str, re.DOTALL)
-            if act_match:
-                act_str = act_match.group(1)
-                
-                # Extract effect type
-                effect_id_match = re.search(r'id\s*:\s*["\']([^"\']*)["\']', act_str)
-                if effect_id_match:
-                    effect_id = effect_id_match.group(1)
-                    
-                    # Set effect type based on id
-                    if effect_id in ['heal', 'tent']:
-                        item['effect'] = {
-                            'type': 'Restore HP',
-                            'target': 'Single',
-                            'strength': 0,
-                            'status': {}
-                        }
-                    elif effect_id == 'detox':
-                        item['effect'] = {
-                            'type': 'Cure Status',
-                            'target': 'Single',
-                            'strength': 0,
-                            'status': {'poison': True}
-                        }
-                    else:
-                        item['effect'] = {
-                            'type': 'None',
-                            'target': 'Self',
-                            'strength': 0,
-                            'status': {}
-                        }
-                    
-                    # Extract effect value if present
-                    val_match = re.search(r'val\s*:\s*(\d+)', act_str)
-                    if val_match:
-                        item['effect']['strength'] = int(val_match.group(1))
-                    
-                    # Extract target
-                    trg_match = re.search(r'trg\s*:\s*\[\s*["\']([^"\']*)["\'],\s*["\']([^"\']*)["\']', act_str)
-                    if trg_match:
-                        target_type = trg_match.group(1)
-                        target_scope = trg_match.group(2)
-                        
-                        if target_scope == 'all':
-                            item['effect']['target'] = 'All' if target_type == 'player' else 'All Enemies'
-                        else:
-                            item['effect']['target'] = 'Single' if target_type == 'player' else 'Enemy'
+                item['effect'] = {
+                    'type': 'None',
+                    'target': 'Self',
+                    'strength': 0,
+                    'status': {}
+                }
             
-            # Extract message as description
-            msg_match = re.search(r'msg\s*:\s*["\']([^"\']*)["\']', item_str)
-            if msg_match:
-                # Clean up description by removing HTML tags
-                description = msg_match.group(1).replace('<br>', ' ')
-                item['description'] = description
-            
-            # Determine item type based on properties and name
-            if 'テント' in item['name'] or 'خيمة' in item['name'] or 'tent' in item_str.lower():
-                item['type'] = 'Consumable'
-                item['category'] = 'Tent'
-            elif 'ポーション' in item['name'] or 'شفاء' in item['name'] or 'heal' in item_str.lower():
-                item['type'] = 'Consumable'
-                item['category'] = 'Potion'
-            elif 'どく' in item['name'] or 'نقي' in item['name'] or 'detox' in item_str.lower():
-                item['type'] = 'Consumable'
-                item['category'] = 'Antidote'
-            elif 'battle' in item_str and '"battle":!1' in item_str:
-                # Items that can't be used in battle are often key items
-                item['type'] = 'Key Item'
-            
-            # Add default for remaining properties
-            item['job_restrictions'] = []
-            item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0}
-            item['rarity'] = 'Common'
+            # Extract effect value if present
+            if type(act.get('val')) is int:
+                item['effect']['strength'] = act['val']
             
-            return item
-        except Exception as e:
-            self._debug_print(f"Error parsing item from JS: {str(e)}")
-            return None
+            # Extract target
+            trg = act.get('trg')
+            if isinstance(trg, list) and len(trg) >= 2:
+                target_type, target_scope = trg[0], trg[1]
+                
+                if target_scope == 'all':
+                    item['effect']['target'] = 'All' if target_type == 'player' else 'All Enemies'
+                else:
+                    item['effect']['target'] = 'Single' if target_type == 'player' else 'Enemy'
+        
+        # Extract message as description
+        if isinstance(record.get('msg'), str):
+            # Clean up description by removing HTML tags
+            item['description'] = record['msg'].replace('<br>', ' ')
+        
+        # Determine item type based on properties and name
+        name = item['name']
+        if 'テント' in name or 'خيمة' in name or effect_id == 'tent':
+            item['type'] = 'Consumable'
+            item['category'] = 'Tent'
+        elif 'ポーション' in name or 'شفاء' in name or effect_id == 'heal':
+            item['type'] = 'Consumable'
+            item['category'] = 'Potion'
+        elif 'どく' in name or 'نقي' in name or effect_id == 'detox':
+            item['type'] = 'Consumable'
+            item['category'] = 'Antidote'
+        elif record.get('battle') is False:
+            # Items that can't be used in battle are often key items
+            item['type'] = 'Key Item'
+        
+        # Add default for remaining properties
+        item['job_restrictions'] = []
+        item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0}
+        item['rarity'] = 'Common'
+        
+        return ItemRecord(item)
         
     def _parse_item_properties(self, item_str):
         """Parse item properties from a string representation."""
@@ -446,12 +426,12 @@ class GameDataItems(GameData):
             item = {}
             
             # Extract name if available
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', item_str)
+            name_match = self.re_search(r'name\s*:\s*["\']([^"\']*)["\']', item_str)
             if name_match:
                 item['name'] = name_match.group(1)
             else:
                 # Try alternative formats
-                alt_name_match = re.search(r'name\s*=\s*["\']([^"\']*)["\']', item_str)
+                alt_name_match = self.re_search(r'name\s*=\s*["\']([^"\']*)["\']', item_str)
                 if alt_name_match:
                     item['name'] = alt_name_match.group(1)
                 else:
@@ -459,9 +439,9 @@ class GameDataItems(GameData):
                     return None
                 
             # Extract type
-            type_match = re.search(r'type\s*:\s*["\']?([^"\',:;]+)["\']?', item_str)
+            type_match = self.re_search(r'type\s*:\s*["\']?([^"\',:;]+)["\']?', item_str)
             if not type_match:
-                type_match = re.search(r'type\s*=\s*["\']?([^"\',:;]+)["\']?', item_str)
+                type_match = self.re_search(r'type\s*=\s*["\']?([^"\',:;]+)["\']?', item_str)
                 
             if type_match:
                 item['type'] = type_match.group(1)
@@ -479,10 +459,10 @@ class GameDataItems(GameData):
                     item['type'] = 'Misc'
                 
             # Extract power/effect
-            power_match = re.search(r'power\s*:\s*(\d+)', item_str)
+            power_match = self.re_search(r'power\s*:\s*(\d+)', item_str)
             if not power_match:
                 # Try alternative property names
-                power_match = re.search(r'(?:atk|attack|str|strength|def|defense)\s*:\s*(\d+)', item_str)
+                power_match = self.re_search(r'(?:atk|attack|str|strength|def|defense)\s*:\s*(\d+)', item_str)
                 
             if power_match:
                 item['power'] = int(power_match.group(1))
@@ -490,9 +470,9 @@ class GameDataItems(GameData):
                 item['power'] = 0
                 
             # Extract price
-            price_match = re.search(r'price\s*:\s*(\d+)', item_str)
+            price_match = self.re_search(r'price\s*:\s*(\d+)', item_str)
             if not price_match:
-                price_match = re.search(r'(?:cost|value|gold|buy)\s*:\s*(\d+)', item_str)
+                price_match = self.re_search(r'(?:cost|value|gold|buy)\s*:\s*(\d+)', item_str)
                 
             if price_match:
                 item['price'] = int(price_match.group(1))
@@ -500,7 +480,7 @@ class GameDataItems(GameData):
                 item['price'] = 0
                 
             # Extract description
-            desc_match = re.search(r'(?:desc|description|msg)\s*:\s*["\']([^"\']*)["\']', item_str)
+            desc_match = self.re_search(r'(?:desc|description|msg)\s*:\s*["\']([^"\']*)["\']', item_str)
             if desc_match:
                 item['description'] = desc_match.group(1).replace('<br>', ' ')
             else:
@@ -510,7 +490,7 @@ class GameDataItems(GameData):
             item['quantity'] = 1
             
             # Try to get max quantity
-            max_match = re.search(r'max\s*:\s*(\d+)', item_str)
+            max_match = self.re_search(r'max\s*:\s*(\d+)', item_str)
             if max_match:
                 item['quantity'] = int(max_match.group(1))
                 
@@ -525,12 +505,12 @@ class GameDataItems(GameData):
             item['rarity'] = 'Common'
             
             # Extract effect/action information
-            act_match = re.search(r'act\s*:\s*\{(.*?)\}', item_str, re.DOTALL)
+            act_match = self.re_search(r'act\s*:\s*\{(.*?)\}', item_str, re.DOTALL)
             if act_match:
                 act_str = act_match.group(1)
                 
                 # Extract effect type
-                effect_id_match = re.search(r'id\s*:\s*["\']([^"\']*)["\']', act_str)
+                effect_id_match = self.re_search(r'id\s*:\s*["\']([^"\']*)["\']', act_str)
                 if effect_id_match:
                     effect_id = effect_id_match.group(1)
                     
@@ -542,12 +522,12 @@ class GameDataItems(GameData):
                         item['effect']['status']['poison'] = True
                     
                     # Extract effect value if present
-                    val_match = re.search(r'val\s*:\s*(\d+)', act_str)
+                    val_match = self.re_search(r'val\s*:\s*(\d+)', act_str)
                     if val_match:
                         item['effect']['strength'] = int(val_match.group(1))
                     
                     # Extract target
-                    trg_match = re.search(r'trg\s*:\s*\[\s*["\']([^"\']*)["\'],\s*["\']([^"\']*)["\']', act_str)
+                    trg_match = self.re_search(r'trg\s*:\s*\[\s*["\']([^"\']*)["\'],\s*["\']([^"\']*)["\']', act_str)
                     if trg_match:
                         target_type = trg_match.group(1)
                         target_scope = trg_match.group(2)
@@ -630,10 +610,7 @@ class GameDataItems(GameData):
             
     def get_item_by_name(self, name):
         """Get an item by name."""
-        for item in self.items:
-            if item.get('name') == name:
-                return item
-        return None
+        return self.find_record('name', name)
 
     def _extract_magic_array(self):
         """
@@ -642,195 +619,149 @@ class GameDataItems(GameData):
         Returns:
             list: Extracted magic items
         """
-        # Pattern to find magic array
-        pattern = r'mgc\s*:\s*\[\s*\{(.*?)\}\s*\]'
-        
         extracted_items = []
         
-        try:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
-            if matches:
-                # Process the magic array
-                magic_contents = matches[0]
-                magic_strings = re.split(r'\},\s*\{', magic_contents)
-                
-                for i, magic_str in enumerate(magic_strings):
-                    # Add back the curly braces that were removed in the split
-                    if i > 0:
-                        magic_str = '{' + magic_str
-                    if i < len(magic_strings) - 1:
-                        magic_str = magic_str + '}'
-                    
-                    # Parse the magic item
-                    item = self._parse_magic_from_js(magic_str)
-                    if item:
-                        extracted_items.append(item)
-                        self._debug_print(f"Found magic spell: {item['name']}")
-                        
-        except Exception as e:
-            self._debug_print(f"Error extracting magic array: {str(e)}")
+        for path, record in self._item_table('mgc'):
+            item = self._parse_magic_record(record)
+            if item:
+                self.spans.link(item, path)
+                extracted_items.append(item)
+                self._debug_print(f"Found magic spell: {item['name']}")
             
         return extracted_items
         
-    def _parse_magic_from_js(self, magic_str):
+    def _parse_magic_record(self, record):
         """
-        Parse magic spell/ability from JavaScript.
+        Parse magic spell/ability from its parsed JavaScript record.
         
         Args:
-            magic_str (str): String representation of magic spell
+            record (dict): The magic object as parsed from app.js
             
         Returns:
-            dict: Parsed magic item or None if parsing fails
+            dict: Parsed magic item or None if the record has no name
         """
-        try:
-            # Extract basic properties
-            idx_match = re.search(r'idx\s*:\s*(\d+)', magic_str)
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', magic_str)
-            mlv_match = re.search(r'mlv\s*:\s*(\d+)', magic_str)
+        if not isinstance(record, dict) or not isinstance(record.get('name'), str):
+            return None
             
-            if not name_match:
-                return None
-                
-            # Create the magic item
-            item = {
-                'name': name_match.group(1),
-                'type': 'Magic',
-                'category': 'Spell',
-                'power': 0,
-                'price': 0,
-                'description': "A magic spell."
-            }
+        # Create the magic item
+        item = {
+            'name': record['name'],
+            'type': 'Magic',
+            'category': 'Spell',
+            'power': 0,
+            'price': 0,
+            'description': "A magic spell."
+        }
+        
+        # Extract item ID if available
+        if type(record.get('idx')) is int:
+            item['id'] = record['idx']
             
-            # Extract item ID if available
-            if idx_match:
-                item['id'] = int(idx_match.group(1))
-                
-            # Extract magic level
-            if mlv_match:
-                item['magic_level'] = int(mlv_match.group(1))
-            
-            # Extract price information
-            buy_match = re.search(r'buy\s*:\s*(\d+)', magic_str)
-            if buy_match:
-                item['price'] = int(buy_match.group(1))
-                
-            # Extract job restrictions
-            job_match = re.search(r'job\s*:\s*\[(.*?)\]', magic_str)
-            if job_match:
-                job_str = job_match.group(1)
-                # Convert job indices to a list of integers
-                job_values = [int(v.strip()) for v in job_str.split(',') if v.strip().isdigit()]
-                item['job_restrictions'] = job_values
-            else:
-                item['job_restrictions'] = []
-                
-            # Extract effect information
-            act_match = re.search(r'act\s*:\s*\{(.*?)\}', magic_str, re.DOTALL)
-            if act_match:
-                act_str = act_match.group(1)
-                
-                # Default effect structure
-                item['effect'] = {
-                    'type': 'Magic Attack',
-                    'target': 'Single',
-                    'strength': 0,
-                    'status': {}
-                }
-                
-                # Extract effect ID
-                effect_id_match = re.search(r'id\s*:\s*["\']([^"\']*)["\']', act_str)
-                if effect_id_match:
-                    effect_id = effect_id_match.group(1)
-                    
-                    # Set effect type based on id
-                    if effect_id == 'heal':
-                        item['effect']['type'] = 'Restore HP'
-                        item['category'] = 'Healing'
-                    elif effect_id == 'fire':
-                        item['effect']['type'] = 'Fire Damage'
-                        item['category'] = 'Black Magic'
-                    elif effect_id == 'thunder':
-                        item['effect']['type'] = 'Lightning Damage'
-                        item['category'] = 'Black Magic'
-                    elif effect_id in ['dia', 'holy']:
-                        item['effect']['type'] = 'Holy Damage'
-                        item['category'] = 'White Magic'
-                    elif effect_id == 'blink':
-                        item['effect']['type'] = 'Evasion Up'
-                        item['category'] = 'Support'
-                    elif effect_id == 'protes':
-                        item['effect']['type'] = 'Defense Up'
-                        item['category'] = 'Support'
-                    elif effect_id == 'sripl':
-                        item['effect']['type'] = 'Cause Status'
-                        item['effect']['status'] = {'sleep': True}
-                        item['category'] = 'Status'
-                    elif effect_id == 'shape':
-                        item['effect']['type'] = 'Morph'
-                        item['category'] = 'Special'
-                    else:
-                        # Generic categorization based on effect ID
-                        item['effect']['type'] = effect_id.title()
-                        item['category'] = 'Other'
-                
-                # Extract target info
-                trg_match = re.search(r'trg\s*:\s*\[\s*["\']([^"\']*)["\'],\s*["\']([^"\']*)["\']', act_str)
-                if trg_match:
-                    target_type = trg_match.group(1)
-                    target_scope = trg_match.group(2)
-                    
-                    if target_scope == 'all':
-                        item['effect']['target'] = 'All' if target_type == 'player' else 'All Enemies'
-                    elif target_scope == 'single':
-                        item['effect']['target'] = 'Single' if target_type == 'player' else 'Enemy'
-                    elif target_scope == 'self':
-                        item['effect']['target'] = 'Self'
-                
-                # Extract effect value
-                val_match = re.search(r'val\s*:\s*(\d+)', act_str)
-                if val_match:
-                    item['effect']['strength'] = int(val_match.group(1))
-                else:
-                    # Try to extract min/max value range
-                    min_max_match = re.search(r'val\s*:\s*\{\s*min\s*:\s*(\d+),\s*max\s*:\s*(\d+)', act_str)
-                    if min_max_match:
-                        min_val = int(min_max_match.group(1))
-                        max_val = int(min_max_match.group(2))
-                        # Use average as strength
-                        item['effect']['strength'] = (min_val + max_val) // 2
-                        # Store min/max separately
-                        item['effect']['min_value'] = min_val
-                        item['effect']['max_value'] = max_val
+        # Extract magic level
+        if type(record.get('mlv')) is int:
+            item['magic_level'] = record['mlv']
+        
+        # Extract price information
+        if type(record.get('buy')) is int:
+            item['price'] = record['buy']
+            
+        # Extract job restrictions
+        job = record.get('job')
+        item['job_restrictions'] = [v for v in job if type(v) is int] if isinstance(job, list) else []
+            
+        # Extract effect information
+        act = record.get('act')
+        if isinstance(act, dict):
+            # Default effect structure
+            item['effect'] = {
+                'type': 'Magic Attack',
+                'target': 'Single',
+                'strength': 0,
+                'status': {}
+            }
             
-            # Extract description
-            msg_match = re.search(r'msg\s*:\s*["\']([^"\']*)["\']', magic_str)
-            if msg_match:
-                description = msg_match.group(1).replace('<br>', ' ')
-                item['description'] = description
-            else:
-                # Set a default description based on effect
-                if 'effect' in item and 'type' in item['effect']:
-                    item['description'] = f"A spell that {item['effect']['type'].lower()}."
-            
-            # Setup stat bonuses for consistency with other items
-            item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0, 'ma': 0}
-            
-            # Set rarity based on magic level or other factors
-            if 'magic_level' in item:
-                if item['magic_level'] >= 7:
-                    item['rarity'] = 'Legendary'
-                elif item['magic_level'] >= 5:
-                    item['rarity'] = 'Epic'
-                elif item['magic_level'] >= 3:
-                    item['rarity'] = 'Rare'
-                elif item['magic_level'] >= 1:
-                    item['rarity'] = 'Uncommon'
+            # Set effect type based on id
+            effect_id = act.get('id')
+            if isinstance(effect_id, str):
+                if effect_id == 'heal':
+                    item['effect']['type'] = 'Restore HP'
+                    item['category'] = 'Healing'
+                elif effect_id == 'fire':
+                    item['effect']['type'] = 'Fire Damage'
+                    item['category'] = 'Black Magic'
+                elif effect_id == 'thunder':
+                    item['effect']['type'] = 'Lightning Damage'
+                    item['category'] = 'Black Magic'
+                elif effect_id in ['dia', 'holy']:
+                    item['effect']['type'] = 'Holy Damage'
+                    item['category'] = 'White Magic'
+                elif effect_id == 'blink':
+                    item['effect']['type'] = 'Evasion Up'
+                    item['category'] = 'Support'
+                elif effect_id == 'protes':
+                    item['effect']['type'] = 'Defense Up'
+                    item['category'] = 'Support'
+                elif effect_id == 'sripl':
+                    item['effect']['type'] = 'Cause Status'
+                    item['effect']['status'] = {'sleep': True}
+                    item['category'] = 'Status'
+                elif effect_id == 'shape':
+                    item['effect']['type'] = 'Morph'
+                    item['category'] = 'Special'
                 else:
-                    item['rarity'] = 'Common'
+                    # Generic categorization based on effect ID
+                    item['effect']['type'] = effect_id.title()
+                    item['category'] = 'Other'
+            
+            # Extract target info
+            trg = act.get('trg')
+            if isinstance(trg, list) and len(trg) >= 2:
+                target_type, target_scope = trg[0], trg[1]
+                
+                if target_scope == 'all':
+                    item['effect']['target'] = 'All' if target_type == 'player' else 'All Enemies'
+                elif target_scope == 'single':
+                    item['effect']['target'] = 'Single' if target_type == 'player' else 'Enemy'
+                elif target_scope == 'self':
+                    item['effect']['target'] = 'Self'
+            
+            # Extract effect value, either a number or a min/max range
+            val = act.get('val')
+            if type(val) is int:
+                item['effect']['strength'] = val
+            elif isinstance(val, dict) and type(val.get('min')) is int and type(val.get('max')) is int:
+                min_val = val['min']
+                max_val = val['max']
+                # Use average as strength
+                item['effect']['strength'] = (min_val + max_val) // 2
+                # Store min/max separately
+                item['effect']['min_value'] = min_val
+                item['effect']['max_value'] = max_val
+        
+        # Extract description
+        if isinstance(record.get('msg'), str):
+            item['description'] = record['msg'].replace('<br>', ' ')
+        else:
+            # Set a default description based on effect
+            if 'effect' in item and 'type' in item['effect']:
+                item['description'] = f"A spell that {item['effect']['type'].lower()}."
+        
+        # Setup stat bonuses for consistency with other items
+        item['stat_bonuses'] = {'pw': 0, 'sp': 0, 'it': 0, 'st': 0, 'lk': 0, 'ma': 0}
+        
+        # Set rarity based on magic level or other factors
+        if 'magic_level' in item:
+            if item['magic_level'] >= 7:
+                item['rarity'] = 'Legendary'
+            elif item['magic_level'] >= 5:
+                item['rarity'] = 'Epic'
+            elif item['magic_level'] >= 3:
+                item['rarity'] = 'Rare'
+            elif item['magic_level'] >= 1:
+                item['rarity'] = 'Uncommon'
             else:
                 item['rarity'] = 'Common'
-            
-            return item
-        except Exception as e:
-            self._debug_print(f"Error parsing magic spell: {str(e)}")
-            return None
+        else:
+            item['rarity'] = 'Common'
+        
+        return ItemRecord(item)
@@ -0,0 +1,100 @@
+"""
+Background loader for game data.
+
+Runs GameDataManager.load_from_file() on a worker thread so the window and
+splash screen keep painting while app.js is read, indexed and extracted.
+Progress, errors and cancellation are reported through signals.
+"""
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class GameDataLoader(QThread):
+    """Worker thread that loads a bundle into a GameDataManager."""
+
+    # LoadProgress events (see core.load_progress)
+    progress = pyqtSignal(object)
+    # The data was loaded
+    loaded = pyqtSignal()
+    # Loading failed, with the error message
+    failed = pyqtSignal(str)
+    # Loading was cancelled with cancel()
+    cancelled = pyqtSignal()
+
+    def __init__(self, game_data, js_path, parent=None):
+        """
+        Initialize the loader.
+
+        Args:
+            game_data (GameDataManager): Manager to load into
+            js_path (str): Path of app.js
+            parent (QObject): Parent object
+        """
+        super().__init__(parent)
+        self.game_data = game_data
+        self.js_path = js_path
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Ask the loader to stop at the next step."""
+        self._cancel_requested = True
+
+    def is_cancel_requested(self):
+        """Check whether cancel() was called."""
+        return self._cancel_requested
+
+    def run(self):
+        """Load the game data (runs on the worker thread)."""
+        success = self.game_data.load_from_file(
+            self.js_path,
+            progress=self.progress.emit,
+            cancel=self.is_cancel_requested
+        )
+
+        if success:
+            self.loaded.emit()
+        elif self._cancel_requested:
+            self.cancelled.emit()
+        else:
+            self.failed.emit(self.game_data.last_error or "Unknown error")
+
+
+class GameDataPrefetcher(QThread):
+    """
+    Worker thread that extracts the domains a lazy load skipped.
+
+    Started once the editor is idle after loading, so switching to a tab
+    usually finds its data already extracted. Accessing a domain from the
+    GUI thread in the meantime simply extracts it there first.
+    """
+
+    # A domain finished extracting
+    domain_ready = pyqtSignal(str)
+
+    def __init__(self, game_data, parent=None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            game_data (GameDataManager): Manager loaded with lazy=True
+            parent (QObject): Parent object
+        """
+        super().__init__(parent)
+        self.game_data = game_data
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Stop after the domain being extracted."""
+        self._cancel_requested = True
+
+    def run(self):
+        """Extract pending domains one at a time (runs on the worker thread)."""
+        while not self._cancel_requested:
+            try:
+                domain = self.game_data.prefetch_next()
+            except Exception as e:
+                print(f"Error prefetching game data: {str(e)}")
+                break
+            if domain is None:
+                break
+            self.domain_ready.emit(domain)
@@ -5,8 +5,23 @@ Game Data Manager - Main module that integrates all game data components.
 import os
 import re
 import json
+import threading
 
 from core.game_data import GameData
+from core.module_index import ModuleIndex
+from core.extraction_cache import ExtractionCache
+from core.parallel_extraction import extract_parallel
+from core.load_progress import LoadStage, LoadProgress, LoadCancelled
+from core.source_patcher import write_patched
+from core.extraction_profiler import PROFILER
+from core.change_journal import ChangeJournal, values_equal
+from core.undo_history import UndoHistory, ListReplace, DEFAULT_MAX_BYTES, MISSING, copy_value, set_path
+from core.edit_log import EditLog
+from core.backup_store import BackupStore, BackupError
+from core.reference_index import ReferenceIndex
+from core.search_index import SearchIndex
+from core.map_grid import CellPatch
+from core.data_export import EXPORT_DIR_NAME, export_domains, import_domain, find_domain_file
 from core.game_data_characters import GameDataCharacters
 from core.game_data_items import GameDataItems
 from core.game_data_spells import GameDataSpells
@@ -15,11 +30,28 @@ from core.game_data_battles import GameDataBattles
 from core.game_data_monsters import GameDataMonsters
 from core.game_data_npcs import GameDataNPCs
 
+# Order in which parse_game_data() runs the extractors
+EXTRACTION_ORDER = ('characters', 'items', 'maps', 'battles', 'spells', 'monsters', 'npcs')
+
+# Bytes read from app.js between two progress events
+READ_CHUNK_SIZE = 256 * 1024
+
 class GameDataManager:
     """Main manager for all game data components."""
     
-    def __init__(self):
-        """Initialize the game data manager."""
+    def __init__(self, use_cache=True, parallel=False, max_workers=None, lazy=False, undo_memory=DEFAULT_MAX_BYTES,
+                 edit_log=True):
+        """
+        Initialize the game data manager.
+        
+        Args:
+            use_cache (bool): Restore unchanged bundles from the extraction cache
+            parallel (bool): Run the extractors in a process pool
+            max_workers (int): Size of that pool, None picks one per CPU
+            lazy (bool): Extract each domain on first access instead of while loading
+            undo_memory (int): Memory cap of the undo history, in bytes
+            edit_log (bool): Log the edits to disk until they are saved, see core.edit_log
+        """
         # Create data handlers for each type of game data
         self.character_data = GameDataCharacters()
         self.item_data = GameDataItems()
@@ -32,250 +64,1162 @@ class GameDataManager:
         # Working variables
         self.js_path = ""
         self.js_content = ""
-        self._has_changes = False
+        self.module_index = ModuleIndex()
+        self.extraction_cache = ExtractionCache(enabled=use_cache)
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.lazy = lazy
+        
+        # Domains loaded but not extracted yet (lazy mode); the lock keeps
+        # accesses from the GUI and background prefetching from extracting twice
+        self._pending = set()
+        self._lock = threading.RLock()
+        self._cache_key = None
+        
+        # Unsaved edits of every handler, see core.change_journal
+        self.journal = ChangeJournal()
+        # Undo/redo steps of every handler, see core.undo_history
+        self.history = UndoHistory(max_bytes=undo_memory)
+        # Crash log of the same edits, and the edits a crashed session left
+        self.edit_log = EditLog(enabled=edit_log)
+        self.recovered_edits = []
+        # Number of values the last save wrote, and the edits it couldn't write
+        self.saved_changes = 0
+        self.unsaved_changes = []
+        # Backup stores by bundle path, created on first save
+        self._backup_stores = {}
+        # Where the records are used, built on the first find_usages()
+        self.references = ReferenceIndex()
+        # Text search over every domain, built on the first search()
+        self.search_index = SearchIndex()
+        self._search_generation = None
+        # Identify this session's data in export manifests, see data_revision()
+        self._session = os.urandom(8).hex()
+        self._generation = 0
+        for name, handler in self._handlers().items():
+            handler.journal = self.journal
+            handler.history = self.history
+            handler.edit_log = self.edit_log
+            handler.domain = name
+        
+        # Names of the handlers whose data changed in the last load
+        self.changed_domains = set()
+        
+        # Reason the last load failed, "cancelled" if it was cancelled
+        self.last_error = None
+        self._progress = None
+        self._cancel = None
+        self._last_percent = None
+        
+    def _handlers(self):
+        """Get all data handlers keyed by the name of the data they hold."""
+        return {
+            'characters': self.character_data,
+            'items': self.item_data,
+            'spells': self.spell_data,
+            'maps': self.map_data,
+            'battles': self.battle_data,
+            'monsters': self.monster_data,
+            'npcs': self.npc_data,
+        }
+        
+    def handler(self, name):
+        """Get the data handler of a domain, e.g. 'items'."""
+        return self._handlers()[name]
+        
+    def load_from_file(self, js_path, progress=None, cancel=None):
+        """
+        Load game data from the specified JavaScript file.
         
-    def load_from_file(self, js_path):
-        """Load game data from the specified JavaScript file."""
+        Reloading the file that is already loaded only re-runs the handlers
+        whose bundle modules changed; changed_domains tells which handlers
+        ended up with different data.
+        
+        Args:
+            js_path (str): Path of app.js
+            progress (callable): Called with a LoadProgress for each step
+            cancel (callable): Polled between steps, returning True stops the load
+            
+        Returns:
+            bool: True on success; on failure last_error holds the reason
+        """
+        self._progress = progress
+        self._cancel = cancel
+        self._last_percent = None
+        self.last_error = None
+        
+        # Module digests of the previous load, used to reload incrementally
+        previous_digests = None
+        previous_states = None
+        if js_path == self.js_path and len(self.module_index):
+            previous_digests = self.module_index.module_digests()
+            previous_states = {name: handler.export_state() for name, handler in self._handlers().items()}
+            previous_states['pending'] = set(self._pending)
+            
         self.js_path = js_path
+        self._generation += 1
+        
+        # Hold the lock so nothing extracts from a half-loaded bundle
+        with self._lock:
+            return self._load(js_path, previous_digests, previous_states)
+            
+    def _load(self, js_path, previous_digests, previous_states):
+        """Body of load_from_file(), runs with the lock held."""
+        self._pending = set()
         
         try:
             print(f"Loading game data from {js_path}...")
-            with open(js_path, 'r', encoding='utf-8') as f:
-                self.js_content = f.read()
+            self.js_content = self._read_bundle(js_path)
                 
-            # Distribute the JS content to all data handlers
-            self._distribute_js_content()
+            # Restore the previous extraction if the bundle hasn't changed
+            self._report(LoadStage.CACHE, 0, 1, "Checking extraction cache...")
+            cache_key = self._cache_key = self.extraction_cache.make_key(js_path, self.js_content)
+            if self._restore_from_cache(self.extraction_cache.load(js_path, cache_key)):
+                print("Loaded game data from the extraction cache")
+                self.changed_domains = {name for name, handler in self._handlers().items()
+                                        if previous_states is None or not values_equal(handler.export_state(), previous_states[name])}
+            else:
+                # Split the bundle into its modules once for all handlers
+                self._report(LoadStage.INDEX, 0, len(self.js_content), "Indexing bundle modules...")
+                if self.module_index.build(self.js_content, progress=self._report_indexing):
+                    print(f"Indexed {len(self.module_index)} bundle modules")
+                    
+                # Distribute the JS content to all data handlers
+                self._distribute_js_content()
+                    
+                # Parse the game data
+                if previous_digests is not None:
+                    self.changed_domains = self._reparse_changed_modules(previous_digests,
+                                                                         previous_states['pending'])
+                elif self.lazy:
+                    # Extracted on first access, see _ensure_extracted()
+                    self._pending = set(EXTRACTION_ORDER)
+                    self.changed_domains = set(self._handlers())
+                else:
+                    self.parse_game_data()
+                    self.changed_domains = set(self._handlers())
                 
-            # Parse the game data
-            self.parse_game_data()
+                self._store_cache()
             
-            # Reset changes flag after loading
-            self._has_changes = False
+            # Edits of re-extracted data are gone, the others are kept
+            self.journal.clear(None, *(self.changed_domains | self._pending))
+            self.history.clear(*(self.changed_domains | self._pending))
+            self._open_edit_log(js_path, previous_states is not None)
             
+            self._report(LoadStage.DONE, 1, 1, "Game data loaded")
             return True
+        except LoadCancelled:
+            print("Loading game data cancelled")
+            self.last_error = "cancelled"
         except Exception as e:
             print(f"Error loading game data: {str(e)}")
-            return False
+            self.last_error = str(e)
+        finally:
+            self._progress = None
+            self._cancel = None
+            
+        # Don't compare the next load against a half-built index
+        self.module_index = ModuleIndex()
+        return False
+        
+    def _report(self, stage, current=0, total=0, message="", domain=None):
+        """Check for cancellation and send a progress event to the load callback."""
+        if self._cancel is not None and self._cancel():
+            raise LoadCancelled()
+        if self._progress is None:
+            return
+            
+        event = LoadProgress(stage, current, total, message, domain)
+        # Skip events that wouldn't move the progress bar
+        key = (event.percent, message)
+        if key != self._last_percent:
+            self._last_percent = key
+            self._progress(event)
+            
+    def _report_indexing(self, module_count, offset):
+        """Progress callback for ModuleIndex.build()."""
+        self._report(LoadStage.INDEX, offset, len(self.js_content),
+                     f"Indexing bundle modules ({module_count})...")
+        
+    def _read_bundle(self, js_path):
+        """
+        Read app.js in chunks, reporting the bytes read.
+        
+        Line endings are kept as they are, so a save writes back the bytes
+        outside the edited values unchanged, mixed line endings included.
+        """
+        total = os.path.getsize(js_path)
+        chunks = []
+        bytes_read = 0
+        self._report(LoadStage.READ, 0, total, "Reading app.js...")
+        with open(js_path, 'rb') as f:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                bytes_read += len(chunk)
+                self._report(LoadStage.READ, bytes_read, total, "Reading app.js...")
+                
+        return b''.join(chunks).decode('utf-8')
+        
+    def _extract(self, name):
+        """Run a domain's extractor, replacing its records and source spans."""
+        handler = self._handlers()[name]
+        # Spans of the other handlers stay valid, they are relative to their modules
+        handler.spans.clear()
+        with PROFILER.time_handler(name):
+            getattr(handler, f"extract_{name}")()
+        handler.snapshot_records()
+        
+    def _ensure_extracted(self, name):
+        """Extract a domain that was loaded lazily and hasn't been extracted yet."""
+        if name not in self._pending:
+            return
+            
+        with self._lock:
+            if name not in self._pending:
+                return
+            print(f"Extracting {name} on first access...")
+            self._extract(name)
+            self._pending.discard(name)
+            
+            # Everything is extracted now, so the cache can be written
+            if not self._pending:
+                self._store_cache()
+                
+    def pending_domains(self):
+        """Get the domains that haven't been extracted yet, in extraction order."""
+        return [name for name in EXTRACTION_ORDER if name in self._pending]
+        
+    def prefetch_next(self):
+        """
+        Extract the next pending domain, e.g. while the editor is idle.
+        
+        Returns:
+            str: Name of the domain extracted, or None if nothing was pending
+        """
+        with self._lock:
+            pending = self.pending_domains()
+            if not pending:
+                return None
+            self._ensure_extracted(pending[0])
+            return pending[0]
+            
+    def _store_cache(self):
+        """Write the extraction cache once every domain has been extracted."""
+        if self._pending or self._cache_key is None:
+            return
+        self.extraction_cache.store(self.js_path, self._cache_key, self._cache_state())
+        
+    def _reparse_changed_modules(self, previous_digests, previous_pending=()):
+        """
+        Re-run only the handlers affected by modules that changed since the last load.
+        
+        Handlers tied to a module (MODULE_PATH) run when that module changed;
+        handlers that scan the whole bundle run whenever anything changed.
+        
+        Args:
+            previous_digests (dict): module_digests() of the previous load
+            previous_pending (set): Domains the previous load hadn't extracted yet
+            
+        Returns:
+            set: Names of the handlers whose extracted data changed
+        """
+        digests = self.module_index.module_digests()
+        changed_modules = {key for key in previous_digests.keys() | digests.keys()
+                           if previous_digests.get(key) != digests.get(key)}
+        if not changed_modules:
+            print("No bundle modules changed")
+            self._pending = set(previous_pending)
+            return set()
+            
+        print(f"{len(changed_modules)} bundle module(s) changed, re-extracting affected data...")
+        changed_domains = set()
+        handlers = self._handlers()
+        for i, (name, handler) in enumerate(handlers.items()):
+            self._report(LoadStage.EXTRACT, i, len(handlers), f"Checking {name}...", name)
+            if name in previous_pending:
+                # Never extracted, it will be extracted from the new bundle on first access
+                self._pending.add(name)
+                continue
+            if handler.MODULE_PATH is not None:
+                module = self.module_index.find_module(handler.MODULE_PATH)
+                if module is not None and self.module_index.module_key(module) not in changed_modules:
+                    continue
+                    
+            previous_state = handler.export_state()
+            self._extract(name)
+            if not values_equal(handler.export_state(), previous_state):
+                changed_domains.add(name)
+                
+        return changed_domains
     
     def _distribute_js_content(self):
         """Distribute the loaded JS content to all data handlers."""
-        handlers = [
-            self.character_data,
-            self.item_data,
-            self.spell_data,
-            self.map_data,
-            self.battle_data,
-            self.monster_data,
-            self.npc_data
-        ]
-        
-        for handler in handlers:
-            handler.load_js_content(self.js_content, self.js_path)
+        for handler in self._handlers().values():
+            handler.load_js_content(self.js_content, self.js_path, self.module_index)
             
-    def has_changes(self):
-        """Check if there are unsaved changes in any data component."""
-        # Check if the main manager has changes
-        if self._has_changes:
+    def _cache_state(self):
+        """Collect the module index and the extracted data of every handler."""
+        return {
+            'modules': self.module_index.export_state(),
+            'handlers': {name: handler.export_state() for name, handler in self._handlers().items()},
+        }
+        
+    def _restore_from_cache(self, state):
+        """
+        Restore the module index and handler data from a cached state.
+        
+        Returns:
+            bool: True if everything was restored, False to fall back to parsing
+        """
+        if not isinstance(state, dict):
+            return False
+            
+        try:
+            handler_states = state['handlers']
+            self.module_index.import_state(self.js_content, state['modules'])
+            self._distribute_js_content()
+            for name, handler in self._handlers().items():
+                if not handler.import_state(handler_states[name]):
+                    return False
             return True
+        except Exception as e:
+            print(f"Ignoring invalid extraction cache: {str(e)}")
+            return False
             
-        # Check if any of the data handlers have changes
-        return (self.character_data.has_changes() or
-                self.item_data.has_changes() or
-                self.spell_data.has_changes() or
-                self.map_data.has_changes() or
-                self.battle_data.has_changes() or
-                self.monster_data.has_changes() or
-                self.npc_data.has_changes())
+    def has_changes(self):
+        """Check if there are unsaved changes in any data component."""
+        return bool(self.journal)
         
     def mark_as_changed(self):
-        """Mark the data as changed."""
-        self._has_changes = True
+        """
+        Mark the data as changed without saying what changed.
+        
+        The next save then visits every record; editors should prefer
+        record_changed(), which journals the edited record only.
+        """
+        self.journal.mark_dirty(None)
+        
+    def record_changed(self, record):
+        """
+        Journal the edits of a record, add them to the undo history and
+        update the lookup indexes.
+        
+        The record is compared with its original (see GameData.original_record),
+        so its journal entries are the net changes since the last load or save,
+        and with its state when it was last reported for the undo step.
+        
+        Args:
+            record (dict): The edited record
+            
+        Returns:
+            bool: True if the record belongs to one of the handlers
+        """
+        with self._lock:
+            found = False
+            for name, handler in self._handlers().items():
+                if name not in self._pending and handler.reindex_record(record):
+                    key = handler.record_key(record)
+                    original = handler.original_record(record)
+                    self.journal.update(name, key, record, handler.record_changes(record, original))
+                    changes = self.history.record_edit(name, key, record, original)
+                    if changes:
+                        self._log_changes(name, handler, key, record, changes)
+                    if self._search_generation is not None:
+                        self.search_index.add(name, record)
+                    found = True
+            if not found:
+                # Not a record of ours, fall back to a full save
+                self.journal.mark_dirty(None)
+            return found
             
     def save_to_file(self, file_path=None):
-        """Save the game data to a JavaScript file."""
+        """
+        Save the game data to a JavaScript file.
+        
+        Only the values that were edited are rewritten (see core.source_patcher),
+        everything else is copied from the loaded bundle byte for byte. Edits
+        that can't be written (see collect_source_patches()) stay pending and
+        are listed in unsaved_changes.
+        
+        Args:
+            file_path (str): File to write, defaults to the loaded app.js
+            
+        Returns:
+            bool: True if the file was written with every edit
+        """
+        self.saved_changes = 0
+        self.unsaved_changes = []
         if file_path is None:
             if not self.js_path:
                 return False
             file_path = self.js_path
         
         try:
-            # Create a backup of the original file if it exists
-            if os.path.exists(file_path):
-                backup_path = file_path + ".bak"
-                try:
-                    import shutil
-                    shutil.copy2(file_path, backup_path)
-                    print(f"Created backup at {backup_path}")
-                except Exception as e:
-                    print(f"Warning: Could not create backup: {str(e)}")
-            
-            # For now, just print what would be saved
-            print(f"Saving {len(self.characters)} characters, {len(self.items)} items, "
-                  f"{len(self.maps)} maps, {len(self.battles)} battles, {len(self.spells)} spells, "
-                  f"{len(self.monsters)} monsters, and {len(self.npcs)} NPCs to {file_path}")
+            with self._lock:
+                patches, saved, unsaved = self.collect_source_patches()
+                self.saved_changes = len(patches)
+                self.unsaved_changes = self.describe_unsaved(unsaved)
+                in_place = bool(self.js_path) and os.path.abspath(file_path) == os.path.abspath(self.js_path)
+                
+                if patches or not in_place:
+                    # Keep the file being replaced, then the saved one, in the
+                    # backup store; unchanged content is only stored once
+                    backups = self.backup_store(file_path)
+                    if os.path.exists(file_path):
+                        self._backup(backups, file_path, "Before save")
+                    
+                    js_content = write_patched(self.js_content, patches, file_path)
+                    self._backup(backups, file_path, "Saved")
+                    
+                    # The loaded bundle is now the saved one, move the spans along
+                    if in_place and patches:
+                        self._rebase(js_content)
+                print(f"Saved {len(patches)} changed value(s) to {file_path}")
+                
+                self._reset_changes(saved, unsaved)
+                if in_place and patches and not self.journal:
+                    self._store_cache()
+                
+                # The crash log keeps the edits that are still unsaved only
+                self.edit_log.reset(self._cache_key.digest.hex() if self._cache_key is not None else None,
+                                    self._pending_operations())
+                
+            if unsaved:
+                for line in self.unsaved_changes:
+                    print(f"Warning: {line}")
+                print(f"Warning: {len(unsaved)} edit(s) were not saved")
+                return False
+            return True
+        except Exception as e:
+            print(f"Error saving game data: {str(e)}")
+            return False
             
-            # In a real implementation, you would update the actual file here
-            # This would involve complex JavaScript generation based on the data
+    def backup_store(self, file_path=None):
+        """Get the backup store of a bundle (the loaded one by default), see core.backup_store."""
+        path = os.path.abspath(file_path or self.js_path)
+        store = self._backup_stores.get(path)
+        if store is None:
+            store = self._backup_stores[path] = BackupStore(path)
+        return store
+        
+    def _backup(self, store, file_path, label):
+        """Add the content of file_path to a backup store, a failure is only a warning."""
+        try:
+            version = store.add_file(file_path, label)
+            if version is not None:
+                print(f"Stored backup version {version.number} of {file_path}")
+        except (OSError, BackupError) as e:
+            print(f"Warning: Could not create backup: {str(e)}")
             
-            # Reset changes flag for all components
-            self._reset_changes()
+    def list_backups(self):
+        """Get the backup versions of the loaded bundle, oldest first."""
+        if not self.js_path:
+            return []
+        return self.backup_store().versions()
+        
+    def restore_backup(self, number):
+        """
+        Write a backup version over the loaded app.js.
+        
+        The current file is backed up first. The data isn't reloaded, callers
+        reload it (the window does so right after).
+        
+        Args:
+            number (int): Version to restore
             
+        Returns:
+            bool: True if the file was written
+        """
+        if not self.js_path:
+            return False
+        try:
+            version = self.backup_store().restore(number)
+            print(f"Restored backup version {version.number} to {self.js_path}")
             return True
-        except Exception as e:
-            print(f"Error saving game data: {str(e)}")
+        except (OSError, BackupError) as e:
+            print(f"Error restoring backup: {str(e)}")
             return False
             
-    def _reset_changes(self):
-        """Reset the changes flag for all components."""
-        self._has_changes = False
+    def collect_source_patches(self):
+        """
+        Get the patches writing every edited record back to app.js.
+        
+        Only the records in the change journal are visited, unless their
+        domain has changes that weren't journaled record by record.
+        
+        Edits are only written into existing values: records added or removed
+        in the editor, the data not extracted from literals (characters,
+        battles, NPCs) and fields that aren't copied as is from their literal
+        can't be saved and are reported as unsaved.
         
-        # Reset changes for all data handlers
-        handlers = [
-            self.character_data,
-            self.item_data,
-            self.spell_data,
-            self.map_data,
-            self.battle_data,
-            self.monster_data,
-            self.npc_data
-        ]
+        Returns:
+            tuple: (list of SourcePatch, list of the (domain, record) pairs
+                whose edits the patches write, list of the (domain, record,
+                changes) edits that can't be written; changes is None for a
+                whole record, and record too for a domain changed as a whole)
+        """
+        patches = {}
+        saved = []
+        unsaved = []
+        for name, handler in self._handlers().items():
+            # Domains never extracted can't have been edited
+            if name in self._pending:
+                continue
+            dirty = self.journal.is_dirty(name)
+            if not len(handler.spans):
+                # Not extracted from literals, nothing can be written
+                journaled = self.journal.records(name, ('changed', 'added', 'removed'))
+                unsaved += [(name, record, None) for record in journaled]
+                if dirty:
+                    journaled = {id(record) for record in journaled}
+                    changed, removed = handler.snapshot_changes()
+                    unsaved += [(name, record, None) for record in changed if id(record) not in journaled]
+                    if removed:
+                        unsaved.append((name, None, None))
+                continue
+                
+            unsaved += [(name, record, None) for record in self.journal.records(name, ('removed',))]
+            journaled = self.journal.records(name)
+            if dirty:
+                journaled = {id(record) for record in journaled}
+                records = handler.get_records()
+            else:
+                records = journaled
+            for record in records:
+                result = handler.source_patches(record)
+                if result is None:
+                    # Added in the editor, or lost its source link
+                    if not dirty or id(record) in journaled or handler.record_changes(record):
+                        unsaved.append((name, record, None))
+                    continue
+                record_patches, unwritten = result
+                if unwritten:
+                    unsaved.append((name, record, unwritten))
+                elif record_patches or not dirty or id(record) in journaled:
+                    saved.append((name, record))
+                for patch in record_patches:
+                    # Items and spells share the magic table, keep one copy of equal patches
+                    key = (patch.start, patch.end, patch.text)
+                    patches[key] = patch
+        return list(patches.values()), saved, unsaved
+        
+    def describe_unsaved(self, unsaved):
+        """Get one line per edit collect_source_patches() can't write, for the window and the CLI."""
+        statuses = {(name, id(record)): status for name, record, status, _ in self.journal.touched()}
+        lines = []
+        for name, record, changes in unsaved:
+            if record is None:
+                lines.append(f"{name}: changed as a whole, can't be written to app.js")
+                continue
+            key = self._handlers()[name].record_key(record)
+            if changes is not None:
+                fields = ', '.join('.'.join(str(part) for part in field) for field, _, _ in changes)
+                lines.append(f"{name}: {key} {fields} can't be written to app.js")
+            else:
+                status = statuses.get((name, id(record)), 'changed')
+                lines.append(f"{name}: {key} {status}, can't be written to app.js")
+        return lines
         
-        for handler in handlers:
-            handler._has_changes = False
+    def _rebase(self, js_content):
+        """Switch to the bundle written by a save, keeping the extracted records."""
+        self.js_content = js_content
+        self.module_index.build(js_content)
+        self._distribute_js_content()
+        for handler in self._handlers().values():
+            handler.rebase_spans()
             
+        # The file changed on disk, it is cached under its new key (see
+        # save_to_file(), not while edits are left unsaved)
+        self._cache_key = self.extraction_cache.make_key(self.js_path, js_content)
+        
+    def _reset_changes(self, saved, unsaved):
+        """
+        Forget the journal entries of what a save wrote, the saved state
+        becomes the original one; the edits left unsaved stay pending.
+        
+        Args:
+            saved (list): (domain, record) pairs whose edits were all written
+            unsaved (list): (domain, record, changes) edits left, see collect_source_patches()
+        """
+        handlers = self._handlers()
+        written = {}
+        for name, record in saved:
+            self.journal.discard(name, record)
+            written.setdefault(name, []).append(record)
+        for name, record, changes in unsaved:
+            if changes is not None:
+                # Partly written, only the edits left are pending
+                self.journal.update(name, handlers[name].record_key(record), record, changes)
+                written.setdefault(name, []).append(record)
+        self.journal.clear_dirty(keep={name for name, _, _ in unsaved})
+        
+        for name, handler in handlers.items():
+            if name in self._pending:
+                continue
+            handler._has_changes = self.journal.has_changes(name)
+            if name in written:
+                handler.snapshot_records(written[name])
+            
+    def _pending_operations(self):
+        """
+        Get the edit log operations that replay the pending edits of the
+        journal, see core.edit_log.
+        
+        Removals come first and additions in list order, so the positions
+        logged are the current ones when they are replayed.
+        """
+        handlers = self._handlers()
+        dirty = [name for name in EXTRACTION_ORDER if name not in self._pending and self.journal.is_dirty(name)]
+        operations = [{'op': 'replace', 'd': name, 'r': [copy_value(record) for record in handlers[name].get_records()]}
+                      for name in dirty]
+        additions = []
+        edits = []
+        for name, record, status, fields in self.journal.touched():
+            if name in dirty:
+                continue
+            handler = handlers[name]
+            key = handler.record_key(record)
+            if status == 'removed':
+                # Still in the saved bundle, found again by key
+                operations.append({'op': 'remove', 'd': name, 'i': None, 'k': key})
+                continue
+            records = handler.get_records()
+            if hasattr(records, 'index_of'):
+                position = records.index_of(record)
+            else:
+                position = next(i for i, other in enumerate(records) if other is record)
+            if status == 'added':
+                additions.append((position, {'op': 'add', 'd': name, 'i': position, 'r': copy_value(record)}))
+                continue
+            operation = {'op': 'set', 'd': name, 'i': position, 'k': key, 'c': [], 'x': []}
+            for field in fields:
+                value = record
+                try:
+                    for part in field:
+                        value = value[part]
+                except (KeyError, IndexError, TypeError):
+                    operation['x'].append(list(field))
+                    continue
+                operation['c'].append([list(field), copy_value(value)])
+            edits.append(operation)
+        operations += [operation for _, operation in sorted(additions, key=lambda addition: addition[0])]
+        return operations + edits
+        
     def parse_game_data(self):
         """Parse game data from the loaded JavaScript content."""
         print("Parsing game data...")
         
+        if self.parallel and self._parse_game_data_parallel():
+            print("Game data parsing complete")
+            return
+        
         # Extract different game elements using their respective handlers
-        self.character_data.extract_characters()
-        self.item_data.extract_items()
-        self.map_data.extract_maps()
-        self.battle_data.extract_battles()
-        self.spell_data.extract_spells()
-        self.monster_data.extract_monsters()
-        self.npc_data.extract_npcs()
+        for i, name in enumerate(EXTRACTION_ORDER):
+            self._report(LoadStage.EXTRACT, i, len(EXTRACTION_ORDER), f"Extracting {name}...", name)
+            self._extract(name)
+        self._report(LoadStage.EXTRACT, len(EXTRACTION_ORDER), len(EXTRACTION_ORDER), "Extraction complete")
         
         print("Game data parsing complete")
+        
+    def _parse_game_data_parallel(self):
+        """
+        Run all extractors concurrently in a process pool.
+        
+        Returns:
+            bool: False if the pool couldn't be used, so the caller parses serially
+        """
+        handlers = self._handlers()
+        done = []
+        
+        def on_domain_done(name):
+            done.append(name)
+            self._report(LoadStage.EXTRACT, len(done), len(handlers), f"Extracted {name}", name)
+            
+        try:
+            # Patterns run in the pool workers, only the total time is profiled here
+            with PROFILER.time_handler('parallel'):
+                states = extract_parallel(self.js_content, self.js_path, self.module_index,
+                                          list(handlers), self.max_workers, on_domain_done)
+        except LoadCancelled:
+            raise
+        except Exception as e:
+            print(f"Parallel extraction failed, extracting serially: {str(e)}")
+            return False
+            
+        # Merge in handler order, whatever order the workers finished in
+        for name, handler in handlers.items():
+            handler.import_state(states[name])
+        return True
     
+    def domain_records(self, name):
+        """Get a domain's record list, indexed and journaling additions and removals."""
+        self._ensure_extracted(name)
+        handler = self._handlers()[name]
+        handler.record_index()
+        return handler.get_records()
+        
+    def replace_records(self, name, records):
+        """Replace a domain's record list, journaling the records added and removed."""
+        handler = self._handlers()[name]
+        if name in self._pending:
+            # Never extracted, so there is nothing to compare with
+            self._pending.discard(name)
+            setattr(handler, handler.DATA_ATTRS[0], records)
+            self.journal.mark_dirty(name)
+            return
+            
+        old_records = handler.get_records()
+        old_ids = {id(record) for record in old_records}
+        new_ids = {id(record) for record in records}
+        setattr(handler, handler.DATA_ATTRS[0], records)
+        links = []
+        for record in old_records:
+            if id(record) not in new_ids:
+                self.journal.record_removed(name, handler.record_key(record), record)
+                path = handler.spans.unlink(record)
+                if path is not None:
+                    links.append((record, path))
+        for record in records:
+            if id(record) not in old_ids:
+                self.journal.record_added(name, handler.record_key(record), record)
+                self.history.track(record, name)
+        self.history.push(ListReplace(name, old_records, records, links))
+        self.edit_log.append({'op': 'replace', 'd': name, 'r': [copy_value(record) for record in records]})
+        
+    def link_records(self, name, links):
+        """
+        Link records put back in a domain to their source values again.
+        
+        Args:
+            name (str): Domain
+            links (list): (record, path) pairs, see SourceSpans.unlink()
+        """
+        handler = self._handlers()[name]
+        for record, path in links:
+            handler.spans.link(record, path)
+            
+    def _log_changes(self, name, handler, key, record, changes):
+        """Append the changes of a record to the edit log."""
+        records = handler.get_records()
+        position = records.index_of(record) if hasattr(records, 'index_of') else None
+        operation = {'op': 'set', 'd': name, 'i': position, 'k': key, 'c': [], 'x': []}
+        for path, _, new in changes:
+            if new is MISSING:
+                operation['x'].append(list(path))
+            else:
+                operation['c'].append([list(path), copy_value(new)])
+        self.edit_log.append(operation)
+        
+    def _open_edit_log(self, js_path, reloading):
+        """Attach the edit log to the loaded bundle, reading what a crashed session left."""
+        bundle = self._cache_key.digest.hex() if self._cache_key is not None else None
+        if reloading and self.edit_log.path == EditLog.log_path(js_path):
+            # Same file reloaded, the edits kept are logged already
+            if bundle != self.edit_log.bundle:
+                self.edit_log.reset(bundle)
+            return
+        self.recovered_edits = self.edit_log.open(js_path, bundle)
+        if not self.recovered_edits:
+            self.edit_log.start()
+            
+    def replay_recovered_edits(self):
+        """
+        Apply the edits a crashed session left in the edit log, as one undo step.
+        
+        Returns:
+            set: Names of the domains that changed
+        """
+        operations, self.recovered_edits = self.recovered_edits, []
+        # The replayed edits are logged again into the new file
+        self.edit_log.start()
+        domains = set()
+        with self._lock, self.history.transaction("Restore unsaved edits"):
+            for operation in operations:
+                try:
+                    if self._replay(operation):
+                        domains.add(operation['d'])
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    print(f"Skipping an edit that can't be replayed: {str(e)}")
+        print(f"Replayed {len(operations)} logged edit(s)")
+        return domains
+        
+    def discard_recovered_edits(self):
+        """Forget the edits a crashed session left, see replay_recovered_edits()."""
+        self.recovered_edits = []
+        self.edit_log.start()
+        
+    def _replay(self, operation):
+        """Apply one edit log operation, returns True if something changed."""
+        name = operation['d']
+        handler = self._handlers()[name]
+        if operation['op'] == 'replace':
+            self.replace_records(name, [handler.make_record(record) for record in operation['r']])
+            return True
+        records = self.domain_records(name)
+        if operation['op'] == 'add':
+            records.insert(min(operation['i'], len(records)), handler.make_record(operation['r']))
+            return True
+            
+        # Find the record by position, or by key if it has none; the key of
+        # a 'set' is the one after the edit, so it can't be checked
+        position = operation.get('i')
+        record = records[position] if position is not None and position < len(records) else None
+        if record is None or (operation['op'] == 'remove' and handler.record_key(record) != operation['k']):
+            record = next((other for other in records if handler.record_key(other) == operation['k']), None)
+            if record is None:
+                print(f"Skipping an edit of a missing record: {name} {operation['k']}")
+                return False
+        if operation['op'] == 'remove':
+            records.remove(record)
+        else:
+            for path, value in operation['c']:
+                # Painted tiles are logged as the cells they changed
+                set_path(record, path, CellPatch.from_dict(value) or value)
+            for path in operation['x']:
+                set_path(record, path, MISSING)
+            self.record_changed(record)
+        return True
+        
+    def data_revision(self, name):
+        """
+        Get a token that changes whenever the data of a domain may have changed.
+        
+        It combines this session, the number of loads and the journal's
+        revision of the domain, so two equal tokens mean the same data.
+        """
+        return f"{self._session}:{self._generation}:{self.journal.revision(name)}"
+        
+    def export_dir(self):
+        """Get the default export directory, next to the loaded bundle."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.js_path)), EXPORT_DIR_NAME)
+        
+    def export_data(self, directory=None, fmt='ndjson', domains=None, force=False):
+        """
+        Export the records to one file per domain, rewriting only the domains
+        that changed since the last export (see core.data_export).
+        
+        Args:
+            directory (str): Export directory, export_dir() by default
+            fmt (str): 'ndjson', 'ndjson.gz' or 'json'
+            domains (list): Domains to export, all by default
+            force (bool): Rewrite the unchanged domains too
+            
+        Returns:
+            dict: domain -> {'path', 'records', 'written'}
+        """
+        directory = directory or self.export_dir()
+        with self._lock:
+            results = export_domains(self, directory, domains or list(self._handlers()), fmt, force)
+        written = [name for name, result in results.items() if result['written']]
+        print(f"Exported {len(written)} of {len(results)} domain(s) to {directory}")
+        return results
+        
+    def import_data(self, directory=None, domains=None, prune=True):
+        """
+        Update the records from an export directory, as one undo step.
+        
+        Records are matched by their journal key and updated in place, so
+        the import is journaled and saved like edits made in the tabs.
+        
+        Args:
+            directory (str): Export directory, export_dir() by default
+            domains (list): Domains to import, every exported one by default
+            prune (bool): Remove the records an exported file doesn't have
+            
+        Returns:
+            set: Names of the domains that changed
+        """
+        directory = directory or self.export_dir()
+        changed = set()
+        with self._lock, self.history.transaction("Import data"):
+            for name in domains or list(self._handlers()):
+                path = find_domain_file(directory, name)
+                if path is None:
+                    continue
+                updated, added, removed = import_domain(self, name, path, prune)
+                if updated or added or removed:
+                    changed.add(name)
+                print(f"Imported {name}: {updated} updated, {added} added, {removed} removed")
+        return changed
+        
+    def find_usages(self, domain, record):
+        """
+        Find where a record is used: bundle modules (encounter patterns, shops)
+        and other records (monster drops, battles).
+        
+        The bundle is scanned once, then only the modules that changed are
+        scanned again (see core.reference_index); the references held by
+        records are re-read for the domains edited since the last query.
+        A renamed record also lists the uses of its original name.
+        
+        Args:
+            domain (str): Kind of data, e.g. 'monsters'
+            record (dict): A record of that domain
+            
+        Returns:
+            list: Reference objects, see describe_usage()
+        """
+        with self._lock:
+            self._refresh_references()
+            handler = self._handlers()[domain]
+            targets = list(handler.reference_targets(record))
+            original = handler.original_record(record)
+            if original is not None:
+                targets += [target for target in handler.reference_targets(original) if target not in targets]
+            return self.references.references(targets, exclude=record)
+            
+    def describe_usage(self, reference):
+        """Get a one-line description of a reference returned by find_usages()."""
+        return self.references.describe(reference)
+        
+    def safe_delete(self, domain, record):
+        """
+        Remove a record, unless something uses it.
+        
+        Returns:
+            list: The uses that kept the record, empty if it was removed
+        """
+        usages = self.find_usages(domain, record)
+        if not usages:
+            self.domain_records(domain).remove(record)
+        return usages
+        
+    def _refresh_references(self):
+        """Bring the reference index up to date with the bundle and the records."""
+        if not len(self.module_index) and self.js_content:
+            self.module_index.build(self.js_content)
+        self.references.refresh_modules(self.module_index, (self.item_data.MODULE_PATH,))
+        for name, handler in self._handlers().items():
+            self.references.refresh_records(name, handler, self.domain_records(name), self.data_revision(name))
+            
+    def search(self, query, limit=50, domains=None):
+        """
+        Search the names, IDs, descriptions and other texts of every domain.
+        
+        Matching is fuzzy and Unicode-normalized (see core.search_index). The
+        index is built on the first search; after that edited records are
+        re-indexed as they are reported and added or removed ones when the
+        next search finds their domain's revision changed.
+        
+        Args:
+            query (str): Text typed by the user
+            limit (int): Most results returned
+            domains (set): Only search these domains, all by default
+            
+        Returns:
+            list: SearchResult objects (domain, record, score, field), best first
+        """
+        with self._lock:
+            full = self._search_generation != self._generation
+            for name in self._handlers():
+                self.search_index.sync(name, self.domain_records(name), self.data_revision(name), full)
+            self._search_generation = self._generation
+            return self.search_index.search(query, limit, domains)
+            
+    def close(self):
+        """Close the edit log at the end of a normal session, nothing is left to recover."""
+        self.edit_log.close()
+        
+    def undo(self):
+        """
+        Undo the last edit step.
+        
+        Returns:
+            set: Names of the domains that changed, empty if there was nothing to undo
+        """
+        with self._lock:
+            return self.history.undo(self)
+            
+    def redo(self):
+        """Redo the last undone step, see undo()."""
+        with self._lock:
+            return self.history.redo(self)
+        
     # Properties to access data from different handlers
     @property
     def characters(self):
-        return self.character_data.characters
+        return self.domain_records('characters')
         
     @characters.setter
     def characters(self, value):
-        self.character_data.characters = value
-        self.character_data.mark_as_changed()
+        self.replace_records('characters', value)
     
     @property
     def items(self):
-        return self.item_data.items
+        return self.domain_records('items')
         
     @items.setter
     def items(self, value):
-        self.item_data.items = value
-        self.item_data.mark_as_changed()
+        self.replace_records('items', value)
     
     @property
     def spells(self):
-        return self.spell_data.spells
+        return self.domain_records('spells')
         
     @spells.setter
     def spells(self, value):
-        self.spell_data.spells = value
-        self.spell_data.mark_as_changed()
+        self.replace_records('spells', value)
     
     @property
     def maps(self):
-        return self.map_data.maps
+        return self.domain_records('maps')
         
     @maps.setter
     def maps(self, value):
-        self.map_data.maps = value
-        self.map_data.mark_as_changed()
+        self.replace_records('maps', value)
     
     @property
     def battles(self):
-        return self.battle_data.battles
+        return self.domain_records('battles')
         
     @battles.setter
     def battles(self, value):
-        self.battle_data.battles = value
-        self.battle_data.mark_as_changed()
+        self.replace_records('battles', value)
     
     @property
     def monsters(self):
-        return self.monster_data.monsters
+        return self.domain_records('monsters')
         
     @monsters.setter
     def monsters(self, value):
-        self.monster_data.monsters = value
-        self.monster_data.mark_as_changed()
+        self.replace_records('monsters', value)
     
     @property
     def npcs(self):
-        return self.npc_data.npcs
+        return self.domain_records('npcs')
         
     @npcs.setter
     def npcs(self, value):
-        self.npc_data.npcs = value
-        self.npc_data.mark_as_changed()
+        self.replace_records('npcs', value)
     
     # Properties for "using default" flags
     @property
     def using_default_characters(self):
+        self._ensure_extracted('characters')
         return self.character_data.using_default_characters
     
     @property
     def using_default_items(self):
+        self._ensure_extracted('items')
         return self.item_data.using_default_items
     
     @property
     def using_default_spells(self):
+        self._ensure_extracted('spells')
         return self.spell_data.using_default_spells
     
     @property
     def using_default_maps(self):
+        self._ensure_extracted('maps')
         return self.map_data.using_default_maps
     
     @property
     def using_default_battles(self):
+        self._ensure_extracted('battles')
         return self.battle_data.using_default_battles
     
     @property
     def using_default_monsters(self):
+        self._ensure_extracted('monsters')
         return self.monster_data.using_default_monsters
     
     @property
     def using_default_npcs(self):
+        self._ensure_extracted('npcs')
         return self.npc_data.using_default_npcs
     
     # Convenience methods that delegate to the appropriate handler
     def get_character_by_name(self, name):
         """Get a character by name."""
+        self._ensure_extracted('characters')
         return self.character_data.get_character_by_name(name)
         
     def get_item_by_name(self, name):
         """Get an item by name."""
+        self._ensure_extracted('items')
         return self.item_data.get_item_by_name(name)
         
     def get_spell_by_name(self, name):
         """Get a spell by name."""
+        self._ensure_extracted('spells')
         return self.spell_data.get_spell_by_name(name)
         
     def get_map_by_name(self, name):
         """Get a map by name."""
+        self._ensure_extracted('maps')
         return self.map_data.get_map_by_name(name)
         
     def get_battle_by_name(self, name):
         """Get a battle by name."""
+        self._ensure_extracted('battles')
         return self.battle_data.get_battle_by_name(name)
         
     def get_monster_by_name(self, name):
         """Get a monster by name."""
+        self._ensure_extracted('monsters')
         return self.monster_data.get_monster_by_name(name)
         
     def get_npc_by_name(self, name):
         """Get an NPC by name."""
-        return self.npc_data.get_npc_by_name(name) 
\ No newline at end of file
+        self._ensure_extracted('npcs')
+        return self.npc_data.get_npc_by_name(name)         
+        
+    def get_monster_by_id(self, monster_id):
+        """Get a monster by ID."""
+        self._ensure_extracted('monsters')
+        return self.monster_data.get_monster_by_id(monster_id)
+        
+    def find_records(self, domain, key, value):
+        """
+        Get the records of a domain whose index key has value.
+        
+        Args:
+            domain (str): Kind of data, e.g. 'items'
+            key (str): Index key of the domain's handler, e.g. 'type' (see INDEX_KEYS)
+            value: Value to look up
+            
+        Returns:
+            list: The records, in list order
+        """
+        self._ensure_extracted(domain)
+        return self._handlers()[domain].find_records(key, value)
+        
+    def index_values(self, domain, key):
+        """Get the distinct values of a domain's index key, with their number of records."""
+        self._ensure_extracted(domain)
+        return self._handlers()[domain].index_values(key)
+        
+    def reindex_record(self, record):
+        """
+        Update the indexes after an editor changed a record's name, type...
+        
+        Args:
+            record (dict): The edited record
+            
+        Returns:
+            bool: True if the record belongs to one of the handlers
+        """
+        with self._lock:
+            found = False
+            for name, handler in self._handlers().items():
+                if name not in self._pending:
+                    found = handler.reindex_record(record) or found
+            return found
+        
+    def get_source_span(self, domain, record, *field):
+        """
+        Find where an extracted record, or a value inside it, is in app.js.
+        
+        Args:
+            domain (str): Kind of data, e.g. 'monsters'
+            record (dict): A record of that domain
+            *field: Keys/indices of a value inside the record's source literal
+            
+        Returns:
+            tuple: (start, end) character offsets in js_content, or None if unknown
+        """
+        self._ensure_extracted(domain)
+        return self._handlers()[domain].source_span(record, *field)
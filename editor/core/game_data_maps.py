@@ -1,24 +1,68 @@
 """
 Map data handling module.
+
+The maps are the map scenes of the bundle (./vue/game/scene/map/*.vue).
+Each scene's data() names its map (mapName), tileset type (mapType), music
+(bgm) and requires the modules of its tile grid (mapFlag), overlays
+(overlaySrc) and encounters (encountPattern). The grids are read into
+NumPy arrays, see core.map_grid.
 """
 
 import re
+import copy
+
+import numpy as np
+
 from core.game_data import GameData
+from core.change_journal import diff_records
+from core.record_index import field_key
+from core.source_patcher import SourcePatch
+from core.map_grid import parse_module_grid, format_row, format_grid, as_grid
 from core.default_game_data import DEFAULT_MAPS
 
+# Scene data fields read as strings: mapName: "field"
+_SCENE_STRING_RE = re.compile(r'\b(mapName|mapType|bgm)\s*:\s*"([^"]*)"')
+
+# Scene data fields requiring a module: mapFlag: t("../../variables/mapFlag/_field")
+_SCENE_REQUIRE_RE = re.compile(r'\b(mapFlag|overlaySrc|encountPattern)\s*:\s*[A-Za-z_$][\w$]*\(\s*"([^"]+)"\s*\)')
+
 class GameDataMaps(GameData):
     """Handler for map data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('maps', 'using_default_maps')
+    
+    # Hash indexes over the maps, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('tileset', field_key('tileset')),
+    )
+    
     def __init__(self):
         """Initialize map data handler."""
         super().__init__()
         self.maps = []
         self.using_default_maps = False
         
+    def make_record(self, data):
+        """Build a map from plain data, e.g. read from JSON, with its tiles as a grid."""
+        record = dict(data)
+        if record.get('tiles') is not None:
+            record['tiles'] = as_grid(record['tiles'])
+        return record
+        
     def extract_maps(self):
         """Extract map data from the JavaScript content."""
         print("Extracting maps...")
         
+        # The map scenes and the grids they require
+        scene_maps = self._extract_scene_maps()
+        if scene_maps:
+            self.maps = scene_maps
+            self.using_default_maps = False
+            print(f"Successfully extracted {len(self.maps)} maps")
+            return
+        
         # Look for map data in the JavaScript content
         patterns = [
             # Look for map array or object initialization
@@ -30,10 +74,10 @@ class GameDataMaps(GameData):
         all_maps = []
         
         for pattern in patterns:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
+            matches = self.re_findall(pattern, self.js_content, re.DOTALL)
             for match in matches:
                 # Try to extract individual map entries
-                map_entries = re.findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
+                map_entries = self.re_findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
                 
                 for map_id, map_content in map_entries:
                     map_data = self._parse_map_properties(map_id, map_content)
@@ -52,6 +96,148 @@ class GameDataMaps(GameData):
         self.maps = DEFAULT_MAPS.copy()
         self.using_default_maps = True
         
+    def _extract_scene_maps(self):
+        """
+        Extract a map from every scene module requiring a mapFlag grid.
+        
+        Returns:
+            list: The maps, empty without a module index
+        """
+        if self.module_index is None:
+            return []
+            
+        maps = []
+        for module in self.module_index:
+            flag_require = next((path for path in module.requires if '/mapFlag/' in path), None)
+            if flag_require is None:
+                continue
+            source = self.module_index.get_source(module)
+            
+            # Only the requires the scene's data() names
+            required = {}
+            for field, require_path in _SCENE_REQUIRE_RE.findall(source):
+                required_module = self.module_index.get_module(module.requires.get(require_path))
+                if required_module is not None and required_module.path:
+                    required.setdefault(field, required_module.path)
+            flag_path = required.get('mapFlag')
+            if flag_path is None:
+                continue
+            literal = self._read_grid(flag_path)
+            if literal is None:
+                continue
+                
+            fields = dict(_SCENE_STRING_RE.findall(source))
+            height, width = literal.grid.shape
+            map_data = {
+                'name': fields.get('mapName') or flag_path.rsplit('_', 1)[-1],
+                'width': width,
+                'height': height,
+                # The scene's mapType: field, town, dungeon
+                'tileset': fields.get('mapType', 'field'),
+                'bgm': fields.get('bgm'),
+                'scene': module.path,
+                'tiles': literal.grid,
+                'overlays': [],
+                'encounter_pattern': required.get('encountPattern'),
+                'encounter_groups': [],
+            }
+            
+            overlays = self.get_module_exports(required['overlaySrc']) if 'overlaySrc' in required else None
+            if isinstance(overlays, list):
+                map_data['overlays'] = overlays
+            encounters = self.get_module_exports(required['encountPattern']) if 'encountPattern' in required else None
+            if isinstance(encounters, dict):
+                map_data['encounter_groups'] = list(encounters)
+                
+            self.spans.link(map_data, (flag_path,))
+            maps.append(map_data)
+        return maps
+        
+    def _read_grid(self, flag_path):
+        """
+        Parse the grid of a mapFlag module, recording its spans.
+        
+        The whole literal is recorded under (flag_path,) and each row under
+        (flag_path, y), relative to the module body.
+        
+        Returns:
+            GridLiteral: The grid, None if the module has none
+        """
+        source = self.get_module_source(flag_path)
+        literal = parse_module_grid(source) if source is not None else None
+        if literal is None:
+            return None
+        self.spans.add((flag_path,), *literal.span)
+        for y, row_span in enumerate(literal.rows):
+            self.spans.add((flag_path, y), *row_span)
+        return literal
+        
+    def snapshot_records(self, records=None):
+        """
+        Remember the extracted state of every map, grids aren't rebuilt from their literal.
+        
+        Args:
+            records (list): Maps a save wrote: only their tiles are saved, so
+                only the tiles of their snapshots are updated
+        """
+        if records is None:
+            self._snapshots = {id(record): (record, copy.deepcopy(record)) for record in self.get_records()}
+            return
+        for record in records:
+            original = self.original_record(record)
+            if original is not None and 'tiles' in record:
+                original['tiles'] = copy.deepcopy(record['tiles'])
+        
+    def original_record(self, record):
+        """Get a map as it was loaded (or last saved), None for a map added since."""
+        snapshot = self._snapshots.get(id(record))
+        return snapshot[1] if snapshot is not None and snapshot[0] is record else None
+        
+    def source_patches(self, record):
+        """
+        Get the patches writing a map's painted tiles back to its mapFlag module.
+        
+        Only the edited rows are rewritten; a grid resized since the load
+        replaces the whole literal. The other fields of a map aren't saved.
+        
+        Returns:
+            tuple: (list of SourcePatch, list of the (field path, old, new)
+                edits of the other fields), or None if the map has no grid in app.js
+        """
+        span = self.source_span(record)
+        if span is None:
+            return None
+        original = self.original_record(record)
+        changes = diff_records(original, record)
+        unwritten = [change for change in changes if change[0][0] != 'tiles']
+        grid = record.get('tiles')
+        old_grid = original.get('tiles') if original is not None else None
+        if grid is None or old_grid is None:
+            return [], changes
+        if np.array_equal(grid, old_grid):
+            return [], unwritten
+        grid = as_grid(grid)
+            
+        if grid.shape == old_grid.shape:
+            patches = []
+            for y in np.flatnonzero((grid != old_grid).any(axis=1)).tolist():
+                row_span = self.source_span(record, y)
+                if row_span is None:
+                    break
+                patches.append(SourcePatch(row_span[0], row_span[1], format_row(grid[y])))
+            else:
+                return patches, unwritten
+        return [SourcePatch(span[0], span[1], format_grid(grid, self.js_content[span[0]:span[1]]))], unwritten
+        
+    def rebase_spans(self):
+        """Record the grid spans again after a save rewrote the bundle."""
+        links = [(record, self.spans.record_path(record)) for record in self.get_records()]
+        self.spans.clear()
+        self._exports_cache = {}
+        for record, path in links:
+            if path is not None and self._read_grid(path[0]) is not None:
+                self.spans.link(record, path)
+                
     def _parse_map_properties(self, map_id, map_content):
         """Parse map properties from a string representation."""
         try:
@@ -60,7 +246,7 @@ class GameDataMaps(GameData):
             }
             
             # Extract name if available
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', map_content)
+            name_match = self.re_search(r'name\s*:\s*["\']([^"\']*)["\']', map_content)
             if name_match:
                 map_data['name'] = name_match.group(1)
             else:
@@ -68,8 +254,8 @@ class GameDataMaps(GameData):
                 map_data['name'] = map_id.replace('_', ' ').title()
                 
             # Extract dimensions
-            width_match = re.search(r'width\s*:\s*(\d+)', map_content)
-            height_match = re.search(r'height\s*:\s*(\d+)', map_content)
+            width_match = self.re_search(r'width\s*:\s*(\d+)', map_content)
+            height_match = self.re_search(r'height\s*:\s*(\d+)', map_content)
             
             if width_match:
                 map_data['width'] = int(width_match.group(1))
@@ -82,7 +268,7 @@ class GameDataMaps(GameData):
                 map_data['height'] = 15  # Default height
                 
             # Extract tileset if available
-            tileset_match = re.search(r'tileset\s*:\s*["\']?([^"\',:]+)["\']?', map_content)
+            tileset_match = self.re_search(r'tileset\s*:\s*["\']?([^"\',:]+)["\']?', map_content)
             if tileset_match:
                 map_data['tileset'] = tileset_match.group(1)
             else:
@@ -99,7 +285,7 @@ class GameDataMaps(GameData):
                     map_data['tileset'] = 'field'  # Default tileset
                     
             # Extract battle background if available
-            bg_match = re.search(r'battleBg\s*:\s*["\']?([^"\',:]+)["\']?', map_content)
+            bg_match = self.re_search(r'battleBg\s*:\s*["\']?([^"\',:]+)["\']?', map_content)
             if bg_match:
                 map_data['battle_background'] = bg_match.group(1)
             else:
@@ -114,7 +300,7 @@ class GameDataMaps(GameData):
                     map_data['battle_background'] = 'field'  # Default
                     
             # Extract encounter rate if available
-            rate_match = re.search(r'encounterRate\s*:\s*(\d+)', map_content)
+            rate_match = self.re_search(r'encounterRate\s*:\s*(\d+)', map_content)
             if rate_match:
                 map_data['encounter_rate'] = int(rate_match.group(1))
             else:
@@ -133,7 +319,4 @@ class GameDataMaps(GameData):
             
     def get_map_by_name(self, name):
         """Get a map by name."""
-        for map_data in self.maps:
-            if map_data.get('name') == name:
-                return map_data
-        return None 
\ No newline at end of file
+        return self.find_record('name', name) 
\ No newline at end of file
@@ -4,6 +4,9 @@ Monster data handling module.
 
 import re
 from core.game_data import GameData
+from core.record_index import field_key
+from core.records import MonsterRecord
+from core.js_literal_parser import JSParseError, parse_js_literal
 from core.default_game_data import DEFAULT_MONSTERS
 
 # Mapping of monster IDs to their sprite positions
@@ -80,10 +83,53 @@ SPRITE_POSITION_MAP = {
     "0d": {"sheet": "monsters1", "row": 2, "col": 4},
     "0e": {"sheet": "monsters1", "row": 3, "col": 0},
 }
+# Property mapping (JS property name -> our property name)
+MONSTER_PROPERTY_MAP = {
+    "name": "name",
+    "type": "type",
+    "size": "size",
+    "ep": "exp",
+    "gil": "gold",
+    "hp": "hp",
+    "atk": "attack",
+    "pw": "power",  # Add pw as power
+    "def": "defense",
+    "mdef": "magic_defense",
+    "dx": "dexterity",
+    "sp": "speed",
+    "it": "intelligence",
+    "ev": "evasion",
+    "act": "actions",
+    "add": "status_effects",
+    "drop": "drops",
+    "weak": "weaknesses"
+}
 
 class GameDataMonsters(GameData):
     """Handler for monster data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('monsters', 'using_default_monsters')
+    
+    # Hash indexes over the monsters, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('id', field_key('id')),
+        ('type', field_key('type')),
+        ('sheet', field_key('sprite', 'sheet')),
+    )
+    
+    # Records are journaled by their ID
+    RECORD_KEY = 'id'
+    
+    # Bundle module holding the monster definitions
+    MODULE_PATH = './game/variables/_enemy'
+    
+    RECORD_CLASS = MonsterRecord
+    
+    # Every mapped property is copied as is, so all of them can be saved
+    SOURCE_FIELDS = tuple(((ours,), (js,)) for js, ours in MONSTER_PROPERTY_MAP.items())
+    
     def __init__(self):
         """Initialize monster data handler."""
         super().__init__()
@@ -95,26 +141,29 @@ class GameDataMonsters(GameData):
         """Extract monster data from the JavaScript content."""
         print("Extracting monsters...")
         
-        # Look for the module 56 which contains monster definitions
-        module_56_pattern = r'56: \[function\(.*?e\.exports\s*=\s*\{(.*?)\}\s*,\s*\{\s*\}\s*\]'
-        module_match = re.search(module_56_pattern, self.js_content, re.DOTALL)
+        # Look up the enemy module (module 56) in the bundle's module index
+        monster_table = self.get_module_exports(self.MODULE_PATH)
+        table_path = (self.MODULE_PATH,)
+        if monster_table is None and self.module_index is None:
+            # No index available, scan the whole bundle for module 56
+            module_56_match = self.re_search(r'56: \[function\(.*?e\.exports\s*=\s*(?=\{)', self.js_content, re.DOTALL)
+            if module_56_match:
+                try:
+                    table_path = (None,)
+                    monster_table = parse_js_literal(self.js_content, module_56_match.end(),
+                                                     self.spans.recorder(table_path))
+                except JSParseError as e:
+                    print(f"Error parsing module 56: {str(e)}")
         
-        if module_match:
+        if isinstance(monster_table, dict):
             print("Found monster data in module 56!")
-            monster_data_str = module_match.group(1)
-            
-            # Extract each monster entry
-            monster_entries = re.findall(r'([a-zA-Z0-9_]+):\s*\{(.*?)\},', monster_data_str, re.DOTALL)
-            print(f"Found {len(monster_entries)} monster entries in module 56")
+            print(f"Found {len(monster_table)} monster entries in module 56")
             
             all_monsters = []
-            for monster_id, monster_content in monster_entries:
-                # Format monster ID with ms_ prefix if it doesn't already have one
-                if not monster_id.startswith("ms_") and not re.match(r'^[a-zA-Z]+$', monster_id):
-                    monster_id = f"ms_{monster_id}"
-                
-                monster = self._parse_monster_properties(monster_id, monster_content)
+            for key, record in monster_table.items():
+                monster = self._parse_monster_record(self._format_monster_id(key), record)
                 if monster:
+                    self.spans.link(monster, table_path + (key,))
                     all_monsters.append(monster)
             
             if all_monsters:
@@ -145,7 +194,7 @@ class GameDataMonsters(GameData):
         debug_info = {"patterns_matched": [], "total_matches": 0}
         
         for pattern in patterns:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
+            matches = self.re_findall(pattern, self.js_content, re.DOTALL)
             if matches:
                 debug_info["patterns_matched"].append(pattern)
                 debug_info["total_matches"] += len(matches)
@@ -153,7 +202,7 @@ class GameDataMonsters(GameData):
             for match in matches:
                 # Process each monster entry
                 if '{' in match:  # If it's an object with multiple monsters
-                    monster_entries = re.findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
+                    monster_entries = self.re_findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
                     print(f"Found {len(monster_entries)} monster entries in object format")
                     
                     for monster_id, monster_content in monster_entries:
@@ -165,7 +214,7 @@ class GameDataMonsters(GameData):
                         if monster:
                             all_monsters.append(monster)
                 else:  # If it's an array of monster objects
-                    monster_matches = re.findall(r'\{(.*?)\}', match, re.DOTALL)
+                    monster_matches = self.re_findall(r'\{(.*?)\}', match, re.DOTALL)
                     print(f"Found {len(monster_matches)} monster entries in array format")
                     for i, monster_str in enumerate(monster_matches):
                         monster_id = f"ms_{i:02d}"
@@ -192,68 +241,53 @@ class GameDataMonsters(GameData):
         self.monsters = DEFAULT_MONSTERS.copy()
         self.using_default_monsters = True
         
-    def _parse_monster_properties(self, monster_id, content):
-        """Parse monster properties from the monster definition content."""
-        monster = {"id": monster_id}
+    def _format_monster_id(self, key):
+        """Format monster ID with ms_ prefix if it doesn't already have one."""
+        if not key.startswith("ms_") and not re.match(r'^[a-zA-Z]+$', key):
+            return f"ms_{key}"
+        return key
+        
+    def parse_source_record(self, path, literal):
+        """Build a monster from its source literal again, see GameData.source_patches()."""
+        return self._parse_monster_record(self._format_monster_id(path[-1]), literal)
         
-        # Property mapping (JS property name -> our property name)
-        property_map = {
-            "name": "name",
-            "type": "type",
-            "size": "size",
-            "ep": "exp",
-            "gil": "gold",
-            "hp": "hp",
-            "atk": "attack",
-            "pw": "power",  # Add pw as power
-            "def": "defense",
-            "mdef": "magic_defense",
-            "dx": "dexterity",
-            "sp": "speed",
-            "it": "intelligence",
-            "ev": "evasion",
-            "act": "actions",
-            "add": "status_effects",
-            "drop": "drops",
-            "weak": "weaknesses"
-        }
+    def reference_targets(self, record):
+        """Encounter patterns refer to a monster by ID, the battles tab by name."""
+        targets = []
+        if record.get('id'):
+            targets.append(('monster', record['id']))
+        if record.get('name'):
+            targets.append(('monster-name', record['name']))
+        return targets
         
-        # Extract properties using regex matches
-        for js_prop, our_prop in property_map.items():
-            # Try different regex patterns to catch different property formats
-            patterns = [
-                r'{0}\s*:\s*(?:"([^"]*)"|\s*\'([^\']*)\'|([^,\}}]+))'.format(js_prop),  # Standard property
-                r'"{0}"\s*:\s*(?:"([^"]*)"|\s*\'([^\']*)\'|([^,\}}]+))'.format(js_prop),  # Quoted key
-                r'\'{0}\'\s*:\s*(?:"([^"]*)"|\s*\'([^\']*)\'|([^,\}}]+))'.format(js_prop),   # Single-quoted key
-            ]
+    def record_references(self, record):
+        """Drops refer to an item table entry: {"ctg": "item", "idx": 0, "per": 5}."""
+        references = []
+        for drop in record.get('drops') or ():
+            if isinstance(drop, dict) and 'ctg' in drop and 'idx' in drop:
+                references.append((('item', drop['ctg'], drop['idx']), 'drop'))
+        return references
+        
+    def _parse_monster_properties(self, monster_id, content):
+        """Parse monster properties from the body of a monster definition."""
+        try:
+            record = parse_js_literal('{' + content + '}')
+        except JSParseError as e:
+            print(f"Error parsing monster {monster_id}: {str(e)}")
+            return None
+        return self._parse_monster_record(monster_id, record)
+        
+    def _parse_monster_record(self, monster_id, record):
+        """Build a monster from its parsed JavaScript record."""
+        if not isinstance(record, dict):
+            return None
             
-            for pattern in patterns:
-                matches = re.search(pattern, content)
-                if matches:
-                    # Take the first non-None group from the match
-                    value = next((g for g in matches.groups() if g is not None), "")
-                    value = value.strip()
-                    
-                    # Handle arrays
-                    if value.startswith('[') and value.endswith(']'):
-                        # Extract array values
-                        array_values = []
-                        array_matches = re.findall(r'"([^"]*)"|\s*\'([^\']*)\'|([^,\[\]]+)', value)
-                        for match in array_matches:
-                            array_val = next((g for g in match if g is not None), "").strip()
-                            if array_val and not array_val.isspace():
-                                array_values.append(array_val)
-                        monster[our_prop] = array_values
-                    else:
-                        # Handle numeric values
-                        if value.replace('.', '', 1).isdigit():
-                            if '.' in value:
-                                monster[our_prop] = float(value)
-                            else:
-                                monster[our_prop] = int(value)
-                        else:
-                            monster[our_prop] = value
-                    break
+        monster = {"id": monster_id}
+        
+        # Copy the properties we know about; arrays keep their structure
+        for js_prop, our_prop in MONSTER_PROPERTY_MAP.items():
+            if js_prop in record and record[js_prop] is not None:
+                monster[our_prop] = record[js_prop]
         
         # Ensure the monster has minimum required properties
         if 'name' not in monster or not monster['name']:
@@ -267,7 +301,7 @@ class GameDataMonsters(GameData):
             # Default sprite position
             monster['sprite'] = {"sheet": "monsters1", "row": 0, "col": 0}
         
-        return monster
+        return MonsterRecord(monster)
     
     def get_sprite_for_id(self, monster_id):
         """Get sprite data for a given monster ID."""
@@ -300,17 +334,11 @@ class GameDataMonsters(GameData):
             
     def get_monster_by_name(self, name):
         """Get a monster by name."""
-        for monster in self.monsters:
-            if monster.get('name') == name:
-                return monster
-        return None
+        return self.find_record('name', name)
         
     def get_monster_by_id(self, monster_id):
         """Get a monster by ID."""
-        for monster in self.monsters:
-            if monster.get('id') == monster_id:
-                return monster
-        return None
+        return self.find_record('id', monster_id)
         
     def mark_as_changed(self):
         """Mark the monster data as changed."""
@@ -4,11 +4,21 @@ NPC data handling module.
 
 import re
 from core.game_data import GameData
+from core.record_index import field_key
 from core.default_game_data import DEFAULT_NPCS
 
 class GameDataNPCs(GameData):
     """Handler for NPC data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('npcs', 'using_default_npcs')
+    
+    # Hash indexes over the npcs, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('role', field_key('role')),
+    )
+    
     def __init__(self):
         """Initialize NPC data handler."""
         super().__init__()
@@ -32,18 +42,18 @@ class GameDataNPCs(GameData):
         all_npcs = []
         
         for pattern in patterns:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
+            matches = self.re_findall(pattern, self.js_content, re.DOTALL)
             for match in matches:
                 # Process each NPC entry
                 if '{' in match:  # If it's an object with multiple NPCs
-                    npc_entries = re.findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
+                    npc_entries = self.re_findall(r'([a-zA-Z0-9_]+)\s*:\s*\{(.*?)\}', match, re.DOTALL)
                     
                     for npc_id, npc_content in npc_entries:
                         npc = self._parse_npc_properties(npc_id, npc_content)
                         if npc:
                             all_npcs.append(npc)
                 else:  # If it's an array of NPC objects
-                    npc_matches = re.findall(r'\{(.*?)\}', match, re.DOTALL)
+                    npc_matches = self.re_findall(r'\{(.*?)\}', match, re.DOTALL)
                     for i, npc_str in enumerate(npc_matches):
                         npc = self._parse_npc_properties(f"npc{i}", npc_str)
                         if npc:
@@ -69,7 +79,7 @@ class GameDataNPCs(GameData):
             }
             
             # Extract name if available
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', npc_content)
+            name_match = self.re_search(r'name\s*:\s*["\']([^"\']*)["\']', npc_content)
             if name_match:
                 npc['name'] = name_match.group(1)
             else:
@@ -77,7 +87,7 @@ class GameDataNPCs(GameData):
                 npc['name'] = npc_id.replace('_', ' ').title()
                 
             # Extract role/occupation if available
-            role_match = re.search(r'role\s*:\s*["\']([^"\']*)["\']', npc_content)
+            role_match = self.re_search(r'role\s*:\s*["\']([^"\']*)["\']', npc_content)
             if role_match:
                 npc['role'] = role_match.group(1)
             else:
@@ -92,9 +102,9 @@ class GameDataNPCs(GameData):
                     npc['role'] = 'Villager'  # Default role
                     
             # Extract dialogue/text if available
-            dialogue_match = re.search(r'dialogue\s*:\s*["\']([^"\']*)["\']', npc_content)
+            dialogue_match = self.re_search(r'dialogue\s*:\s*["\']([^"\']*)["\']', npc_content)
             if not dialogue_match:
-                dialogue_match = re.search(r'text\s*:\s*["\']([^"\']*)["\']', npc_content)
+                dialogue_match = self.re_search(r'text\s*:\s*["\']([^"\']*)["\']', npc_content)
                 
             if dialogue_match:
                 npc['dialogue'] = dialogue_match.group(1)
@@ -110,15 +120,15 @@ class GameDataNPCs(GameData):
                     npc['dialogue'] = "Hello there!"  # Default dialogue
                     
             # Extract map location if available
-            map_match = re.search(r'map\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
+            map_match = self.re_search(r'map\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
             if map_match:
                 npc['map'] = map_match.group(1)
             else:
                 npc['map'] = "town"  # Default map
                 
             # Extract position if available
-            x_match = re.search(r'x\s*:\s*(\d+)', npc_content)
-            y_match = re.search(r'y\s*:\s*(\d+)', npc_content)
+            x_match = self.re_search(r'x\s*:\s*(\d+)', npc_content)
+            y_match = self.re_search(r'y\s*:\s*(\d+)', npc_content)
             
             if x_match:
                 npc['x'] = int(x_match.group(1))
@@ -131,7 +141,7 @@ class GameDataNPCs(GameData):
                 npc['y'] = 10  # Default y position
                 
             # Extract sprite/image if available
-            sprite_match = re.search(r'sprite\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
+            sprite_match = self.re_search(r'sprite\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
             if sprite_match:
                 npc['sprite'] = sprite_match.group(1)
             else:
@@ -142,7 +152,7 @@ class GameDataNPCs(GameData):
             if 'quest' in npc_content.lower():
                 npc['has_quest'] = True
                 
-                quest_id_match = re.search(r'questId\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
+                quest_id_match = self.re_search(r'questId\s*:\s*["\']?([^"\',:]+)["\']?', npc_content)
                 if quest_id_match:
                     npc['quest_id'] = quest_id_match.group(1)
                 else:
@@ -157,7 +167,4 @@ class GameDataNPCs(GameData):
             
     def get_npc_by_name(self, name):
         """Get an NPC by name."""
-        for npc in self.npcs:
-            if npc.get('name') == name:
-                return npc
-        return None 
\ No newline at end of file
+        return self.find_record('name', name) 
\ No newline at end of file
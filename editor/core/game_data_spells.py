@@ -8,14 +8,30 @@ def dprint(*args, **kwargs):
     if DEBUG:
         print(*args, **kwargs)
 
-import re
 import os
 from core.game_data import GameData
+from core.record_index import field_key
+from core.records import SpellRecord
 from core.default_game_data import DEFAULT_SPELLS
 
 class GameDataSpells(GameData):
     """Handler for spell data in the game."""
     
+    # Extracted state, saved to and restored from the extraction cache
+    DATA_ATTRS = ('spells', 'using_default_spells')
+    
+    # Hash indexes over the spells, see GameData.find_record()
+    INDEX_KEYS = (
+        ('name', field_key('name')),
+        ('type', field_key('type')),
+        ('level', field_key('level')),
+    )
+    
+    # Bundle module holding the magic table (shared with items)
+    MODULE_PATH = './game/variables/_items'
+    
+    RECORD_CLASS = SpellRecord
+    
     def __init__(self):
         """Initialize spell data handler."""
         super().__init__()
@@ -35,54 +51,44 @@ class GameDataSpells(GameData):
             dprint("Using default spells instead")
             return
             
-        # Using a similar approach to what works in GameDataItems._extract_magic_array
-        # Pattern to find magic array
-        pattern = r'mgc\s*:\s*\[\s*\{(.*?)\}\s*\]'
+        # Using the same magic table as GameDataItems._extract_magic_array
         all_spells = []
         
-        try:
-            matches = re.findall(pattern, self.js_content, re.DOTALL)
-            if matches:
-                dprint(f"Found mgc array with {len(matches)} matches")
-                
-                # Process the first magic array we found
-                magic_contents = matches[0]
-                dprint(f"Magic array content length: {len(magic_contents)} characters")
-                
-                # Split the content into individual spell objects
-                magic_strings = re.split(r'\},\s*\{', magic_contents)
-                dprint(f"Found {len(magic_strings)} potential spell objects")
-                
-                for i, magic_str in enumerate(magic_strings):
-                    # Add back the curly braces that were removed in the split
-                    if i > 0:
-                        magic_str = '{' + magic_str
-                    if i < len(magic_strings) - 1:
-                        magic_str = magic_str + '}'
-                    
-                    dprint(f"\nProcessing spell candidate {i+1}...")
-                    spell = self._parse_spell_properties(magic_str)
-                    if spell:
-                        all_spells.append(spell)
-                        dprint(f"✅ Added spell: {spell['name']} (Type: {spell['type']}, Power: {spell['power']}, MP: {spell['mp_cost']}, Target: {spell['target']})")
-                    else:
-                        dprint(f"❌ Failed to parse spell candidate {i+1}")
-                
-                # If we found spells, save them
-                if all_spells:
-                    self.spells = all_spells
-                    self.using_default_spells = False
-                    dprint(f"\n✅ Successfully extracted {len(all_spells)} spells")
-                    dprint("Spell names extracted:")
-                    for i, spell in enumerate(all_spells):
-                        dprint(f"  {i+1}. {spell['name']} ({spell['type']})")
-                    return
+        exports = self.get_module_exports(self.MODULE_PATH)
+        if isinstance(exports, dict):
+            magic_table = exports.get('mgc')
+            table_path = (self.MODULE_PATH, 'mgc')
+        else:
+            # No module index, look for the table in the whole bundle
+            magic_table = self.find_literal('mgc')
+            table_path = (None, 'mgc')
+        
+        if isinstance(magic_table, list):
+            dprint(f"Found mgc array with {len(magic_table)} spell objects")
+            
+            for i, record in enumerate(magic_table):
+                dprint(f"\nProcessing spell candidate {i+1}...")
+                spell = self._parse_spell_record(record)
+                if spell:
+                    self.spans.link(spell, table_path + (i,))
+                    all_spells.append(spell)
+                    dprint(f"✅ Added spell: {spell['name']} (Type: {spell['type']}, Power: {spell['power']}, MP: {spell['mp_cost']}, Target: {spell['target']})")
                 else:
-                    dprint("No valid spells found in the mgc array")
+                    dprint(f"❌ Failed to parse spell candidate {i+1}")
+            
+            # If we found spells, save them
+            if all_spells:
+                self.spells = all_spells
+                self.using_default_spells = False
+                dprint(f"\n✅ Successfully extracted {len(all_spells)} spells")
+                dprint("Spell names extracted:")
+                for i, spell in enumerate(all_spells):
+                    dprint(f"  {i+1}. {spell['name']} ({spell['type']})")
+                return
             else:
-                dprint("Could not find mgc array in the JS content")
-        except Exception as e:
-            dprint(f"Error extracting spells: {str(e)}")
+                dprint("No valid spells found in the mgc array")
+        else:
+            dprint("Could not find mgc array in the JS content")
         
         # Use defaults if we couldn't extract any spells
         dprint("\n❌ Could not extract any spells from game data, using defaults instead")
@@ -175,183 +181,188 @@ class GameDataSpells(GameData):
             dprint(f"Error finding spell images: {str(e)}")
             return {}
         
-    def _parse_spell_properties(self, spell_str):
-        """Parse spell properties from a string representation."""
-        try:
-            dprint("------- Parsing spell properties -------")
-            spell = {}
-            
-            # Extract name if available
-            name_match = re.search(r'name\s*:\s*["\']([^"\']*)["\']', spell_str)
-            if name_match:
-                spell['name'] = name_match.group(1)
-                dprint(f"📝 Found name: {spell['name']}")
-            else:
-                dprint("❌ No name found, skipping")
-                return None
-            
-            # Check if this is actually a spell by looking for spell-specific properties
-            is_spell = False
-            
-            mlv_match = re.search(r'mlv\s*:', spell_str)
-            if mlv_match:
-                is_spell = True
-                dprint("✅ Found magic level indicator (mlv)")
+    def parse_source_record(self, path, literal):
+        """Build a spell from its source literal again, see GameData.source_patches()."""
+        return self._parse_spell_record(literal)
+        
+    def reference_targets(self, record):
+        """Magic shops refer to a spell by its position in the magic table, ('item', 'mgc', 0)."""
+        path = self.spans.record_path(record)
+        return (('item',) + tuple(path[-2:]),) if path is not None else ()
+        
+    def source_fields(self, record, literal):
+        """Get the spell fields copied as is from the source literal."""
+        fields = [(('name',), ('name',))]
+        if 'mlv' not in literal or type(literal['mlv']) is int:
+            fields.append((('level',), ('mlv',)))
             
-            act_id_match = re.search(r'act\s*:.*?id\s*:', spell_str, re.DOTALL)
-            if act_id_match:
-                if not re.search(r'battle\s*:', spell_str):
-                    is_spell = True
-                    dprint("✅ Found action ID indicator (act.id)")
-                
-            job_match = re.search(r'job\s*:\s*\[', spell_str)
-            if job_match:
-                is_spell = True
-                dprint("✅ Found job restrictions")
+        act = literal.get('act')
+        if isinstance(act, dict):
+            val = act.get('val')
+            if isinstance(val, dict) and type(val.get('min')) is int:
+                fields.append((('power',), ('act', 'val', 'min')))
+            elif not isinstance(val, dict):
+                fields.append((('power',), ('act', 'val')))
+        return fields
+        
+    def _parse_spell_record(self, record):
+        """Parse spell properties from a parsed JavaScript record."""
+        dprint("------- Parsing spell properties -------")
+        if not isinstance(record, dict) or not isinstance(record.get('name'), str):
+            dprint("❌ No name found, skipping")
+            return None
             
-            if not is_spell:
-                dprint("❌ Object does not appear to be a spell, skipping")
-                return None
+        spell = {'name': record['name']}
+        dprint(f"📝 Found name: {spell['name']}")
+        
+        act = record.get('act')
+        if not isinstance(act, dict):
+            act = {}
+        
+        # Check if this is actually a spell by looking for spell-specific properties
+        is_spell = False
+        
+        if 'mlv' in record:
+            is_spell = True
+            dprint("✅ Found magic level indicator (mlv)")
+        
+        if 'id' in act and 'battle' not in record:
+            is_spell = True
+            dprint("✅ Found action ID indicator (act.id)")
             
-            mlv_match = re.search(r'mlv\s*:\s*(\d+)', spell_str)
-            if mlv_match:
-                spell['level'] = int(mlv_match.group(1))
-                dprint(f"📝 Found level: {spell['level']}")
-            else:
-                spell['level'] = 0
-                dprint("📝 No level found, using default: 0")
+        if isinstance(record.get('job'), list):
+            is_spell = True
+            dprint("✅ Found job restrictions")
+        
+        if not is_spell:
+            dprint("❌ Object does not appear to be a spell, skipping")
+            return None
+        
+        if type(record.get('mlv')) is int:
+            spell['level'] = record['mlv']
+            dprint(f"📝 Found level: {spell['level']}")
+        else:
+            spell['level'] = 0
+            dprint("📝 No level found, using default: 0")
+        
+        if type(record.get('buy')) is int:
+            buy_price = record['buy']
+            spell['mp_cost'] = max(1, min(20, buy_price // 20))
+            dprint(f"📝 Found buy price: {buy_price}, estimated MP cost: {spell['mp_cost']}")
+        else:
+            spell['mp_cost'] = 5
+            dprint("📝 No buy price found, using default MP cost: 5")
+        
+        act_id = None
+        if isinstance(act.get('id'), str):
+            act_id = act['id'].lower()
+            dprint(f"📝 Found action ID: {act_id}")
             
-            buy_match = re.search(r'buy\s*:\s*(\d+)', spell_str)
-            if buy_match:
-                buy_price = int(buy_match.group(1))
-                spell['mp_cost'] = max(1, min(20, buy_price // 20))
-                dprint(f"📝 Found buy price: {buy_price}, estimated MP cost: {spell['mp_cost']}")
-            else:
-                spell['mp_cost'] = 5
-                dprint("📝 No buy price found, using default MP cost: 5")
+            spell_type_map = {
+                'fire': 'Fire',
+                'thunder': 'Lightning',
+                'heal': 'Heal',
+                'dia': 'Light',
+                'protes': 'Buff',
+                'blink': 'Buff',
+                'sripl': 'Status',
+                'shape': 'Status'
+            }
             
-            act_id = None
-            act_id_match = re.search(r'act\s*:.*?id\s*:\s*["\']([^"\']*)["\']', spell_str, re.DOTALL)
-            if act_id_match:
-                act_id = act_id_match.group(1).lower()
-                dprint(f"📝 Found action ID: {act_id}")
-                
-                spell_type_map = {
-                    'fire': 'Fire',
-                    'thunder': 'Lightning',
-                    'heal': 'Heal',
-                    'dia': 'Light',
-                    'protes': 'Buff',
-                    'blink': 'Buff',
-                    'sripl': 'Status',
-                    'shape': 'Status'
-                }
-                
-                spell['type'] = spell_type_map.get(act_id, 'Fire')
-                dprint(f"📝 Mapped to spell type: {spell['type']}")
+            spell['type'] = spell_type_map.get(act_id, 'Fire')
+            dprint(f"📝 Mapped to spell type: {spell['type']}")
+        else:
+            dprint("No action ID found, guessing type from name...")
+            if 'cure' in spell['name'].lower() or 'heal' in spell['name'].lower() or 'ケアル' in spell['name']:
+                spell['type'] = 'Heal'
+            elif 'fire' in spell['name'].lower() or 'ファイア' in spell['name']:
+                spell['type'] = 'Fire'
+            elif 'thunder' in spell['name'].lower() or 'lightning' in spell['name'].lower() or 'サンダー' in spell['name']:
+                spell['type'] = 'Lightning'
+            elif 'blizzard' in spell['name'].lower() or 'ice' in spell['name'].lower():
+                spell['type'] = 'Ice'
+            elif 'protect' in spell['name'].lower() or 'shell' in spell['name'].lower() or 'haste' in spell['name'].lower() or 'プロテス' in spell['name']:
+                spell['type'] = 'Buff'
             else:
-                dprint("No action ID found, guessing type from name...")
-                if 'cure' in spell['name'].lower() or 'heal' in spell['name'].lower() or 'ケアル' in spell['name']:
-                    spell['type'] = 'Heal'
-                elif 'fire' in spell['name'].lower() or 'ファイア' in spell['name']:
-                    spell['type'] = 'Fire'
-                elif 'thunder' in spell['name'].lower() or 'lightning' in spell['name'].lower() or 'サンダー' in spell['name']:
-                    spell['type'] = 'Lightning'
-                elif 'blizzard' in spell['name'].lower() or 'ice' in spell['name'].lower():
-                    spell['type'] = 'Ice'
-                elif 'protect' in spell['name'].lower() or 'shell' in spell['name'].lower() or 'haste' in spell['name'].lower() or 'プロテス' in spell['name']:
-                    spell['type'] = 'Buff'
-                else:
-                    spell['type'] = 'Fire'
-                dprint(f"📝 Guessed spell type from name: {spell['type']}")
+                spell['type'] = 'Fire'
+            dprint(f"📝 Guessed spell type from name: {spell['type']}")
+        
+        val = act.get('val')
+        if isinstance(val, dict) and type(val.get('min')) is int:
+            spell['power'] = val['min']
+            dprint(f"📝 Found power (min val): {spell['power']}")
+        elif type(val) is int:
+            spell['power'] = val
+            dprint(f"📝 Found power (direct val): {spell['power']}")
+        else:
+            spell['power'] = max(5, spell['level'] * 5 + 5)
+            dprint(f"📝 No power found, calculated from level: {spell['power']}")
+        
+        trg = act.get('trg')
+        if isinstance(trg, list) and trg and isinstance(trg[0], str):
+            target_type = trg[0].lower()
+            dprint(f"📝 Found target type: {target_type}")
             
-            min_val_match = re.search(r'val\s*:\s*\{\s*min\s*:\s*(\d+)', spell_str)
-            if min_val_match:
-                spell['power'] = int(min_val_match.group(1))
-                dprint(f"📝 Found power (min val): {spell['power']}")
-            else:
-                val_match = re.search(r'val\s*:\s*(\d+)', spell_str)
-                if val_match:
-                    spell['power'] = int(val_match.group(1))
-                    dprint(f"📝 Found power (direct val): {spell['power']}")
-                else:
-                    spell['power'] = max(5, spell['level'] * 5 + 5)
-                    dprint(f"📝 No power found, calculated from level: {spell['power']}")
+            target_scope = trg[1].lower() if len(trg) > 1 and isinstance(trg[1], str) else "single"
+            dprint(f"📝 Found target scope: {target_scope}")
             
-            trg_match = re.search(r'trg\s*:\s*\[\s*["\']([^"\']*)["\']', spell_str)
-            if trg_match:
-                target_type = trg_match.group(1).lower()
-                dprint(f"📝 Found target type: {target_type}")
-                
-                scope_match = re.search(r'trg\s*:\s*\[\s*["\'][^"\']*["\'],\s*["\']([^"\']*)["\']', spell_str)
-                target_scope = scope_match.group(1).lower() if scope_match else "single"
-                dprint(f"📝 Found target scope: {target_scope}")
-                
-                if target_type == 'enemy' and target_scope == 'all':
-                    spell['target'] = 'All Enemies'
-                elif target_type == 'player' and target_scope == 'all':
-                    spell['target'] = 'All Allies'
-                elif target_scope == 'self':
-                    spell['target'] = 'Self'
-                elif target_type == 'player':
-                    spell['target'] = 'Single Ally'
-                elif target_type == 'enemy':
-                    spell['target'] = 'Single Enemy'
-                else:
-                    if spell['type'] in ['Heal', 'Cure', 'Buff']:
-                        spell['target'] = 'Single Ally'
-                    else:
-                        spell['target'] = 'Single Enemy'
-                dprint(f"📝 Mapped to target: {spell['target']}")
+            if target_type == 'enemy' and target_scope == 'all':
+                spell['target'] = 'All Enemies'
+            elif target_type == 'player' and target_scope == 'all':
+                spell['target'] = 'All Allies'
+            elif target_scope == 'self':
+                spell['target'] = 'Self'
+            elif target_type == 'player':
+                spell['target'] = 'Single Ally'
+            elif target_type == 'enemy':
+                spell['target'] = 'Single Enemy'
             else:
-                dprint("No target information found, using defaults based on type...")
                 if spell['type'] in ['Heal', 'Cure', 'Buff']:
                     spell['target'] = 'Single Ally'
                 else:
                     spell['target'] = 'Single Enemy'
-                dprint(f"📝 Set default target: {spell['target']}")
-            
-            effect_type = None
-            effect_type_match = re.search(r'effectType\s*:\s*["\']([^"\']*)["\']', spell_str)
-            if effect_type_match:
-                effect_type = effect_type_match.group(1)
-                spell['effect_type'] = effect_type
-                dprint(f"📝 Found effect type: {effect_type}")
-            
-            flash_color_match = re.search(r'flashColor\s*:\s*["\']([^"\']*)["\']', spell_str)
-            if flash_color_match:
-                flash_color = flash_color_match.group(1)
-                spell['flash_color'] = flash_color
-                dprint(f"📝 Found flash color: {flash_color}")
-            
-            msg_match = re.search(r'msg\s*:\s*["\']([^"\']*)["\']', spell_str)
-            if msg_match and msg_match.group(1):
-                msg = msg_match.group(1).replace('<br>', ' ')
-                spell['description'] = msg
-                dprint(f"📝 Found description: {msg[:30]}...")
+            dprint(f"📝 Mapped to target: {spell['target']}")
+        else:
+            dprint("No target information found, using defaults based on type...")
+            if spell['type'] in ['Heal', 'Cure', 'Buff']:
+                spell['target'] = 'Single Ally'
             else:
-                if spell['type'] in ['Heal', 'Cure']:
-                    spell['description'] = f"A healing spell with power {spell['power']}."
-                elif spell['type'] == 'Buff':
-                    spell['description'] = f"A support spell that enhances abilities."
-                else:
-                    spell['description'] = f"An offensive {spell['type']} spell with power {spell['power']}."
-                dprint(f"📝 Generated description: {spell['description']}")
-            
-            image_files = self._get_spell_image_file(act_id, effect_type)
-            if image_files:
-                spell['image_files'] = image_files
-                dprint(f"📝 Found spell images: {image_files}")
-            
-            dprint("✅ Successfully parsed spell properties")
-            return spell
-        except Exception as e:
-            dprint(f"❌ Error parsing spell: {str(e)}")
-            return None
+                spell['target'] = 'Single Enemy'
+            dprint(f"📝 Set default target: {spell['target']}")
+        
+        effect_type = None
+        if isinstance(act.get('effectType'), str):
+            effect_type = act['effectType']
+            spell['effect_type'] = effect_type
+            dprint(f"📝 Found effect type: {effect_type}")
+        
+        if isinstance(act.get('flashColor'), str):
+            flash_color = act['flashColor']
+            spell['flash_color'] = flash_color
+            dprint(f"📝 Found flash color: {flash_color}")
+        
+        msg = record.get('msg')
+        if isinstance(msg, str) and msg:
+            msg = msg.replace('<br>', ' ')
+            spell['description'] = msg
+            dprint(f"📝 Found description: {msg[:30]}...")
+        else:
+            if spell['type'] in ['Heal', 'Cure']:
+                spell['description'] = f"A healing spell with power {spell['power']}."
+            elif spell['type'] == 'Buff':
+                spell['description'] = f"A support spell that enhances abilities."
+            else:
+                spell['description'] = f"An offensive {spell['type']} spell with power {spell['power']}."
+            dprint(f"📝 Generated description: {spell['description']}")
+        
+        image_files = self._get_spell_image_file(act_id, effect_type)
+        if image_files:
+            spell['image_files'] = image_files
+            dprint(f"📝 Found spell images: {image_files}")
+        
+        dprint("✅ Successfully parsed spell properties")
+        return SpellRecord(spell)
             
     def get_spell_by_name(self, name):
         """Get a spell by name."""
-        for spell in self.spells:
-            if spell.get('name') == name:
-                return spell
-        return None
+        return self.find_record('name', name)
@@ -0,0 +1,347 @@
+"""
+Parser for the JavaScript object literals used by the game's data modules.
+
+The data modules in app.js (enemies, items, jobs, encounter patterns, ...)
+export plain literals such as ``e.exports = {ms_00: {name: "...", hp: 8}}``.
+This module turns those literals into Python values with a small
+recursive-descent parser that walks the text once, instead of running a
+separate regular expression for every field.
+
+Supported syntax: objects (identifier, string and number keys), arrays,
+strings, numbers, true/false/null/undefined, ``!0``/``!1`` and ``void 0``.
+
+The parser can also report the source span of every value it parses, see
+core.source_spans. format_js_literal() goes the other way, for writing
+edited values back into the bundle.
+"""
+
+import re
+import math
+import numbers
+from collections.abc import Mapping
+
+
+class JSParseError(ValueError):
+    """Raised when a literal can't be parsed."""
+
+    def __init__(self, message, pos):
+        super().__init__(f"{message} at offset {pos}")
+        self.pos = pos
+
+
+# Whitespace and comments between tokens
+_SKIP_RE = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+# Number literals: decimal, float, exponent and hex
+_NUMBER_RE = re.compile(r'-?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)')
+
+# Identifiers (object keys and keywords)
+_IDENT_RE = re.compile(r'[A-Za-z_$][\w$]*')
+
+# String bodies up to the closing quote
+_DOUBLE_STRING_RE = re.compile(r'"((?:[^"\\\n]|\\.)*)"', re.DOTALL)
+_SINGLE_STRING_RE = re.compile(r"'((?:[^'\\\n]|\\.)*)'", re.DOTALL)
+
+# Escape sequences inside strings
+_ESCAPE_RE = re.compile(r'\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|[\s\S])')
+
+# Module export assignment
+_EXPORTS_RE = re.compile(r'\b(?:e|module)\.exports\s*=\s*')
+
+_KEYWORDS = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'undefined': None,
+}
+
+# Characters escaped when formatting strings
+_FORMAT_ESCAPES = {
+    '\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t',
+    '\u2028': '\\u2028', '\u2029': '\\u2029',
+}
+_FORMAT_ESCAPE_RE = re.compile('[\\\\"\n\r\t\u2028\u2029]')
+
+_SIMPLE_ESCAPES = {
+    'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0',
+    '\n': '', '\r\n': '', '\u2028': '', '\u2029': '',
+}
+
+
+def _unescape(match):
+    """Decode a single JavaScript escape sequence."""
+    escape = match.group(1)
+    if escape in _SIMPLE_ESCAPES:
+        return _SIMPLE_ESCAPES[escape]
+    if escape.startswith('u{'):
+        return chr(int(escape[2:-1], 16))
+    if escape[0] in 'ux' and len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return escape
+
+
+class JSLiteralParser:
+    """Recursive-descent parser over a JavaScript source string."""
+
+    def __init__(self, text, pos=0, on_span=None):
+        """
+        Initialize the parser at the given offset of text.
+
+        Args:
+            text (str): Source text
+            pos (int): Offset where parsing starts
+            on_span (callable): Called with (path, start, end) for every value
+                parsed, path being the tuple of keys/indices leading to it
+        """
+        self.text = text
+        self.pos = pos
+        self.on_span = on_span
+        self._path = []
+
+    def _skip(self):
+        """Skip whitespace and comments."""
+        self.pos = _SKIP_RE.match(self.text, self.pos).end()
+
+    def _peek(self):
+        """Return the next significant character without consuming it."""
+        self._skip()
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+
+    def _expect(self, ch):
+        """Consume the given character or raise an error."""
+        if self._peek() != ch:
+            raise JSParseError(f"Expected '{ch}'", self.pos)
+        self.pos += 1
+
+    def parse_value(self):
+        """Parse the value starting at the current position."""
+        if self.on_span is None:
+            return self._parse_value()
+
+        self._skip()
+        start = self.pos
+        value = self._parse_value()
+        self.on_span(tuple(self._path), start, self.pos)
+        return value
+
+    def _parse_value(self):
+        """Parse a value without reporting its span."""
+        ch = self._peek()
+
+        if ch == '{':
+            return self.parse_object()
+        if ch == '[':
+            return self.parse_array()
+        if ch == '"' or ch == "'":
+            return self.parse_string()
+        if ch == '!':
+            # Minifiers write true/false as !0/!1
+            self.pos += 1
+            return not self.parse_value()
+        if ch == '-' or ch == '.' or ch.isdigit():
+            return self.parse_number()
+
+        match = _IDENT_RE.match(self.text, self.pos)
+        if match:
+            word = match.group()
+            if word in _KEYWORDS:
+                self.pos = match.end()
+                return _KEYWORDS[word]
+            if word == 'void':
+                self.pos = match.end()
+                self.parse_value()
+                return None
+            raise JSParseError(f"Unsupported identifier '{word}'", self.pos)
+
+        raise JSParseError(f"Unexpected character {ch!r}", self.pos)
+
+    def parse_object(self):
+        """Parse an object literal into a dict."""
+        self._expect('{')
+        result = {}
+
+        while True:
+            ch = self._peek()
+            if ch == '}':
+                self.pos += 1
+                return result
+
+            key = self.parse_key()
+            self._expect(':')
+            self._path.append(key)
+            result[key] = self.parse_value()
+            self._path.pop()
+
+            ch = self._peek()
+            if ch == ',':
+                self.pos += 1
+            elif ch != '}':
+                raise JSParseError("Expected ',' or '}'", self.pos)
+
+    def parse_array(self):
+        """Parse an array literal into a list."""
+        self._expect('[')
+        result = []
+
+        while True:
+            ch = self._peek()
+            if ch == ']':
+                self.pos += 1
+                return result
+
+            self._path.append(len(result))
+            result.append(self.parse_value())
+            self._path.pop()
+
+            ch = self._peek()
+            if ch == ',':
+                self.pos += 1
+            elif ch != ']':
+                raise JSParseError("Expected ',' or ']'", self.pos)
+
+    def parse_key(self):
+        """Parse an object key (identifier, string or number)."""
+        ch = self._peek()
+        if ch == '"' or ch == "'":
+            return self.parse_string()
+
+        match = _IDENT_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            return match.group()
+
+        match = _NUMBER_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            return match.group()
+
+        raise JSParseError("Expected an object key", self.pos)
+
+    def parse_string(self):
+        """Parse a single- or double-quoted string."""
+        pattern = _DOUBLE_STRING_RE if self.text[self.pos] == '"' else _SINGLE_STRING_RE
+        match = pattern.match(self.text, self.pos)
+        if not match:
+            raise JSParseError("Unterminated string", self.pos)
+
+        self.pos = match.end()
+        body = match.group(1)
+        if '\\' in body:
+            body = _ESCAPE_RE.sub(_unescape, body)
+        return body
+
+    def parse_number(self):
+        """Parse a number into an int or float."""
+        match = _NUMBER_RE.match(self.text, self.pos)
+        if not match:
+            raise JSParseError("Invalid number", self.pos)
+
+        self.pos = match.end()
+        token = match.group()
+        if 'x' in token or 'X' in token:
+            return int(token, 16)
+        if '.' in token or 'e' in token or 'E' in token:
+            return float(token)
+        return int(token)
+
+
+def parse_js_literal(text, pos=0, on_span=None):
+    """
+    Parse a JavaScript literal.
+
+    Args:
+        text (str): Source text
+        pos (int): Offset where the literal starts
+        on_span (callable): Called with (path, start, end) for every value parsed
+
+    Returns:
+        The parsed value (dict, list, str, int, float, bool or None)
+
+    Raises:
+        JSParseError: If the text is not a supported literal
+    """
+    return JSLiteralParser(text, pos, on_span).parse_value()
+
+
+def find_exports(source):
+    """Return the offset of the value assigned to e.exports, or -1 if there is none."""
+    match = _EXPORTS_RE.search(source)
+    return match.end() if match else -1
+
+
+def parse_module_exports(source, on_span=None):
+    """
+    Parse the literal a data module assigns to e.exports.
+
+    Args:
+        source (str): Source of a bundle module
+        on_span (callable): Called with (path, start, end) for every value
+            parsed, with offsets into source
+
+    Returns:
+        The exported value, or None if the module doesn't export a literal
+    """
+    pos = find_exports(source)
+    if pos < 0:
+        return None
+
+    # Modules that export a variable (e.exports = s) are not data literals
+    match = _IDENT_RE.match(source, pos)
+    if match and match.group() not in _KEYWORDS and match.group() != 'void':
+        return None
+
+    try:
+        return parse_js_literal(source, pos, on_span)
+    except JSParseError as e:
+        print(f"Error parsing module exports: {str(e)}")
+        return None
+
+
+def format_js_literal(value):
+    """
+    Format a Python value as a JavaScript literal in the bundle's style.
+
+    Strings are double-quoted and keep non-ASCII characters, object keys
+    are written bare when they are valid identifiers, booleans are minified
+    to !0/!1 like the rest of the bundle. Integer and float types other
+    than Python's (e.g. NumPy scalars) are written as their value.
+
+    Args:
+        value: dict, list, str, int, float, bool or None
+
+    Returns:
+        str: The literal source
+
+    Raises:
+        TypeError: If the value has no literal form
+        ValueError: If the value is an infinite or NaN float, JSON-like
+            literals have none
+    """
+    if value is None:
+        return 'null'
+    if value is True:
+        return '!0'
+    if value is False:
+        return '!1'
+    if isinstance(value, numbers.Integral):
+        return repr(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"Can't format {value} as a JavaScript literal")
+        return repr(value)
+    if isinstance(value, str):
+        return '"' + _FORMAT_ESCAPE_RE.sub(lambda m: _FORMAT_ESCAPES[m.group()], value) + '"'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(format_js_literal(v) for v in value) + ']'
+    if isinstance(value, Mapping):
+        return '{' + ', '.join(f"{format_js_key(k)}: {format_js_literal(v)}" for k, v in value.items()) + '}'
+    raise TypeError(f"Can't format {type(value).__name__} as a JavaScript literal")
+
+
+def format_js_key(key):
+    """Format an object key, quoting it unless it is a valid identifier."""
+    key = str(key)
+    if _IDENT_RE.fullmatch(key):
+        return key
+    return format_js_literal(key)
@@ -0,0 +1,56 @@
+"""
+Progress events reported while game data is loaded.
+
+GameDataManager.load_from_file() takes a progress callback that receives
+LoadProgress events and a cancel callback that is polled between steps.
+Both are plain callables so loading stays usable without Qt; the editor
+forwards the events from its loader thread through signals.
+"""
+
+
+class LoadStage:
+    """Stages of loading a bundle, in order."""
+
+    READ = 'read'           # Reading app.js, current/total in bytes
+    CACHE = 'cache'         # Restoring the extraction cache
+    INDEX = 'index'         # Indexing bundle modules, current is the module count
+    EXTRACT = 'extract'     # Extracting domains, current/total in domains
+    DONE = 'done'
+
+    # Share of the overall progress bar given to each stage
+    WEIGHTS = {
+        READ: (0, 30),
+        CACHE: (30, 100),
+        INDEX: (30, 45),
+        EXTRACT: (45, 100),
+        DONE: (100, 100),
+    }
+
+
+class LoadProgress:
+    """A single progress event."""
+
+    __slots__ = ('stage', 'current', 'total', 'message', 'domain')
+
+    def __init__(self, stage, current=0, total=0, message="", domain=None):
+        self.stage = stage
+        self.current = current
+        self.total = total
+        self.message = message
+        self.domain = domain        # Domain being extracted, e.g. 'monsters'
+
+    @property
+    def percent(self):
+        """Overall progress from 0 to 100."""
+        start, end = LoadStage.WEIGHTS.get(self.stage, (0, 100))
+        if self.total <= 0:
+            return start
+        fraction = min(1.0, max(0.0, self.current / self.total))
+        return int(start + (end - start) * fraction)
+
+    def __repr__(self):
+        return f"LoadProgress({self.stage}, {self.current}/{self.total}, {self.message!r})"
+
+
+class LoadCancelled(Exception):
+    """Raised inside load_from_file() when the cancel callback asks to stop."""
@@ -0,0 +1,286 @@
+"""
+Tile grids of the maps.
+
+The maps of the bundle are nested arrays of tile flags in the mapFlag
+modules, one inner array per row:
+
+    var s = [[0, 0, 1, ...], [0, 2, 2, ...], ...];
+    e.exports = s
+
+sometimes with a constant standing for a value (var s = 100, n = [[..., s,
+1, s, ...]]; e.exports = n). A grid is read straight into a 2-D uint16
+NumPy array: the rows are located with str.find(), the constants
+substituted, and the numbers converted by NumPy's text reader in one call,
+so no Python int or list is built per tile. The span of every row is kept,
+so a save only rewrites the rows that were painted.
+"""
+
+import re
+
+import numpy as np
+
+from core.js_literal_parser import JSParseError
+
+# Type of the tile values
+GRID_DTYPE = np.uint16
+
+# e.exports = s, or the array itself
+_EXPORTS_RE = re.compile(r'\be\.exports\s*=\s*(?:([A-Za-z_$][\w$]*)|(\[))')
+
+# Numeric constants declared before the grid: var s = 100, n = [...
+_CONSTANT_RE = re.compile(r'([A-Za-z_$][\w$]*)\s*=\s*(\d+)\s*[,;]')
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_$][\w$]*')
+
+# Anything a grid of numbers can't hold once the constants are substituted
+_INVALID_RE = re.compile(r'[^\d\s,]')
+
+_WHITESPACE = ' \t\r\n'
+
+
+class GridLiteral:
+    """A grid parsed from a module, with the spans of its source."""
+
+    __slots__ = ('grid', 'span', 'rows')
+
+    def __init__(self, grid, span, rows):
+        self.grid = grid            # 2-D GRID_DTYPE array, (height, width)
+        self.span = span            # (start, end) of the outer array literal
+        self.rows = rows            # (start, end) of each row literal
+
+
+def _skip(source, pos):
+    """Get the offset of the first non-whitespace character from pos."""
+    while pos < len(source) and source[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def find_grid_start(source):
+    """
+    Find the array literal a mapFlag module exports.
+
+    Returns:
+        int: Offset of its opening bracket, None if the module doesn't export one
+    """
+    match = _EXPORTS_RE.search(source)
+    if match is None:
+        return None
+    if match.group(2):
+        return match.start(2)
+    declaration = re.search(r'\b%s\s*=\s*\[' % re.escape(match.group(1)), source)
+    return declaration.end() - 1 if declaration is not None else None
+
+
+def parse_grid(source, start, constants=None):
+    """
+    Parse a nested array of numbers into a 2-D array.
+
+    Args:
+        source (str): Text holding the literal
+        start (int): Offset of its opening bracket
+        constants (dict): Identifier -> value of the names allowed in the rows
+
+    Returns:
+        GridLiteral: The grid with its spans
+
+    Raises:
+        JSParseError: The literal isn't a rectangular array of numbers
+    """
+    if constants is None:
+        constants = {}
+    if source[start:start + 1] != '[':
+        raise JSParseError("Expected '['", start)
+
+    # Locate the rows; their content is checked when converted
+    rows = []
+    pos = _skip(source, start + 1)
+    while source[pos:pos + 1] == '[':
+        end = source.find(']', pos)
+        if end == -1:
+            raise JSParseError("Unterminated row", pos)
+        rows.append((pos, end + 1))
+        pos = _skip(source, end + 1)
+        if source[pos:pos + 1] == ',':
+            pos = _skip(source, pos + 1)
+    if source[pos:pos + 1] != ']':
+        raise JSParseError("Expected a row or ']'", pos)
+    if not rows:
+        raise JSParseError("Empty grid", start)
+
+    widths = {source.count(',', row_start, row_end) + 1 for row_start, row_end in rows}
+    if len(widths) != 1:
+        raise JSParseError("Rows of different lengths", start)
+    width = widths.pop()
+
+    # Rows joined by commas: "0, 0, 1,0, 2, 2"
+    text = ','.join(source[row_start + 1:row_end - 1] for row_start, row_end in rows)
+    if _IDENTIFIER_RE.search(text):
+        try:
+            text = _IDENTIFIER_RE.sub(lambda match: str(constants[match.group()]), text)
+        except KeyError as e:
+            raise JSParseError(f"Unknown name in grid: {e.args[0]}", start) from None
+    if _INVALID_RE.search(text):
+        raise JSParseError("Grid holds something other than numbers", start)
+    try:
+        values = np.fromstring(text, dtype=np.int64, sep=',')
+    except ValueError:
+        raise JSParseError("Malformed grid row", start) from None
+    if values.size != len(rows) * width:
+        raise JSParseError("Malformed grid row", start)
+    if values.size and values.max() > np.iinfo(GRID_DTYPE).max:
+        raise JSParseError("Tile value out of range", start)
+
+    grid = values.astype(GRID_DTYPE).reshape(len(rows), width)
+    return GridLiteral(grid, (start, pos + 1), rows)
+
+
+def parse_module_grid(source):
+    """
+    Parse the grid a mapFlag module exports.
+
+    Args:
+        source (str): Body of the module
+
+    Returns:
+        GridLiteral: The grid, None if the module doesn't export one
+    """
+    start = find_grid_start(source)
+    if start is None:
+        return None
+    constants = {name: int(value) for name, value in _CONSTANT_RE.findall(source, 0, start)}
+    try:
+        return parse_grid(source, start, constants)
+    except JSParseError as e:
+        print(f"Error parsing map grid: {str(e)}")
+        return None
+
+
+def format_row(row):
+    """Format a grid row as a JavaScript array literal."""
+    return '[' + ', '.join(map(str, row.tolist())) + ']'
+
+
+class _AnyConstant(dict):
+    """Constants of a literal only parsed for its layout."""
+
+    def __missing__(self, key):
+        return 0
+
+
+def format_grid(grid, original=None):
+    """
+    Format a grid as a JavaScript array literal.
+
+    Args:
+        grid (numpy.ndarray): The grid
+        original (str): Literal the grid replaces, its layout is kept
+
+    Returns:
+        str: The literal
+    """
+    newline = '\r\n' if original is not None and '\r\n' in original else '\n'
+    opening, separator, closing = newline + '    ', ',' + newline + '    ', newline
+    if original is not None:
+        try:
+            literal = parse_grid(original, 0, _AnyConstant())
+        except JSParseError:
+            literal = None
+        if literal is not None:
+            rows = literal.rows
+            opening = original[1:rows[0][0]]
+            closing = original[rows[-1][1]:-1]
+            if len(rows) > 1:
+                separator = original[rows[0][1]:rows[1][0]]
+    return '[' + opening + separator.join(format_row(row) for row in grid) + closing + ']'
+
+
+def new_grid(width, height):
+    """Make an empty grid."""
+    return np.zeros((max(height, 0), max(width, 0)), dtype=GRID_DTYPE)
+
+
+def as_grid(value):
+    """
+    Convert tiles to a grid, e.g. the nested lists of a JSON file.
+
+    Raises:
+        ValueError: The value isn't a 2-D array of tile values
+    """
+    grid = np.asarray(value)
+    if grid.size == 0:
+        return np.zeros((0, 0), dtype=GRID_DTYPE)
+    if grid.ndim != 2 or not np.issubdtype(grid.dtype, np.integer):
+        raise ValueError("Tiles must be rows of integers of the same length")
+    if grid.min() < 0 or grid.max() > np.iinfo(GRID_DTYPE).max:
+        raise ValueError("Tile value out of range")
+    return grid.astype(GRID_DTYPE)
+
+
+def resize_grid(grid, width, height):
+    """Crop or pad a grid (with tile 0) to a new size."""
+    resized = new_grid(width, height)
+    rows = min(height, grid.shape[0])
+    columns = min(width, grid.shape[1])
+    resized[:rows, :columns] = grid[:rows, :columns]
+    return resized
+
+
+def run_cells(ys, xs, lengths):
+    """
+    Expand runs of cells along rows into the cells themselves.
+
+    Args:
+        ys (numpy.ndarray): Row of each run
+        xs (numpy.ndarray): Column of its first cell
+        lengths (numpy.ndarray): Cells in the run
+
+    Returns:
+        tuple: (ys, xs) arrays of the cells, run by run
+    """
+    lengths = np.asarray(lengths, dtype=np.intp)
+    total = int(lengths.sum())
+    # Position of each cell in its run: 0, 1, 2, 0, 1, 0...
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return (np.repeat(np.asarray(ys, dtype=np.intp), lengths),
+            np.repeat(np.asarray(xs, dtype=np.intp), lengths) + offsets)
+
+
+class CellPatch:
+    """
+    Cells of a grid with their tiles, e.g. the cells an edit changed.
+
+    The undo history stores a grid edit as two patches of the same cells,
+    one with the old tiles and one with the new ones; setting a patch on a
+    grid (see undo_history.set_path()) writes its tiles in one call.
+    """
+
+    __slots__ = ('ys', 'xs', 'values')
+
+    def __init__(self, ys, xs, values):
+        self.ys = ys                # Rows of the cells
+        self.xs = xs                # Their columns
+        self.values = values        # Their tiles
+
+    def __len__(self):
+        return len(self.ys)
+
+    def __deepcopy__(self, memo):
+        # Never changed once made, copies can share the arrays
+        return self
+
+    def apply(self, grid):
+        """Write the tiles into a grid."""
+        grid[self.ys, self.xs] = self.values
+
+    def to_dict(self):
+        """Convert to JSON for the edit log, see from_dict()."""
+        return {'$cells': [self.ys.tolist(), self.xs.tolist(), self.values.tolist()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Make a patch from to_dict() data, None if the data isn't one."""
+        if not isinstance(data, dict) or '$cells' not in data:
+            return None
+        ys, xs, values = data['$cells']
+        return cls(np.asarray(ys, dtype=np.intp), np.asarray(xs, dtype=np.intp), np.asarray(values, dtype=GRID_DTYPE))
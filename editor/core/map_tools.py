@@ -0,0 +1,174 @@
+"""
+Editing tools of the map editor, working on the NumPy tile grids.
+
+Every tool changes the grid in place and returns the cells whose tile
+changed as (ys, xs) arrays, so the caller reports the edit once (one undo
+step, see UndoHistory.transaction()) and sends one diff to the renderer,
+whatever the number of cells:
+
+- flood_fill() fills the 4-connected region of one tile. It works on runs
+  (the spans of the region's tile on each row, found for the whole grid
+  with NumPy) rather than cells: the region is the runs connected to the
+  clicked one, found by following the overlapping runs of the rows above
+  and below, then written in one assignment;
+- fill_rectangle() and draw_line() compute their cells with NumPy;
+- copy_stamp() and paste_stamp() copy a block of tiles and write it back
+  elsewhere, clipped to the grid.
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+from core.map_grid import run_cells
+
+_NO_CELLS = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+
+
+def _set_cells(grid, ys, xs, value):
+    """Write a tile into the cells not holding it yet, returns those cells."""
+    changed = grid[ys, xs] != value
+    ys, xs = ys[changed], xs[changed]
+    grid[ys, xs] = value
+    return ys, xs
+
+
+def flood_fill(grid, x, y, value):
+    """
+    Fill the region of (x, y)'s tile: the cells holding it connected to
+    (x, y) horizontally or vertically.
+
+    Args:
+        grid (numpy.ndarray): The map's tiles
+        x (int): Column clicked
+        y (int): Row clicked
+        value (int): Tile to fill with
+
+    Returns:
+        tuple: (ys, xs) arrays of the changed cells
+    """
+    height, width = grid.shape
+    if not (0 <= x < width and 0 <= y < height) or grid[y, x] == value:
+        return _NO_CELLS
+
+    # Runs of the clicked tile on every row, row by row: edges of the region
+    # mask are +1 where a run starts and -1 past its end
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = grid == grid[y, x]
+    edges = np.diff(padded, axis=1)
+    run_ys, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]
+    # Runs of row r are row_first[r]:row_first[r + 1]
+    row_first = np.searchsorted(run_ys, np.arange(height + 1)).tolist()
+    starts = run_starts.tolist()
+    ends = run_ends.tolist()
+    rows = run_ys.tolist()
+
+    seed = bisect_right(starts, x, row_first[y], row_first[y + 1]) - 1
+    filled = {seed}
+    pending = [seed]
+    while pending:
+        run = pending.pop()
+        row, start, end = rows[run], starts[run], ends[run]
+        for other_row in (row - 1, row + 1):
+            if not 0 <= other_row < height:
+                continue
+            # The runs of that row overlapping this one: ending after its
+            # start, starting before its end
+            last = row_first[other_row + 1]
+            other = bisect_right(ends, start, row_first[other_row], last)
+            while other < last and starts[other] < end:
+                if other not in filled:
+                    filled.add(other)
+                    pending.append(other)
+                other += 1
+
+    runs = np.fromiter(filled, dtype=np.intp, count=len(filled))
+    ys, xs = run_cells(run_ys[runs], run_starts[runs], run_ends[runs] - run_starts[runs])
+    grid[ys, xs] = value
+    return ys, xs
+
+
+def fill_rectangle(grid, x0, y0, x1, y1, value):
+    """
+    Fill the rectangle between two corners (included), clipped to the grid.
+
+    Returns:
+        tuple: (ys, xs) arrays of the changed cells
+    """
+    height, width = grid.shape
+    left, right = max(min(x0, x1), 0), min(max(x0, x1), width - 1)
+    top, bottom = max(min(y0, y1), 0), min(max(y0, y1), height - 1)
+    if left > right or top > bottom:
+        return _NO_CELLS
+    ys, xs = np.nonzero(grid[top:bottom + 1, left:right + 1] != value)
+    ys += top
+    xs += left
+    grid[ys, xs] = value
+    return ys, xs
+
+
+def line_cells(x0, y0, x1, y1):
+    """
+    Get the cells of the line between two cells, both included.
+
+    One cell per step along the longer axis, like Bresenham's algorithm, so
+    the line has no gaps and no doubled cells.
+
+    Returns:
+        tuple: (ys, xs) arrays
+    """
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    t = np.linspace(0.0, 1.0, steps + 1)
+    xs = np.rint(x0 + (x1 - x0) * t).astype(np.intp)
+    ys = np.rint(y0 + (y1 - y0) * t).astype(np.intp)
+    return ys, xs
+
+
+def draw_line(grid, x0, y0, x1, y1, value):
+    """
+    Draw a line of tiles between two cells, clipped to the grid.
+
+    Returns:
+        tuple: (ys, xs) arrays of the changed cells
+    """
+    height, width = grid.shape
+    ys, xs = line_cells(x0, y0, x1, y1)
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    return _set_cells(grid, ys[inside], xs[inside], value)
+
+
+def copy_stamp(grid, x0, y0, x1, y1):
+    """
+    Copy the tiles of the rectangle between two corners (included).
+
+    Returns:
+        numpy.ndarray: The tiles, None if the rectangle is outside the grid
+    """
+    height, width = grid.shape
+    left, right = max(min(x0, x1), 0), min(max(x0, x1), width - 1)
+    top, bottom = max(min(y0, y1), 0), min(max(y0, y1), height - 1)
+    if left > right or top > bottom:
+        return None
+    return grid[top:bottom + 1, left:right + 1].copy()
+
+
+def paste_stamp(grid, stamp, x, y):
+    """
+    Write copied tiles with their top-left corner at (x, y), clipped to the grid.
+
+    Returns:
+        tuple: (ys, xs) arrays of the changed cells
+    """
+    height, width = grid.shape
+    stamp_height, stamp_width = stamp.shape
+    # Part of the stamp inside the grid
+    left, top = max(0, -x), max(0, -y)
+    right, bottom = min(stamp_width, width - x), min(stamp_height, height - y)
+    if left >= right or top >= bottom:
+        return _NO_CELLS
+    source = stamp[top:bottom, left:right]
+    target = grid[y + top:y + bottom, x + left:x + right]
+    ys, xs = np.nonzero(target != source)
+    target[ys, xs] = source[ys, xs]
+    return ys + y + top, xs + x + left
@@ -0,0 +1,355 @@
+"""
+Browserify module index for the game bundle.
+
+app.js is a browserify bundle: a table of numbered modules, each stored as
+``id: [function(t, e, i) {...}, {"./name": id, ...}]``. The index splits the
+bundle into those modules in a single pass so data handlers can ask for the
+source of one module instead of scanning the whole file.
+"""
+
+import re
+import bisect
+import hashlib
+import posixpath
+
+# Header of a module entry inside the module table
+_MODULE_HEADER_RE = re.compile(r'(\d+)\s*:\s*\[\s*function\s*\([^)]*\)\s*\{')
+
+# Dependency map that follows the module function: , {"./x": 1, ...}]
+_MODULE_DEPS_RE = re.compile(r'\s*,\s*\{([^{}]*)\}\s*\]')
+
+# Separator between two module entries
+_MODULE_NEXT_RE = re.compile(r'\s*,\s*(?=\d+\s*:\s*\[)')
+
+# Entry point list at the end of the bundle: }, {}, [2])
+_ENTRIES_RE = re.compile(r'\s*\}\s*,\s*\{[^{}]*\}\s*,\s*\[([\d,\s]*)\]')
+
+# A single "name": id pair in a dependency map
+_DEP_PAIR_RE = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*(\d+)|\'((?:[^\'\\]|\\.)*)\'\s*:\s*(\d+)')
+
+# Everything the brace matcher has to look at: strings, template literals,
+# comments, braces and slashes (which may start a regular expression)
+_TOKEN_RE = re.compile(
+    r'"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r'|`(?:[^`\\]|\\.)*`'
+    r'|//[^\n]*'
+    r'|/\*.*?\*/'
+    r'|[{}/]',
+    re.DOTALL
+)
+
+# Regular expression literal, including character classes and flags
+_REGEX_LITERAL_RE = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-zA-Z]*')
+
+# Keywords after which a slash starts a regular expression, not a division
+_REGEX_KEYWORDS = frozenset([
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await'
+])
+
+
+class BundleModule:
+    """A single module of a browserify bundle."""
+
+    __slots__ = ('id', 'start', 'end', 'body_start', 'body_end', 'requires', 'path')
+
+    def __init__(self, module_id, start, end, body_start, body_end, requires):
+        self.id = module_id
+        self.start = start              # Offset of the module id
+        self.end = end                  # Offset just past the closing ']'
+        self.body_start = body_start    # Offset just past the function's '{'
+        self.body_end = body_end        # Offset of the function's closing '}'
+        self.requires = requires        # Require name -> module id
+        self.path = None                # Canonical path, e.g. ./game/variables/_enemy
+
+    def __repr__(self):
+        return f"BundleModule({self.id}, {self.path or '?'}, {self.start}-{self.end})"
+
+
+class ModuleIndex:
+    """Index of the modules contained in a browserify bundle."""
+
+    def __init__(self, js_content=""):
+        """Initialize the index, building it if content is given."""
+        self.js_content = ""
+        self.modules = {}
+        self.entries = []
+        self._paths = {}
+        self._starts = []
+        self._ordered = []
+        self._digests = None
+
+        if js_content:
+            self.build(js_content)
+
+    def __len__(self):
+        return len(self.modules)
+
+    def __contains__(self, module_id):
+        return module_id in self.modules
+
+    def __iter__(self):
+        return iter(self._ordered)
+
+    def build(self, js_content, progress=None):
+        """
+        Tokenize the bundle once and record every module.
+
+        Args:
+            js_content (str): The bundle source
+            progress (callable): Called with (modules indexed, offset) after each module
+
+        Returns:
+            bool: True if at least one module was found
+        """
+        self.js_content = js_content
+        self.modules = {}
+        self.entries = []
+        self._paths = {}
+        self._digests = None
+
+        header = self._find_table_start(js_content)
+        pos = header.start() if header else -1
+
+        while header:
+            body_start = header.end()
+            body_end = self._find_block_end(js_content, body_start)
+            if body_end < 0:
+                break
+
+            deps_match = _MODULE_DEPS_RE.match(js_content, body_end + 1)
+            if not deps_match:
+                break
+
+            requires = {}
+            for pair in _DEP_PAIR_RE.finditer(deps_match.group(1)):
+                if pair.group(1) is not None:
+                    requires[pair.group(1)] = int(pair.group(2))
+                else:
+                    requires[pair.group(3)] = int(pair.group(4))
+
+            module_id = int(header.group(1))
+            self.modules[module_id] = BundleModule(
+                module_id, pos, deps_match.end(), body_start, body_end, requires
+            )
+            if progress is not None:
+                progress(len(self.modules), deps_match.end())
+
+            # Move on to the next entry of the table
+            next_match = _MODULE_NEXT_RE.match(js_content, deps_match.end())
+            if not next_match:
+                entries_match = _ENTRIES_RE.match(js_content, deps_match.end())
+                if entries_match:
+                    self.entries = [int(v) for v in re.findall(r'\d+', entries_match.group(1))]
+                break
+            pos = next_match.end()
+            header = _MODULE_HEADER_RE.match(js_content, pos)
+
+        self._ordered = sorted(self.modules.values(), key=lambda m: m.start)
+        self._starts = [m.start for m in self._ordered]
+        self._resolve_paths()
+        return bool(self.modules)
+
+    def export_state(self):
+        """Get the index as plain values that can be cached alongside the bundle."""
+        return {
+            'entries': list(self.entries),
+            'paths': dict(self._paths),
+            'digests': self.module_digests(),
+            'modules': [
+                (m.id, m.start, m.end, m.body_start, m.body_end, m.requires, m.path)
+                for m in self._ordered
+            ],
+        }
+
+    def import_state(self, js_content, state):
+        """
+        Restore an index saved with export_state() without tokenizing the bundle.
+
+        Args:
+            js_content (str): The bundle source the state was built from
+            state (dict): Value returned by export_state()
+        """
+        self.js_content = js_content
+        self.modules = {}
+        self.entries = list(state['entries'])
+        self._paths = dict(state['paths'])
+        self._digests = dict(state['digests'])
+
+        for module_id, start, end, body_start, body_end, requires, path in state['modules']:
+            module = BundleModule(module_id, start, end, body_start, body_end, requires)
+            module.path = path
+            self.modules[module_id] = module
+
+        self._ordered = sorted(self.modules.values(), key=lambda m: m.start)
+        self._starts = [m.start for m in self._ordered]
+
+    def module_digests(self):
+        """
+        Hash the body of every module.
+
+        Modules are keyed by their canonical path so that digests can be
+        compared across rebuilds that renumber the bundle; modules without
+        a path fall back to their id.
+
+        Returns:
+            dict: Module key -> digest of the module body
+        """
+        if self._digests is None:
+            self._digests = {}
+            for module in self._ordered:
+                body = self.js_content[module.body_start:module.body_end]
+                digest = hashlib.blake2b(body.encode('utf-8'), digest_size=16).digest()
+                self._digests[self.module_key(module)] = digest
+        return dict(self._digests)
+
+    @staticmethod
+    def module_key(module):
+        """Get the key module_digests() uses for a module."""
+        return module.path if module.path is not None else module.id
+
+    def _find_table_start(self, js_content):
+        """Find the header of the first module in the module table."""
+        for match in _MODULE_HEADER_RE.finditer(js_content):
+            # The first entry directly follows the opening brace of the table
+            i = match.start() - 1
+            while i >= 0 and js_content[i].isspace():
+                i -= 1
+            if i >= 0 and js_content[i] == '{':
+                return match
+        return None
+
+    def _find_block_end(self, text, pos):
+        """Return the offset of the '}' closing the block that starts at pos."""
+        depth = 1
+        search = _TOKEN_RE.search
+        while True:
+            match = search(text, pos)
+            if not match:
+                return -1
+            token = match.group()
+            pos = match.end()
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth == 0:
+                    return match.start()
+            elif token == '/' and self._slash_starts_regex(text, match.start()):
+                regex_match = _REGEX_LITERAL_RE.match(text, match.start())
+                if regex_match:
+                    pos = regex_match.end()
+
+    @staticmethod
+    def _slash_starts_regex(text, pos):
+        """Decide whether the slash at pos starts a regex literal or is a division."""
+        i = pos - 1
+        while i >= 0 and text[i] in ' \t\r\n':
+            i -= 1
+        if i < 0:
+            return True
+
+        ch = text[i]
+        if ch in ')]}':
+            return False
+        if ch.isalnum() or ch in '_$':
+            j = i
+            while j >= 0 and (text[j].isalnum() or text[j] in '_$'):
+                j -= 1
+            return text[j + 1:i + 1] in _REGEX_KEYWORDS
+        return True
+
+    def _resolve_paths(self):
+        """Give every reachable module a canonical path, starting from the entry points."""
+        roots = [m for m in self.entries if m in self.modules] or self._guess_roots()
+        queue = [(module_id, '.') for module_id in roots]
+
+        while queue:
+            module_id, directory = queue.pop(0)
+            module = self.modules[module_id]
+            for name, dep_id in module.requires.items():
+                if dep_id not in self.modules:
+                    continue
+                if name.startswith('.'):
+                    path = posixpath.normpath(posixpath.join(directory, name))
+                    if not path.startswith('../'):
+                        path = './' + path
+                else:
+                    path = name
+                self._paths.setdefault(path, dep_id)
+
+                dep = self.modules[dep_id]
+                if dep.path is None:
+                    dep.path = path
+                    dep_dir = posixpath.dirname(path) if path.startswith('./') else './node_modules/' + path
+                    queue.append((dep_id, dep_dir))
+
+    def _guess_roots(self):
+        """Pick modules nobody requires as roots when the entry list is missing."""
+        required = set()
+        for module in self.modules.values():
+            required.update(module.requires.values())
+        return [m for m in sorted(self.modules) if m not in required]
+
+    def get_module(self, module_id):
+        """Get a module by its numeric id."""
+        return self.modules.get(module_id)
+
+    def find_module(self, path):
+        """
+        Find the module exported under a require path.
+
+        Args:
+            path (str): Require path such as './game/variables/_enemy'. A
+                trailing '.js' and the leading './' are optional, and the
+                path may be a suffix of the canonical one as long as it
+                is unambiguous ('./vue/game/...' matches './game/...').
+
+        Returns:
+            BundleModule: The module, or None if no module has that path
+        """
+        if path in self._paths:
+            return self.modules[self._paths[path]]
+
+        normalized = path[:-3] if path.endswith('.js') else path
+        if normalized.startswith('./'):
+            normalized = normalized[2:]
+        module_id = self._paths.get('./' + normalized)
+
+        if module_id is None:
+            # Fall back to a unique suffix match on the canonical paths
+            suffix = '/' + normalized
+            found = {m for p, m in self._paths.items()
+                     if p.endswith(suffix) or p.endswith(suffix + '.js')}
+            if len(found) != 1:
+                return None
+            module_id = found.pop()
+
+        self._paths[path] = module_id
+        return self.modules[module_id]
+
+    def get_source(self, module):
+        """
+        Get the body of a module's function.
+
+        Args:
+            module: A BundleModule, a module id or a require path
+
+        Returns:
+            str: The module source, or None if the module is unknown
+        """
+        if isinstance(module, int):
+            module = self.modules.get(module)
+        elif isinstance(module, str):
+            module = self.find_module(module)
+        if module is None:
+            return None
+        return self.js_content[module.body_start:module.body_end]
+
+    def module_at(self, offset):
+        """Get the module whose entry contains the given offset."""
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i >= 0 and offset < self._ordered[i].end:
+            return self._ordered[i]
+        return None
@@ -0,0 +1,122 @@
+"""
+Parallel extraction of game data domains.
+
+The extractors are independent of each other, so they can run in a process
+pool. The bundle is written once to a temporary file that every worker maps
+read-only, instead of pickling the whole text for each task, and the module
+index is sent as its (small) exported state so workers don't rebuild it.
+Each worker returns the handler's export_state(); the caller merges the
+results in a fixed order, so the outcome doesn't depend on which worker
+finishes first.
+"""
+
+import os
+import mmap
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.module_index import ModuleIndex
+from core.process_entry import process_context, as_main
+from core.game_data_characters import GameDataCharacters
+from core.game_data_items import GameDataItems
+from core.game_data_spells import GameDataSpells
+from core.game_data_maps import GameDataMaps
+from core.game_data_battles import GameDataBattles
+from core.game_data_monsters import GameDataMonsters
+from core.game_data_npcs import GameDataNPCs
+
+# Handler class for each domain, the domain name also names its extract_ method
+HANDLER_CLASSES = {
+    'characters': GameDataCharacters,
+    'items': GameDataItems,
+    'spells': GameDataSpells,
+    'maps': GameDataMaps,
+    'battles': GameDataBattles,
+    'monsters': GameDataMonsters,
+    'npcs': GameDataNPCs,
+}
+
+
+def _read_shared_bundle(bundle_path):
+    """Map the shared bundle file read-only and decode it."""
+    with open(bundle_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, 'utf-8')
+
+
+def _extract_domain(domain, bundle_path, js_path, index_state):
+    """
+    Run one extractor in a worker process.
+
+    Args:
+        domain (str): Domain to extract, a key of HANDLER_CLASSES
+        bundle_path (str): Temporary file holding the bundle as UTF-8
+        js_path (str): Original path of the bundle
+        index_state (dict): ModuleIndex.export_state() of the bundle
+
+    Returns:
+        dict: The handler's export_state()
+    """
+    js_content = _read_shared_bundle(bundle_path)
+
+    module_index = ModuleIndex()
+    module_index.import_state(js_content, index_state)
+
+    handler = HANDLER_CLASSES[domain]()
+    handler.load_js_content(js_content, js_path, module_index)
+    getattr(handler, f"extract_{domain}")()
+    return handler.export_state()
+
+
+def extract_parallel(js_content, js_path, module_index, domains, max_workers=None, on_done=None):
+    """
+    Extract several domains concurrently in a process pool.
+
+    Args:
+        js_content (str): The bundle source
+        js_path (str): Path of the bundle
+        module_index (ModuleIndex): Index built for js_content
+        domains (list): Domains to extract
+        max_workers (int): Pool size, defaults to one worker per domain up to the CPU count
+        on_done (callable): Called with each domain name as its worker finishes
+
+    Returns:
+        dict: Domain -> exported handler state, in the order of domains
+    """
+    if max_workers is None:
+        max_workers = max(1, min(len(domains), os.cpu_count() or 1))
+
+    index_state = module_index.export_state()
+
+    fd, bundle_path = tempfile.mkstemp(prefix="openff_bundle_", suffix=".js")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(js_content.encode('utf-8'))
+
+        # Not forked: the loader runs on a QThread. Workers are started by
+        # submit(), without re-running the caller's __main__
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=process_context()) as pool:
+            with as_main():
+                futures = {
+                    domain: pool.submit(_extract_domain, domain, bundle_path, js_path, index_state)
+                    for domain in domains
+                }
+            if on_done is not None:
+                domain_of = {future: domain for domain, future in futures.items()}
+                for future in as_completed(domain_of):
+                    try:
+                        on_done(domain_of[future])
+                    except BaseException:
+                        # Don't wait for the remaining workers (e.g. the load was cancelled)
+                        for pending in futures.values():
+                            pending.cancel()
+                        raise
+            # Collect in request order so the merge is deterministic
+            return {domain: futures[domain].result() for domain in domains}
+    finally:
+        try:
+            os.remove(bundle_path)
+        except OSError:
+            pass
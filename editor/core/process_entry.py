@@ -0,0 +1,49 @@
+"""
+Entry module of the editor's helper processes.
+
+Processes started with 'forkserver' or 'spawn' import the parent's
+__main__ module again before they run (as __mp_main__), so that functions
+defined there can be unpickled. A script driving the core without an
+``if __name__ == '__main__':`` guard would then run a second time in every
+helper: load the bundle again, and fail starting processes of its own
+while the helper is still bootstrapping.
+
+The helpers only run functions of the core modules, so they don't need
+the caller's __main__: processes started inside as_main() import this
+module in its place, which does nothing. It is also what the fork server
+preloads, instead of __main__.
+"""
+
+import sys
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+# One swap of __main__ at a time
+_lock = threading.Lock()
+
+
+def process_context():
+    """
+    Get the multiprocessing context the editor starts its processes with.
+
+    fork isn't used, the editor forks from a process running Qt threads;
+    processes have to be started inside as_main().
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+@contextmanager
+def as_main():
+    """Start processes with this module as the __main__ they import, see the module docstring."""
+    with _lock:
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main
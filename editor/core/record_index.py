@@ -0,0 +1,350 @@
+"""
+Hash indexes over extracted game data records.
+
+Lookups such as get_item_by_name() used to scan the whole record list on
+every call. Each handler now keeps a RecordIndex: for every index key
+(e.g. 'name', 'type' or 'job') a dict maps the key's values to the records
+having them, so a lookup is a dict access and a filtered view only touches
+its own records.
+
+The handler's record list is wrapped in a RecordList, a list that tells the
+index (and a listener, the change journal) about records added or removed
+through it. Edits inside a record
+(renames, a new type...) aren't visible to the list, so editors report them
+with GameData.reindex_record(), and lookups double-check what they return.
+
+The index is updated record by record: adding or removing a record only
+touches the buckets of its own values. The list also maps each record to
+its position for index_of(); the map follows appends and removals at the
+end, other changes drop it and it is rebuilt on the next lookup, once, in
+the same O(n) as the list's own shifting of the records after them.
+"""
+
+
+def _get_path(record, path):
+    """Follow a key path into a record, None if it is missing."""
+    value = record
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+def field_key(*path):
+    """
+    Index key function for a field of the records.
+
+    Args:
+        *path: Key path of the field, e.g. ('sprite', 'sheet')
+
+    Returns:
+        function: record -> tuple of the indexed values (empty if missing)
+    """
+    def key(record):
+        value = _get_path(record, path)
+        return () if value is None else (value,)
+    return key
+
+
+def each_key(*path):
+    """
+    Index key function for a list field, indexing the record under every element.
+
+    Args:
+        *path: Key path of the list, e.g. ('job_restrictions',)
+
+    Returns:
+        function: record -> tuple of the indexed values
+    """
+    def key(record):
+        value = _get_path(record, path)
+        return tuple(value) if isinstance(value, (list, tuple)) else ()
+    return key
+
+
+class RecordIndex:
+    """Dict indexes of a list of records, by any number of keys."""
+
+    def __init__(self, keys):
+        """
+        Initialize an empty index.
+
+        Args:
+            keys (dict): Key name -> function returning a record's values for the key
+        """
+        self.keys = keys
+        self._buckets = {name: {} for name in keys}     # key -> value -> {id(record): record}
+        self._values = {}                               # id(record) -> {key: indexed values}
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, record):
+        return id(record) in self._values
+
+    def rebuild(self, records):
+        """Index records from scratch, in list order."""
+        self._buckets = {name: {} for name in self.keys}
+        self._values = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record, position_of=None):
+        """
+        Add a record, after the records already having the same values.
+
+        Args:
+            record (dict): The record
+            position_of (callable): record -> position in the list, to put a
+                record inserted before others in list order within its buckets
+        """
+        record_id = id(record)
+        if record_id in self._values:
+            return
+        values = {}
+        for name, key in self.keys.items():
+            indexed = values[name] = self._hashable(key(record))
+            buckets = self._buckets[name]
+            for value in indexed:
+                bucket = buckets.get(value)
+                if bucket is None:
+                    bucket = buckets[value] = {}
+                bucket[record_id] = record
+                if position_of is not None and len(bucket) > 1:
+                    buckets[value] = dict(sorted(bucket.items(), key=lambda item: position_of(item[1])))
+        self._values[record_id] = values
+
+    def discard(self, record):
+        """Remove a record, if it is indexed."""
+        values = self._values.pop(id(record), None)
+        if values is None:
+            return
+        for name, indexed in values.items():
+            buckets = self._buckets[name]
+            for value in indexed:
+                bucket = buckets.get(value)
+                if bucket is not None:
+                    bucket.pop(id(record), None)
+                    if not bucket:
+                        del buckets[value]
+
+    def update(self, record):
+        """
+        Re-read the values of an indexed record after it was edited.
+
+        Returns:
+            bool: True if the record is indexed
+        """
+        values = self._values.get(id(record))
+        if values is None:
+            return False
+        if any(self._hashable(key(record)) != values[name] for name, key in self.keys.items()):
+            # Re-adding moves the record to the end of its new buckets
+            self.discard(record)
+            self.add(record)
+        return True
+
+    def first(self, name, value):
+        """Get the first indexed record whose key name has value, or None."""
+        try:
+            bucket = self._buckets[name].get(value)
+        except TypeError:
+            return None     # Unhashable value, nothing indexed under it
+        return next(iter(bucket.values())) if bucket else None
+
+    def select(self, name, value):
+        """Get the indexed records whose key name has value."""
+        try:
+            bucket = self._buckets[name].get(value)
+        except TypeError:
+            return []
+        return list(bucket.values()) if bucket else []
+
+    def values(self, name):
+        """Get the distinct values of a key, with their number of records."""
+        return {value: len(bucket) for value, bucket in self._buckets[name].items()}
+
+    def _hashable(self, values):
+        """Drop the values that can't be dict keys."""
+        try:
+            hash(values)
+            return values
+        except TypeError:
+            return tuple(value for value in values if getattr(type(value), '__hash__', None) is not None)
+
+
+class RecordList(list):
+    """List of records keeping a RecordIndex up to date."""
+
+    def __init__(self, records=(), index=None, listener=None):
+        """
+        Initialize the list.
+        
+        Args:
+            records: Initial records
+            index (RecordIndex): Index to keep up to date
+            listener: Called with ('added' or 'removed', record, position) when
+                records are added or removed, ('reset', None, None) when the list
+                is rewritten
+        """
+        super().__init__(records)
+        self.index = index
+        self.listener = listener
+        self._positions = None      # id(record) -> first position, None until needed again
+        self._counts = {}           # id(record) -> number of times the record is in the list
+        self._count_all()
+        if index is not None:
+            index.rebuild(self)
+
+    def __reduce_ex__(self, protocol):
+        # Pickles (cache, pool workers) as a plain list, the index is rebuilt on use
+        return (list, (list(self),))
+
+    def _count_all(self):
+        self._positions = None
+        self._counts = {}
+        for record in self:
+            self._counts[id(record)] = self._counts.get(id(record), 0) + 1
+
+    def _reindex(self, action='reset'):
+        self._count_all()
+        if self.index is not None:
+            self.index.rebuild(self)
+        if action and self.listener is not None:
+            self.listener(action, None, None)
+
+    def _notify(self, action, record, position):
+        if self.listener is not None:
+            self.listener(action, record, position)
+
+    def _added(self, record, position):
+        """Count and index a record put at position, and tell the listener."""
+        at_end = position == len(self) - 1
+        count = self._counts[id(record)] = self._counts.get(id(record), 0) + 1
+        if self._positions is not None:
+            if at_end:
+                self._positions.setdefault(id(record), position)
+            else:
+                self._positions = None
+        if self.index is not None:
+            if count > 1 and not at_end:
+                # Another copy of the record, maybe after it: its buckets move
+                self.index.rebuild(self)
+            else:
+                self.index.add(record, None if at_end else self.index_of)
+        self._notify('added', record, position)
+
+    def append(self, record):
+        super().append(record)
+        self._added(record, len(self) - 1)
+
+    def extend(self, records):
+        records = list(records)
+        start = len(self)
+        super().extend(records)
+        for offset, record in enumerate(records):
+            self._counts[id(record)] = self._counts.get(id(record), 0) + 1
+            if self._positions is not None:
+                self._positions.setdefault(id(record), start + offset)
+            if self.index is not None:
+                self.index.add(record)
+            self._notify('added', record, start + offset)
+
+    def __iadd__(self, records):
+        self.extend(records)
+        return self
+
+    def remove(self, record):
+        # list.remove() compares dicts by value, prefer the record itself
+        position = self.index_of(record)
+        if position is not None:
+            self.pop(position)
+            return
+        super().remove(record)
+        self._reindex()
+
+    def pop(self, position=-1):
+        if position < 0:
+            position += len(self)
+        record = super().pop(position)
+        if self._positions is not None:
+            if position < len(self):
+                # The records after it moved
+                self._positions = None
+            elif self._positions.get(id(record)) == position:
+                del self._positions[id(record)]
+        self._forget(record, position)
+        return record
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def insert(self, position, record):
+        super().insert(position, record)
+        # Where list.insert() put it
+        if position < 0:
+            position = max(position + len(self) - 1, 0)
+        self._added(record, min(position, len(self) - 1))
+
+    def __setitem__(self, position, value):
+        if isinstance(position, slice):
+            super().__setitem__(position, value)
+            self._reindex()
+            return
+        old = self[position]
+        super().__setitem__(position, value)
+        self._positions = None
+        self._counts[id(old)] -= 1
+        if not self._counts[id(old)]:
+            del self._counts[id(old)]
+        count = self._counts[id(value)] = self._counts.get(id(value), 0) + 1
+        if self.index is not None:
+            if id(old) in self._counts or count > 1:
+                self.index.rebuild(self)
+            else:
+                self.index.discard(old)
+                self.index.add(value, self.index_of)
+        self._notify('reset', None, None)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            super().__delitem__(position)
+            self._reindex()
+            return
+        self.pop(position)
+
+    def sort(self, *args, **kwargs):
+        # Only the order changes, nothing to journal
+        super().sort(*args, **kwargs)
+        self._reindex(None)
+
+    def reverse(self):
+        super().reverse()
+        self._reindex(None)
+
+    def index_of(self, record):
+        """Get the position of the record itself (list.index() compares by value), None if absent."""
+        if id(record) not in self._counts:
+            return None
+        if self._positions is None:
+            positions = {}
+            for position, other in enumerate(self):
+                positions.setdefault(id(other), position)
+            self._positions = positions
+        return self._positions.get(id(record))
+
+    def _forget(self, record, position):
+        """Uncount and unindex a record taken out of the list, unless another copy remains."""
+        self._counts[id(record)] -= 1
+        if self._counts[id(record)]:
+            if self.index is not None:
+                # The remaining copies decide its place in the buckets
+                self.index.rebuild(self)
+            return
+        del self._counts[id(record)]
+        if self.index is not None:
+            self.index.discard(record)
+        self._notify('removed', record, position)
@@ -0,0 +1,173 @@
+"""
+Compact record types for the extracted game data.
+
+Items, monsters and spells used to be plain dicts: every record carried its
+own hash table of key strings, and items nested a second dict for their
+stat bonuses. The record classes here keep the known fields in __slots__
+instead (one pointer per field, no per-record table) and behave like a dict
+for the editor tabs: record['name'], record.get('price', 0), 'id' in record,
+iteration, len(), update(), equality with plain dicts and pickling all work.
+
+Fields that aren't declared (editors may add their own, such as a monster's
+'behavior') go to a small overflow dict created on first use. Iteration
+yields the declared fields first, in FIELDS order, then the others in
+insertion order. Hot code can also read declared fields as attributes
+(record.name), which skips the mapping protocol.
+"""
+
+from collections.abc import MutableMapping
+
+# Value of a declared field the record doesn't have
+_UNSET = object()
+
+
+class Record(MutableMapping):
+    """Dict-compatible record storing its declared fields in slots."""
+
+    __slots__ = ('_extra',)
+
+    # Field names stored in slots, set by subclasses
+    FIELDS = ()
+    _slots = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Slot descriptors by field name, read without a getattr() per access
+        cls._slots = {name: cls.__dict__[name] for name in cls.FIELDS}
+
+    def __init__(self, data=(), **fields):
+        """
+        Initialize a record.
+
+        Args:
+            data: Mapping or (key, value) pairs to copy, like dict()
+            **fields: More fields
+        """
+        # Unset fields hold a marker rather than being empty, so a missing
+        # key is a comparison instead of a caught AttributeError
+        for slot in self._slots.values():
+            slot.__set__(self, _UNSET)
+        self._extra = None
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    def __getitem__(self, key):
+        slot = self._slots.get(key)
+        if slot is not None:
+            value = slot.__get__(self)
+            if value is not _UNSET:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        slot = self._slots.get(key)
+        if slot is not None:
+            value = slot.__get__(self)
+            return default if value is _UNSET else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        slot = self._slots.get(key)
+        if slot is not None:
+            slot.__set__(self, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        slot = self._slots.get(key)
+        if slot is not None and slot.__get__(self) is not _UNSET:
+            slot.__set__(self, _UNSET)
+        elif slot is None and self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot.__get__(self) is not _UNSET
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for name, slot in self._slots.items():
+            if slot.__get__(self) is not _UNSET:
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        """Get a shallow copy, like dict.copy()."""
+        return type(self)(self)
+
+    def to_dict(self):
+        """Get the record as a plain dict, nested records included (e.g. for json)."""
+        return {key: value.to_dict() if isinstance(value, Record) else value
+                for key, value in self.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def __reduce__(self):
+        # Pickled as its items, so the cache doesn't depend on the slot layout
+        return (type(self), (list(self.items()),))
+
+
+class StatBonuses(Record):
+    """Stat bonuses of an item."""
+
+    FIELDS = ('pw', 'sp', 'it', 'st', 'lk', 'ma')
+    __slots__ = FIELDS
+
+
+class ItemRecord(Record):
+    """An item, weapon, armor or magic entry of the items tab."""
+
+    FIELDS = ('name', 'id', 'type', 'category', 'power', 'price', 'quantity', 'rarity',
+              'description', 'magic_level', 'effect', 'job_restrictions', 'stat_bonuses')
+    __slots__ = FIELDS
+
+    def __init__(self, data=(), **fields):
+        super().__init__(data, **fields)
+        # The stat bonuses are a small fixed set of fields too
+        bonuses = self.get('stat_bonuses')
+        if type(bonuses) is dict:
+            self['stat_bonuses'] = StatBonuses(bonuses)
+
+
+class MonsterRecord(Record):
+    """A monster of the _enemy module."""
+
+    FIELDS = ('id', 'name', 'type', 'size', 'exp', 'gold', 'hp', 'attack', 'power', 'defense',
+              'magic_defense', 'dexterity', 'speed', 'intelligence', 'evasion', 'actions',
+              'status_effects', 'drops', 'weaknesses', 'sprite')
+    __slots__ = FIELDS
+
+
+class SpellRecord(Record):
+    """A spell of the magic table."""
+
+    FIELDS = ('name', 'level', 'mp_cost', 'type', 'power', 'target', 'effect_type',
+              'flash_color', 'description', 'image_files')
+    __slots__ = FIELDS
+
+
+def to_json(value):
+    """json.dumps() default for the record classes and tile grids; sets are written sorted."""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Can't convert a {type(value).__name__} to JSON")
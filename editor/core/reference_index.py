@@ -0,0 +1,225 @@
+"""
+Cross-reference index of the game data.
+
+Answers "where is this record used?" without rescanning app.js: encounter
+patterns naming a monster ID ("ms_15"), shops listing an item table entry
+(e.wep[0]), monster drops and battle formations pointing at other records.
+
+Two kinds of references are indexed:
+
+- module references, found by scanning the bundle modules once. The hits of
+  a module are kept with the digest of its body (see
+  ModuleIndex.module_digests()) and offsets relative to the body, so after a
+  reload or a save only the modules whose source changed are scanned again;
+- record references, read from the records of the handlers that point at
+  other records (GameData.record_references()). They are rebuilt for one
+  domain at a time, when its data revision changed since the last query.
+
+References point at targets, small tuples naming what is referenced, e.g.
+('monster', 'ms_15') or ('item', 'wep', 0). A handler tells which targets
+name one of its records with GameData.reference_targets().
+"""
+
+import re
+
+# Monster IDs in string literals, e.g. encounter patterns: id: "ms_15"
+_MONSTER_ID_RE = re.compile(r'["\'](ms_[0-9A-Za-z]+)["\']')
+
+# What precedes the path of a required module bound to a variable:
+# var e = t("../../variables/_items")
+_REQUIRE_BINDING_RE = re.compile(r'([A-Za-z_$][\w$]*)\s*=\s*[A-Za-z_$][\w$]*\(\s*$')
+
+# Tables of the items module, referenced as e.wep[0]
+ITEM_TABLES = ('item', 'wep', 'arm', 'mgc')
+
+
+class Reference:
+    """One use of a record, in a bundle module or in another record."""
+
+    __slots__ = ('target', 'kind', 'module', 'start', 'end', 'domain', 'record')
+
+    def __init__(self, target, kind, module=None, start=None, end=None, domain=None, record=None):
+        self.target = target        # What is referenced, e.g. ('monster', 'ms_15')
+        self.kind = kind            # 'encounter', 'shop', 'drop'...
+        self.module = module        # BundleModule holding the reference, None for records
+        self.start = start          # Offsets in js_content, None for records
+        self.end = end
+        self.domain = domain        # Domain of the referencing record, None for modules
+        self.record = record
+
+    def __repr__(self):
+        where = f"module {self.module.id}" if self.module is not None else self.domain
+        return f"Reference({self.target}, {self.kind}, {where})"
+
+
+def scan_module(source, module, table_modules):
+    """
+    Find the references in the body of one module.
+
+    Args:
+        source (str): Body of the module
+        module (BundleModule): The module, for its require map
+        table_modules (set): IDs of the modules holding the item tables
+
+    Returns:
+        list: (target, kind, start, end) with offsets relative to the body
+    """
+    hits = []
+    if 'ms_' in source:
+        for match in _MONSTER_ID_RE.finditer(source):
+            hits.append((('monster', match.group(1)), 'encounter', match.start(1), match.end(1)))
+
+    # Item tables are reached through the variable the items module is bound to
+    names = set()
+    for path, module_id in module.requires.items():
+        if module_id not in table_modules:
+            continue
+        position = source.find(f'"{path}"')
+        while position != -1:
+            match = _REQUIRE_BINDING_RE.search(source, max(0, position - 64), position)
+            if match:
+                names.add(match.group(1))
+            position = source.find(f'"{path}"', position + 1)
+    if names:
+        kind = 'shop' if '/shop/' in (module.path or '') else 'item table'
+        pattern = re.compile(r'\b(?:%s)\.(%s)\[(\d+)\]' % ('|'.join(re.escape(name) for name in names),
+                                                          '|'.join(ITEM_TABLES)))
+        for match in pattern.finditer(source):
+            hits.append((('item', match.group(1), int(match.group(2))), kind, match.start(), match.end()))
+    return hits
+
+
+class ReferenceIndex:
+    """References to the game data records, by target."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.module_index = None
+        self._modules = {}          # Module key -> (digest, hits of scan_module())
+        self._module_targets = {}   # Target -> [(module key, start, end, kind)]
+        self._records = {}          # Domain -> (revision, {target: [(kind, record)]})
+
+    def refresh_modules(self, module_index, table_module_paths=()):
+        """
+        Bring the module references up to date with a (re)built module index.
+
+        Args:
+            module_index (ModuleIndex): Index of the loaded bundle
+            table_module_paths (tuple): Require paths of the modules holding
+                the item tables
+
+        Returns:
+            int: Number of modules scanned, 0 if nothing changed
+        """
+        digests = module_index.module_digests()
+        if module_index is self.module_index and len(digests) == len(self._modules) \
+                and all(self._modules.get(key, (None,))[0] == digest for key, digest in digests.items()):
+            return 0
+
+        table_modules = set()
+        for path in table_module_paths:
+            module = module_index.find_module(path)
+            if module is not None:
+                table_modules.add(module.id)
+
+        scanned = 0
+        modules = {}
+        for module in module_index:
+            key = module_index.module_key(module)
+            digest = digests.get(key)
+            previous = self._modules.get(key)
+            if previous is not None and previous[0] == digest:
+                modules[key] = previous
+                continue
+            source = module_index.js_content[module.body_start:module.body_end]
+            modules[key] = (digest, scan_module(source, module, table_modules))
+            scanned += 1
+        self._modules = modules
+        self.module_index = module_index
+
+        self._module_targets = {}
+        for key, (_, hits) in modules.items():
+            for target, kind, start, end in hits:
+                self._module_targets.setdefault(target, []).append((key, start, end, kind))
+        return scanned
+
+    def refresh_records(self, domain, handler, records, revision):
+        """
+        Re-read the references held by a domain's records if its data changed.
+
+        Args:
+            domain (str): Kind of data
+            handler (GameData): Its handler, see GameData.record_references()
+            records (list): Its records
+            revision: Data revision of the domain, see GameDataManager.data_revision()
+        """
+        cached = self._records.get(domain)
+        if cached is not None and cached[0] == revision:
+            return
+        targets = {}
+        for record in records:
+            for target, kind in handler.record_references(record):
+                targets.setdefault(target, []).append((kind, record))
+        self._records[domain] = (revision, targets)
+
+    def references(self, targets, exclude=None):
+        """
+        Get the references to any of the targets.
+
+        Args:
+            targets: Targets naming a record, see GameData.reference_targets()
+            exclude (dict): A record whose own references are left out
+
+        Returns:
+            list: Reference objects, module references in bundle order first
+        """
+        found = []
+        seen = set()
+        modules = []
+        for target in targets:
+            for key, start, end, kind in self._module_targets.get(target, ()):
+                if (key, start) in seen:
+                    continue
+                seen.add((key, start))
+                module = self._find_module(key)
+                if module is not None:
+                    modules.append(Reference(target, kind, module, module.body_start + start,
+                                             module.body_start + end))
+        modules.sort(key=lambda reference: reference.start)
+        found += modules
+
+        for domain, (_, domain_targets) in self._records.items():
+            for target in targets:
+                for kind, record in domain_targets.get(target, ()):
+                    if record is exclude or (domain, id(record)) in seen:
+                        continue
+                    seen.add((domain, id(record)))
+                    found.append(Reference(target, kind, domain=domain, record=record))
+        return found
+
+    def describe(self, reference):
+        """Get a one-line description of a reference, for the editor tabs."""
+        if reference.module is None:
+            record = reference.record
+            name = record.get('name') or record.get('id') or '?'
+            return f"{reference.domain}: {name} ({reference.kind})"
+
+        js_content = self.module_index.js_content
+        line = js_content.count('\n', 0, reference.start) + 1
+        line_start = js_content.rfind('\n', 0, reference.start) + 1
+        line_end = js_content.find('\n', reference.start)
+        text = js_content[line_start:line_end if line_end != -1 else len(js_content)].strip()
+        module = reference.module
+        return f"{module.path or 'module ' + str(module.id)} line {line}: {text[:80]} ({reference.kind})"
+
+    def clear(self):
+        """Forget every reference, e.g. when another bundle is loaded."""
+        self.module_index = None
+        self._modules = {}
+        self._module_targets = {}
+        self._records = {}
+
+    def _find_module(self, key):
+        if isinstance(key, int):
+            return self.module_index.get_module(key)
+        return self.module_index.find_module(key)
@@ -0,0 +1,271 @@
+"""
+Global search over the records of every domain.
+
+An inverted index maps the character bigrams (and single characters, for
+one-letter queries) of the record texts — names, IDs, descriptions,
+dialogue and every other string field — to the records holding them. A
+query is split the same way; the records sharing enough of its n-grams are
+candidates, ranked by the share of the query they contain, the weight of
+the field (a name counts more than a description) and whether the field
+contains the query as is, starts with it or equals it. Misspelled or
+partial queries still find the record, and nothing scans the records.
+
+Text is normalized before being split, so the Japanese and Arabic names of
+the bundle match however they are typed:
+
+- NFKC folds full-width and half-width forms ("ｺﾞﾌﾞﾘﾝ" is "ゴブリン");
+- case is folded, and combining marks (Arabic harakat, Latin accents once
+  decomposed) are dropped;
+- katakana are folded to hiragana ("ごぶりん" finds "ゴブリン");
+- Arabic letter variants are unified (أ إ آ to ا, ة to ه, ى to ي).
+
+The index follows the edits: records reported through record_changed()
+are re-indexed one by one, and added or removed records are picked up by
+comparing the indexed records with the domain's list when its data
+revision changed (see GameDataManager.search()).
+"""
+
+import heapq
+import unicodedata
+from functools import lru_cache
+
+# Weight of a field by its name, other string fields weigh DEFAULT_WEIGHT
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'id': 2.5,
+    'idx': 2.5,
+    'title': 2.0,
+    'description': 1.0,
+    'dialogue': 1.0,
+    'message': 1.0,
+    'text': 1.0,
+}
+DEFAULT_WEIGHT = 0.5
+
+# Share of the query's n-grams a record must contain to be a result
+MIN_MATCH = 0.5
+
+# Candidates ranked field by field, the ones sharing the most n-grams
+MAX_CANDIDATES = 500
+
+# Longest text indexed per field, longer ones are cut
+MAX_FIELD_LENGTH = 512
+
+_ARABIC_FOLD = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ة': 'ه', 'ى': 'ي'})
+
+_START = '\x02'
+_END = '\x03'
+
+
+@lru_cache(maxsize=16384)
+def _normalize(text):
+    """Normalize text for indexing and searching, see the module docstring."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    chars = []
+    for char in unicodedata.normalize('NFD', text):
+        if unicodedata.category(char) == 'Mn' and not 0x3099 <= ord(char) <= 0x309A:
+            # Combining mark, but keep the kana voicing marks
+            continue
+        code = ord(char)
+        if 0x30A1 <= code <= 0x30F6:
+            # Katakana to hiragana
+            char = chr(code - 0x60)
+        chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars)).translate(_ARABIC_FOLD).strip()
+
+
+def normalize(text):
+    """Normalize text for indexing and searching, see the module docstring."""
+    # Many records share their descriptions and categories
+    return _normalize(str(text))
+
+
+def ngrams(text, unigrams=True):
+    """
+    Split normalized text into the n-grams of the index.
+
+    The bigrams of the padded text (so the first and last characters count
+    twice, which favors prefix matches), plus the characters themselves,
+    which only one-character queries look up.
+    """
+    padded = _START + text + _END
+    grams = {padded[i:i + 2] for i in range(len(padded) - 1)}
+    if unigrams:
+        grams.update(text)
+    return grams
+
+
+def record_fields(record):
+    """
+    Get the searchable texts of a record.
+
+    Yields:
+        tuple: (field name, weight, normalized text)
+    """
+    for key, value in record.items():
+        if isinstance(value, str):
+            if value:
+                yield key, FIELD_WEIGHTS.get(key, DEFAULT_WEIGHT), normalize(value[:MAX_FIELD_LENGTH])
+        elif isinstance(value, int) and not isinstance(value, bool):
+            if key in ('id', 'idx'):
+                yield key, FIELD_WEIGHTS[key], str(value)
+        elif hasattr(value, 'items'):
+            yield from record_fields(value)
+        elif isinstance(value, (list, tuple)):
+            for element in value:
+                if isinstance(element, str) and element:
+                    yield key, DEFAULT_WEIGHT, normalize(element[:MAX_FIELD_LENGTH])
+                elif hasattr(element, 'items'):
+                    yield from record_fields(element)
+
+
+class SearchResult:
+    """A record matching a query."""
+
+    __slots__ = ('domain', 'record', 'score', 'field')
+
+    def __init__(self, domain, record, score, field):
+        self.domain = domain
+        self.record = record
+        self.score = score
+        self.field = field          # Field that matched best
+
+    def __repr__(self):
+        return f"SearchResult({self.domain}, {self.record.get('name')!r}, {self.score:.2f}, {self.field})"
+
+
+class SearchIndex:
+    """Inverted n-gram index over the records of several domains."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._postings = {}         # n-gram -> set of doc ids
+        self._docs = {}             # doc id -> (domain, record, fields, grams)
+        self._doc_ids = {}          # (domain, id(record)) -> doc id
+        self._revisions = {}        # domain -> data revision indexed
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, domain, record):
+        """Index a record, replacing its previous entry."""
+        self.remove(domain, record)
+        fields = list(record_fields(record))
+        grams = set()
+        for _, _, text in fields:
+            grams |= ngrams(text)
+        doc_id = self._next_id
+        self._next_id += 1
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc_id)
+        self._docs[doc_id] = (domain, record, fields, grams)
+        self._doc_ids[(domain, id(record))] = doc_id
+
+    def remove(self, domain, record):
+        """Drop a record from the index, if it is indexed."""
+        doc_id = self._doc_ids.pop((domain, id(record)), None)
+        if doc_id is None:
+            return
+        _, _, _, grams = self._docs.pop(doc_id)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def sync(self, domain, records, revision, full=False):
+        """
+        Bring a domain up to date with its record list if its revision changed.
+
+        Records added or removed since the last sync are indexed or dropped;
+        edited ones are expected to have been re-indexed with add() already.
+
+        Args:
+            domain (str): Kind of data
+            records (list): Its records
+            revision: Data revision of the domain, see GameDataManager.data_revision()
+            full (bool): Re-index every record (e.g. after a reload)
+        """
+        if not full and self._revisions.get(domain) == revision:
+            return
+        current = {id(record): record for record in records}
+        indexed = [self._docs[doc_id][1] for (d, _), doc_id in list(self._doc_ids.items()) if d == domain]
+        for record in indexed:
+            if full or id(record) not in current or current[id(record)] is not record:
+                self.remove(domain, record)
+        for record_id, record in current.items():
+            if (domain, record_id) not in self._doc_ids:
+                self.add(domain, record)
+        self._revisions[domain] = revision
+
+    def is_synced(self, domain, revision):
+        """Check if a domain was synced at a revision."""
+        return self._revisions.get(domain) == revision
+
+    def search(self, query, limit=50, domains=None):
+        """
+        Find the records matching a query, best first.
+
+        Args:
+            query (str): Text typed by the user
+            limit (int): Most results returned
+            domains (set): Only search these domains, all by default
+
+        Returns:
+            list: SearchResult objects
+        """
+        text = normalize(query)
+        if not text:
+            return []
+        grams = ngrams(text, unigrams=len(text) == 1)
+
+        # Count the query's n-grams each record holds
+        counts = {}
+        for gram in grams:
+            for doc_id in self._postings.get(gram, ()):
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        threshold = MIN_MATCH * len(grams)
+        candidates = [(count, doc_id) for doc_id, count in counts.items() if count >= threshold]
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = heapq.nlargest(MAX_CANDIDATES, candidates)
+
+        results = []
+        for _, doc_id in candidates:
+            domain, record, fields, _ = self._docs[doc_id]
+            if domains is not None and domain not in domains:
+                continue
+            result = self._rank(domain, record, fields, text, grams)
+            if result.field is not None:
+                results.append(result)
+        results.sort(key=lambda result: -result.score)
+        return results[:limit]
+
+    def clear(self):
+        """Forget every record."""
+        self.__init__()
+
+    @staticmethod
+    def _rank(domain, record, fields, text, grams):
+        """Score a candidate by its best matching field."""
+        best_score = 0.0
+        best_field = None
+        for field, weight, field_text in fields:
+            if field_text == text:
+                bonus = 3.0
+            elif field_text.startswith(text):
+                bonus = 2.0
+            elif text in field_text:
+                bonus = 1.5
+            else:
+                shared = len(grams & ngrams(field_text, unigrams=len(text) == 1))
+                if not shared:
+                    continue
+                # Share of the query found, less for long fields
+                bonus = shared / len(grams) * min(1.0, 2 * len(text) / max(len(field_text), 1) + 0.5)
+            score = weight * bonus
+            if score > best_score:
+                best_score = score
+                best_field = field
+        return SearchResult(domain, record, best_score, best_field)
@@ -0,0 +1,152 @@
+"""
+Surgical saving of edited game data into app.js.
+
+Instead of regenerating the bundle, a save replaces only the source text
+of the values that were edited (or inserts the properties that didn't
+exist yet). The output is assembled in one pass from the unchanged slices
+of the loaded bundle and the re-serialized values, so every byte outside
+the patched spans is written back exactly as it was read.
+"""
+
+import os
+import re
+import tempfile
+
+from core.js_literal_parser import format_js_key, format_js_literal
+from core.backup_store import copy_permissions, fsync_directory
+
+
+class SourcePatch:
+    """Replacement of js_content[start:end] with text."""
+
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start, end, text):
+        self.start = start      # Offset of the first replaced character
+        self.end = end          # Offset just past the replaced text, equal to start for insertions
+        self.text = text
+
+    def __repr__(self):
+        return f"SourcePatch({self.start}-{self.end}, {self.text!r})"
+
+
+def replace_value(span, value):
+    """
+    Create a patch replacing the literal at span with a new value.
+
+    Args:
+        span (tuple): (start, end) of the current literal
+        value: New value
+
+    Returns:
+        SourcePatch: The patch
+    """
+    return SourcePatch(span[0], span[1], format_js_literal(value))
+
+
+def insert_properties(content, span, properties):
+    """
+    Create a patch adding properties to an object literal.
+
+    The properties go after the object's last property, indented like it
+    (and with the same line ending) when the object spans several lines.
+
+    Args:
+        content (str): The bundle
+        span (tuple): (start, end) of the object literal, including its braces
+        properties (dict): Key -> value of the properties to add
+
+    Returns:
+        SourcePatch: The patch, or None if the span isn't an object literal
+    """
+    start, end = span
+    if not properties or content[start] != '{' or content[end - 1] != '}':
+        return None
+
+    # Insert after the last significant character before the closing brace
+    pos = end - 1
+    while pos > start + 1 and content[pos - 1].isspace():
+        pos -= 1
+    last = content[pos - 1]
+
+    parts = [f"{format_js_key(key)}: {format_js_literal(value)}" for key, value in properties.items()]
+    if '\n' in content[start:end] and last != '{':
+        # Multi-line object, put each property on its own line
+        line_start = content.rfind('\n', start, pos) + 1
+        indent = re.match(r'[ \t]*', content[line_start:pos]).group()
+        newline = '\r\n' if content[line_start - 2:line_start] == '\r\n' else '\n'
+        separator = ',' + newline + indent
+        text = separator.join(parts)
+        text = (newline + indent if last == ',' else separator) + text
+    else:
+        text = ', '.join(parts)
+        if last not in '{,':
+            text = ', ' + text
+        elif last == ',':
+            text = ' ' + text
+    return SourcePatch(pos, pos, text)
+
+
+def iter_patched(content, patches):
+    """
+    Yield the patched bundle piece by piece.
+
+    Args:
+        content (str): The bundle
+        patches (list): SourcePatch objects, in any order
+
+    Yields:
+        str: Unchanged slices of content and patch texts, in order
+
+    Raises:
+        ValueError: If two patches overlap
+    """
+    pos = 0
+    for patch in sorted(patches, key=lambda p: (p.start, p.end)):
+        if patch.start < pos:
+            raise ValueError(f"Overlapping source patches at offset {patch.start}")
+        if patch.start > pos:
+            yield content[pos:patch.start]
+        yield patch.text
+        pos = patch.end
+    if pos < len(content):
+        yield content[pos:]
+
+
+def write_patched(content, patches, file_path):
+    """
+    Write the patched bundle to file_path, atomically.
+
+    The pieces are streamed into a temporary file next to file_path that
+    is fsync'ed then renamed over it, so a failed save (or a crash) never
+    leaves a truncated bundle. Line endings aren't translated, content
+    holds the ones of the file it was read from.
+
+    Args:
+        content (str): The bundle
+        patches (list): SourcePatch objects
+        file_path (str): File to write
+
+    Returns:
+        str: The patched content
+    """
+    pieces = []
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".app_", suffix=".js.tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            for piece in iter_patched(content, patches):
+                f.write(piece)
+                pieces.append(piece)
+            f.flush()
+            os.fsync(f.fileno())
+        copy_permissions(temp_path, file_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+    return ''.join(pieces)
@@ -0,0 +1,143 @@
+"""
+Source spans of extracted game data.
+
+Records extracted from the data modules remember where they came from in
+app.js, so the code editor can jump to them and saves can patch the exact
+text instead of regenerating the bundle. The spans are kept out of the
+record dicts in a side table: the offsets of every parsed value live in two
+integer arrays, and a dict maps the value's path to its row. A path is the
+module path followed by the keys and indices leading to the value, e.g.
+('./game/variables/_items', 'wep', 3, 'buy').
+
+Offsets are relative to the start of the module body (or of the whole
+bundle when the path starts with None), so the spans of modules that
+didn't change stay valid when another module grows or shrinks.
+"""
+
+from array import array
+
+
+class SourceSpans:
+    """Array-backed table of the source spans of parsed values."""
+
+    # Unsigned 32-bit offsets, enough for any bundle module
+    TYPECODE = 'I'
+
+    def __init__(self):
+        """Initialize an empty table."""
+        self._starts = array(self.TYPECODE)
+        self._ends = array(self.TYPECODE)
+        self._rows = {}         # Value path -> row in the arrays
+        self._records = {}      # id(record) -> (record, path of its source value)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, path, start, end):
+        """
+        Record the span of a parsed value.
+
+        Args:
+            path (tuple): Module path followed by the keys/indices of the value
+            start (int): Offset of the value's first character
+            end (int): Offset just past the value
+        """
+        row = self._rows.get(path)
+        if row is None:
+            self._rows[path] = len(self._starts)
+            self._starts.append(start)
+            self._ends.append(end)
+        else:
+            self._starts[row] = start
+            self._ends[row] = end
+
+    def recorder(self, prefix):
+        """
+        Get a callback for the literal parser that records spans under prefix.
+
+        Args:
+            prefix (tuple): Path of the parsed literal, e.g. (module_path,)
+
+        Returns:
+            callable: Takes (path, start, end) with path relative to the literal
+        """
+        def record(path, start, end):
+            self.add(prefix + path, start, end)
+        return record
+
+    def span(self, path):
+        """Get the (start, end) of the value at path, or None if it has no span."""
+        row = self._rows.get(path)
+        if row is None:
+            return None
+        return self._starts[row], self._ends[row]
+
+    def link(self, record, path):
+        """Remember that an extracted record was built from the value at path."""
+        self._records[id(record)] = (record, path)
+
+    def unlink(self, record):
+        """
+        Forget the link of a record, e.g. taken out of its list.
+
+        The table holds a reference to each linked record (so ids aren't
+        reused): records that are gone must be unlinked or they stay alive.
+
+        Returns:
+            tuple: The path the record was linked to, None if it wasn't
+        """
+        entry = self._records.get(id(record))
+        if entry is None or entry[0] is not record:
+            return None
+        del self._records[id(record)]
+        return entry[1]
+
+    def retain(self, records):
+        """Unlink every record but the given ones."""
+        kept = {id(record) for record in records}
+        self._records = {key: entry for key, entry in self._records.items() if key in kept}
+
+    def record_path(self, record):
+        """Get the path of the value a record was built from, or None."""
+        entry = self._records.get(id(record))
+        return entry[1] if entry is not None and entry[0] is record else None
+
+    def clear(self):
+        """Remove every span and record link."""
+        self._starts = array(self.TYPECODE)
+        self._ends = array(self.TYPECODE)
+        self._rows = {}
+        self._records = {}
+
+    def export_state(self, records):
+        """
+        Get the table in a picklable form.
+
+        Args:
+            records (list): The extracted records, linked by their position
+
+        Returns:
+            dict: State for import_state()
+        """
+        return {
+            'starts': self._starts.tobytes(),
+            'ends': self._ends.tobytes(),
+            'paths': list(self._rows),
+            'records': [self.record_path(record) for record in records],
+        }
+
+    def import_state(self, state, records):
+        """
+        Restore a table saved with export_state().
+
+        Args:
+            state (dict): The exported state
+            records (list): The restored records, in the order they were exported
+        """
+        self.clear()
+        self._starts.frombytes(state['starts'])
+        self._ends.frombytes(state['ends'])
+        self._rows = {path: row for row, path in enumerate(state['paths'])}
+        for record, path in zip(records, state['records']):
+            if path is not None:
+                self.link(record, path)
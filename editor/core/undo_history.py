@@ -0,0 +1,637 @@
+"""
+Undo/redo history shared by all editor tabs.
+
+Entries store what changed, not copies of the data lists: a FieldEdit keeps
+the old and new value of every field path an edit touched, a ListEdit the
+record added to or removed from a domain and its position. To compute the
+step changes, the history keeps the state of every record as it was last
+reported (see UndoHistory.record_edit); records nobody edited cost nothing.
+
+Tile grids get their own entry: the cells of a grid an edit changed are
+found and stored as NumPy arrays (two CellPatch objects, see core.map_grid),
+never one value per cell. Consecutive paints of the same map merge into a
+TileStroke, which is run-length encoded once the stroke ends (runs of cells
+on one row painted from the same tile to the same tile), so a long stroke
+or a large fill is a handful of runs and undoing it is a single step.
+
+The history has a memory cap: entries estimate their size, and when the
+total goes over max_bytes the oldest undo steps are dropped first. The
+record states kept to compute the steps are measured too (editing a large
+map costs its copy) but kept outside the cap: dropping steps can't free
+them, they are needed for the next edit of their record, and they only go
+with clear(). Undo and redo only touch the records of the entry they apply,
+whatever the length of the history.
+"""
+
+import sys
+import copy
+import time
+from collections import deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+import numpy as np
+
+from core.map_grid import CellPatch, run_cells
+
+# Default memory cap of the history
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Edits of the same fields reported within this many seconds merge into one
+# step (typing in a field, dragging the brush over a map)
+MERGE_GAP = 1.0
+
+# Value of a field a record doesn't have
+MISSING = object()
+
+# Values that can be shared instead of copied
+_IMMUTABLE = (int, float, str, bool, bytes, type(None))
+
+
+def copy_value(value):
+    """Copy a value, unless it is immutable."""
+    if isinstance(value, _IMMUTABLE) or value is MISSING:
+        return value
+    return copy.deepcopy(value)
+
+
+def _size(value):
+    """Estimate the memory used by a value, nested containers included."""
+    size = sys.getsizeof(value)
+    if isinstance(value, CellPatch):
+        size += value.ys.nbytes + value.xs.nbytes + value.values.nbytes
+    elif isinstance(value, Mapping):
+        size += sum(_size(key) + _size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_size(item) for item in value)
+    return size
+
+
+def diff_values(old, new, path=()):
+    """
+    Compare two records down to the changed values.
+
+    Unlike change_journal.diff_records(), lists are compared item by item
+    too, and NumPy arrays of the same shape cell by cell: painting tiles is
+    one ('tiles',) change whose old and new values are CellPatch objects of
+    the changed cells, rather than two copies of the whole grid.
+
+    Args:
+        old: Previous state
+        new: Current state
+        path (tuple): Path of old/new inside the record, for recursion
+
+    Returns:
+        list: (path, old value, new value), MISSING for a missing field
+    """
+    changes = []
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        for key in list(old) + [key for key in new if key not in old]:
+            old_value = old.get(key, MISSING)
+            new_value = new.get(key, MISSING)
+            if old_value is new_value:
+                continue
+            changes += diff_values(old_value, new_value, path + (key,))
+    elif type(old) is list and type(new) is list and len(old) == len(new) and path:
+        for position, (old_item, new_item) in enumerate(zip(old, new)):
+            if old_item != new_item:
+                changes += diff_values(old_item, new_item, path + (position,))
+    elif isinstance(old, np.ndarray) and isinstance(new, np.ndarray) and old.shape == new.shape and path:
+        # Tile grids, the changed cells are found in one pass
+        ys, xs = np.nonzero(old != new)
+        if len(ys):
+            changes.append((path, CellPatch(ys, xs, old[ys, xs]), CellPatch(ys, xs, new[ys, xs])))
+    elif isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        if type(old) is not type(new) or not np.array_equal(old, new):
+            changes.append((path, old, new))
+    elif old != new or type(old) is not type(new):
+        changes.append((path, old, new))
+    return changes
+
+
+def set_path(record, path, value):
+    """Set the value at a field path of a record, deleting the field for MISSING and writing the cells of a CellPatch."""
+    container = record
+    for key in path[:-1]:
+        container = container[key]
+    if isinstance(value, CellPatch):
+        value.apply(container[path[-1]])
+    elif value is MISSING:
+        if path[-1] in container:
+            del container[path[-1]]
+    else:
+        container[path[-1]] = value
+
+
+class FieldEdit:
+    """Changed field values of one record."""
+
+    def __init__(self, domain, key, record, changes):
+        """
+        Initialize the edit.
+
+        Args:
+            domain (str): Kind of data
+            key: Key of the record, for the label
+            record (dict): The edited record
+            changes (list): (path, old, new) from diff_values()
+        """
+        self.domain = domain
+        self.key = key
+        self.record = record
+        self.time = time.monotonic()
+        # Path -> [old, new], the values owned by the entry
+        self.changes = {path: [copy_value(old), copy_value(new)] for path, old, new in changes}
+
+    @property
+    def label(self):
+        fields = sorted({'.'.join(str(part) for part in path) for path in self.changes})
+        return f"Edit {self.key} {', '.join(fields[:3])}{'...' if len(fields) > 3 else ''}"
+
+    def domains(self):
+        return {self.domain}
+
+    def size(self):
+        return 200 + sum(_size(path) + _size(old) + _size(new) for path, (old, new) in self.changes.items())
+
+    def merge(self, other, gap):
+        """Merge a later edit of the same fields (the next keystroke...) made within gap seconds, None for any time."""
+        if (type(other) is not FieldEdit or other.record is not self.record or other.changes.keys() != self.changes.keys()
+                or (gap is not None and other.time - self.time > gap)):
+            return False
+        if any(isinstance(new, CellPatch) for _, new in self.changes.values()):
+            # Patches of different cells don't replace each other
+            return False
+        for path, (_, new) in other.changes.items():
+            self.changes[path][1] = new
+        self.time = other.time
+        return True
+
+    def seal(self):
+        """The entry won't be merged into anymore."""
+
+    def undo(self, manager):
+        for path, (old, _) in self.changes.items():
+            set_path(self.record, path, copy_value(old))
+        manager.record_changed(self.record)
+
+    def redo(self, manager):
+        for path, (_, new) in self.changes.items():
+            set_path(self.record, path, copy_value(new))
+        manager.record_changed(self.record)
+
+
+class TileStroke:
+    """Tiles painted on one map in a row, run-length encoded once sealed."""
+
+    def __init__(self, domain, key, record, field, old, new):
+        """
+        Initialize the stroke.
+
+        Args:
+            domain (str): Kind of data
+            key: Key of the record, for the label
+            record (dict): The painted map
+            field (str): Field holding the grid, e.g. 'tiles'
+            old (CellPatch): The painted cells with their tiles before
+            new (CellPatch): The same cells with their painted tiles
+        """
+        self.domain = domain
+        self.key = key
+        self.record = record
+        self.field = field
+        self.time = time.monotonic()
+        self.patches = [(old, new)]     # While the stroke is open
+        self.runs = None                # Rows of (y, x, length, old, new) once sealed
+        self._count = len(old)          # Cells painted, None until counted again after a merge
+        self._patch_size = _size(old) + _size(new)
+
+    @classmethod
+    def from_changes(cls, domain, key, record, changes):
+        """Make a stroke of diff_values() changes, None if they aren't all cells of one grid."""
+        if len(changes) == 1 and isinstance(changes[0][1], CellPatch):
+            path, old, new = changes[0]
+            return cls(domain, key, record, path[0], old, new) if len(path) == 1 else None
+
+        # Grids held as lists, one change per cell
+        fields = {path[0] for path, _, _ in changes}
+        if len(fields) != 1 or any(len(path) != 3 or type(path[1]) is not int or type(path[2]) is not int
+                                   or not isinstance(old, int) or not isinstance(new, int)
+                                   for path, old, new in changes):
+            return None
+        ys = np.array([path[1] for path, _, _ in changes], dtype=np.intp)
+        xs = np.array([path[2] for path, _, _ in changes], dtype=np.intp)
+        return cls(domain, key, record, fields.pop(),
+                   CellPatch(ys, xs, np.array([old for _, old, _ in changes])),
+                   CellPatch(ys, xs, np.array([new for _, _, new in changes])))
+
+    @property
+    def count(self):
+        """Number of cells painted, a cell painted twice counting once."""
+        if self._count is None:
+            self._count = len(self._cells()[0])
+        return self._count
+
+    @property
+    def label(self):
+        return f"Paint {self.count} tile{'s' if self.count != 1 else ''} on {self.key}"
+
+    def domains(self):
+        return {self.domain}
+
+    def size(self):
+        if self.runs is not None:
+            return 200 + self.runs.nbytes
+        return 200 + self._patch_size
+
+    def merge(self, other, gap):
+        """Add the cells of a later stroke on the same grid, made within gap seconds (None for any time)."""
+        if (self.runs is not None or type(other) is not TileStroke or other.record is not self.record
+                or other.field != self.field or (gap is not None and other.time - self.time > gap)):
+            return False
+        # Counting the cells sorts them, so it waits until the label is needed
+        self.patches += other.patches
+        self._patch_size += other._patch_size
+        self._count = None
+        self.time = other.time
+        return True
+
+    def _cells(self):
+        """Get the painted cells, sorted by row and column: (ys, xs, first old tiles, last new tiles)."""
+        ys = np.concatenate([old.ys for old, _ in self.patches])
+        xs = np.concatenate([old.xs for old, _ in self.patches])
+        old = np.concatenate([old.values for old, _ in self.patches])
+        new = np.concatenate([new.values for _, new in self.patches])
+        if len(self.patches) == 1:
+            order = np.lexsort((xs, ys))
+            return ys[order], xs[order], old[order], new[order]
+        # A cell painted more than once goes from its first old tile to its last new one
+        keys = (ys.astype(np.int64) << 32) | xs.astype(np.int64)
+        _, first = np.unique(keys, return_index=True)
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        return ys[first], xs[first], old[first], new[last]
+
+    def seal(self):
+        """Encode the cells as runs of one row painted from and to the same tiles."""
+        if self.runs is not None:
+            return
+        ys, xs, old, new = self._cells()
+        if self._count is None:
+            self._count = len(ys)
+        painted = old != new
+        ys, xs, old, new = ys[painted], xs[painted], old[painted], new[painted]
+        # A run starts where a cell doesn't continue the previous one
+        starts = np.ones(len(ys), dtype=bool)
+        starts[1:] = (ys[1:] != ys[:-1]) | (xs[1:] != xs[:-1] + 1) | (old[1:] != old[:-1]) | (new[1:] != new[:-1])
+        starts = np.flatnonzero(starts)
+        lengths = np.diff(np.append(starts, len(ys)))
+        self.runs = np.stack([ys[starts], xs[starts], lengths, old[starts], new[starts]], axis=1).astype(np.int32)
+        self.patches = None
+
+    def _paint(self, manager, undo):
+        self.seal()
+        grid = self.record[self.field]
+        ys, xs, lengths, old, new = self.runs.T
+        if isinstance(grid, np.ndarray):
+            cell_ys, cell_xs = run_cells(ys, xs, lengths)
+            grid[cell_ys, cell_xs] = np.repeat(old if undo else new, lengths)
+        else:
+            for y, x, length, old_tile, new_tile in self.runs.tolist():
+                grid[y][x:x + length] = [old_tile if undo else new_tile] * length
+        manager.record_changed(self.record)
+
+    def undo(self, manager):
+        self._paint(manager, True)
+
+    def redo(self, manager):
+        self._paint(manager, False)
+
+
+class ListEdit:
+    """A record added to or removed from a domain."""
+
+    def __init__(self, domain, key, record, position, added, source_path=None):
+        self.domain = domain
+        self.key = key
+        self.record = record
+        self.position = position
+        self.added = added
+        self.source_path = source_path      # Source link of a removed record, see SourceSpans.unlink()
+
+    @property
+    def label(self):
+        return f"{'Add' if self.added else 'Remove'} {self.key}"
+
+    def domains(self):
+        return {self.domain}
+
+    def size(self):
+        # The record itself is shared with the data or other entries
+        return 200
+
+    def merge(self, other, gap):
+        return False
+
+    def seal(self):
+        pass
+
+    def _apply(self, manager, add):
+        records = manager.domain_records(self.domain)
+        if add:
+            position = self.position if self.position is not None else len(records)
+            records.insert(min(position, len(records)), self.record)
+            if self.source_path is not None:
+                manager.link_records(self.domain, [(self.record, self.source_path)])
+        else:
+            records.remove(self.record)
+
+    def undo(self, manager):
+        self._apply(manager, not self.added)
+
+    def redo(self, manager):
+        self._apply(manager, self.added)
+
+
+class ListReplace:
+    """A domain's record list replaced by another one."""
+
+    def __init__(self, domain, old_records, new_records, links=()):
+        # Shallow copies: the records themselves are shared, not copied
+        self.domain = domain
+        self.old_records = list(old_records)
+        self.new_records = list(new_records)
+        self.links = list(links)        # (record, path) source links of the replaced records
+
+    @property
+    def label(self):
+        return f"Replace {self.domain}"
+
+    def domains(self):
+        return {self.domain}
+
+    def size(self):
+        return 200 + sys.getsizeof(self.old_records) + sys.getsizeof(self.new_records)
+
+    def merge(self, other, gap):
+        return False
+
+    def seal(self):
+        pass
+
+    def undo(self, manager):
+        manager.replace_records(self.domain, list(self.old_records))
+        manager.link_records(self.domain, self.links)
+
+    def redo(self, manager):
+        manager.replace_records(self.domain, list(self.new_records))
+
+
+class CompoundEdit:
+    """Several entries undone and redone as one step, see UndoHistory.transaction()."""
+
+    def __init__(self, label):
+        self.label = label
+        self.entries = []
+        self.time = time.monotonic()
+
+    def add(self, entry):
+        # Inside a step, strokes merge whatever the time between paints
+        if not (self.entries and self.entries[-1].merge(entry, gap=None)):
+            if self.entries:
+                self.entries[-1].seal()
+            self.entries.append(entry)
+
+    def domains(self):
+        return set().union(*(entry.domains() for entry in self.entries))
+
+    def size(self):
+        return 200 + sum(entry.size() for entry in self.entries)
+
+    def merge(self, other, gap):
+        return False
+
+    def seal(self):
+        for entry in self.entries:
+            entry.seal()
+
+    def undo(self, manager):
+        for entry in reversed(self.entries):
+            entry.undo(manager)
+
+    def redo(self, manager):
+        for entry in self.entries:
+            entry.redo(manager)
+
+
+class UndoHistory:
+    """Bounded undo and redo stacks of edit entries."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, merge_gap=MERGE_GAP):
+        """
+        Initialize an empty history.
+
+        Args:
+            max_bytes (int): Memory cap, the oldest entries are dropped above it
+            merge_gap (float): Seconds within which edits of the same fields merge
+        """
+        self.max_bytes = max_bytes
+        self.merge_gap = merge_gap
+        self.listeners = []             # Called without arguments after every change
+        self._undo = deque()
+        self._redo = []
+        self._bytes = 0                 # Size of the entries, kept under max_bytes
+        self._sizes = {}                # id(entry) -> size counted in _bytes
+        self._states = {}               # id(record) -> (record, state when last reported, domain)
+        self._state_bytes = 0           # Size of the states, outside the cap
+        self._state_sizes = {}          # id(record) -> size of its state counted in _state_bytes
+        self._suspended = 0
+        self._transaction = None
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def memory(self):
+        """Estimated bytes used by the entries and the record states."""
+        return self._bytes + self._state_bytes
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    def track(self, record, domain=None):
+        """Remember the current state of a record, later edits are compared with it."""
+        self._set_state(record, copy.deepcopy(record), domain)
+
+    def record_edit(self, domain, key, record, original=None):
+        """
+        Push the changes of a record since it was last reported.
+
+        Args:
+            domain (str): Kind of data
+            key: Key of the record, for the labels
+            record (dict): The edited record
+            original (dict): State to compare with if the record wasn't reported
+                before (as loaded), None to only start tracking it
+
+        Returns:
+            list: The (path, old, new) changes, new values still shared with
+                the record; they are computed while undoing too
+        """
+        state = self._states.get(id(record))
+        if state is not None and state[0] is record:
+            base = state[1]
+        elif original is not None:
+            base = copy.deepcopy(original)
+        else:
+            self.track(record, domain)
+            return []
+        changes = diff_values(base, record)
+        for path, _, new in changes:
+            set_path(base, path, copy_value(new))
+        if state is None or state[0] is not record:
+            self._set_state(record, base, domain)
+        elif changes:
+            # Only the changed values are measured again; a CellPatch is
+            # written into a grid of the same size
+            self._states[id(record)] = (record, base, domain)
+            delta = sum(_size(new) - _size(old) for _, old, new in changes if not isinstance(new, CellPatch))
+            self._state_sizes[id(record)] = self._state_sizes.get(id(record), 0) + delta
+            self._state_bytes += delta
+        if changes and not self._suspended:
+            self.push(TileStroke.from_changes(domain, key, record, changes)
+                      or FieldEdit(domain, key, record, changes))
+        return changes
+
+    def push(self, entry):
+        """Add an entry, merging it into the last one when it continues it."""
+        if self._suspended:
+            return
+        if self._transaction is not None:
+            self._transaction.add(entry)
+            return
+        self._clear_redo()
+        last = self._undo[-1] if self._undo else None
+        if last is not None and last.merge(entry, self.merge_gap):
+            self._resize(last)
+        else:
+            if last is not None:
+                last.seal()
+                self._resize(last)
+            self._undo.append(entry)
+            self._resize(entry)
+        self._evict()
+        self._notify()
+
+    @contextmanager
+    def transaction(self, label):
+        """Group everything pushed inside the with block into one undo step."""
+        if self._transaction is not None:
+            # Nested, part of the outer step
+            yield
+            return
+        compound = self._transaction = CompoundEdit(label)
+        try:
+            yield
+        finally:
+            self._transaction = None
+            if compound.entries:
+                compound.seal()
+                self.push(compound)
+
+    @contextmanager
+    def suspended(self):
+        """Don't record the edits made inside the with block (undo, loading...)."""
+        self._suspended += 1
+        try:
+            yield
+        finally:
+            self._suspended -= 1
+
+    def undo(self, manager):
+        """
+        Undo the last step.
+
+        Args:
+            manager: GameDataManager the entries are applied to
+
+        Returns:
+            set: Domains changed, empty if there was nothing to undo
+        """
+        if not self._undo:
+            return set()
+        entry = self._undo.pop()
+        entry.seal()
+        with self.suspended():
+            entry.undo(manager)
+        self._redo.append(entry)
+        self._notify()
+        return entry.domains()
+
+    def redo(self, manager):
+        """Redo the last undone step, see undo()."""
+        if not self._redo:
+            return set()
+        entry = self._redo.pop()
+        with self.suspended():
+            entry.redo(manager)
+        self._undo.append(entry)
+        self._notify()
+        return entry.domains()
+
+    def clear(self, *domains):
+        """Forget the entries touching some domains, or all entries and states."""
+        if not domains:
+            self._undo.clear()
+            self._redo = []
+            self._sizes = {}
+            self._states = {}
+            self._state_sizes = {}
+            self._bytes = 0
+            self._state_bytes = 0
+        else:
+            domains = set(domains)
+            for stack in (self._undo, self._redo):
+                for entry in [entry for entry in stack if entry.domains() & domains]:
+                    stack.remove(entry)
+                    self._bytes -= self._sizes.pop(id(entry), 0)
+            for key in [key for key, state in self._states.items() if state[2] in domains]:
+                del self._states[key]
+                self._state_bytes -= self._state_sizes.pop(key, 0)
+        self._notify()
+
+    def _set_state(self, record, state, domain):
+        """Keep the state of a record, counted in memory but not in the cap."""
+        size = _size(state)
+        self._state_bytes += size - self._state_sizes.get(id(record), 0)
+        self._states[id(record)] = (record, state, domain)
+        self._state_sizes[id(record)] = size
+
+    def _resize(self, entry):
+        size = entry.size()
+        self._bytes += size - self._sizes.get(id(entry), 0)
+        self._sizes[id(entry)] = size
+
+    def _clear_redo(self):
+        for entry in self._redo:
+            self._bytes -= self._sizes.pop(id(entry), 0)
+        self._redo = []
+
+    def _evict(self):
+        """Drop the oldest entries until the history fits in max_bytes."""
+        while self._bytes > self.max_bytes and len(self._undo) > 1:
+            entry = self._undo.popleft()
+            self._bytes -= self._sizes.pop(id(entry), 0)
+
+    def _notify(self):
+        for listener in list(self.listeners):
+            listener()
@@ -9,7 +9,7 @@ This script launches the OpenFF Game Editor application.
 import sys
 import os
 import time
-import random
+import multiprocessing
 
 # Add the parent directory to the path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,7 +17,7 @@ sys.path.insert(0, parent_dir)
 
 from PyQt6.QtWidgets import QApplication, QSplashScreen, QProgressBar
 from PyQt6.QtGui import QPixmap, QFont, QColor, QPainter
-from PyQt6.QtCore import Qt, QTimer, QUrl
+from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 
 # Try different import approaches
@@ -25,14 +25,19 @@ try:
     # Try direct import
     from main_window import MainWindow
     from utils.theme import apply_theme
+    from core.extraction_profiler import PROFILER
 except ImportError:
     # Try package import
     from editor.main_window import MainWindow
     from editor.utils.theme import apply_theme
+    from editor.core.extraction_profiler import PROFILER
 
 class EnhancedSplashScreen(QSplashScreen):
     """Enhanced splash screen with progress bar and custom styling."""
     
+    # Emitted when the user presses Escape to stop loading
+    cancel_requested = pyqtSignal()
+    
     def __init__(self, pixmap):
         super().__init__(pixmap)
         self.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint)
@@ -83,6 +88,9 @@ class EnhancedSplashScreen(QSplashScreen):
         ]
         self.current_message = 0
         
+        # Message of the current loading step, replaces the rotating messages once set
+        self.status_message = None
+        
         # Setup media player for background music
         self.player = QMediaPlayer()
         self.audio_output = QAudioOutput()
@@ -103,7 +111,7 @@ class EnhancedSplashScreen(QSplashScreen):
         painter.setFont(font)
         
         # Draw the message with a subtle shadow effect
-        message = self.loading_messages[self.current_message % len(self.loading_messages)]
+        message = self.status_message or self.loading_messages[self.current_message % len(self.loading_messages)]
         
         # Draw text shadow
         painter.setPen(QColor(0, 0, 0, 180))
@@ -124,6 +132,20 @@ class EnhancedSplashScreen(QSplashScreen):
                        Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignRight,
                        "OpenFF Game Editor v1.0.0")
                        
+    def show_progress(self, event):
+        """Show a LoadProgress event from the game data loader."""
+        self.progress_bar.setValue(event.percent)
+        if event.message and event.message != self.status_message:
+            self.status_message = event.message
+            self.repaint()
+            
+    def keyPressEvent(self, event):
+        """Cancel loading on Escape."""
+        if event.key() == Qt.Key.Key_Escape:
+            self.cancel_requested.emit()
+        else:
+            super().keyPressEvent(event)
+                       
     def play_music(self, music_path):
         """Play background music."""
         if os.path.exists(music_path):
@@ -167,60 +189,34 @@ def main():
                            'mp3', 'bgm', 'SEMO-00001_01_loop.mp3')
     splash.play_music(bgm_path)
     
-    # Create a timer for progress updates
-    progress = 0
-    loading_finished = False
-    
     # Create window at the beginning to avoid issues
-    window = MainWindow()
-    window_data_loaded = False
+    # (--parallel-extraction runs the data extractors in a process pool,
+    # --profile-extraction prints the cost of every extraction pattern,
+    # --undo-memory=MB caps the memory used by the undo history)
+    profile_extraction = '--profile-extraction' in sys.argv
+    undo_memory = None
+    for arg in sys.argv:
+        if arg.startswith('--undo-memory='):
+            try:
+                undo_memory = int(float(arg.split('=', 1)[1]) * 1024 * 1024)
+            except ValueError:
+                print(f"Ignoring invalid undo memory cap: {arg}")
+    window = MainWindow(parallel_extraction='--parallel-extraction' in sys.argv,
+                        profile_extraction=profile_extraction,
+                        undo_memory=undo_memory)
     
-    def update_progress():
-        nonlocal progress, window_data_loaded, loading_finished
+    loading_finished = False
+    
+    def finish_loading(window, splash):
+        nonlocal loading_finished
         
-        # If loading is already finished, don't continue
+        # Later reloads also emit load_finished, only the first one ends the splash
         if loading_finished:
             return
-            
-        # Increment progress
-        progress += random.randint(1, 5)
-        if progress > 100:
-            progress = 100
-            
-        # Update progress bar
-        splash.progress_bar.setValue(progress)
-        
-        # Change message occasionally
-        if progress % 15 == 0:
-            splash.current_message = (splash.current_message + 1) % len(splash.loading_messages)
-            splash.repaint()
+        loading_finished = True
         
-        # When progress hits certain marks, do actual loading steps
-        if progress >= 60 and not window_data_loaded:
-            # Load game data
-            try:
-                print("Loading game data...")
-                window.load_game_data()
-                window_data_loaded = True
-                print("Game data loaded successfully")
-            except Exception as e:
-                print(f"Error loading game data: {str(e)}")
-                window_data_loaded = True  # Mark as loaded even if error to avoid trying again
-        
-        # When progress reaches 100%        
-        if progress >= 100 and not loading_finished:
-            print("Loading complete, preparing to show main window...")
-            loading_finished = True
-            timer.stop()
-            
-            # Force process events before transitioning
-            app.processEvents()
-            
-            # Use direct call instead of a timer for transition
-            finish_loading(window, splash)
-    
-    def finish_loading(window, splash):
         print("Finishing loading process...")
+        splash.progress_bar.setValue(100)
         
         # Stop the music when transitioning to main window
         splash.stop_music()
@@ -235,14 +231,25 @@ def main():
         
         # Force processing events again to ensure UI updates
         app.processEvents()
+        
+        if profile_extraction:
+            print(PROFILER.report())
+    
+    # The window loads the game data on a worker thread and reports real progress
+    window.load_progress.connect(splash.show_progress)
+    window.load_finished.connect(lambda: finish_loading(window, splash))
+    splash.cancel_requested.connect(window.cancel_loading)
+    
+    # Start loading once the event loop runs
+    QTimer.singleShot(0, window.load_game_data)
     
-    # Set up timer for progress updates
-    timer = QTimer()
-    timer.timeout.connect(update_progress)
-    timer.start(100)  # Update every 100ms
+    # Stop the pattern guard's helper process on exit
+    app.aboutToQuit.connect(PROFILER.close)
     
     # Run the application
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Needed for the extraction process pool in frozen builds
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
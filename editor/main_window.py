@@ -3,15 +3,17 @@ import sys
 import platform
 from PyQt6.QtWidgets import (QMainWindow, QTabWidget, QFileDialog, QMessageBox,
                            QVBoxLayout, QHBoxLayout, QWidget, QSplitter, QApplication, 
-                           QLabel, QPushButton, QTreeView, QTextEdit, QProgressBar)
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QAction
+                           QLabel, QPushButton, QTreeView, QTextEdit, QProgressBar, QInputDialog)
+from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal
+from PyQt6.QtGui import QIcon, QAction, QKeySequence
 
 # Import utilities
 try:
     from editor.utils.theme import apply_theme
+    from editor.utils.search import SearchDialog
     # Import core components
     from editor.core.game_data_manager import GameDataManager
+    from editor.core.game_data_loader import GameDataLoader, GameDataPrefetcher
     # Import editor modules
     from editor.modules.character_editor.character_editor import CharacterEditorTab
     from editor.modules.item_editor.item_editor import ItemEditorTab
@@ -24,8 +26,10 @@ try:
 except ImportError:
     # Local imports
     from utils.theme import apply_theme
+    from utils.search import SearchDialog
     # Import core components
     from core.game_data_manager import GameDataManager
+    from core.game_data_loader import GameDataLoader, GameDataPrefetcher
     # Try to import modules directly (they might not exist yet)
     try:
         from modules.character_editor.character_editor import CharacterEditorTab
@@ -43,12 +47,31 @@ except ImportError:
 class MainWindow(QMainWindow):
     """Main window for the OpenFF Game Editor."""
     
-    def __init__(self):
+    # Forwarded from the background loader: LoadProgress events, then the end of loading
+    load_progress = pyqtSignal(object)
+    load_finished = pyqtSignal()
+    # Emitted when the pending changes change, from whichever thread made them
+    journal_changed = pyqtSignal()
+    history_changed = pyqtSignal()
+    
+    def __init__(self, parallel_extraction=False, profile_extraction=False, undo_memory=None):
         super().__init__()
         
         # Initialize attributes
-        self.game_data = GameDataManager()
+        self.parallel_extraction = parallel_extraction
+        self.profile_extraction = profile_extraction
+        # Memory cap of the undo history in bytes, None for the default
+        self.undo_memory = undo_memory
+        self.game_data = self.create_game_data_manager()
         self.code_editor = None
+        self.loader = None
+        self.prefetcher = None
+        self._reloading = False
+        
+        # Editor tab for each kind of game data, used to refresh only what changed
+        self.domain_tabs = {}
+        # Tabs whose data changed while they were hidden, refreshed when shown
+        self._stale_tabs = set()
         
         # Set up the UI
         self.init_ui()
@@ -77,8 +100,19 @@ class MainWindow(QMainWindow):
         # Set up menus
         self.setup_menus()
         
-        # Set up status bar
+        # Set up status bar, with a progress bar shown while loading
         self.statusBar().showMessage("Ready")
+        self.load_progress_bar = QProgressBar()
+        self.load_progress_bar.setMaximumWidth(200)
+        self.load_progress_bar.setRange(0, 100)
+        self.load_progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.load_progress_bar)
+        
+        # Pending changes, kept up to date from the change journal
+        self.changes_label = QLabel()
+        self.statusBar().addPermanentWidget(self.changes_label)
+        self.journal_changed.connect(self.update_changes_label)
+        self.update_changes_label()
         
         # Create editor tabs (requires game data to be loaded)
         self.create_editor_tabs()
@@ -164,6 +198,19 @@ class MainWindow(QMainWindow):
             self.code_editor = CodeEditorTab()
             self.tab_widget.addTab(self.code_editor, "Code Editor")
             
+            # Reload the game data when app.js is saved from the code editor
+            self.code_editor.file_saved.connect(self.on_code_file_saved)
+            
+            self.domain_tabs = {
+                'characters': character_tab,
+                'items': item_tab,
+                'maps': map_tab,
+                'battles': battle_tab,
+                'spells': spell_tab,
+                'monsters': self.monster_tab,
+                'npcs': npc_tab,
+            }
+            
             # Connect tab changed signal to handle tab activation
             self.tab_widget.currentChanged.connect(self.on_tab_changed)
             
@@ -175,9 +222,17 @@ class MainWindow(QMainWindow):
         """Handle tab changes to activate specific tab functionality."""
         # Get the current tab widget
         current_tab = self.tab_widget.widget(index)
+        is_monster_tab = hasattr(self, 'monster_tab') and current_tab == self.monster_tab
+        
+        # Refresh a tab whose data changed while it was hidden
+        # (tab_activated() already refreshes the monster editor)
+        if current_tab in self._stale_tabs:
+            self._stale_tabs.discard(current_tab)
+            if not is_monster_tab:
+                current_tab.update_data()
         
         # Check if it's the monster editor and call tab_activated
-        if hasattr(self, 'monster_tab') and current_tab == self.monster_tab:
+        if is_monster_tab:
             self.monster_tab.tab_activated()
             
             # Debug: Print all monster IDs
@@ -233,12 +288,37 @@ class MainWindow(QMainWindow):
         new_action.triggered.connect(self.new_project)
         file_menu.addAction(new_action)
         
+        # Reload action (picks up changes made to app.js outside the editor)
+        reload_action = QAction("&Reload Game Data", self)
+        reload_action.setShortcut("F5")
+        reload_action.triggered.connect(self.reload_game_data)
+        file_menu.addAction(reload_action)
+        
         # Save action
         save_action = QAction("&Save", self)
         save_action.setShortcut("Ctrl+S")
         save_action.triggered.connect(self.save_game_data)
         file_menu.addAction(save_action)
         
+        # Restore backup action
+        restore_action = QAction("Restore &Backup...", self)
+        restore_action.triggered.connect(self.restore_backup)
+        file_menu.addAction(restore_action)
+        
+        # Export and import of the records, one file per domain
+        export_action = QAction("&Export Data...", self)
+        export_action.triggered.connect(self.export_game_data)
+        file_menu.addAction(export_action)
+        
+        import_action = QAction("&Import Data...", self)
+        import_action.triggered.connect(self.import_game_data)
+        file_menu.addAction(import_action)
+        
+        # Pending changes action
+        changes_action = QAction("&Pending Changes...", self)
+        changes_action.triggered.connect(self.show_pending_changes)
+        file_menu.addAction(changes_action)
+        
         # Exit action
         exit_action = QAction("E&xit", self)
         exit_action.setShortcut("Alt+F4")
@@ -248,6 +328,28 @@ class MainWindow(QMainWindow):
         # Edit menu
         edit_menu = self.menuBar().addMenu("&Edit")
         
+        # Undo and redo actions, shared by every editor tab
+        self.undo_action = QAction("&Undo", self)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self.undo_edit)
+        edit_menu.addAction(self.undo_action)
+        
+        self.redo_action = QAction("&Redo", self)
+        self.redo_action.setShortcuts([QKeySequence("Ctrl+Y"), QKeySequence("Ctrl+Shift+Z")])
+        self.redo_action.triggered.connect(self.redo_edit)
+        edit_menu.addAction(self.redo_action)
+        
+        self.history_changed.connect(self.update_undo_actions)
+        self.update_undo_actions()
+        edit_menu.addSeparator()
+        
+        # Global search; Ctrl+F stays the code editor's find
+        search_action = QAction("&Search Game Data...", self)
+        search_action.setShortcuts([QKeySequence("Ctrl+P"), QKeySequence("Ctrl+Shift+F")])
+        search_action.triggered.connect(self.show_search)
+        edit_menu.addAction(search_action)
+        edit_menu.addSeparator()
+        
         # Preferences action
         prefs_action = QAction("&Preferences", self)
         prefs_action.triggered.connect(self.show_preferences)
@@ -263,6 +365,12 @@ class MainWindow(QMainWindow):
     
     def new_project(self):
         """Create a new project."""
+        # Don't let a running load fill the old data manager
+        if self.is_loading():
+            self.loader.cancel()
+            self.loader.wait()
+        self.stop_prefetching()
+            
         # Check if there are unsaved changes
         if self.game_data.has_changes():
             reply = QMessageBox.question(
@@ -278,14 +386,22 @@ class MainWindow(QMainWindow):
                 return
         
         # Reset the game data
-        self.game_data = GameDataManager()
+        self.game_data.close()
+        self.game_data = self.create_game_data_manager()
         
         # Update the UI
         self.update_editor_tabs()
+        self.update_changes_label()
+        self.update_undo_actions()
         self.statusBar().showMessage("New project created", 3000)
     
     def save_game_data(self):
         """Save the game data."""
+        # The loader holds the manager's lock, saving now would block the GUI
+        if self.is_loading():
+            self.statusBar().showMessage("Game data is still loading", 3000)
+            return
+            
         # If we have a js file path, save to that path
         app_js_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "js", "app.js")
         
@@ -296,12 +412,7 @@ class MainWindow(QMainWindow):
             if success:
                 self.statusBar().showMessage("Game data saved successfully", 3000)
             else:
-                self.statusBar().showMessage("Failed to save game data", 3000)
-                QMessageBox.warning(
-                    self,
-                    "Error Saving Game Data",
-                    "Failed to save game data."
-                )
+                self.show_save_error()
         else:
             # Ask for a file path
             file_path, _ = QFileDialog.getSaveFileName(
@@ -317,12 +428,24 @@ class MainWindow(QMainWindow):
                 if success:
                     self.statusBar().showMessage("Game data saved successfully", 3000)
                 else:
-                    self.statusBar().showMessage("Failed to save game data", 3000)
-                    QMessageBox.warning(
-                        self,
-                        "Error Saving Game Data",
-                        "Failed to save game data."
-                    )
+                    self.show_save_error()
+        
+    def show_save_error(self):
+        """Tell why the last save failed, listing the edits it couldn't write."""
+        self.update_changes_label()
+        self.statusBar().showMessage("Failed to save game data", 3000)
+        unsaved = self.game_data.unsaved_changes
+        if unsaved:
+            lines = unsaved[:20] + ([f"... and {len(unsaved) - 20} more"] if len(unsaved) > 20 else [])
+            message = ("These edits can't be written to app.js and are still unsaved "
+                       "(the other edits were saved):\n\n" + "\n".join(lines))
+        else:
+            message = "Failed to save game data."
+        QMessageBox.warning(
+            self,
+            "Error Saving Game Data",
+            message
+        )
     
     def show_preferences(self):
         """Show the preferences dialog."""
@@ -341,7 +464,15 @@ class MainWindow(QMainWindow):
         )
     
     def load_game_data(self):
-        """Load game data from js/app.js."""
+        """
+        Load game data from js/app.js in the background.
+        
+        Progress is forwarded through load_progress and load_finished is
+        emitted once loading ended, whether it succeeded or not.
+        
+        Returns:
+            bool: True if loading was started
+        """
         print("Loading game data...")
         
         # Define the path to app.js
@@ -349,55 +480,401 @@ class MainWindow(QMainWindow):
         
         # Check if the file exists
         if os.path.exists(app_js_path):
-            # Load the game data
-            success = self.game_data.load_from_file(app_js_path)
+            self._reloading = False
+            return self._start_loader(app_js_path)
+        
+        self.statusBar().showMessage("app.js not found", 3000)
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("File Not Found")
+        msg_box.setText(f"Could not find js/app.js at {app_js_path}. Default game data will be used.")
+        msg_box.setIcon(QMessageBox.Icon.Warning)
+        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+        msg_box.setModal(False)
+        msg_box.show()
+        self.load_finished.emit()
+        return False
+        
+    def create_game_data_manager(self):
+        """
+        Create the data manager for a project.
+        
+        Without parallel extraction, domains are extracted lazily: the window
+        shows as soon as the bundle is indexed, the visible tab extracts what
+        it needs and a background prefetcher extracts the rest.
+        
+        When profiling, every domain is extracted during the load and the
+        extraction cache is bypassed, so the profile covers the whole run.
+        """
+        options = {} if self.undo_memory is None else {'undo_memory': self.undo_memory}
+        if self.profile_extraction:
+            manager = GameDataManager(use_cache=False, parallel=self.parallel_extraction, **options)
+        else:
+            manager = GameDataManager(parallel=self.parallel_extraction, lazy=not self.parallel_extraction, **options)
+        # Loads run on a worker thread, so journal and history updates go through signals
+        manager.journal.listeners.append(self.journal_changed.emit)
+        manager.history.listeners.append(self.history_changed.emit)
+        return manager
+        
+    def update_undo_actions(self):
+        """Enable the undo and redo actions, named after the steps they apply."""
+        history = self.game_data.history
+        self.undo_action.setEnabled(history.can_undo())
+        self.undo_action.setText(f"&Undo {history.undo_label()}" if history.can_undo() else "&Undo")
+        self.redo_action.setEnabled(history.can_redo())
+        self.redo_action.setText(f"&Redo {history.redo_label()}" if history.can_redo() else "&Redo")
+        
+    def undo_edit(self):
+        """Undo the last edit and refresh the tabs showing its data."""
+        label = self.game_data.history.undo_label()
+        domains = self.game_data.undo()
+        if domains:
+            self.update_editor_tabs(domains)
+            self.statusBar().showMessage(f"Undid: {label}", 3000)
             
-            if success:
-                # Check if we're using default characters
-                if self.game_data.using_default_characters:
-                    self.statusBar().showMessage("Using default character data", 3000)
-                    # Display message in a non-blocking way
-                    QApplication.processEvents()
-                    # Use a single-button message box that doesn't block the application flow
-                    msg_box = QMessageBox(self)
-                    msg_box.setWindowTitle("Using Default Characters")
-                    msg_box.setText("The editor could not extract character data from your app.js file. "
-                                   "This can happen because of minification or different code structure. "
-                                   "Default characters have been created for you to edit.\n\n"
-                                   "Any changes you make will be saved correctly.")
-                    msg_box.setIcon(QMessageBox.Icon.Information)
-                    msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-                    # Show non-modal message box
-                    msg_box.setModal(False)
-                    msg_box.show()
-                else:
-                    self.statusBar().showMessage("Game data loaded successfully", 3000)
-                
-                # Update the editor tabs with the loaded data
-                self.update_editor_tabs()
+    def redo_edit(self):
+        """Redo the last undone edit and refresh the tabs showing its data."""
+        label = self.game_data.history.redo_label()
+        domains = self.game_data.redo()
+        if domains:
+            self.update_editor_tabs(domains)
+            self.statusBar().showMessage(f"Redid: {label}", 3000)
+        
+    def update_changes_label(self):
+        """Show the summary of the pending changes in the status bar."""
+        self.changes_label.setText(self.game_data.journal.summary())
+        
+    def show_pending_changes(self):
+        """List the pending changes, field by field."""
+        journal = self.game_data.journal
+        if not journal:
+            QMessageBox.information(self, "Pending Changes", "No unsaved changes.")
+            return
+        
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Pending Changes")
+        msg_box.setText(journal.summary())
+        msg_box.setDetailedText(journal.describe(limit=500))
+        msg_box.setIcon(QMessageBox.Icon.Information)
+        msg_box.exec()
+        
+    def _start_loader(self, js_path):
+        """Start loading js_path on a worker thread."""
+        if self.is_loading():
+            return False
+            
+        # The prefetcher would only wait on the loader's lock
+        self.stop_prefetching()
+        
+        self.loader = GameDataLoader(self.game_data, js_path, self)
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.loaded.connect(self.on_game_data_loaded)
+        self.loader.failed.connect(self.on_game_data_load_failed)
+        self.loader.cancelled.connect(self.on_game_data_load_cancelled)
+        self.loader.finished.connect(self.on_loader_finished)
+        
+        # Keep the editors read-only while their data is replaced
+        self.tab_widget.setEnabled(False)
+        self.load_progress_bar.setValue(0)
+        self.load_progress_bar.show()
+        
+        self.loader.start()
+        return True
+        
+    def is_loading(self):
+        """Check whether game data is being loaded."""
+        return self.loader is not None and self.loader.isRunning()
+        
+    def cancel_loading(self):
+        """Cancel a load in progress."""
+        if self.is_loading():
+            self.loader.cancel()
+            
+    def on_load_progress(self, event):
+        """Show a LoadProgress event in the status bar."""
+        self.load_progress_bar.setValue(event.percent)
+        self.statusBar().showMessage(event.message)
+        self.load_progress.emit(event)
+        
+    def on_game_data_loaded(self):
+        """Refresh the editors once the loader finished successfully."""
+        if self._reloading:
+            changed = self.game_data.changed_domains
+            self.update_editor_tabs(changed)
+            if changed:
+                self.statusBar().showMessage(f"Reloaded game data: {', '.join(sorted(changed))} changed", 3000)
             else:
-                self.statusBar().showMessage("Failed to load game data", 3000)
-                msg_box = QMessageBox(self)
-                msg_box.setWindowTitle("Error Loading Game Data")
-                msg_box.setText(f"Failed to load game data from {app_js_path}. Check the file format.")
-                msg_box.setIcon(QMessageBox.Icon.Warning)
-                msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-                msg_box.setModal(False)
-                msg_box.show()
-        else:
-            self.statusBar().showMessage("app.js not found", 3000)
+                self.statusBar().showMessage("Reloaded game data: no changes", 3000)
+            self.start_prefetching()
+            return
+            
+        # Check if we're using default characters (this extracts them
+        # right away, the character editor is the first tab anyway)
+        if self.game_data.using_default_characters:
+            self.statusBar().showMessage("Using default character data", 3000)
+            # Use a single-button message box that doesn't block the application flow
             msg_box = QMessageBox(self)
-            msg_box.setWindowTitle("File Not Found")
-            msg_box.setText(f"Could not find js/app.js at {app_js_path}. Default game data will be used.")
-            msg_box.setIcon(QMessageBox.Icon.Warning)
+            msg_box.setWindowTitle("Using Default Characters")
+            msg_box.setText("The editor could not extract character data from your app.js file. "
+                           "This can happen because of minification or different code structure. "
+                           "Default characters have been created for you to edit.\n\n"
+                           "Any changes you make will be saved correctly.")
+            msg_box.setIcon(QMessageBox.Icon.Information)
             msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+            # Show non-modal message box
             msg_box.setModal(False)
             msg_box.show()
+        else:
+            self.statusBar().showMessage("Game data loaded successfully", 3000)
+        
+        # Update the editor tabs with the loaded data
+        self.update_editor_tabs()
+        self.offer_edit_recovery()
+        self.start_prefetching()
+        
+    def offer_edit_recovery(self):
+        """Offer to replay the unsaved edits of a session that crashed."""
+        recovered = self.game_data.recovered_edits
+        if not recovered:
+            return
+        
+        reply = QMessageBox.question(
+            self,
+            "Recover Unsaved Edits",
+            f"The previous session ended without saving {len(recovered)} edit(s) to this app.js.\n\n"
+            "Do you want to restore them?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            domains = self.game_data.replay_recovered_edits()
+            self.update_editor_tabs(domains)
+            self.statusBar().showMessage(f"Restored {len(recovered)} unsaved edit(s)", 3000)
+        else:
+            self.game_data.discard_recovered_edits()
+            
+    def start_prefetching(self):
+        """Extract the domains a lazy load skipped on a background thread."""
+        if not self.game_data.pending_domains():
+            return
+        self.stop_prefetching()
+        self.prefetcher = GameDataPrefetcher(self.game_data, self)
+        self.prefetcher.domain_ready.connect(self.on_domain_prefetched)
+        self.prefetcher.start(QThread.Priority.LowPriority)
+        
+    def stop_prefetching(self):
+        """Stop the background prefetcher, waiting for the domain it is extracting."""
+        if self.prefetcher is not None and self.prefetcher.isRunning():
+            self.prefetcher.cancel()
+            self.prefetcher.wait()
+        self.prefetcher = None
+        
+    def on_domain_prefetched(self, domain):
+        """Show which domain the prefetcher extracted."""
+        self.statusBar().showMessage(f"Extracted {domain} in the background", 2000)
+        
+    def on_game_data_load_failed(self, message):
+        """Report a failed load."""
+        self.statusBar().showMessage("Failed to load game data", 3000)
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Error Loading Game Data")
+        msg_box.setText(f"Failed to load game data from {self.loader.js_path}. Check the file format.\n\n{message}")
+        msg_box.setIcon(QMessageBox.Icon.Warning)
+        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+        msg_box.setModal(False)
+        msg_box.show()
+        
+    def on_game_data_load_cancelled(self):
+        """Report a cancelled load."""
+        self.statusBar().showMessage("Loading game data cancelled", 3000)
+        
+    def on_loader_finished(self):
+        """Re-enable the editors when the loader thread ended."""
+        self.tab_widget.setEnabled(True)
+        self.load_progress_bar.hide()
+        self.load_finished.emit()
+        
+    def closeEvent(self, event):
+        """Stop a running load before the window closes."""
+        if self.is_loading():
+            self.loader.cancel()
+            self.loader.wait()
+        self.stop_prefetching()
+        # A normal exit, the edit log has nothing to recover
+        self.game_data.close()
+        super().closeEvent(event)
     
-    def update_editor_tabs(self):
-        """Update all editor tabs with the loaded game data."""
-        # Update each tab that has an update_data method
-        for i in range(self.tab_widget.count()):
-            tab = self.tab_widget.widget(i)
-            if hasattr(tab, "update_data") and callable(tab.update_data):
-                tab.update_data() 
\ No newline at end of file
+    def reload_game_data(self):
+        """Reload app.js, re-extracting and refreshing only the data that changed."""
+        if self.is_loading():
+            return
+            
+        if not self.game_data.js_path:
+            self.load_game_data()
+            return
+            
+        if self.game_data.has_changes():
+            reply = QMessageBox.question(
+                self,
+                "Unsaved Changes",
+                "Reloading app.js will discard unsaved changes to the data that changed. Continue?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+                
+        self._reloading = True
+        self._start_loader(self.game_data.js_path)
+            
+    def restore_backup(self):
+        """Write a saved version of app.js back from the backup store, then reload it."""
+        if self.is_loading() or not self.game_data.js_path:
+            return
+            
+        versions = self.game_data.list_backups()
+        if not versions:
+            QMessageBox.information(self, "Restore Backup", "There are no backups of this app.js yet.")
+            return
+            
+        # Newest first
+        choices = [version.describe() for version in reversed(versions)]
+        choice, ok = QInputDialog.getItem(self, "Restore Backup", "Version to restore:", choices, 0, False)
+        if not ok:
+            return
+        version = versions[len(versions) - 1 - choices.index(choice)]
+        
+        if self.game_data.has_changes():
+            reply = QMessageBox.question(
+                self,
+                "Unsaved Changes",
+                "Restoring a backup reloads app.js and discards unsaved changes to the data that changed. Continue?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+                
+        if self.game_data.restore_backup(version.number):
+            self.statusBar().showMessage(f"Restored backup #{version.number}", 3000)
+            self._reloading = True
+            self._start_loader(self.game_data.js_path)
+        else:
+            QMessageBox.warning(self, "Restore Backup", f"Could not restore backup #{version.number}.")
+            
+    def export_game_data(self):
+        """Export the records to a directory, one NDJSON file per domain."""
+        if self.is_loading() or not self.game_data.js_path:
+            return
+            
+        directory = QFileDialog.getExistingDirectory(self, "Export Data", self.game_data.export_dir())
+        if not directory:
+            return
+        try:
+            results = self.game_data.export_data(directory)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Export Data", f"Could not export the game data: {str(e)}")
+            return
+        written = sum(1 for result in results.values() if result['written'])
+        self.statusBar().showMessage(f"Exported {written} changed domain(s) of {len(results)}", 3000)
+        
+    def import_game_data(self):
+        """Update the records from an export directory, as one undo step."""
+        if self.is_loading() or not self.game_data.js_path:
+            return
+            
+        directory = QFileDialog.getExistingDirectory(self, "Import Data", self.game_data.export_dir())
+        if not directory:
+            return
+        try:
+            domains = self.game_data.import_data(directory)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import Data", f"Could not import the game data: {str(e)}")
+            return
+        if domains:
+            self.update_editor_tabs(domains)
+        self.statusBar().showMessage(f"Imported {len(domains)} changed domain(s)", 3000)
+            
+    def on_code_file_saved(self, file_path):
+        """Reload the game data when the code editor saves the loaded app.js."""
+        if self.game_data.js_path and os.path.abspath(file_path) == os.path.abspath(self.game_data.js_path):
+            self.reload_game_data()
+
+    def show_record_source(self, domain, record, *field):
+        """
+        Show where a record comes from in app.js in the code editor.
+
+        Args:
+            domain (str): Kind of data, e.g. 'monsters'
+            record (dict): A record of that domain
+            *field: Keys of a value inside the record's source literal
+
+        Returns:
+            bool: False if the record has no known source span
+        """
+        span = self.game_data.get_source_span(domain, record, *field)
+        if span is None or self.code_editor is None:
+            self.statusBar().showMessage("No source location for this record", 3000)
+            return False
+        return self.show_source_range(*span)
+
+    def show_source_range(self, start, end):
+        """
+        Select a range of app.js in the code editor, e.g. a usage of a record.
+
+        Args:
+            start (int): Character offset in the loaded bundle
+            end (int): Offset just past the range
+
+        Returns:
+            bool: False if app.js couldn't be opened
+        """
+        if self.code_editor is None:
+            return False
+        js_path = self.game_data.js_path
+        if self.code_editor.current_file is None or os.path.abspath(self.code_editor.current_file) != os.path.abspath(js_path):
+            if not self.code_editor.load_file(js_path):
+                return False
+
+        self.tab_widget.setCurrentWidget(self.code_editor)
+        self.code_editor.select_range(start, end)
+        return True
+
+    def show_search(self):
+        """Open the global search over the records of every domain."""
+        if self.is_loading():
+            self.statusBar().showMessage("Game data is still loading", 3000)
+            return
+        if not self.game_data.js_path:
+            self.statusBar().showMessage("No game data loaded", 3000)
+            return
+        SearchDialog(self.game_data, self.open_record, self).exec()
+
+    def open_record(self, domain, record):
+        """Show a record in its editor tab, e.g. a search result."""
+        tab = self.domain_tabs.get(domain)
+        if tab is None or not hasattr(tab, 'select_record'):
+            return
+        self.tab_widget.setCurrentWidget(tab)
+        tab.select_record(record)
+
+    def update_editor_tabs(self, domains=None):
+        """
+        Update editor tabs with the loaded game data.
+        
+        Args:
+            domains (set): Names of the data that changed (e.g. {'monsters'});
+                None updates every tab
+        """
+        if domains is not None:
+            tabs = [self.domain_tabs[domain] for domain in domains if domain in self.domain_tabs]
+        else:
+            tabs = [self.tab_widget.widget(i) for i in range(self.tab_widget.count())]
+            
+        # Only the visible editor is refreshed now; hidden editors are marked
+        # stale and refreshed by on_tab_changed(), so their data is only
+        # extracted when they are first shown
+        current_tab = self.tab_widget.currentWidget()
+        for tab in tabs:
+            if not (hasattr(tab, "update_data") and callable(tab.update_data)):
+                continue
+            if tab is current_tab or tab not in self.domain_tabs.values():
+                tab.update_data()
+            else:
+                self._stale_tabs.add(tab) 
\ No newline at end of file
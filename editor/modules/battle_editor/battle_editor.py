@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QPen, QBrush
 import random
+from editor.utils.usages import show_usages, confirm_delete
 
 class BattleEditorTab(QWidget):
     """Tab for editing game battles with visual elements."""
@@ -50,6 +51,9 @@ class BattleEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_battle)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Right side - Battle details
@@ -253,6 +257,7 @@ class BattleEditorTab(QWidget):
         self.preview_box.setEnabled(enabled)
         self.enemies_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_battle(self):
         """Add a new battle."""
@@ -279,12 +284,26 @@ class BattleEditorTab(QWidget):
         if not self.current_battle:
             return
             
+        # Warn about the places still using it
+        if not confirm_delete(self, self.game_data, 'battles', self.current_battle):
+            return
+            
         # Remove from the game data
         self.game_data.battles.remove(self.current_battle)
         
         # Update the UI
         self.update_data()
         
+    def find_usages(self):
+        """Show where the selected battle is used."""
+        show_usages(self, self.game_data, 'battles', self.current_battle)
+        
+    def select_record(self, record):
+        """Select a battle in the list, e.g. a result of the global search."""
+        row = self.game_data.battles.index_of(record)
+        if row is not None:
+            self.battle_list.setCurrentRow(row)
+        
     def add_enemy(self):
         """Add an enemy to the current battle."""
         if not self.current_battle:
@@ -295,6 +314,7 @@ class BattleEditorTab(QWidget):
         
         # Add to the battle
         self.current_battle['enemies'].append(enemy)
+        self.game_data.record_changed(self.current_battle)
         
         # Update the UI
         self.update_enemy_list()
@@ -315,6 +335,7 @@ class BattleEditorTab(QWidget):
         # Remove from the battle
         if enemy in self.current_battle['enemies']:
             self.current_battle['enemies'].remove(enemy)
+            self.game_data.record_changed(self.current_battle)
             
         # Update the UI
         self.update_enemy_list()
@@ -328,6 +349,9 @@ class BattleEditorTab(QWidget):
         # Update the battle with the form values
         self.current_battle['name'] = self.name_edit.text()
         
+        # Journal the edited fields and update the lookup indexes
+        self.game_data.record_changed(self.current_battle)
+        
         # Update the UI
         self.update_data()
         
@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
                            QCheckBox, QDialog, QFileDialog, QDialogButtonBox)
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QPixmap
+from editor.utils.usages import show_usages, confirm_delete
 
 class SpriteSheetDialog(QDialog):
     """Dialog for viewing and managing the full sprite sheet."""
@@ -137,6 +138,9 @@ class CharacterEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_character)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Right side - Character details
@@ -466,8 +470,8 @@ class CharacterEditorTab(QWidget):
         # Reload the character image to show the new job's sprite
         self.load_character_image()
         
-        # Mark the game data as changed
-        self.game_data.mark_as_changed()
+        # Journal the new job
+        self.game_data.record_changed(self.current_character)
     
     def on_animation_changed(self, index):
         """Handle changes to the animation dropdown."""
@@ -674,6 +678,7 @@ class CharacterEditorTab(QWidget):
         self.details_tabs.setEnabled(enabled)
         self.image_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_character(self):
         """Add a new character."""
@@ -721,9 +726,6 @@ class CharacterEditorTab(QWidget):
         # Add to the game data
         self.game_data.characters.append(new_character)
         
-        # Mark the game data as changed
-        self.game_data.mark_as_changed()
-        
         # Update the UI
         self.update_data()
         
@@ -738,15 +740,26 @@ class CharacterEditorTab(QWidget):
         if not self.current_character:
             return
             
+        # Warn about the places still using it
+        if not confirm_delete(self, self.game_data, 'characters', self.current_character):
+            return
+            
         # Remove from the game data
         self.game_data.characters.remove(self.current_character)
         
-        # Mark the game data as changed
-        self.game_data.mark_as_changed()
-        
         # Update the UI
         self.update_data()
         
+    def find_usages(self):
+        """Show where the selected character is used."""
+        show_usages(self, self.game_data, 'characters', self.current_character)
+        
+    def select_record(self, record):
+        """Select a character in the list, e.g. a result of the global search."""
+        row = self.game_data.characters.index_of(record)
+        if row is not None:
+            self.character_list.setCurrentRow(row)
+        
     def save_character(self):
         """Save changes to the selected character."""
         if not self.current_character:
@@ -839,8 +852,8 @@ class CharacterEditorTab(QWidget):
             # Only update if it's a job-based sprite
             self.current_character['sprite'] = sprite_base
         
-        # Mark the game data as changed
-        self.game_data.mark_as_changed()
+        # Journal the edited fields and update the lookup indexes
+        self.game_data.record_changed(self.current_character)
         
         # Update the UI
         self.update_data()
@@ -8,8 +8,8 @@ import os
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
                            QPushButton, QFileDialog, QLabel, QMessageBox,
                            QSplitter)
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont, QFontMetrics, QColor, QTextCharFormat, QSyntaxHighlighter
+from PyQt6.QtCore import Qt, QSize, pyqtSignal
+from PyQt6.QtGui import QFont, QFontMetrics, QColor, QTextCharFormat, QSyntaxHighlighter, QTextCursor
 
 class SimpleJsSyntaxHighlighter(QSyntaxHighlighter):
     """Simple syntax highlighter for JavaScript code."""
@@ -62,7 +62,9 @@ class SimpleJsSyntaxHighlighter(QSyntaxHighlighter):
                     # Word boundary matching (simplified)
                     word = pattern[2:-2]  # Remove \b from start and end
                     i = text.find(word, i)
-                    if i >= 0 and (i == 0 or not text[i-1].isalnum()) and (i + len(word) == len(text) or not text[i + len(word)].isalnum()):
+                    if i < 0:
+                        break
+                    if (i == 0 or not text[i-1].isalnum()) and (i + len(word) == len(text) or not text[i + len(word)].isalnum()):
                         self.setFormat(i, len(word), format)
                         i += len(word)
                     else:
@@ -92,6 +94,9 @@ class SimpleJsSyntaxHighlighter(QSyntaxHighlighter):
 class CodeEditorTab(QWidget):
     """Tab for editing code files."""
     
+    # Emitted with the file path after a file was saved
+    file_saved = pyqtSignal(str)
+    
     def __init__(self):
         super().__init__()
         self.current_file = None
@@ -148,6 +153,25 @@ class CodeEditorTab(QWidget):
             )
             return False
     
+    def select_range(self, start, end):
+        """
+        Select part of the loaded file and scroll to it.
+        
+        Args:
+            start (int): Character offset of the first selected character
+            end (int): Character offset just past the selection
+        """
+        text = self.editor.toPlainText()
+        # Qt counts positions in UTF-16 code units, Python in code points
+        start, end = (len(text[:offset].encode('utf-16-le')) // 2 for offset in (start, end))
+        
+        cursor = self.editor.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+        self.editor.setFocus()
+    
     def open_file(self):
         """Open a file dialog to select a file to edit."""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -173,6 +197,7 @@ class CodeEditorTab(QWidget):
                 "Success",
                 "File saved successfully!"
             )
+            self.file_saved.emit(self.current_file)
         except Exception as e:
             QMessageBox.critical(
                 self,
@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
                            QTreeWidgetItem, QSplitter)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QPen, QBrush, QIcon, QLinearGradient, QRadialGradient
+from editor.utils.usages import show_usages, confirm_delete
 
 class ItemEditorTab(QWidget):
     """Tab for editing game items with visual elements."""
@@ -14,6 +15,7 @@ class ItemEditorTab(QWidget):
         super().__init__()
         self.game_data = game_data
         self.current_item = None
+        self.item_nodes = {}        # Item name -> its node in the item tree
         
         # Define item type colors
         self.type_colors = {
@@ -94,6 +96,9 @@ class ItemEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_item)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Right side - Item details
@@ -292,10 +297,8 @@ class ItemEditorTab(QWidget):
         self.subtype_combo.clear()
         
         # Find existing subcategories for this type
-        existing_subcategories = set()
-        for item in self.game_data.items:
-            if item.get('type') == item_type and item.get('category'):
-                existing_subcategories.add(item.get('category'))
+        existing_subcategories = {item.get('category') for item in self.game_data.find_records('items', 'type', item_type)
+                                  if item.get('category')}
         
         # If we have existing subcategories, show those
         if existing_subcategories:
@@ -308,6 +311,7 @@ class ItemEditorTab(QWidget):
         """Update the UI with the latest game data."""
         # Clear the tree
         self.item_tree.clear()
+        self.item_nodes = {}
         
         # Find which categories and subcategories actually exist in the game data
         existing_types = set()
@@ -363,6 +367,7 @@ class ItemEditorTab(QWidget):
             # Create item node
             item_node = QTreeWidgetItem([item_name])
             item_node.setData(0, Qt.ItemDataRole.UserRole, {"type": "item", "value": item_name})
+            self.item_nodes.setdefault(item_name, item_node)
             
             # Add to specific subcategory if available
             if item_category and (item_type, item_category) in subcategory_nodes:
@@ -507,6 +512,7 @@ class ItemEditorTab(QWidget):
         # Update the item's type
         item_type = self.type_combo.currentText()
         self.current_item['type'] = item_type
+        self.game_data.record_changed(self.current_item)
         
         # Update the subtype combo
         self.update_subtype_combo(item_type)
@@ -710,6 +716,7 @@ class ItemEditorTab(QWidget):
         self.details_tabs.setEnabled(enabled)
         self.image_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_item(self):
         """Add a new item."""
@@ -724,10 +731,8 @@ class ItemEditorTab(QWidget):
         selected_subcategory = ""
         
         # Find existing subcategories for this type
-        existing_subcategories = set()
-        for item in self.game_data.items:
-            if item.get('type') == selected_category and item.get('category'):
-                existing_subcategories.add(item.get('category'))
+        existing_subcategories = {item.get('category') for item in self.game_data.find_records('items', 'type', selected_category)
+                                  if item.get('category')}
         
         # Use first existing subcategory if available
         if existing_subcategories:
@@ -773,12 +778,9 @@ class ItemEditorTab(QWidget):
             }
         }
         
-        # Add to the game data
+        # Add to the game data (the change journal records the addition)
         self.game_data.items.append(new_item)
         
-        # Mark data as changed
-        self.game_data.mark_as_changed()
-        
         # Update the UI
         self.update_data()
         
@@ -791,25 +793,25 @@ class ItemEditorTab(QWidget):
         if not self.current_item:
             return
         
-        # Get the name of the selected item
-        item_name = self.current_item.get('name', '')
-        
-        # Confirm deletion
-        reply = QMessageBox.question(self, "Confirm Delete",
-                                 f"Are you sure you want to delete '{item_name}'?",
-                                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                                 QMessageBox.StandardButton.No)
-                                 
-        if reply == QMessageBox.StandardButton.Yes:
+        # Confirm deletion, warning about the shops and drops still using it
+        if confirm_delete(self, self.game_data, 'items', self.current_item):
             # Remove from the game data
-            self.game_data.items = [item for item in self.game_data.items if item.get('name') != item_name]
-            
-            # Mark data as changed
-            self.game_data.mark_as_changed()
+            self.game_data.items.remove(self.current_item)
             
             # Update the UI
             self.update_data()
         
+    def find_usages(self):
+        """Show the shops and monster drops using the selected item."""
+        show_usages(self, self.game_data, 'items', self.current_item)
+        
+    def select_record(self, record):
+        """Select an item in the tree, e.g. a result of the global search."""
+        # The item may be in a category the filter hides
+        if self.category_filter.currentIndex() != 0:
+            self.category_filter.setCurrentIndex(0)
+        self.select_item_by_name(record['name'])
+        
     def save_item(self):
         """Save changes to the selected item."""
         if not self.current_item:
@@ -866,8 +868,8 @@ class ItemEditorTab(QWidget):
         for stat, spin in self.stat_bonuses.items():
             self.current_item['stat_bonuses'][stat] = spin.value()
         
-        # Mark the game data as changed
-        self.game_data.mark_as_changed()
+        # Journal the edited fields and update the lookup indexes
+        self.game_data.record_changed(self.current_item)
         
         # Check if the type or category changed
         type_changed = original_type != self.current_item['type']
@@ -889,30 +891,13 @@ class ItemEditorTab(QWidget):
         
     def select_item_by_name(self, item_name):
         """Find and select an item in the tree by its name."""
-        # Expand all items to ensure we can find the item
+        # Expand all items to ensure the item is visible
         self.item_tree.expandAll()
         
-        # Find the item in the tree
-        for i in range(self.item_tree.topLevelItemCount()):
-            category = self.item_tree.topLevelItem(i)
-            
-            # Check each child of the category
-            for j in range(category.childCount()):
-                child = category.child(j)
-                
-                # If this is a subcategory, check its children
-                child_data = child.data(0, Qt.ItemDataRole.UserRole)
-                if child_data and child_data.get('type') == 'subcategory':
-                    for k in range(child.childCount()):
-                        item = child.child(k)
-                        item_data = item.data(0, Qt.ItemDataRole.UserRole)
-                        if item_data and item_data.get('type') == 'item' and item_data.get('value') == item_name:
-                            self.item_tree.setCurrentItem(item)
-                            return
-                # If this is an item directly under category
-                elif child_data and child_data.get('type') == 'item' and child_data.get('value') == item_name:
-                    self.item_tree.setCurrentItem(child)
-                    return
+        # Nodes are looked up by name, see update_data()
+        item_node = self.item_nodes.get(item_name)
+        if item_node is not None:
+            self.item_tree.setCurrentItem(item_node)
         
     def save_changes(self):
         """Save all changes to the game data."""
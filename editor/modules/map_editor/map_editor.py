@@ -1,16 +1,33 @@
 import os
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, 
                            QGroupBox, QFormLayout, QLabel, QLineEdit, 
-                           QSpinBox, QComboBox, QPushButton, QScrollArea,
-                           QGridLayout)
+                           QSpinBox, QComboBox, QPushButton)
 from PyQt6.QtCore import Qt, QSize, QUrl, QByteArray
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QIcon
-from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineScript
-from PyQt6.QtWebChannel import QWebChannel
-import json
+# The PixiJS view needs QtWebEngine, without it the map is drawn by TileMapView
+try:
+    from PyQt6.QtWebEngineWidgets import QWebEngineView
+    from PyQt6.QtWebEngineCore import QWebEngineScript
+    from PyQt6.QtWebChannel import QWebChannel
+    WEB_ENGINE_AVAILABLE = True
+except ImportError:
+    WEB_ENGINE_AVAILABLE = False
+from editor.utils.usages import show_usages, confirm_delete
+from editor.core.map_grid import new_grid, as_grid, resize_grid
+from editor.core.map_tools import flood_fill, fill_rectangle, draw_line, copy_stamp, paste_stamp
 
-from .map_web_channel import MapWebChannel
+from .map_web_channel import MapWebChannel, MapTransport
+from .tile_map_view import TileMapView, tile_color
+
+# Editing tools: name shown -> name used by use_tool() and the PixiJS view
+MAP_TOOLS = {
+    "Brush": "brush",
+    "Fill": "fill",
+    "Rectangle": "rectangle",
+    "Line": "line",
+    "Copy": "copy",
+    "Paste": "paste"
+}
 
 class TileButton(QPushButton):
     """Custom button for map tiles."""
@@ -26,23 +43,12 @@ class TileButton(QPushButton):
         
     def update_appearance(self):
         """Update the button appearance based on tile type."""
-        # Define colors for different tile types
-        colors = {
-            0: QColor(0, 128, 0),    # Grass
-            1: QColor(139, 69, 19),  # Dirt
-            2: QColor(0, 0, 255),    # Water
-            3: QColor(128, 128, 128), # Stone
-            4: QColor(210, 180, 140), # Sand
-            5: QColor(0, 0, 0)       # Wall
-        }
-        
         # Create a pixmap for the tile
         pixmap = QPixmap(32, 32)
         painter = QPainter(pixmap)
         
-        # Fill with the tile color
-        color = colors.get(self.tile_type, QColor(255, 255, 255))
-        painter.fillRect(0, 0, 32, 32, color)
+        # Fill with the tile color, the same as on the map
+        painter.fillRect(0, 0, 32, 32, tile_color(self.tile_type))
         
         # Draw a border
         painter.setPen(QPen(QColor(0, 0, 0)))
@@ -62,10 +68,12 @@ class MapEditorTab(QWidget):
         self.game_data = game_data
         self.current_map = None
         self.current_tile_type = 0
-        self.map_tiles = []
+        self.current_tool = "brush"
+        self.tool_start = None      # Cell pressed with the rectangle, line or copy tool
+        self.stamp = None           # Tiles copied with the copy tool
         
-        # Flag to indicate if we're using the old grid or the new PixiJS view
-        self.using_pixi = True
+        # Flag to indicate if we're using the scene renderer or the PixiJS view
+        self.using_pixi = WEB_ENGINE_AVAILABLE
         
         self.init_ui()
         
@@ -91,6 +99,9 @@ class MapEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_map)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Map details
@@ -103,19 +114,19 @@ class MapEditorTab(QWidget):
         
         # Width field
         self.width_spin = QSpinBox()
-        self.width_spin.setRange(10, 100)
+        self.width_spin.setRange(1, 1024)
         self.width_spin.valueChanged.connect(self.on_size_changed)
         details_layout.addRow("Width:", self.width_spin)
         
         # Height field
         self.height_spin = QSpinBox()
-        self.height_spin.setRange(10, 100)
+        self.height_spin.setRange(1, 1024)
         self.height_spin.valueChanged.connect(self.on_size_changed)
         details_layout.addRow("Height:", self.height_spin)
         
         # Tileset field
         self.tileset_combo = QComboBox()
-        self.tileset_combo.addItems(["town", "castle", "forest", "dungeon"])
+        self.tileset_combo.addItems(["field", "town", "castle", "forest", "dungeon"])
         self.tileset_combo.currentTextChanged.connect(self.on_tileset_changed)
         details_layout.addRow("Tileset:", self.tileset_combo)
         
@@ -140,6 +151,14 @@ class MapEditorTab(QWidget):
             tile_button.clicked.connect(lambda checked, tile_type=i: self.set_current_tile_type(tile_type))
             palette_layout.addWidget(tile_button)
             
+        # Tool selection
+        palette_layout.addStretch()
+        palette_layout.addWidget(QLabel("Tool:"))
+        self.tool_combo = QComboBox()
+        self.tool_combo.addItems(list(MAP_TOOLS))
+        self.tool_combo.currentTextChanged.connect(self.set_current_tool)
+        palette_layout.addWidget(self.tool_combo)
+            
         self.palette_box.setLayout(palette_layout)
         right_layout.addWidget(self.palette_box)
         
@@ -151,13 +170,17 @@ class MapEditorTab(QWidget):
             # Initialize web channel for communication with JavaScript
             self.web_channel = QWebChannel()
             self.map_handler = MapWebChannel()
-            self.map_handler.tileUpdated.connect(self.on_web_tile_updated)
+            self.map_handler.cellsPainted.connect(self.on_web_cells_painted)
+            self.map_handler.toolUsed.connect(self.use_tool)
             self.web_channel.registerObject("mapHandler", self.map_handler)
             
             # Create a web view for the PixiJS map editor
             self.web_view = QWebEngineView()
             self.web_view.page().setWebChannel(self.web_channel)
             
+            # Tiles go to the page packed, as diffs once it has the map
+            self.map_transport = MapTransport(self.web_view.page().runJavaScript, self)
+            
             # Get the absolute path to the HTML file
             current_dir = os.path.dirname(os.path.abspath(__file__))
             html_path = os.path.join(current_dir, "pixi_map_editor.html")
@@ -169,20 +192,24 @@ class MapEditorTab(QWidget):
             # Add the web view to the layout
             self.map_layout.addWidget(self.web_view)
         else:
-            # Create the traditional grid view (as a fallback)
-            # Create a scroll area for the map
-            self.scroll_area = QScrollArea()
-            self.scroll_area.setWidgetResizable(True)
-            self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
-            self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
+            # Draw the map from a tile atlas in a graphics view (as a fallback)
+            self.map_view = TileMapView()
+            self.map_view.cellPressed.connect(self.on_cell_pressed)
+            self.map_view.cellDragged.connect(self.on_cell_dragged)
+            self.map_view.cellReleased.connect(self.on_cell_released)
             
-            # Create a widget to hold the map grid
-            self.map_widget = QWidget()
-            self.grid_layout = QGridLayout(self.map_widget)
-            self.grid_layout.setSpacing(0)
-            self.scroll_area.setWidget(self.map_widget)
+            # Zoom buttons, Ctrl+wheel zooms too
+            zoom_layout = QHBoxLayout()
+            zoom_out_button = QPushButton("Zoom Out")
+            zoom_out_button.clicked.connect(self.map_view.zoom_out)
+            zoom_in_button = QPushButton("Zoom In")
+            zoom_in_button.clicked.connect(self.map_view.zoom_in)
+            zoom_layout.addWidget(zoom_out_button)
+            zoom_layout.addWidget(zoom_in_button)
+            zoom_layout.addStretch()
             
-            self.map_layout.addWidget(self.scroll_area)
+            self.map_layout.addLayout(zoom_layout)
+            self.map_layout.addWidget(self.map_view)
         
         self.map_box.setLayout(self.map_layout)
         right_layout.addWidget(self.map_box)
@@ -196,73 +223,54 @@ class MapEditorTab(QWidget):
         
     def on_web_view_loaded(self, success):
         """Handle web view loaded event."""
+        # The page holds nothing yet, even if it was showing a map
+        self.map_transport.reset()
         if success and self.current_map:
             # Initialize the map in the web view
             self.init_pixi_map()
-            
-            # Set up JavaScript communication with web channel
-            self.web_view.page().runJavaScript("""
-                // Set up the connection to the Qt WebChannel
-                if (typeof qt !== 'undefined' && typeof qt.webChannelTransport !== 'undefined') {
-                    new QWebChannel(qt.webChannelTransport, function(channel) {
-                        window.mapHandler = channel.objects.mapHandler;
-                        
-                        // Override the tile click event to use the web channel
-                        document.addEventListener('tileClicked', function(e) {
-                            var detail = JSON.parse(e.detail);
-                            if (window.mapHandler) {
-                                window.mapHandler.tileClicked(detail.x, detail.y, detail.type);
-                            }
-                        });
-                    });
-                }
-            """)
     
-    def on_web_tile_updated(self, x, y, tile_type):
-        """Handle tile update from the web view."""
-        if not self.current_map:
+    def on_web_cells_painted(self, layer, indices, values):
+        """Handle a batch of tiles painted in the web view."""
+        if not self.current_map or layer != 'tiles':
             return
         
         # Make sure the map has a tiles array
         if 'tiles' not in self.current_map:
-            self.current_map['tiles'] = [[0 for _ in range(self.current_map['width'])] for _ in range(self.current_map['height'])]
-        
-        # Update the tile in the data structure
-        if 0 <= y < len(self.current_map['tiles']) and 0 <= x < len(self.current_map['tiles'][y]):
-            self.current_map['tiles'][y][x] = tile_type
+            self.current_map['tiles'] = new_grid(self.current_map['width'], self.current_map['height'])
+        
+        # Update the tiles in the data structure, one journal update for the batch
+        tiles = self.current_map['tiles']
+        inside = indices < tiles.size
+        indices, values = indices[inside], values[inside]
+        if len(indices):
+            tiles.reshape(-1)[indices] = values
+            self.map_transport.acknowledge(layer, indices, values)
+            self.game_data.record_changed(self.current_map)
     
     def init_pixi_map(self):
-        """Initialize the PixiJS map with the current map data."""
+        """Show the current map in the PixiJS view, sending only what it doesn't have."""
         if not self.current_map or not self.using_pixi:
             return
             
-        # Prepare map data for the web view
-        map_data = {
-            'width': self.current_map['width'],
-            'height': self.current_map['height'],
-            'tileset': self.current_map['tileset'],
-            'tiles': [[0 for _ in range(self.current_map['width'])] for _ in range(self.current_map['height'])]
+        if 'tiles' not in self.current_map:
+            self.current_map['tiles'] = new_grid(self.current_map['width'], self.current_map['height'])
+        tiles = self.current_map['tiles']
+        meta = {
+            'width': int(tiles.shape[1]),
+            'height': int(tiles.shape[0]),
+            'tileset': self.current_map['tileset']
         }
-        
-        # If the map has tile data, use it
-        if 'tiles' in self.current_map:
-            map_data['tiles'] = self.current_map['tiles']
-            
-        # Send the map data to the web view
-        message = json.dumps({"action": "init_map", "data": map_data})
-        js_code = f"receiveMessageFromPython('{message}');"
-        self.web_view.page().runJavaScript(js_code)
+        self.map_transport.show_map(id(self.current_map), meta, {'tiles': tiles})
     
     def on_tileset_changed(self, tileset_name):
         """Handle tileset change."""
         if self.current_map:
             self.current_map['tileset'] = tileset_name
+            self.game_data.record_changed(self.current_map)
             
             if self.using_pixi:
-                # Update the tileset in the web view
-                message = json.dumps({"action": "load_tileset", "data": {"tileset": tileset_name}})
-                js_code = f"receiveMessageFromPython('{message}');"
-                self.web_view.page().runJavaScript(js_code)
+                # Load the tileset in the web view, the tiles aren't sent again
+                self.init_pixi_map()
         
     def update_data(self):
         """Update the UI with the latest game data."""
@@ -276,6 +284,8 @@ class MapEditorTab(QWidget):
         # Clear the current selection
         self.current_map = None
         self.enable_details(False)
+        if not self.using_pixi:
+            self.map_view.set_grid(None)
         
     def on_map_selected(self, current, previous):
         """Handle selection of a map in the list."""
@@ -291,8 +301,13 @@ class MapEditorTab(QWidget):
         if self.current_map:
             # Update the details
             self.name_edit.setText(self.current_map['name'])
+            # Showing the size isn't resizing the map
+            self.width_spin.blockSignals(True)
+            self.height_spin.blockSignals(True)
             self.width_spin.setValue(self.current_map['width'])
             self.height_spin.setValue(self.current_map['height'])
+            self.width_spin.blockSignals(False)
+            self.height_spin.blockSignals(False)
             
             # Set the tileset
             tileset_index = self.tileset_combo.findText(self.current_map['tileset'])
@@ -315,75 +330,119 @@ class MapEditorTab(QWidget):
         
         if self.using_pixi:
             # Update the current tile type in the web view
-            message = json.dumps({"action": "set_tile_type", "data": {"tileType": tile_type}})
-            js_code = f"receiveMessageFromPython('{message}');"
-            self.web_view.page().runJavaScript(js_code)
+            self.map_transport.send_message("set_tile_type", {"tileType": tile_type})
             
     def on_size_changed(self):
         """Handle change of map size."""
         if not self.current_map:
             return
             
-        # Update the map size
+        # Update the map size, cropping or padding its grid
         self.current_map['width'] = self.width_spin.value()
         self.current_map['height'] = self.height_spin.value()
+        if 'tiles' in self.current_map:
+            self.current_map['tiles'] = resize_grid(as_grid(self.current_map['tiles']),
+                                                    self.current_map['width'], self.current_map['height'])
+        self.game_data.record_changed(self.current_map)
         
         if self.using_pixi:
-            # Resize the map in the web view
-            message = json.dumps({"action": "resize_map", "data": {"width": self.current_map["width"], "height": self.current_map["height"]}})
-            js_code = f"receiveMessageFromPython('{message}');"
-            self.web_view.page().runJavaScript(js_code)
+            # Resize the map in the web view, which gets the resized grid
+            self.init_pixi_map()
         else:
             # Recreate the traditional map grid
             self.create_map_grid()
         
     def create_map_grid(self):
-        """Create the grid of tiles for the map."""
+        """Show the map's grid in the map view."""
         # This is used only when not using PixiJS
         if self.using_pixi:
             return
             
-        # Clear the existing grid
-        self.map_tiles = []
-        
-        # Remove all widgets from the grid layout
-        while self.grid_layout.count():
-            item = self.grid_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-                
-        # Create new tile buttons
-        for y in range(self.current_map['height']):
-            row = []
-            for x in range(self.current_map['width']):
-                # Get tile type if available
-                tile_type = 0
-                if 'tiles' in self.current_map and y < len(self.current_map['tiles']) and x < len(self.current_map['tiles'][y]):
-                    tile_type = self.current_map['tiles'][y][x]
+        # Make sure the map has a grid; the view draws it in place, not a copy
+        if 'tiles' not in self.current_map:
+            self.current_map['tiles'] = new_grid(self.current_map['width'], self.current_map['height'])
+        self.map_view.set_grid(self.current_map['tiles'])
+            
+    def set_current_tool(self, tool_name):
+        """Set the current editing tool."""
+        self.current_tool = MAP_TOOLS[tool_name]
+        self.tool_start = None
+        
+        if self.using_pixi:
+            # The web view paints with the brush, and reports the other tools
+            self.map_transport.send_message("set_tool", {"tool": self.current_tool})
+            
+    def on_cell_pressed(self, x, y):
+        """Handle the mouse pressed on a tile of the map view."""
+        if self.current_tool == "brush":
+            self.on_tile_clicked(x, y)
+        elif self.current_tool in ("fill", "paste"):
+            self.use_tool(self.current_tool, x, y, x, y)
+        else:
+            self.tool_start = (x, y)
+            
+    def on_cell_dragged(self, x, y):
+        """Handle the mouse dragged onto another tile of the map view."""
+        if self.current_tool == "brush":
+            self.on_tile_clicked(x, y)
+            
+    def on_cell_released(self, x, y):
+        """Handle the mouse released on a tile of the map view, ending a rectangle, line or copy."""
+        if self.tool_start is not None:
+            x0, y0 = self.tool_start
+            self.tool_start = None
+            self.use_tool(self.current_tool, x0, y0, x, y)
+            
+    def use_tool(self, tool, x0, y0, x1, y1):
+        """
+        Apply a tool to the current map, as one undo step and one update of the view.
+        
+        Args:
+            tool (str): 'fill' or 'paste' (at x0, y0), 'rectangle', 'line' or 'copy'
+                (from x0, y0 to x1, y1)
+        """
+        if not self.current_map or 'tiles' not in self.current_map:
+            return
+        tiles = self.current_map['tiles']
+        
+        if tool == "copy":
+            self.stamp = copy_stamp(tiles, x0, y0, x1, y1)
+            return
+        if tool == "paste" and self.stamp is None:
+            return
+            
+        with self.game_data.history.transaction(f"{tool.title()} on {self.current_map['name']}"):
+            if tool == "fill":
+                ys, xs = flood_fill(tiles, x0, y0, self.current_tile_type)
+            elif tool == "rectangle":
+                ys, xs = fill_rectangle(tiles, x0, y0, x1, y1, self.current_tile_type)
+            elif tool == "line":
+                ys, xs = draw_line(tiles, x0, y0, x1, y1, self.current_tile_type)
+            elif tool == "paste":
+                ys, xs = paste_stamp(tiles, self.stamp, x0, y0)
+            else:
+                return
+            if len(ys):
+                self.game_data.record_changed(self.current_map)
                 
-                # Create a tile button
-                tile_button = TileButton(x, y, tile_type)
-                tile_button.clicked.connect(lambda checked, x=x, y=y: self.on_tile_clicked(x, y))
-                self.grid_layout.addWidget(tile_button, y, x)
-                row.append(tile_button)
-            self.map_tiles.append(row)
+        # One diff for the whole change
+        if len(ys):
+            if self.using_pixi:
+                self.map_transport.update({'tiles': tiles})
+            else:
+                self.map_view.refresh_cells(ys, xs)
             
     def on_tile_clicked(self, x, y):
-        """Handle click on a map tile."""
-        if not self.current_map or y >= len(self.map_tiles) or x >= len(self.map_tiles[y]):
+        """Handle click on (or drag over) a map tile."""
+        if not self.current_map or 'tiles' not in self.current_map:
             return
             
-        # Set the tile type
-        tile_button = self.map_tiles[y][x]
-        tile_button.tile_type = self.current_tile_type
-        tile_button.update_appearance()
-        
-        # Update map tile data
-        if 'tiles' not in self.current_map:
-            self.current_map['tiles'] = [[0 for _ in range(self.current_map['width'])] for _ in range(self.current_map['height'])]
-        
-        if y < len(self.current_map['tiles']) and x < len(self.current_map['tiles'][y]):
-            self.current_map['tiles'][y][x] = self.current_tile_type
+        # Update map tile data, repainting only that tile
+        tiles = self.current_map['tiles']
+        if y < tiles.shape[0] and x < tiles.shape[1] and tiles[y, x] != self.current_tile_type:
+            tiles[y, x] = self.current_tile_type
+            self.game_data.record_changed(self.current_map)
+            self.map_view.refresh_cells((y,), (x,))
         
     def enable_details(self, enabled):
         """Enable or disable the details widgets."""
@@ -391,6 +450,7 @@ class MapEditorTab(QWidget):
         self.palette_box.setEnabled(enabled)
         self.map_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_map(self):
         """Add a new map."""
@@ -400,7 +460,7 @@ class MapEditorTab(QWidget):
             'width': 20,
             'height': 15,
             'tileset': "town",
-            'tiles': [[0 for _ in range(20)] for _ in range(15)]
+            'tiles': new_grid(20, 15)
         }
         
         # Add to the game data
@@ -420,12 +480,26 @@ class MapEditorTab(QWidget):
         if not self.current_map:
             return
             
+        # Warn about the places still using it
+        if not confirm_delete(self, self.game_data, 'maps', self.current_map):
+            return
+            
         # Remove from the game data
         self.game_data.maps.remove(self.current_map)
         
         # Update the UI
         self.update_data()
         
+    def find_usages(self):
+        """Show where the selected map is used."""
+        show_usages(self, self.game_data, 'maps', self.current_map)
+        
+    def select_record(self, record):
+        """Select a map in the list, e.g. a result of the global search."""
+        row = self.game_data.maps.index_of(record)
+        if row is not None:
+            self.map_list.setCurrentRow(row)
+        
     def save_map(self):
         """Save changes to the selected map."""
         if not self.current_map:
@@ -437,32 +511,19 @@ class MapEditorTab(QWidget):
         self.current_map['height'] = self.height_spin.value()
         self.current_map['tileset'] = self.tileset_combo.currentText()
         
-        # If using PixiJS, get the tile data from the web view
-        if self.using_pixi:
-            # Ask the web view for the current tile data
-            self.web_view.page().runJavaScript(
-                "JSON.stringify(mapGrid.map(row => row.map(tile => tile.tileData.type)))",
-                self.update_map_tiles
-            )
+        # Journal the edited fields and update the lookup indexes
+        self.game_data.record_changed(self.current_map)
         
-        # Update the UI
+        # Update the UI, which clears the selection
+        map_name = self.current_map['name']
         self.update_data()
         
         # Reselect the map
         for i in range(self.map_list.count()):
-            if self.map_list.item(i).text() == self.current_map['name']:
+            if self.map_list.item(i).text() == map_name:
                 self.map_list.setCurrentRow(i)
                 break
     
-    def update_map_tiles(self, tiles_json):
-        """Update map tiles from JSON string."""
-        if tiles_json and self.current_map:
-            try:
-                tiles = json.loads(tiles_json)
-                self.current_map['tiles'] = tiles
-            except json.JSONDecodeError:
-                print("Error decoding tile data from PixiJS")
-                
     def save_changes(self):
         """Save all changes to the game data."""
         # This would be called from the main window
@@ -1,38 +1,199 @@
 """
 Web channel for communication between PyQt and the PixiJS map editor.
+
+Tiles cross the channel packed, never as JSON arrays:
+
+- a whole layer (a 2-D grid of tile values) is sent as its little-endian
+  uint16 bytes, zlib-compressed and base64-encoded; the page inflates it
+  with DecompressionStream straight into a Uint16Array;
+- edits are sent as diff batches, (flat index, value) pairs packed in a
+  little-endian Uint32Array, base64-encoded. The page sends the tiles
+  painted during an animation frame back the same way, in one call; the
+  other tools only send the cells they were used on, the tiles they change
+  come back as one diff.
+
+MapTransport keeps a copy of every layer as the page has it, so a layer is
+only sent again if it changed, and then only the tiles that differ.
 """
 
-from PyQt6.QtCore import QObject, pyqtSlot, pyqtSignal
+from PyQt6.QtCore import QObject, QTimer, pyqtSlot, pyqtSignal
+import base64
 import json
+import zlib
+
+import numpy as np
+
+# Type of the packed tile values and of the diff batches
+LAYER_DTYPE = np.dtype('<u2')
+CELL_DTYPE = np.dtype('<u4')
+
+# Edits sent to the page are coalesced for one frame
+FLUSH_INTERVAL_MS = 16
+
+# A diff touching more than this share of a layer is sent as the whole layer
+FULL_LAYER_RATIO = 0.25
+
+
+def encode_layer(grid):
+    """Pack a grid for receiveMapLayer(): zlib-compressed uint16 tiles, base64-encoded."""
+    data = np.ascontiguousarray(grid, dtype=LAYER_DTYPE).tobytes()
+    return base64.b64encode(zlib.compress(data, 1)).decode('ascii')
+
+
+def encode_cells(indices, values):
+    """Pack (flat index, value) pairs for receiveMapDiff(), base64-encoded."""
+    cells = np.empty((len(indices), 2), dtype=CELL_DTYPE)
+    cells[:, 0] = indices
+    cells[:, 1] = values
+    return base64.b64encode(cells.tobytes()).decode('ascii')
+
+
+def decode_cells(data):
+    """
+    Unpack the (flat index, value) pairs of a batch painted in the page.
+
+    Returns:
+        tuple: (indices, values) arrays
+
+    Raises:
+        ValueError: The data isn't a packed batch
+    """
+    raw = base64.b64decode(data, validate=True)
+    if len(raw) % (2 * CELL_DTYPE.itemsize):
+        raise ValueError("Truncated tile batch")
+    cells = np.frombuffer(raw, dtype=CELL_DTYPE).reshape(-1, 2)
+    return cells[:, 0].astype(np.intp), cells[:, 1]
+
 
 class MapWebChannel(QObject):
     """Handles communication between PyQt and the PixiJS map editor."""
-    
-    # Signals for map updates
-    tileUpdated = pyqtSignal(int, int, int)  # x, y, type
-    
+
+    # Tiles painted in the page during one frame: layer, flat indices, values
+    cellsPainted = pyqtSignal(str, object, object)
+
+    # A tool other than the brush used in the page: tool, x0, y0, x1, y1
+    toolUsed = pyqtSignal(str, int, int, int, int)
+
     def __init__(self, parent=None):
         super().__init__(parent)
-    
+
     @pyqtSlot(str, str, str)
     def handleMessage(self, action, data, callback):
         """Handle messages from JavaScript."""
         try:
             data_obj = json.loads(data)
-            
-            if action == "tileClicked":
-                x = data_obj.get("x", 0)
-                y = data_obj.get("y", 0)
-                tile_type = data_obj.get("type", 0)
-                self.tileUpdated.emit(x, y, tile_type)
+
+            if action == "tilesPainted":
+                self.tilesPainted(data_obj.get("layer", "tiles"), data_obj.get("cells", ""))
                 callback("true")
             else:
                 callback("false")
         except Exception as e:
             print(f"Error handling message: {str(e)}")
             callback("false")
-    
-    @pyqtSlot(int, int, int)
-    def tileClicked(self, x, y, tile_type):
-        """Handle tile click events from JavaScript."""
-        self.tileUpdated.emit(x, y, tile_type) 
\ No newline at end of file
+
+    @pyqtSlot(str, str)
+    def tilesPainted(self, layer, cells):
+        """Handle a batch of painted tiles from JavaScript, see decode_cells()."""
+        try:
+            indices, values = decode_cells(cells)
+        except ValueError as e:
+            print(f"Error decoding painted tiles: {str(e)}")
+            return
+        if len(indices):
+            self.cellsPainted.emit(layer, indices, values)
+
+    @pyqtSlot(str, int, int, int, int)
+    def useTool(self, tool, x0, y0, x1, y1):
+        """Handle a fill, rectangle, line, copy or paste from JavaScript, applied in Python."""
+        self.toolUsed.emit(tool, x0, y0, x1, y1)
+
+
+class MapTransport:
+    """Sends a map's layers to the page, skipping what the page already has."""
+
+    def __init__(self, run_javascript, parent=None):
+        """
+        Initialize the transport.
+
+        Args:
+            run_javascript (callable): Runs a script in the page, e.g. QWebEnginePage.runJavaScript
+            parent (QObject): Owner of the flush timer
+        """
+        self.run_javascript = run_javascript
+        self.map_key = None
+        self.meta = None
+        self._mirror = {}           # Layer -> copy of the grid as the page has it
+        self._layers = {}           # Layer -> grid to send on the next flush
+        self._timer = QTimer(parent)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def reset(self):
+        """Forget what the page holds, e.g. after it was (re)loaded."""
+        self._timer.stop()
+        self.map_key = None
+        self.meta = None
+        self._mirror = {}
+        self._layers = {}
+
+    def show_map(self, map_key, meta, layers):
+        """
+        Show a map in the page, now.
+
+        Args:
+            map_key: Identity of the map; the page's layers are only
+                reused for the same map
+            meta (dict): width, height and tileset of the map
+            layers (dict): Layer name -> 2-D grid
+        """
+        if map_key != self.map_key:
+            self.reset()
+            self.map_key = map_key
+        if meta != self.meta:
+            self.meta = dict(meta)
+            self.send_message("init_map", self.meta)
+        self._layers.update(layers)
+        self.flush()
+
+    def update(self, layers):
+        """Send the changes of some layers with the next frame's batch."""
+        self._layers.update(layers)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def acknowledge(self, layer, indices, values):
+        """Note tiles the page changed itself, so they aren't sent back."""
+        mirror = self._mirror.get(layer)
+        if mirror is not None:
+            mirror.reshape(-1)[indices] = values
+
+    def flush(self):
+        """Send the pending layers: nothing if unchanged, a diff, or the whole layer."""
+        self._timer.stop()
+        layers, self._layers = self._layers, {}
+        for name, grid in layers.items():
+            mirror = self._mirror.get(name)
+            if mirror is None or mirror.shape != grid.shape:
+                self._send_layer(name, grid)
+                continue
+            indices = np.flatnonzero(mirror != grid)
+            if not len(indices):
+                continue
+            if len(indices) > FULL_LAYER_RATIO * grid.size:
+                self._send_layer(name, grid)
+                continue
+            values = grid.reshape(-1)[indices]
+            self.run_javascript(f"receiveMapDiff('{name}', '{encode_cells(indices, values)}');")
+            mirror.reshape(-1)[indices] = values
+
+    def send_message(self, action, data):
+        """Send a small JSON message to the page."""
+        message = json.dumps({"action": action, "data": data})
+        self.run_javascript(f"receiveMessageFromPython({json.dumps(message)});")
+
+    def _send_layer(self, name, grid):
+        height, width = grid.shape
+        self.run_javascript(f"receiveMapLayer('{name}', {width}, {height}, '{encode_layer(grid)}');")
+        self._mirror[name] = np.array(grid, dtype=LAYER_DTYPE)
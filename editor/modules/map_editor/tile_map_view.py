@@ -0,0 +1,371 @@
+"""
+Scene-based tile map renderer for the map editor.
+
+The whole map is one QGraphicsItem drawing the map's NumPy grid (see
+core.map_grid) directly, instead of one widget per tile:
+
+- zoomed in, the visible tiles are drawn in one drawPixmapFragments() call
+  from a cached atlas holding one pre-rendered tile per tile value; the
+  fragments of a row are kept until one of its tiles changes;
+- zoomed out, the map is drawn from an overview image with one pixel per
+  tile, kept up to date with a color lookup table, so a 256x256 map is a
+  single scaled image blit;
+- only what is exposed gets painted: the item culls to the exposed
+  rectangle, a painted tile repaints its own rectangle only, and scrolling
+  lets the view blit what stays visible.
+"""
+
+import numpy as np
+from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QStyleOptionGraphicsItem
+from PyQt6.QtCore import Qt, QRectF, QPointF, pyqtSignal
+from PyQt6.QtGui import QPixmap, QPainter, QColor, QPen, QImage
+
+# Size of a tile in scene coordinates, the size it is drawn at zoom 1
+TILE_SIZE = 32
+
+# Zoom factors the view steps through, ZOOM_LEVELS[DEFAULT_ZOOM] at first
+ZOOM_LEVELS = (0.0625, 0.125, 0.25, 0.5, 1.0, 2.0, 4.0)
+DEFAULT_ZOOM = 4
+
+# Below this many screen pixels per tile, the overview image is drawn
+ATLAS_MIN_PIXELS = 12
+
+# Colors of the palette's tile types
+TILE_COLORS = {
+    0: QColor(0, 128, 0),       # Grass
+    1: QColor(139, 69, 19),     # Dirt
+    2: QColor(0, 0, 255),       # Water
+    3: QColor(128, 128, 128),   # Stone
+    4: QColor(210, 180, 140),   # Sand
+    5: QColor(0, 0, 0)          # Wall
+}
+
+
+def tile_color(tile_type):
+    """Get the color a tile value is drawn with; other values get a stable color of their own."""
+    color = TILE_COLORS.get(tile_type)
+    if color is None:
+        # Spread the hues with the golden ratio so neighboring values differ
+        color = QColor.fromHsv(int(tile_type * 137.508) % 360, 160, 200)
+    return color
+
+
+class TileAtlas:
+    """One pre-rendered pixmap per tile value, in a single pixmap."""
+    
+    # Tiles per atlas row
+    COLUMNS = 16
+    
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.pixmap = QPixmap()
+        self._slots = {}        # Tile value -> slot in the atlas
+    
+    def source_rect(self, tile_type):
+        """Get the rectangle of a tile value in the atlas pixmap, adding it if needed."""
+        slot = self._slots.get(tile_type)
+        if slot is None:
+            slot = self._add(tile_type)
+        size = self.tile_size
+        return QRectF((slot % self.COLUMNS) * size, (slot // self.COLUMNS) * size, size, size)
+    
+    def ensure(self, tile_types):
+        """Add the tile values not in the atlas yet, growing the pixmap once."""
+        missing = [tile_type for tile_type in tile_types if tile_type not in self._slots]
+        if missing:
+            self._grow(len(self._slots) + len(missing))
+            for tile_type in missing:
+                self._draw(tile_type, len(self._slots))
+                self._slots[tile_type] = len(self._slots)
+    
+    def _add(self, tile_type):
+        self.ensure((tile_type,))
+        return self._slots[tile_type]
+    
+    def _grow(self, count):
+        """Make room for count tiles, keeping the ones drawn."""
+        size = self.tile_size
+        rows = max(1, -(-count // self.COLUMNS))
+        if not self.pixmap.isNull() and self.pixmap.height() >= rows * size:
+            return
+        # Double the rows so adding tiles one by one doesn't copy every time
+        rows = max(rows, (self.pixmap.height() // size) * 2)
+        pixmap = QPixmap(self.COLUMNS * size, rows * size)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        if not self.pixmap.isNull():
+            painter = QPainter(pixmap)
+            painter.drawPixmap(0, 0, self.pixmap)
+            painter.end()
+        self.pixmap = pixmap
+    
+    def _draw(self, tile_type, slot):
+        """Render a tile: its color with a darker border, like the palette buttons."""
+        size = self.tile_size
+        x = (slot % self.COLUMNS) * size
+        y = (slot // self.COLUMNS) * size
+        color = tile_color(tile_type)
+        painter = QPainter(self.pixmap)
+        painter.fillRect(x, y, size, size, color)
+        painter.setPen(QPen(color.darker(160)))
+        painter.drawRect(x, y, size - 1, size - 1)
+        painter.end()
+
+
+class TileMapItem(QGraphicsItem):
+    """The tiles of a map, drawn from a grid."""
+    
+    def __init__(self, grid, atlas):
+        """
+        Initialize the item.
+        
+        Args:
+            grid (numpy.ndarray): The map's tiles, shared with the map record
+            atlas (TileAtlas): Pre-rendered tiles
+        """
+        super().__init__()
+        self.grid = grid
+        self.atlas = atlas
+        self._colors = np.zeros(0, dtype=np.uint32)     # Tile value -> 0xAARRGGBB
+        self._pixels = None
+        self._overview = None
+        self._row_fragments = {}   # Row -> atlas fragment of each of its tiles, made when first drawn
+        # Exposed rectangles come with the paint options
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self.rebuild()
+    
+    def boundingRect(self):
+        height, width = self.grid.shape
+        return QRectF(0, 0, width * TILE_SIZE, height * TILE_SIZE)
+    
+    def rebuild(self):
+        """Rebuild the overview image after the whole grid changed."""
+        self._update_colors(self.grid)
+        self._pixels = self._colors[self.grid]
+        self._wrap_pixels()
+        self._row_fragments.clear()
+        self.update()
+    
+    def refresh_cells(self, ys, xs):
+        """
+        Repaint some tiles after they changed in the grid.
+        
+        Args:
+            ys (numpy.ndarray): Rows of the changed tiles
+            xs (numpy.ndarray): Their columns
+        """
+        ys = np.asarray(ys, dtype=np.intp)
+        xs = np.asarray(xs, dtype=np.intp)
+        if not len(ys):
+            return
+        values = self.grid[ys, xs]
+        self._update_colors(values)
+        self._pixels[ys, xs] = self._colors[values]
+        for y in np.unique(ys).tolist():
+            self._row_fragments.pop(y, None)
+        # One dirty rectangle around the changed tiles
+        self.update(QRectF(int(xs.min()) * TILE_SIZE, int(ys.min()) * TILE_SIZE,
+                           (int(xs.max()) - int(xs.min()) + 1) * TILE_SIZE,
+                           (int(ys.max()) - int(ys.min()) + 1) * TILE_SIZE))
+    
+    def paint(self, painter, option, widget=None):
+        """Draw the exposed tiles."""
+        height, width = self.grid.shape
+        if not width or not height:
+            return
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        x0 = max(0, int(exposed.left() // TILE_SIZE))
+        y0 = max(0, int(exposed.top() // TILE_SIZE))
+        x1 = min(width, int(-(-exposed.right() // TILE_SIZE)))
+        y1 = min(height, int(-(-exposed.bottom() // TILE_SIZE)))
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if scale * TILE_SIZE < ATLAS_MIN_PIXELS:
+            # Far out: one pixel per tile, scaled without smoothing
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+            painter.drawImage(QRectF(x0 * TILE_SIZE, y0 * TILE_SIZE, (x1 - x0) * TILE_SIZE, (y1 - y0) * TILE_SIZE),
+                              self._overview, QRectF(x0, y0, x1 - x0, y1 - y0))
+            return
+        
+        # Close: the visible tiles from the atlas, in one call
+        fragments = []
+        for y in range(y0, y1):
+            row = self._row_fragments.get(y)
+            if row is None:
+                row = self._row_fragments[y] = self._make_row_fragments(y)
+            fragments += row[x0:x1]
+        painter.drawPixmapFragments(fragments, self.atlas.pixmap)
+    
+    def _make_row_fragments(self, y):
+        """Make the atlas fragments drawing a row of tiles."""
+        row = self.grid[y].tolist()
+        values = set(row)
+        self.atlas.ensure(values)
+        sources = {value: self.atlas.source_rect(value) for value in values}
+        create = QPainter.PixmapFragment.create
+        center_y = y * TILE_SIZE + TILE_SIZE / 2
+        return [create(QPointF(x * TILE_SIZE + TILE_SIZE / 2, center_y), sources[value])
+                for x, value in enumerate(row)]
+    
+    def _update_colors(self, values):
+        """Extend the color lookup table to the values in an array."""
+        if not np.size(values):
+            return
+        highest = int(np.max(values))
+        if highest < len(self._colors):
+            return
+        known = len(self._colors)
+        colors = np.zeros(highest + 1, dtype=np.uint32)
+        colors[:known] = self._colors
+        for value in range(known, highest + 1):
+            colors[value] = tile_color(value).rgb()
+        self._colors = colors
+    
+    def _wrap_pixels(self):
+        """Wrap the pixel array in the overview image, sharing its memory."""
+        self._pixels = np.ascontiguousarray(self._pixels)
+        height, width = self._pixels.shape
+        self._overview = QImage(self._pixels.data, width, height, width * 4, QImage.Format.Format_RGB32)
+
+
+class TileMapView(QGraphicsView):
+    """Zoomable, pannable view of a map's tiles, reporting the tiles under the mouse."""
+    
+    # Left button on a tile: pressed, moved onto another tile, released
+    cellPressed = pyqtSignal(int, int)
+    cellDragged = pyqtSignal(int, int)
+    cellReleased = pyqtSignal(int, int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.atlas = TileAtlas()
+        self.map_item = None
+        self.zoom_index = DEFAULT_ZOOM
+        self._last_cell = None
+        self._pan_start = None
+        
+        # Repaint only what changed; the item culls itself
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.OptimizationFlag.DontSavePainterState, True)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setBackgroundBrush(QColor(48, 48, 48))
+        self.setMouseTracking(False)
+        self._apply_zoom()
+    
+    def set_grid(self, grid):
+        """
+        Show a map's grid, or nothing for None.
+        
+        The grid is shared, not copied: after changing tiles in it, call
+        refresh_cells() (or refresh() after replacing many).
+        """
+        self.scene().clear()
+        self.map_item = None
+        self._last_cell = None
+        if grid is None:
+            self.scene().setSceneRect(QRectF())
+            return
+        self.map_item = TileMapItem(grid, self.atlas)
+        self.scene().addItem(self.map_item)
+        self.scene().setSceneRect(self.map_item.boundingRect())
+    
+    def refresh(self):
+        """Repaint the whole map after its grid changed."""
+        if self.map_item is not None:
+            self.map_item.rebuild()
+    
+    def refresh_cells(self, ys, xs):
+        """Repaint the tiles at (ys[i], xs[i]) after they changed in the grid."""
+        if self.map_item is not None:
+            self.map_item.refresh_cells(ys, xs)
+    
+    def zoom_in(self):
+        self.set_zoom(self.zoom_index + 1)
+    
+    def zoom_out(self):
+        self.set_zoom(self.zoom_index - 1)
+    
+    def set_zoom(self, index):
+        """Zoom to one of ZOOM_LEVELS, by index."""
+        index = max(0, min(index, len(ZOOM_LEVELS) - 1))
+        if index != self.zoom_index:
+            self.zoom_index = index
+            self._apply_zoom()
+    
+    def _apply_zoom(self):
+        zoom = ZOOM_LEVELS[self.zoom_index]
+        self.resetTransform()
+        self.scale(zoom, zoom)
+    
+    def cell_at(self, position):
+        """Get the (x, y) of the tile under a viewport position, None outside the map."""
+        if self.map_item is None:
+            return None
+        point = self.mapToScene(position)
+        height, width = self.map_item.grid.shape
+        x = int(point.x() // TILE_SIZE)
+        y = int(point.y() // TILE_SIZE)
+        if 0 <= x < width and 0 <= y < height:
+            return x, y
+        return None
+    
+    def wheelEvent(self, event):
+        """Ctrl+wheel zooms around the mouse, the wheel alone scrolls."""
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoom_in()
+            elif event.angleDelta().y() < 0:
+                self.zoom_out()
+            event.accept()
+            return
+        super().wheelEvent(event)
+    
+    def mousePressEvent(self, event):
+        """Left button paints, the middle button pans."""
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self._pan_start = event.position()
+            self.viewport().setCursor(Qt.CursorShape.ClosedHandCursor)
+            event.accept()
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            cell = self.cell_at(event.position().toPoint())
+            self._last_cell = cell
+            if cell is not None:
+                self.cellPressed.emit(*cell)
+            event.accept()
+            return
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        if self._pan_start is not None:
+            delta = event.position() - self._pan_start
+            self._pan_start = event.position()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - int(delta.x()))
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - int(delta.y()))
+            event.accept()
+            return
+        if event.buttons() & Qt.MouseButton.LeftButton:
+            cell = self.cell_at(event.position().toPoint())
+            if cell is not None and cell != self._last_cell:
+                self._last_cell = cell
+                self.cellDragged.emit(*cell)
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.MiddleButton and self._pan_start is not None:
+            self._pan_start = None
+            self.viewport().unsetCursor()
+            event.accept()
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            cell = self.cell_at(event.position().toPoint()) or self._last_cell
+            self._last_cell = None
+            if cell is not None:
+                self.cellReleased.emit(*cell)
+            event.accept()
+            return
+        super().mouseReleaseEvent(event)
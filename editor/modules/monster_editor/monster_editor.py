@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QPixmap, QColor
 from editor.core.game_data_monsters import SPRITE_POSITION_MAP
+from editor.utils.usages import show_usages, confirm_delete
 
 class MonsterEditorTab(QWidget):
     """Tab for editing game monsters with visual elements."""
@@ -13,6 +14,7 @@ class MonsterEditorTab(QWidget):
         super().__init__()
         self.game_data = game_data
         self.current_monster = None
+        self.monster_rows = {}      # Monster ID -> row in the monster list
         self.sprite_sheets = {
             "monsters1": "enemySprite.png",
             "game": "gameSprite.png"
@@ -42,6 +44,9 @@ class MonsterEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_monster)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Right side - Monster details
@@ -146,6 +151,7 @@ class MonsterEditorTab(QWidget):
         """Update the UI with the latest game data."""
         # Clear the list
         self.monster_list.clear()
+        self.monster_rows = {}
         
         # Add monsters to the list
         for i, monster in enumerate(self.game_data.monsters):
@@ -160,6 +166,7 @@ class MonsterEditorTab(QWidget):
             item = QListWidgetItem(display_text)
             item.setData(Qt.ItemDataRole.UserRole, monster_id)
             self.monster_list.addItem(item)
+            self.monster_rows.setdefault(monster_id, i)
             
             # Debug: Print the data stored in each list item
             print(f"Added list item #{i+1}: Display={display_text}, Data={monster_id}")
@@ -229,13 +236,10 @@ class MonsterEditorTab(QWidget):
         display_text = current.text()
         print(f"\nDEBUG - Selected item: Text='{display_text}', ID stored='{monster_id}'")
         
-        # Find the monster by ID
-        self.current_monster = None
-        for monster in self.game_data.monsters:
-            if monster.get('id') == monster_id:
-                self.current_monster = monster
-                print(f"DEBUG - Found monster with ID '{monster_id}': {monster.get('name')}")
-                break
+        # Find the monster by ID (an index lookup)
+        self.current_monster = self.game_data.get_monster_by_id(monster_id)
+        if self.current_monster:
+            print(f"DEBUG - Found monster with ID '{monster_id}': {self.current_monster.get('name')}")
         
         if self.current_monster:
             # Update the details - use .get() to provide defaults for missing keys
@@ -322,6 +326,7 @@ class MonsterEditorTab(QWidget):
             sprite_data = self.get_sprite_for_id(text)
             if sprite_data:
                 self.current_monster['sprite'] = sprite_data
+        self.game_data.record_changed(self.current_monster)
             
         # Reload the monster image
         self.load_monster_image()
@@ -498,6 +503,7 @@ class MonsterEditorTab(QWidget):
         self.image_box.setEnabled(enabled)
         self.battle_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_monster(self):
         """Add a new monster."""
@@ -537,12 +543,26 @@ class MonsterEditorTab(QWidget):
         if not self.current_monster:
             return
             
+        # Warn about the places still using it
+        if not confirm_delete(self, self.game_data, 'monsters', self.current_monster):
+            return
+            
         # Remove from the game data
         self.game_data.monsters.remove(self.current_monster)
         
         # Update the UI
         self.update_data()
         
+    def find_usages(self):
+        """Show where the selected monster is used."""
+        show_usages(self, self.game_data, 'monsters', self.current_monster)
+        
+    def select_record(self, record):
+        """Select a monster in the list, e.g. a result of the global search."""
+        row = self.game_data.monsters.index_of(record)
+        if row is not None:
+            self.monster_list.setCurrentRow(row)
+        
     def save_monster(self):
         """Save changes to the selected monster."""
         if not self.current_monster:
@@ -569,19 +589,19 @@ class MonsterEditorTab(QWidget):
         
         # Mark the game data as changed
         try:
-            self.game_data.mark_as_changed()
+            # Journal the edited fields and update the lookup indexes
+            self.game_data.record_changed(self.current_monster)
         except:
             pass
         
-        # Update the UI
+        # Update the UI (this clears the current monster)
+        monster_id = self.current_monster['id']
         self.update_data()
         
         # Reselect the monster
-        monster_id = self.current_monster['id']
-        for i in range(self.monster_list.count()):
-            if self.monster_list.item(i).data(Qt.ItemDataRole.UserRole) == monster_id:
-                self.monster_list.setCurrentRow(i)
-                break
+        row = self.monster_rows.get(monster_id)
+        if row is not None:
+            self.monster_list.setCurrentRow(row)
                 
     def save_changes(self):
         """Save all changes to the game data."""
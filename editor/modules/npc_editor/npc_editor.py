@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
                            QSpinBox, QComboBox, QPushButton, QTextEdit)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap
+from editor.utils.usages import show_usages, confirm_delete
 
 class NPCEditorTab(QWidget):
     """Tab for editing NPCs with visual elements."""
@@ -37,6 +38,9 @@ class NPCEditorTab(QWidget):
         self.remove_button.clicked.connect(self.remove_npc)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
         left_layout.addLayout(button_layout)
         
         # Right side - NPC details
@@ -216,6 +220,7 @@ class NPCEditorTab(QWidget):
             
         # Update the NPC's sprite
         self.current_npc['sprite'] = sprite_name
+        self.game_data.record_changed(self.current_npc)
             
         # Reload the NPC image
         self.load_npc_image()
@@ -247,6 +252,7 @@ class NPCEditorTab(QWidget):
         self.image_box.setEnabled(enabled)
         self.behavior_box.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_npc(self):
         """Add a new NPC."""
@@ -279,12 +285,26 @@ class NPCEditorTab(QWidget):
         if not self.current_npc:
             return
             
+        # Warn about the places still using it
+        if not confirm_delete(self, self.game_data, 'npcs', self.current_npc):
+            return
+            
         # Remove from the game data
         self.game_data.npcs.remove(self.current_npc)
         
         # Update the UI
         self.update_data()
         
+    def find_usages(self):
+        """Show where the selected NPC is used."""
+        show_usages(self, self.game_data, 'npcs', self.current_npc)
+        
+    def select_record(self, record):
+        """Select a NPC in the list, e.g. a result of the global search."""
+        row = self.game_data.npcs.index_of(record)
+        if row is not None:
+            self.npc_list.setCurrentRow(row)
+        
     def save_npc(self):
         """Save changes to the selected NPC."""
         if not self.current_npc:
@@ -300,6 +320,9 @@ class NPCEditorTab(QWidget):
         self.current_npc['direction'] = self.direction_combo.currentText()
         self.current_npc['dialogue'] = self.dialogue_edit.toPlainText()
         
+        # Journal the edited fields and update the lookup indexes
+        self.game_data.record_changed(self.current_npc)
+        
         # Update the UI
         self.update_data()
         
@@ -9,6 +9,7 @@ from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QPen, QBrush, QLinearG
 # Add WebEngine imports for p5.js integration
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineScript
+from editor.utils.usages import show_usages, confirm_delete
 
 class SpellEditorTab(QWidget):
     """Tab for editing game spells with visual elements."""
@@ -56,6 +57,11 @@ class SpellEditorTab(QWidget):
         self.remove_spell_button.clicked.connect(self.remove_selected_spell)
         button_layout.addWidget(self.remove_spell_button)
         
+        self.usages_button = QPushButton("Find Usages")
+        self.usages_button.setEnabled(False)
+        self.usages_button.clicked.connect(self.find_usages)
+        button_layout.addWidget(self.usages_button)
+        
         spell_list_layout.addLayout(button_layout)
         
         self.spell_list = QListWidget()
@@ -453,6 +459,7 @@ class SpellEditorTab(QWidget):
         self.current_spell['power'] = self.power_spin.value()
         self.current_spell['mp_cost'] = self.mp_cost_spin.value()
         self.current_spell['target'] = self.target_combo.currentText()
+        self.game_data.record_changed(self.current_spell)
         
         self.update_p5js_preview()
         
@@ -470,13 +477,12 @@ class SpellEditorTab(QWidget):
         """Handle spell selection from the list"""
         try:
             self.remove_spell_button.setEnabled(True)
+            self.usages_button.setEnabled(True)
             
             spell_name = item.text()
-            for spell in self.game_data.spells:
-                if spell['name'] == spell_name:
-                    self.current_spell = spell
-                    self.load_spell_details()
-                    break
+            self.current_spell = self.game_data.get_spell_by_name(spell_name)
+            if self.current_spell:
+                self.load_spell_details()
                     
             if not self.current_spell:
                 self.clear_animations()
@@ -522,6 +528,7 @@ class SpellEditorTab(QWidget):
                     self.target_combo.setCurrentIndex(index)
                     self.current_spell['target'] = 'Single Enemy'
                     
+            self.game_data.record_changed(self.current_spell)
             self.generate_spell_preview()
             self.update_p5js_preview()
             
@@ -750,6 +757,7 @@ class SpellEditorTab(QWidget):
         self.p5js_preview_box.setEnabled(enabled)
         self.animation_box.setEnabled(enabled)
         self.remove_spell_button.setEnabled(enabled)
+        self.usages_button.setEnabled(enabled)
         
     def add_new_spell(self):
         """Create a new spell with default values and add it to the list"""
@@ -776,6 +784,7 @@ class SpellEditorTab(QWidget):
         self.on_spell_selected(item)
         
         self.remove_spell_button.setEnabled(True)
+        self.usages_button.setEnabled(True)
     
     def remove_selected_spell(self):
         """Remove the currently selected spell"""
@@ -786,16 +795,8 @@ class SpellEditorTab(QWidget):
         if current_row < 0:
             return
             
-        spell_name = self.current_spell['name']
-        
-        confirm = QMessageBox.question(
-            self,
-            "Confirm Deletion",
-            f"Are you sure you want to delete the spell '{spell_name}'?",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-        
-        if confirm == QMessageBox.StandardButton.Yes:
+        # Warn about the magic shops still selling it
+        if confirm_delete(self, self.game_data, 'spells', self.current_spell):
             self.spell_list.takeItem(current_row)
             self.game_data.spells.pop(current_row)
             self.current_spell = None
@@ -804,6 +805,19 @@ class SpellEditorTab(QWidget):
             
             if self.spell_list.count() == 0:
                 self.remove_spell_button.setEnabled(False)
+                self.usages_button.setEnabled(False)
+    
+    def find_usages(self):
+        """Show the magic shops selling the selected spell."""
+        show_usages(self, self.game_data, 'spells', self.current_spell)
+    
+    def select_record(self, record):
+        """Select a spell in the list, e.g. a result of the global search."""
+        row = self.game_data.spells.index_of(record)
+        if row is not None:
+            self.spell_list.setCurrentRow(row)
+            # Spells are loaded on click, not on row changes
+            self.on_spell_selected(self.spell_list.item(row))
     
     def save_spell(self):
         """Save the current spell details back to the data model."""
@@ -822,7 +836,8 @@ class SpellEditorTab(QWidget):
             current_item.setText(self.current_spell['name'])
         
         try:
-            self.game_data.mark_as_changed()
+            # Journal the edited fields and update the lookup indexes
+            self.game_data.record_changed(self.current_spell)
         except:
             pass
         
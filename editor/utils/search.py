@@ -0,0 +1,82 @@
+"""
+Quick-open dialog of the global search.
+
+Results come from GameDataManager.search() (see core.search_index) and are
+refreshed on every keystroke; activating one selects the record in its tab.
+"""
+
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+from PyQt6.QtCore import Qt
+
+from editor.utils.usages import record_title
+
+
+class SearchDialog(QDialog):
+    """Search box over every domain, results listed as you type."""
+
+    def __init__(self, game_data, open_record, parent=None):
+        """
+        Initialize the dialog.
+
+        Args:
+            game_data (GameDataManager): Loaded game data
+            open_record (callable): Called with (domain, record) for the chosen result
+            parent (QWidget): Parent widget
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Search Game Data")
+        self.resize(560, 420)
+        self.game_data = game_data
+        self.open_record = open_record
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Name, ID, description... in any script")
+        self.query_edit.textChanged.connect(self.update_results)
+        self.query_edit.returnPressed.connect(self.activate_current)
+        self.query_edit.installEventFilter(self)
+        layout.addWidget(self.query_edit)
+
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(self.on_result_activated)
+        layout.addWidget(self.result_list)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+    def update_results(self, text):
+        """Search again with the text typed so far."""
+        self.result_list.clear()
+        if not text.strip():
+            self.status_label.clear()
+            return
+        results = self.game_data.search(text)
+        for result in results:
+            item = QListWidgetItem(f"{record_title(result.record)} — {result.domain} ({result.field})")
+            item.setData(Qt.ItemDataRole.UserRole, result)
+            self.result_list.addItem(item)
+        if results:
+            self.result_list.setCurrentRow(0)
+        self.status_label.setText(f"{len(results)} result(s)")
+
+    def eventFilter(self, obj, event):
+        """Let the arrow keys move through the results while typing."""
+        if obj is self.query_edit and event.type() == event.Type.KeyPress \
+                and event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down) and self.result_list.count():
+            step = -1 if event.key() == Qt.Key.Key_Up else 1
+            row = max(0, min(self.result_list.currentRow() + step, self.result_list.count() - 1))
+            self.result_list.setCurrentRow(row)
+            return True
+        return super().eventFilter(obj, event)
+
+    def activate_current(self):
+        """Open the selected result, the best one by default."""
+        item = self.result_list.currentItem()
+        if item is not None:
+            self.on_result_activated(item)
+
+    def on_result_activated(self, item):
+        """Select the record of a result in its editor tab."""
+        result = item.data(Qt.ItemDataRole.UserRole)
+        self.accept()
+        self.open_record(result.domain, result.record)
@@ -0,0 +1,103 @@
+"""
+Find usages and safe delete for the editor tabs.
+
+Both read the game data manager's reference index (see
+core.reference_index), so they answer without rescanning app.js.
+"""
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QListWidget, QListWidgetItem,
+                             QDialogButtonBox, QMessageBox)
+from PyQt6.QtCore import Qt
+
+
+def record_title(record):
+    """Get the name shown for a record in the dialogs."""
+    return str(record.get('name') or record.get('id') or '?')
+
+
+class UsagesDialog(QDialog):
+    """List of the places a record is used; double-click shows a bundle one in the code editor."""
+
+    def __init__(self, game_data, title, usages, parent=None):
+        """
+        Initialize the dialog.
+
+        Args:
+            game_data (GameDataManager): Manager the usages were found with
+            title (str): Name of the record
+            usages (list): Reference objects from GameDataManager.find_usages()
+            parent (QWidget): Parent widget
+        """
+        super().__init__(parent)
+        self.setWindowTitle(f"Usages of {title}")
+        self.resize(640, 360)
+        self.usages = usages
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"'{title}' is used in {len(usages)} place(s):"))
+
+        self.usage_list = QListWidget()
+        for reference in usages:
+            item = QListWidgetItem(game_data.describe_usage(reference))
+            item.setData(Qt.ItemDataRole.UserRole, reference)
+            self.usage_list.addItem(item)
+        self.usage_list.itemDoubleClicked.connect(self.on_usage_activated)
+        layout.addWidget(self.usage_list)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def on_usage_activated(self, item):
+        """Select a bundle reference in the code editor of the main window."""
+        reference = item.data(Qt.ItemDataRole.UserRole)
+        window = self.parent().window() if self.parent() is not None else None
+        if reference.module is not None and hasattr(window, 'show_source_range'):
+            if window.show_source_range(reference.start, reference.end):
+                self.accept()
+
+
+def show_usages(parent, game_data, domain, record):
+    """
+    Show where a record is used.
+
+    Args:
+        parent (QWidget): The editor tab
+        game_data (GameDataManager): Loaded game data
+        domain (str): Kind of data, e.g. 'monsters'
+        record (dict): The selected record, nothing happens if None
+    """
+    if not record:
+        return
+    usages = game_data.find_usages(domain, record)
+    if not usages:
+        QMessageBox.information(parent, "Find Usages", f"'{record_title(record)}' is not used anywhere.")
+        return
+    UsagesDialog(game_data, record_title(record), usages, parent).exec()
+
+
+def confirm_delete(parent, game_data, domain, record):
+    """
+    Ask before deleting a record, warning about the places that still use it.
+
+    Returns:
+        bool: True if the record should be deleted
+    """
+    title = record_title(record)
+    usages = game_data.find_usages(domain, record)
+    if not usages:
+        reply = QMessageBox.question(parent, "Confirm Delete",
+                                     f"Are you sure you want to delete '{title}'?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                     QMessageBox.StandardButton.No)
+        return reply == QMessageBox.StandardButton.Yes
+
+    msg_box = QMessageBox(parent)
+    msg_box.setWindowTitle("Record In Use")
+    msg_box.setIcon(QMessageBox.Icon.Warning)
+    msg_box.setText(f"'{title}' is used in {len(usages)} place(s); deleting it leaves them pointing at nothing.")
+    msg_box.setInformativeText("Delete it anyway?")
+    msg_box.setDetailedText("\n".join(game_data.describe_usage(reference) for reference in usages))
+    msg_box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+    msg_box.setDefaultButton(QMessageBox.StandardButton.No)
+    return msg_box.exec() == QMessageBox.StandardButton.Yes
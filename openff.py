@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+OpenFF command-line tools, see editor/cli.py.
+
+Usage: python openff.py {extract,export,patch,validate,stats} BUNDLE... [options]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editor'))
+
+from cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editor'))
+
+from core.backup_store import make_delta, apply_delta
+
+
+def random_lines(rng, count):
+    """Lines drawn from a small vocabulary, so many of them repeat."""
+    words = [b'idx: 3,', b'name: "x",', b'price: 100,', b'{', b'},', b'', b'\xe3\x83\x86']
+    return [rng.choice(words) + b'\n' for _ in range(count)]
+
+
+def test_delta_round_trip():
+    """Edit random contents like a save does (replace, insert, delete lines) and rebuild them."""
+    rng = random.Random(3)
+    for _ in range(300):
+        base_lines = random_lines(rng, rng.randrange(0, 40))
+        target_lines = list(base_lines)
+        for _ in range(rng.randrange(0, 6)):
+            position = rng.randrange(0, len(target_lines) + 1)
+            action = rng.choice(('replace', 'insert', 'delete'))
+            if action == 'insert' or not target_lines:
+                target_lines[position:position] = random_lines(rng, rng.randrange(1, 4))
+            elif action == 'replace':
+                target_lines[min(position, len(target_lines) - 1)] = b'changed %d\n' % rng.randrange(1000)
+            else:
+                del target_lines[min(position, len(target_lines) - 1)]
+        base = b''.join(base_lines)
+        target = b''.join(target_lines)
+        if rng.random() < 0.3:
+            # No final line break
+            target = target.rstrip(b'\n')
+
+        assert apply_delta(base, make_delta(base, target)) == target
+
+
+def test_delta_edge_cases():
+    for base, target in ((b'', b''), (b'', b'a\nb'), (b'a\nb\n', b''), (b'a\r\nb\r\n', b'a\r\nc\r\n'),
+                         (b'same\n' * 10, b'same\n' * 10)):
+        assert apply_delta(base, make_delta(base, target)) == target
+
+
+def test_small_edit_makes_a_small_delta():
+    base = b''.join(b'line %d\n' % i for i in range(10000))
+    target = base.replace(b'line 5000\n', b'line 5000 edited\n')
+    delta = make_delta(base, target)
+    assert apply_delta(base, delta) == target
+    assert len(delta) < 100
+
+
+if __name__ == '__main__':
+    for test in (test_delta_round_trip, test_delta_edge_cases, test_small_edit_makes_a_small_delta):
+        test()
+    print("All backup store tests passed")
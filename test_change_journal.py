@@ -0,0 +1,149 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import contextlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editor'))
+
+from core.change_journal import ChangeJournal, diff_records
+
+JS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'js', 'app.js')
+
+
+def test_diff_records():
+    old = {'name': 'Potion', 'price': 50, 'stat_bonuses': {'str': 0, 'lk': 1}, 'tiles': np.zeros((2, 2))}
+    new = {'name': 'Potion', 'price': 60, 'stat_bonuses': {'str': 0, 'lk': 2}, 'tiles': np.ones((2, 2)),
+           'behavior': 'flee'}
+    changes = {path: (before, after) for path, before, after in diff_records(old, new)}
+    assert set(changes) == {('price',), ('stat_bonuses', 'lk'), ('tiles',), ('behavior',)}
+    assert changes[('price',)] == (50, 60)
+    assert changes[('behavior',)] == (None, 'flee')
+    assert diff_records(old, dict(old)) == []
+
+
+def test_entries_are_the_net_change():
+    journal = ChangeJournal()
+    record = {'name': 'Potion', 'price': 60}
+
+    journal.update('items', 'Potion', record, [(('price',), 50, 60)])
+    journal.update('items', 'Potion', record, [(('price',), 50, 70)])
+    entries = journal.entries()
+    assert len(entries) == 1 and (entries[0].old, entries[0].new) == (50, 70)
+
+    # Back to the original value: nothing left to save
+    journal.update('items', 'Potion', record, [])
+    assert not journal and journal.entries() == []
+
+
+def test_added_and_removed_records_cancel_out():
+    journal = ChangeJournal()
+    added = {'name': 'New'}
+    journal.record_added('items', 'New', added)
+    journal.update('items', 'New', added, [(('price',), None, 10)])
+    assert [entry.field for entry in journal.entries()] == [None]
+    journal.record_removed('items', 'New', added)
+    assert not journal
+
+    loaded = {'name': 'Old'}
+    journal.record_removed('items', 'Old', loaded)
+    assert journal.records('items') == [] and len(journal.entries()) == 1
+    journal.record_added('items', 'Old', loaded)
+    assert not journal
+
+    # Revisions keep counting, so exports can tell the data changed
+    assert journal.revision('items') == 5
+
+
+def test_manager_journals_net_edits():
+    """Edit a loaded item through the manager, then edit it back."""
+    from core.game_data_manager import GameDataManager
+
+    manager = GameDataManager(use_cache=False, edit_log=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.load_from_file(JS_PATH)
+    item = manager.items[0]
+    price = item['price']
+
+    item['price'] = price + 1
+    manager.record_changed(item)
+    assert [(entry.field, entry.old, entry.new) for entry in manager.journal.entries()] == [(('price',), price, price + 1)]
+
+    item['price'] = price
+    manager.record_changed(item)
+    assert not manager.journal.has_changes()
+
+
+def test_save_keeps_the_edits_it_cant_write():
+    """A removed, an added and a character record can't be written: the save says so and keeps them."""
+    from core.game_data_manager import GameDataManager
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'app.js')
+        shutil.copy(JS_PATH, path)
+        manager = GameDataManager(use_cache=False, edit_log=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.load_from_file(path)
+            monsters = manager.domain_records('monsters')
+            del monsters[0]
+            character = manager.characters[0]
+            character['name'] = 'Renamed'
+            manager.record_changed(character)
+            manager.domain_records('items').append(manager.item_data.make_record({'name': 'New', 'type': 'Weapon'}))
+            item = manager.items[0]
+            item['price'] += 1
+            manager.record_changed(item)
+
+            assert not manager.save_to_file()
+            assert manager.saved_changes == 1 and len(manager.unsaved_changes) == 3
+            assert manager.has_changes()
+            # Only the written price left the journal, the rest still compares with the loaded data
+            assert [entry.field for entry in manager.journal.entries('items')] == [None]
+            assert [entry.new for entry in manager.journal.entries('characters')] == ['Renamed']
+
+            reloaded = GameDataManager(use_cache=False, edit_log=False)
+            reloaded.load_from_file(path)
+        assert reloaded.items[0]['price'] == item['price']
+        assert len(reloaded.monsters) == len(monsters) + 1
+        manager.close()
+        reloaded.close()
+
+
+def test_save_keeps_the_line_endings():
+    """Only the edited value changes in a bundle with mixed line endings."""
+    from core.game_data_manager import GameDataManager
+
+    with open(JS_PATH, 'rb') as f:
+        lines = f.read().split(b'\n')
+    content = b''.join(line + (b'\r\n' if i % 3 == 0 else b'\n') for i, line in enumerate(lines[:-1])) + lines[-1]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'app.js')
+        with open(path, 'wb') as f:
+            f.write(content)
+        manager = GameDataManager(use_cache=False, edit_log=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.load_from_file(path)
+            item = manager.items[0]
+            price = item['price']
+            item['price'] += 1
+            manager.record_changed(item)
+            assert manager.save_to_file()
+        manager.close()
+        with open(path, 'rb') as f:
+            saved = f.read()
+    old, new = str(price).encode(), str(price + 1).encode()
+    start = next(i for i in range(len(content)) if content[i] != saved[i])
+    start -= len(content[:start]) - len(content[:start].rstrip(b'0123456789'))
+    assert content[start:start + len(old)] == old and saved[start:start + len(new)] == new
+    assert saved[:start] == content[:start] and saved[start + len(new):] == content[start + len(old):]
+
+
+if __name__ == '__main__':
+    for test in (test_diff_records, test_entries_are_the_net_change, test_added_and_removed_records_cancel_out,
+                 test_manager_journals_net_edits, test_save_keeps_the_edits_it_cant_write,
+                 test_save_keeps_the_line_endings):
+        test()
+    print("All change journal tests passed")
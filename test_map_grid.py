@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editor'))
+
+from core.js_literal_parser import JSParseError
+from core.map_grid import parse_grid, parse_module_grid, format_grid
+
+# A mapFlag module as the bundle has them, with named tiles
+MODULE = '''
+        "use strict";
+        var W = 5, D = 3;
+        var s = [
+            [0, 0, W, 0],
+            [1, D, W, 0],
+            [0,0,2,   65535]
+        ];
+        e.exports = s
+'''
+
+
+def test_parse_module_grid_with_constants():
+    literal = parse_module_grid(MODULE)
+    assert literal.grid.dtype == np.uint16
+    assert literal.grid.tolist() == [[0, 0, 5, 0], [1, 3, 5, 0], [0, 0, 2, 65535]]
+    start, end = literal.span
+    assert MODULE[start] == '[' and MODULE[end - 1] == ']'
+    assert [MODULE[row_start:row_end] for row_start, row_end in literal.rows][1] == '[1, D, W, 0]'
+
+
+def test_format_parse_round_trip():
+    """Formatting a grid into its literal keeps the layout, and parses back to the same tiles."""
+    literal = parse_module_grid(MODULE)
+    start, end = literal.span
+    original = MODULE[start:end]
+
+    grid = literal.grid.copy()
+    grid[1, 1] = 7
+    text = format_grid(grid, original)
+    assert text.startswith('[\n            [0, 0, 5, 0],\n            [1, 7, 5, 0],')
+    assert text.endswith('\n        ]')
+    assert np.array_equal(parse_grid(text, 0).grid, grid)
+
+    # Without an original literal the default layout is used
+    assert np.array_equal(parse_grid(format_grid(grid), 0).grid, grid)
+
+
+def test_parse_grid_errors():
+    for text, constants in (('[[0, 1], [0]]', None),
+                            ('[[0, X]]', None),
+                            ('[[0, 65536]]', None),
+                            ('[[0, "a"]]', None),
+                            ('[]', None),
+                            ('[[0, 1]', None)):
+        try:
+            parse_grid(text, 0, constants)
+        except JSParseError:
+            continue
+        raise AssertionError(f"{text} should not parse")
+    assert parse_grid('[[0, X]]', 0, {'X': 4}).grid.tolist() == [[0, 4]]
+
+
+if __name__ == '__main__':
+    for test in (test_parse_module_grid_with_constants, test_format_parse_round_trip, test_parse_grid_errors):
+        test()
+    print("All map grid tests passed")
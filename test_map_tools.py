@@ -0,0 +1,90 @@
+import os
+import sys
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editor'))
+
+from core.map_tools import flood_fill, fill_rectangle, draw_line, copy_stamp, paste_stamp
+
+
+def reference_fill(grid, x, y, value):
+    """
+    Flood fill one cell at a time, breadth first, to check flood_fill() against.
+
+    Returns:
+        set: (y, x) of the changed cells
+    """
+    height, width = grid.shape
+    target = grid[y, x]
+    if target == value:
+        return set()
+    filled = {(y, x)}
+    pending = deque([(y, x)])
+    while pending:
+        cy, cx = pending.popleft()
+        for ny, nx in ((cy - 1, cx), (cy + 1, cx), (cy, cx - 1), (cy, cx + 1)):
+            if 0 <= ny < height and 0 <= nx < width and (ny, nx) not in filled and grid[ny, nx] == target:
+                filled.add((ny, nx))
+                pending.append((ny, nx))
+    for cy, cx in filled:
+        grid[cy, cx] = value
+    return filled
+
+
+def test_flood_fill_matches_reference():
+    """Fill random grids (few tiles, so regions have holes and twists) both ways."""
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        height, width = rng.integers(1, 24, size=2)
+        grid = rng.integers(0, 3, size=(height, width)).astype(np.uint16)
+        x, y = int(rng.integers(width)), int(rng.integers(height))
+        value = int(rng.integers(0, 4))
+
+        expected = grid.copy()
+        expected_cells = reference_fill(expected, x, y, value)
+        ys, xs = flood_fill(grid, x, y, value)
+
+        assert np.array_equal(grid, expected)
+        assert set(zip(ys.tolist(), xs.tolist())) == expected_cells
+        assert len(ys) == len(expected_cells)
+
+
+def test_flood_fill_outside_the_grid():
+    grid = np.zeros((4, 4), dtype=np.uint16)
+    ys, xs = flood_fill(grid, 4, 0, 1)
+    assert len(ys) == 0 and not grid.any()
+
+
+def test_rectangle_and_line():
+    grid = np.zeros((5, 6), dtype=np.uint16)
+    ys, xs = fill_rectangle(grid, 4, 3, 1, 1, 2)
+    assert len(ys) == 12 and (grid[1:4, 1:5] == 2).all() and grid.sum() == 24
+
+    # Clipped to the grid, only the cells not holding the tile yet are returned
+    ys, xs = fill_rectangle(grid, -3, -3, 1, 1, 2)
+    assert len(ys) == 3
+
+    grid[:] = 0
+    ys, xs = draw_line(grid, 0, 0, 5, 2, 1)
+    assert sorted(zip(ys.tolist(), xs.tolist())) == [(0, 0), (0, 1), (1, 2), (1, 3), (2, 4), (2, 5)]
+
+
+def test_copy_and_paste_stamp():
+    grid = np.arange(30, dtype=np.uint16).reshape(5, 6)
+    stamp = copy_stamp(grid, 1, 1, 2, 3)
+    assert stamp.shape == (3, 2)
+
+    target = np.zeros((5, 6), dtype=np.uint16)
+    ys, xs = paste_stamp(target, stamp, 4, 3)
+    # Clipped: two rows and two columns fit
+    assert target[3:5, 4:6].tolist() == stamp[:2].tolist()
+    assert len(ys) == 4 and target.sum() == stamp[:2].sum()
+
+
+if __name__ == '__main__':
+    for test in (test_flood_fill_matches_reference, test_flood_fill_outside_the_grid,
+                 test_rectangle_and_line, test_copy_and_paste_stamp):
+        test()
+    print("All map tool tests passed")